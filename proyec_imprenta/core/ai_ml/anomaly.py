@@ -7,26 +7,42 @@ Método: z-score por cliente.
 
 También detecta anomalías de frecuencia: clientes que de repente piden
 muchos más (o muchos menos) pedidos de lo habitual.
+
+El historial se lee una sola vez (o se toma de los momentos mensuales de
+EstadisticaMontoCliente en modo incremental); media y desvío por cliente se
+calculan con operaciones agrupadas de NumPy y todos los pedidos recientes se
+puntúan en un único paso vectorizado.
 """
 from __future__ import annotations
 
-import statistics
+import logging
 from datetime import timedelta
 
-from django.db.models import Avg, Count, StdDev, Sum
+import numpy as np
+from django.db.models import Max, Sum
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
 UMBRAL_ZSCORE    = 2.5   # desvíos estándar para marcar anomalía
 MIN_MUESTRAS     = 5     # mínimo de pedidos históricos para aplicar z-score
 DIAS_RECIENTES   = 30    # ventana de pedidos a analizar
 DIAS_HISTORICOS  = 365   # ventana de historial para calcular estadísticas base
+# Más de lo que dura cualquier transacción: pasado este tiempo no aparece ningún pedido con id menor
+MARGEN_CONFIRMACION = timedelta(minutes=15)
 
 
-def detectar_anomalias_pedidos(dias: int = DIAS_RECIENTES) -> list[dict]:
+def detectar_anomalias_pedidos(dias: int = DIAS_RECIENTES, incremental: bool = False) -> list[dict]:
     """
     Retorna una lista de pedidos recientes que presentan valores anómalos
     (monto muy alto o muy bajo respecto al historial del cliente).
 
+    Args:
+        dias:        ventana de pedidos recientes a analizar.
+        incremental: si es True, las estadísticas base salen de
+                     EstadisticaMontoCliente (meses completos de la ventana
+                     histórica) en lugar de releer un año de pedidos.
+
     Returns:
         [
             {
@@ -51,39 +67,53 @@ def detectar_anomalias_pedidos(dias: int = DIAS_RECIENTES) -> list[dict]:
     desde_rec  = ahora - timedelta(days=dias)
     desde_hist = ahora - timedelta(days=DIAS_HISTORICOS)
 
-    pedidos_recientes = (Pedido.objects
-                         .filter(fecha_pedido__gte=desde_rec.date())
-                         .select_related('cliente')
-                         .values('id', 'cliente_id', 'total', 'fecha_pedido'))
+    recientes = list(Pedido.objects
+                     .filter(fecha_pedido__gte=desde_rec.date())
+                     .values_list('id', 'cliente_id', 'monto_total', 'fecha_pedido'))
+    if not recientes:
+        return []
 
-    anomalias = []
+    cids_rec = np.array([r[1] for r in recientes], dtype=np.int64)
+    montos_rec = np.array([float(r[2] or 0) for r in recientes], dtype=np.float64)
+
+    if incremental:
+        clientes, n, media, std = _estadisticas_desde_buckets(
+            np.unique(cids_rec), _periodo(desde_hist), _periodo(desde_rec)
+        )
+    else:
+        clientes, n, media, std = _estadisticas_desde_pedidos(
+            np.unique(cids_rec), desde_hist, desde_rec
+        )
+
+    if not len(clientes):
+        return []
 
-    # Agrupa estadísticas por cliente (evita N consultas)
-    stats_por_cliente: dict[int, dict] = {}
-
-    for pedido in pedidos_recientes:
-        cid = pedido['cliente_id']
-        if cid not in stats_por_cliente:
-            stats_por_cliente[cid] = _estadisticas_cliente(cid, desde_hist, desde_rec)
-
-        st = stats_por_cliente[cid]
-        if st['n'] < MIN_MUESTRAS or st['std'] == 0:
-            continue  # insuficientes datos o sin variabilidad
-
-        monto = float(pedido['total'] or 0)
-        zscore = (monto - st['media']) / st['std']
-
-        if abs(zscore) >= UMBRAL_ZSCORE:
-            anomalias.append({
-                'pedido_id':      pedido['id'],
-                'cliente_id':     cid,
-                'tipo_anomalia':  'monto_alto' if zscore > 0 else 'monto_bajo',
-                'valor_actual':   round(monto, 2),
-                'valor_esperado': round(st['media'], 2),
-                'desvio_estandar': round(st['std'], 2),
-                'zscore':         round(zscore, 3),
-                'fecha':          pedido['fecha_pedido'],
-            })
+    # Alinear cada pedido reciente con las estadísticas de su cliente
+    pos = np.minimum(np.searchsorted(clientes, cids_rec), len(clientes) - 1)
+    con_stats = clientes[pos] == cids_rec
+    n_ped = np.where(con_stats, n[pos], 0)
+    media_ped = np.where(con_stats, media[pos], 0.0)
+    std_ped = np.where(con_stats, std[pos], 0.0)
+
+    # Insuficientes datos o sin variabilidad → no se evalúa
+    evaluable = (n_ped >= MIN_MUESTRAS) & (std_ped > 0)
+    zscore = np.zeros(len(recientes))
+    np.divide(montos_rec - media_ped, std_ped, out=zscore, where=evaluable)
+    marcados = np.flatnonzero(evaluable & (np.abs(zscore) >= UMBRAL_ZSCORE))
+
+    anomalias = []
+    for i in marcados:
+        z = float(zscore[i])
+        anomalias.append({
+            'pedido_id':      recientes[i][0],
+            'cliente_id':     int(cids_rec[i]),
+            'tipo_anomalia':  'monto_alto' if z > 0 else 'monto_bajo',
+            'valor_actual':   round(float(montos_rec[i]), 2),
+            'valor_esperado': round(float(media_ped[i]), 2),
+            'desvio_estandar': round(float(std_ped[i]), 2),
+            'zscore':         round(z, 3),
+            'fecha':          recientes[i][3],
+        })
 
     anomalias.sort(key=lambda x: abs(x['zscore']), reverse=True)
     return anomalias
@@ -94,63 +124,321 @@ def detectar_anomalias_stock(umbral_pct: float = 0.8) -> list[dict]:
     Detecta insumos cuyo stock cayó más de `umbral_pct` respecto al stock
     mínimo sugerido en los últimos 7 días (señal de consumo extraordinario).
 
+    El stock mínimo se resuelve como Insumo.stock_minimo_sugerido, pero con
+    una única consulta agrupada de consumos para los insumos sin valor
+    pre-calculado (en lugar de una por insumo).
+
     Returns:
         [{'insumo_id', 'insumo_nombre', 'stock_actual', 'stock_minimo',
           'ratio', 'severidad'}, ...]
     """
     try:
-        from insumos.models import Insumo
+        from insumos.models import ConsumoMensualInsumo, Insumo, periodo_inicio_anual
     except ImportError:
         return []
 
-    anomalias = []
-    for insumo in Insumo.objects.filter(activo=True).only(
-        'idInsumo', 'nombre', 'stock', 'stock_minimo_sugerido'
-    ):
-        minimo = int(insumo.stock_minimo_sugerido or 0)
-        if minimo == 0:
-            continue
-        stock = int(insumo.stock or 0)
-        ratio = stock / minimo
-        if ratio <= (1 - umbral_pct):
-            anomalias.append({
-                'insumo_id':     insumo.idInsumo,
-                'insumo_nombre': insumo.nombre,
-                'stock_actual':  stock,
-                'stock_minimo':  minimo,
-                'ratio':         round(ratio, 3),
-                'severidad':     'critica' if stock == 0 else 'alta',
-            })
+    filas = list(Insumo.objects.filter(activo=True).values_list(
+        'idInsumo', 'nombre', 'stock', 'stock_minimo_calculado', 'stock_minimo_manual'
+    ))
+    if not filas:
+        return []
+
+    sin_calculo = [f[0] for f in filas if f[3] is None]
+    consumo_anual = {}
+    dias_reposicion = 15
+    if sin_calculo:
+        consumo_anual = dict(
+            ConsumoMensualInsumo.objects
+            .filter(insumo_id__in=sin_calculo, periodo__gte=periodo_inicio_anual())
+            .values('insumo_id')
+            .annotate(total=Sum('total'))
+            .order_by()
+            .values_list('insumo_id', 'total')
+        )
+        if consumo_anual:
+            try:
+                from configuracion.models import Parametro
+                dias_reposicion = int(Parametro.get('DIAS_REPOSICION_INSUMO', 15))
+            except Exception:
+                dias_reposicion = 15
+
+    minimos = np.array([
+        _stock_minimo(f, consumo_anual.get(f[0]) or 0, dias_reposicion) for f in filas
+    ], dtype=np.int64)
+    stocks = np.array([int(f[2] or 0) for f in filas], dtype=np.int64)
+
+    ratio = np.zeros(len(filas))
+    np.divide(stocks, minimos, out=ratio, where=minimos > 0)
+    marcados = np.flatnonzero((minimos > 0) & (ratio <= (1 - umbral_pct)))
+
+    anomalias = [{
+        'insumo_id':     filas[i][0],
+        'insumo_nombre': filas[i][1],
+        'stock_actual':  int(stocks[i]),
+        'stock_minimo':  int(minimos[i]),
+        'ratio':         round(float(ratio[i]), 3),
+        'severidad':     'critica' if stocks[i] == 0 else 'alta',
+    } for i in marcados]
 
     anomalias.sort(key=lambda x: x['ratio'])
     return anomalias
 
 
 # --------------------------------------------------------------------------- #
-# Helpers internos                                                              #
+# Modo incremental                                                              #
 # --------------------------------------------------------------------------- #
 
-def _estadisticas_cliente(cliente_id: int, desde: 'datetime', hasta: 'datetime') -> dict:
-    """Calcula media y desv. estándar del monto de pedidos históricos."""
-    try:
-        from pedidos.models import Pedido
-        montos = list(
-            Pedido.objects
-            .filter(
-                cliente_id=cliente_id,
-                fecha_pedido__gte=desde.date(),
-                fecha_pedido__lt=hasta.date(),
-            )
-            .values_list('total', flat=True)
+def actualizar_estadisticas_incrementales() -> dict:
+    """
+    Incorpora a EstadisticaMontoCliente los pedidos de la ventana que todavía
+    no están incorporados y descarta los meses que salieron de ella.
+
+    Incorporados son los de id <= EstadisticaMontoEstado.hasta_pedido_id y los
+    que figuran en EstadisticaMontoPedido: se compara contra ese conjunto, no
+    contra el mayor id visto, así que un pedido con id menor que se confirma
+    después (bulk_create en otra transacción) igual se levanta. Sólo se leen
+    los pedidos por encima de la marca: cada corrida cuesta lo que llegó desde
+    la anterior, no un año de historial. Los save()/delete() de Pedido ya se
+    aplican al momento con aplicar_cambio_pedido(); esta pasada levanta lo que
+    no dispara signals (bulk_create) y reconstruir_estadisticas() corrige los
+    update(). Ambas corren desde automatizacion.tasks.tarea_estadisticas_anomalias.
+
+    Returns:
+        {'pedidos': int, 'meses_actualizados': int, 'meses_expirados': int}
+    """
+    from django.db import transaction
+    from automatizacion.models import EstadisticaMontoCliente, EstadisticaMontoEstado, EstadisticaMontoPedido
+    from pedidos.models import Pedido
+
+    ahora = timezone.now()
+    periodo_min = _periodo(ahora - timedelta(days=DIAS_HISTORICOS))
+    with transaction.atomic():
+        estado, _ = EstadisticaMontoEstado.objects.select_for_update().get_or_create(pk=1)
+        expirados, _ = EstadisticaMontoCliente.objects.filter(periodo__lt=periodo_min).delete()
+
+        nuevos = list(Pedido.objects
+                      .filter(id__gt=estado.hasta_pedido_id, fecha_pedido__gte=_primer_dia(periodo_min))
+                      .exclude(id__in=EstadisticaMontoPedido.objects.values('pedido_id'))
+                      .values_list('id', 'cliente_id', 'monto_total', 'fecha_pedido'))
+        meses = _incorporar(nuevos) if nuevos else 0
+        EstadisticaMontoPedido.objects.bulk_create(
+            [EstadisticaMontoPedido(pedido_id=p[0]) for p in nuevos],
+            batch_size=1000,
+        )
+
+        # La marca avanza hasta el candidato de una pasada anterior una vez
+        # vencido el margen: para entonces esta lectura ya vio todo id menor.
+        if estado.candidato_en is not None and ahora - estado.candidato_en >= MARGEN_CONFIRMACION:
+            estado.hasta_pedido_id = max(estado.hasta_pedido_id, estado.candidato_id)
+            estado.candidato_en = None
+            EstadisticaMontoPedido.objects.filter(pedido_id__lte=estado.hasta_pedido_id).delete()
+        if estado.candidato_en is None:
+            estado.candidato_id = Pedido.objects.aggregate(m=Max('id'))['m'] or 0
+            estado.candidato_en = ahora
+        estado.save()
+    return {'pedidos': len(nuevos), 'meses_actualizados': meses, 'meses_expirados': expirados}
+
+
+def _incorporar(nuevos) -> int:
+    """Suma (id, cliente_id, monto, fecha) a los momentos de su mes. Retorna los meses tocados."""
+    from automatizacion.models import EstadisticaMontoCliente
+
+    # Clave compuesta cliente × mes para agrupar en NumPy
+    claves = np.array(
+        [p[1] * 1_000_000 + p[3].year * 100 + p[3].month for p in nuevos], dtype=np.int64
+    )
+    montos = np.array([float(p[2] or 0) for p in nuevos], dtype=np.float64)
+    uniq, _inv, n, suma, m2 = _momentos_por_grupo(claves, montos)
+
+    lote = {}
+    for k, cnt, s, q in zip(uniq.tolist(), n.tolist(), suma.tolist(), m2.tolist()):
+        cliente_id, yyyymm = divmod(k, 1_000_000)
+        lote[(cliente_id, f"{yyyymm // 100:04d}-{yyyymm % 100:02d}")] = (cnt, s, q)
+
+    existentes = {
+        (e.cliente_id, e.periodo): e
+        for e in EstadisticaMontoCliente.objects.filter(
+            cliente_id__in={c for c, _ in lote}, periodo__in={p for _, p in lote},
         )
-        montos = [float(m) for m in montos if m is not None]
-        n = len(montos)
-        if n < 2:
-            return {'n': n, 'media': 0.0, 'std': 0.0}
-        return {
-            'n':     n,
-            'media': statistics.mean(montos),
-            'std':   statistics.stdev(montos),
-        }
-    except Exception:
-        return {'n': 0, 'media': 0.0, 'std': 0.0}
+    }
+    crear, actualizar = [], []
+    for (cliente_id, periodo), (cnt, s, q) in lote.items():
+        e = existentes.get((cliente_id, periodo))
+        if e is None:
+            crear.append(EstadisticaMontoCliente(cliente_id=cliente_id, periodo=periodo, n=cnt, suma=s, m2=q))
+            continue
+        # Combinación de momentos (Chan et al.): estable sin releer el mes
+        n_ab = e.n + cnt
+        delta = s / cnt - (e.suma / e.n if e.n else 0.0)
+        e.m2 = e.m2 + q + delta * delta * e.n * cnt / n_ab
+        e.n = n_ab
+        e.suma = e.suma + s
+        actualizar.append(e)
+
+    EstadisticaMontoCliente.objects.bulk_create(crear, batch_size=500)
+    EstadisticaMontoCliente.objects.bulk_update(actualizar, ['n', 'suma', 'm2', 'actualizado'], batch_size=500)
+    return len(crear) + len(actualizar)
+
+
+def reconstruir_estadisticas() -> dict:
+    """Descarta EstadisticaMontoCliente y la recalcula desde los pedidos de la ventana, en una transacción."""
+    from django.db import transaction
+    from automatizacion.models import EstadisticaMontoCliente, EstadisticaMontoEstado, EstadisticaMontoPedido
+
+    with transaction.atomic():
+        # El lock de la marca serializa contra la pasada incremental y los signals
+        EstadisticaMontoEstado.objects.select_for_update().filter(pk=1).delete()
+        EstadisticaMontoPedido.objects.all().delete()
+        EstadisticaMontoCliente.objects.all().delete()
+        return actualizar_estadisticas_incrementales()
+
+
+def aplicar_cambio_pedido(pedido_id: int, previo, actual) -> None:
+    """
+    Aplica a EstadisticaMontoCliente el alta, cambio o baja de un pedido.
+    `previo` y `actual` son (cliente_id, monto_total, fecha_pedido) o None
+    (alta o baja): se quita la muestra previa de su mes y se suma la nueva
+    con la actualización de Welford, sin releer el mes.
+
+    Antes de la primera carga (sin EstadisticaMontoEstado) no hace nada: el
+    pedido lo toma actualizar_estadisticas_incrementales(). Un alta queda
+    registrada como incorporada; el cambio o la baja de un pedido que la
+    pasada todavía no incorporó se ignora, porque ésta leerá su valor actual.
+    """
+    from django.db import transaction
+    from automatizacion.models import EstadisticaMontoCliente, EstadisticaMontoEstado, EstadisticaMontoPedido
+
+    with transaction.atomic():
+        hasta = EstadisticaMontoEstado.objects.filter(pk=1).values_list('hasta_pedido_id', flat=True).first()
+        if hasta is None:
+            return
+        if previo is None:
+            if pedido_id > hasta:
+                EstadisticaMontoPedido.objects.get_or_create(pedido_id=pedido_id)
+        elif pedido_id > hasta and not EstadisticaMontoPedido.objects.filter(pedido_id=pedido_id).exists():
+            return
+        desde = _primer_dia(_periodo(timezone.now() - timedelta(days=DIAS_HISTORICOS)))
+
+        if previo is not None and previo[2] >= desde:
+            cliente_id, monto, fecha = previo
+            e = (EstadisticaMontoCliente.objects.select_for_update()
+                 .filter(cliente_id=cliente_id, periodo=_periodo(fecha), n__gt=0).first())
+            if e is not None:
+                x = float(monto or 0)
+                media = e.suma / e.n
+                e.n -= 1
+                e.suma -= x
+                e.m2 = max(0.0, e.m2 - (x - media) * (x - e.suma / e.n)) if e.n else 0.0
+                if not e.n:
+                    e.suma = 0.0
+                e.save(update_fields=['n', 'suma', 'm2', 'actualizado'])
+
+        if actual is not None and actual[2] >= desde:
+            cliente_id, monto, fecha = actual
+            e, _ = (EstadisticaMontoCliente.objects.select_for_update()
+                    .get_or_create(cliente_id=cliente_id, periodo=_periodo(fecha)))
+            x = float(monto or 0)
+            media = e.suma / e.n if e.n else 0.0
+            e.n += 1
+            e.suma += x
+            e.m2 += (x - media) * (x - e.suma / e.n)
+            e.save(update_fields=['n', 'suma', 'm2', 'actualizado'])
+
+# --------------------------------------------------------------------------- #
+# Helpers internos                                                              #
+# --------------------------------------------------------------------------- #
+
+def _momentos_por_grupo(claves: np.ndarray, valores: np.ndarray):
+    """
+    n, suma y M2 (suma de cuadrados de desvíos) por clave, en dos pasadas
+    vectorizadas (la segunda sobre la media del grupo, numéricamente estable).
+    """
+    uniq, inv = np.unique(claves, return_inverse=True)
+    n = np.bincount(inv, minlength=len(uniq))
+    suma = np.bincount(inv, weights=valores, minlength=len(uniq))
+    media = suma / n
+    m2 = np.bincount(inv, weights=(valores - media[inv]) ** 2, minlength=len(uniq))
+    return uniq, inv, n, suma, m2
+
+
+def _resumir(n: np.ndarray, suma: np.ndarray, m2: np.ndarray):
+    """Media y desvío muestral (ddof=1); con n < 2 ambos son 0, como statistics.stdev."""
+    hay = n >= 2
+    media = np.where(hay, suma / np.maximum(n, 1), 0.0)
+    std = np.sqrt(np.where(hay, m2 / np.maximum(n - 1, 1), 0.0))
+    return media, std
+
+
+def _estadisticas_desde_pedidos(cliente_ids: np.ndarray, desde, hasta):
+    """Una consulta al historial de los clientes dados; estadísticas agrupadas en NumPy."""
+    from pedidos.models import Pedido
+
+    historial = list(Pedido.objects
+                     .filter(cliente_id__in=cliente_ids.tolist(),
+                             fecha_pedido__gte=desde.date(),
+                             fecha_pedido__lt=hasta.date(),
+                             monto_total__isnull=False)
+                     .values_list('cliente_id', 'monto_total'))
+    if not historial:
+        vacio = np.array([], dtype=np.int64)
+        return vacio, vacio, np.array([]), np.array([])
+
+    claves = np.array([h[0] for h in historial], dtype=np.int64)
+    montos = np.array([float(h[1]) for h in historial], dtype=np.float64)
+    clientes, _inv, n, suma, m2 = _momentos_por_grupo(claves, montos)
+    media, std = _resumir(n, suma, m2)
+    return clientes, n, media, std
+
+
+def _estadisticas_desde_buckets(cliente_ids: np.ndarray, periodo_desde: str, periodo_hasta: str):
+    """
+    Combina los meses [periodo_desde, periodo_hasta) de EstadisticaMontoCliente
+    por cliente. La ventana histórica queda alineada a meses completos.
+    """
+    from automatizacion.models import EstadisticaMontoCliente
+
+    filas = list(EstadisticaMontoCliente.objects
+                 .filter(cliente_id__in=cliente_ids.tolist(),
+                         periodo__gte=periodo_desde, periodo__lt=periodo_hasta, n__gt=0)
+                 .values_list('cliente_id', 'n', 'suma', 'm2'))
+    if not filas:
+        vacio = np.array([], dtype=np.int64)
+        return vacio, vacio, np.array([]), np.array([])
+
+    claves = np.array([f[0] for f in filas], dtype=np.int64)
+    n_b = np.array([f[1] for f in filas], dtype=np.int64)
+    suma_b = np.array([f[2] for f in filas], dtype=np.float64)
+    m2_b = np.array([f[3] for f in filas], dtype=np.float64)
+
+    clientes, inv = np.unique(claves, return_inverse=True)
+    n = np.bincount(inv, weights=n_b, minlength=len(clientes)).astype(np.int64)
+    suma = np.bincount(inv, weights=suma_b, minlength=len(clientes))
+    media_tot = suma / n
+    # M2 total = Σ M2_mes + Σ n_mes·(media_mes − media_total)²
+    desvio_medias = suma_b / n_b - media_tot[inv]
+    m2 = np.bincount(inv, weights=m2_b + n_b * desvio_medias ** 2, minlength=len(clientes))
+    media, std = _resumir(n, suma, m2)
+    return clientes, n, media, std
+
+
+def _stock_minimo(fila, consumo_anual: int, dias_reposicion: int) -> int:
+    """Insumo.stock_minimo_sugerido sobre una fila ya cargada (sin queries)."""
+    _id, _nombre, _stock, calculado, manual = fila
+    if calculado is not None:
+        return int(calculado)
+    consumo_mensual = consumo_anual / 12 if consumo_anual > 0 else 0
+    if consumo_mensual > 0:
+        return round(consumo_mensual * dias_reposicion / 30)
+    if manual is not None:
+        return int(manual)
+    return 0
+
+
+def _periodo(dt) -> str:
+    return dt.strftime('%Y-%m')
+
+
+def _primer_dia(periodo: str):
+    from datetime import date
+    anio, mes = periodo.split('-')
+    return date(int(anio), int(mes), 1)
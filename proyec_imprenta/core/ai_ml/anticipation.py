@@ -5,7 +5,7 @@ Detecta ANTES de que el stock caiga al mínimo si una compra será necesaria,
 basándose en la tendencia de consumo de los últimos N meses.
 
 Algoritmo:
-    1. Recupera consumos mensuales (ConsumoRealInsumo) del insumo.
+    1. Recupera consumos mensuales (ConsumoMensualInsumo) del insumo.
     2. Calcula tasa de consumo diario (promedio ponderado: meses recientes pesan más).
     3. Estima días hasta agotar stock: stock_actual / consumo_diario.
     4. Compara con lead_time del proveedor + buffer de seguridad.
@@ -47,7 +47,7 @@ def anticipar_compras(insumo_id: int, demanda_predicha: float) -> dict | None:
         }
     """
     try:
-        from insumos.models import Insumo, ConsumoRealInsumo
+        from insumos.models import Insumo, ConsumoMensualInsumo
         from configuracion.models import Parametro
         from django.utils import timezone
     except ImportError as e:
@@ -72,16 +72,7 @@ def anticipar_compras(insumo_id: int, demanda_predicha: float) -> dict | None:
     # Consumos de los últimos N meses
     hoy = timezone.now().date()
     periodos = _periodos_anteriores(hoy, meses_hist)
-    consumos_qs = (
-        ConsumoRealInsumo.objects
-        .filter(insumo_id=insumo_id, periodo__in=periodos)
-        .values('periodo', 'cantidad_consumida')
-    )
-    consumos_por_periodo: dict = {}
-    for c in consumos_qs:
-        consumos_por_periodo[c['periodo']] = (
-            consumos_por_periodo.get(c['periodo'], 0) + c['cantidad_consumida']
-        )
+    consumos_por_periodo = ConsumoMensualInsumo.totales(insumo_id, periodos)
 
     # Tasa de consumo diario con decaimiento: meses más recientes pesan más
     # peso = 1 / (1 + antiguedad_meses)
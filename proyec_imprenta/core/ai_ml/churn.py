@@ -8,13 +8,20 @@ Utiliza reglas heurísticas sobre el historial de pedidos:
 
 No requiere modelos ML entrenados; funciona con los datos ya disponibles
 en la BD.  Para integrar un modelo supervisado en el futuro, reemplazar
-`_score_heuristico()` con una llamada al modelo serializado.
+`_puntuar()` con una llamada al modelo serializado.
+
+Las métricas de todos los clientes se obtienen con una única consulta
+agrupada (último pedido, frecuencia y monto de las ventanas 0–3 y 3–6
+meses) y el scoring se calcula con arrays NumPy; el costo en queries no
+depende de la cantidad de clientes.
 """
 from __future__ import annotations
 
 from datetime import timedelta
+from typing import Iterable, Iterator
 
-from django.db.models import Count, Sum
+import numpy as np
+from django.db.models import Count, Max, Q, Sum
 from django.utils import timezone
 
 
@@ -42,122 +49,164 @@ def detectar_riesgo_churn(cliente_id: int) -> dict:
             'freq_anterior': int,    # pedidos en los 3 meses previos
         }
     """
-    try:
-        from pedidos.models import Pedido
-    except ImportError:
-        return {'cliente_id': cliente_id, 'riesgo': 'bajo', 'score': 0.0,
-                'motivos': ['Sin acceso al modelo Pedido'], 'dias_inactivo': 0,
-                'freq_reciente': 0, 'freq_anterior': 0}
-
-    ahora = timezone.now()
+    return _evaluar_lote([cliente_id])[0]
 
-    # --- Último pedido ---
-    ultimo = (Pedido.objects
-              .filter(cliente_id=cliente_id)
-              .order_by('-fecha_pedido')
-              .values('fecha_pedido')
-              .first())
-    if not ultimo:
-        return {'cliente_id': cliente_id, 'riesgo': 'alto', 'score': 1.0,
-                'motivos': ['Sin pedidos registrados'], 'dias_inactivo': -1,
-                'freq_reciente': 0, 'freq_anterior': 0}
-
-    dias_inactivo = (ahora.date() - ultimo['fecha_pedido']).days
-
-    # --- Frecuencia y valor por período ---
-    hace_3m  = ahora - timedelta(days=90)
-    hace_6m  = ahora - timedelta(days=180)
-
-    def _stats(desde, hasta):
-        qs = Pedido.objects.filter(
-            cliente_id=cliente_id,
-            fecha_pedido__gte=desde.date(),
-            fecha_pedido__lt=hasta.date(),
-        )
-        agg = qs.aggregate(total=Count('id'), monto=Sum('total'))
-        return agg['total'] or 0, float(agg['monto'] or 0)
-
-    freq_rec,  monto_rec  = _stats(hace_3m, ahora)
-    freq_ant,  monto_ant  = _stats(hace_6m, hace_3m)
-
-    # --- Scoring heurístico ---
-    score   = 0.0
-    motivos = []
-
-    # Inactividad
-    if dias_inactivo >= DIAS_INACTIVO_ALTO:
-        score  += 0.5
-        motivos.append(f'Inactivo hace {dias_inactivo} días (≥ {DIAS_INACTIVO_ALTO})')
-    elif dias_inactivo >= DIAS_INACTIVO_MEDIO:
-        score  += 0.25
-        motivos.append(f'Inactivo hace {dias_inactivo} días (≥ {DIAS_INACTIVO_MEDIO})')
-
-    # Caída de frecuencia
-    if freq_ant > 0:
-        caida_freq = 1 - freq_rec / freq_ant
-        if caida_freq > CAIDA_FREQ_UMBRAL:
-            score  += 0.25
-            motivos.append(
-                f'Frecuencia cayó {caida_freq:.0%} '
-                f'({freq_ant} → {freq_rec} pedidos en 3 meses)'
-            )
-    elif freq_rec == 0:
-        score  += 0.15
-        motivos.append('Sin pedidos en los últimos 6 meses')
-
-    # Caída de valor
-    if monto_ant > 0:
-        caida_val = 1 - monto_rec / monto_ant
-        if caida_val > CAIDA_VALOR_UMBRAL:
-            score  += 0.20
-            motivos.append(
-                f'Monto cayó {caida_val:.0%} '
-                f'(${monto_ant:.0f} → ${monto_rec:.0f})'
-            )
 
-    score = min(1.0, score)
-    if score >= 0.6:
-        riesgo = 'alto'
-    elif score >= 0.3:
-        riesgo = 'medio'
-    else:
-        riesgo = 'bajo'
-
-    return {
-        'cliente_id':   cliente_id,
-        'riesgo':       riesgo,
-        'score':        round(score, 3),
-        'motivos':      motivos or ['Sin señales de alerta'],
-        'dias_inactivo': dias_inactivo,
-        'freq_reciente': freq_rec,
-        'freq_anterior': freq_ant,
-    }
-
-
-def detectar_churn_masivo(solo_activos: bool = True) -> list[dict]:
+def detectar_churn_masivo(solo_activos: bool = True,
+                          cliente_ids: Iterable[int] | None = None) -> list[dict]:
     """
     Evalúa el riesgo de churn para todos los clientes activos.
 
+    Args:
+        solo_activos: limita la evaluación a clientes con estado 'Activo'.
+        cliente_ids:  subconjunto opcional de clientes a evaluar.
+
     Returns:
-        Lista ordenada de mayor a menor score, excluyendo los de riesgo 'bajo'
-        si solo hay pocos con riesgo.
+        Lista ordenada de mayor a menor score.
+    """
+    resultados = []
+    for lote in iterar_churn(solo_activos=solo_activos, cliente_ids=cliente_ids):
+        resultados.extend(lote)
+    resultados.sort(key=lambda x: x['score'], reverse=True)
+    return resultados
+
+
+def iterar_churn(solo_activos: bool = True,
+                 cliente_ids: Iterable[int] | None = None,
+                 tam_lote: int = 2000) -> Iterator[list[dict]]:
+    """
+    Versión streaming de detectar_churn_masivo: entrega los resultados en
+    lotes de hasta `tam_lote` clientes (orden por id, sin ordenar por score),
+    para que el dashboard pueda ir mostrando resultados sin esperar al total.
+    Cada lote cuesta una consulta agrupada.
     """
     try:
         from clientes.models import Cliente
     except ImportError:
-        return []
+        return
 
     qs = Cliente.objects.all()
     if solo_activos:
-        qs = qs.filter(activo=True)
+        qs = qs.filter(estado='Activo')
+    if cliente_ids is not None:
+        qs = qs.filter(id__in=list(cliente_ids))
+    ids = list(qs.order_by('id').values_list('id', flat=True))
+
+    for i in range(0, len(ids), tam_lote):
+        yield _evaluar_lote(ids[i:i + tam_lote])
+
+
+# --------------------------------------------------------------------------- #
+# Cálculo vectorizado                                                          #
+# --------------------------------------------------------------------------- #
+
+def _evaluar_lote(ids: list[int]) -> list[dict]:
+    """Evalúa un conjunto de clientes con una sola consulta agrupada."""
+    from pedidos.models import Pedido
+
+    ahora = timezone.now()
+    hoy = ahora.date()
+    hace_3m = (ahora - timedelta(days=90)).date()
+    hace_6m = (ahora - timedelta(days=180)).date()
+
+    reciente = Q(fecha_pedido__gte=hace_3m, fecha_pedido__lt=hoy)
+    anterior = Q(fecha_pedido__gte=hace_6m, fecha_pedido__lt=hace_3m)
+    filas = {
+        r['cliente_id']: r
+        for r in (Pedido.objects
+                  .filter(cliente_id__in=ids)
+                  .values('cliente_id')
+                  .annotate(
+                      ultimo=Max('fecha_pedido'),
+                      freq_rec=Count('id', filter=reciente),
+                      monto_rec=Sum('monto_total', filter=reciente),
+                      freq_ant=Count('id', filter=anterior),
+                      monto_ant=Sum('monto_total', filter=anterior),
+                  )
+                  .order_by())
+    }
+
+    n = len(ids)
+    tiene = np.zeros(n, dtype=bool)
+    dias = np.full(n, -1, dtype=np.int64)
+    freq_rec = np.zeros(n, dtype=np.int64)
+    freq_ant = np.zeros(n, dtype=np.int64)
+    monto_rec = np.zeros(n, dtype=np.float64)
+    monto_ant = np.zeros(n, dtype=np.float64)
+    for i, cid in enumerate(ids):
+        r = filas.get(cid)
+        if r is None or r['ultimo'] is None:
+            continue
+        tiene[i] = True
+        dias[i] = (hoy - r['ultimo']).days
+        freq_rec[i] = r['freq_rec'] or 0
+        freq_ant[i] = r['freq_ant'] or 0
+        monto_rec[i] = float(r['monto_rec'] or 0)
+        monto_ant[i] = float(r['monto_ant'] or 0)
+
+    return _puntuar(ids, tiene, dias, freq_rec, freq_ant, monto_rec, monto_ant)
+
+
+def _puntuar(ids, tiene, dias, freq_rec, freq_ant, monto_rec, monto_ant) -> list[dict]:
+    """Scoring heurístico sobre arrays; arma los dicts de salida."""
+    inact_alto = dias >= DIAS_INACTIVO_ALTO
+    inact_medio = ~inact_alto & (dias >= DIAS_INACTIVO_MEDIO)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        caida_freq = np.where(freq_ant > 0, 1 - freq_rec / np.maximum(freq_ant, 1), 0.0)
+        caida_val = np.where(monto_ant > 0, 1 - monto_rec / np.where(monto_ant > 0, monto_ant, 1), 0.0)
+    alerta_freq = (freq_ant > 0) & (caida_freq > CAIDA_FREQ_UMBRAL)
+    sin_pedidos_6m = (freq_ant == 0) & (freq_rec == 0)
+    alerta_val = (monto_ant > 0) & (caida_val > CAIDA_VALOR_UMBRAL)
+
+    # Mismo orden de sumas que la versión escalar (resultado en coma flotante idéntico)
+    score = np.where(inact_alto, 0.5, np.where(inact_medio, 0.25, 0.0))
+    score = score + np.where(alerta_freq, 0.25, np.where(sin_pedidos_6m, 0.15, 0.0))
+    score = score + np.where(alerta_val, 0.20, 0.0)
+    score = np.minimum(1.0, score)
 
     resultados = []
-    for cliente in qs.only('id'):
-        try:
-            r = detectar_riesgo_churn(cliente.id)
-            resultados.append(r)
-        except Exception:
+    for i, cid in enumerate(ids):
+        if not tiene[i]:
+            resultados.append({'cliente_id': cid, 'riesgo': 'alto', 'score': 1.0,
+                               'motivos': ['Sin pedidos registrados'], 'dias_inactivo': -1,
+                               'freq_reciente': 0, 'freq_anterior': 0})
             continue
 
-    resultados.sort(key=lambda x: x['score'], reverse=True)
+        d, fr, fa = int(dias[i]), int(freq_rec[i]), int(freq_ant[i])
+        motivos = []
+        if inact_alto[i]:
+            motivos.append(f'Inactivo hace {d} días (≥ {DIAS_INACTIVO_ALTO})')
+        elif inact_medio[i]:
+            motivos.append(f'Inactivo hace {d} días (≥ {DIAS_INACTIVO_MEDIO})')
+        if alerta_freq[i]:
+            motivos.append(
+                f'Frecuencia cayó {float(caida_freq[i]):.0%} '
+                f'({fa} → {fr} pedidos en 3 meses)'
+            )
+        elif sin_pedidos_6m[i]:
+            motivos.append('Sin pedidos en los últimos 6 meses')
+        if alerta_val[i]:
+            motivos.append(
+                f'Monto cayó {float(caida_val[i]):.0%} '
+                f'(${float(monto_ant[i]):.0f} → ${float(monto_rec[i]):.0f})'
+            )
+
+        s = float(score[i])
+        if s >= 0.6:
+            riesgo = 'alto'
+        elif s >= 0.3:
+            riesgo = 'medio'
+        else:
+            riesgo = 'bajo'
+
+        resultados.append({
+            'cliente_id':   cid,
+            'riesgo':       riesgo,
+            'score':        round(s, 3),
+            'motivos':      motivos or ['Sin señales de alerta'],
+            'dias_inactivo': d,
+            'freq_reciente': fr,
+            'freq_anterior': fa,
+        })
     return resultados
@@ -15,10 +15,11 @@ Model: Ridge regression (robusto con pocos datos de series temporales cortas).
 """
 import logging
 import os
-import pickle
 
 import numpy as np
 
+from core.ai_ml.registro import registro
+
 logger = logging.getLogger(__name__)
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'modelo_demanda_insumo.pkl')
@@ -29,27 +30,32 @@ _warned_missing = False
 
 
 def cargar_modelo():
-    global _model, _warned_missing
-    if _model is None:
-        if not os.path.exists(MODEL_PATH):
-            if not _warned_missing:
-                _warned_missing = True
-                logger.warning(
-                    "Motor ML de demanda de insumos INACTIVO: modelo no encontrado en '%s'. "
-                    "Ejecuta: python manage.py entrenar_modelo_demanda_insumo",
-                    MODEL_PATH,
-                )
-            raise FileNotFoundError(MODEL_PATH)
-        with open(MODEL_PATH, 'rb') as f:
-            _model = pickle.load(f)
-    return _model
+    """
+    Modelo vigente desde el registro (core/ai_ml/registro.py): prefiere el
+    artefacto .npz y lo recarga si el comando de entrenamiento lo reescribe.
+    _model permite inyectar un modelo en memoria (tests, benchmark).
+    """
+    global _warned_missing
+    if _model is not None:
+        return _model
+    try:
+        return registro.obtener('demanda_insumo', MODEL_PATH)
+    except FileNotFoundError:
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning(
+                "Motor ML de demanda de insumos INACTIVO: modelo no encontrado en '%s'. "
+                "Ejecuta: python manage.py entrenar_modelo_demanda_insumo",
+                MODEL_PATH,
+            )
+        raise
 
 
 def predecir_demanda_ml(insumo_id: int, periodo_actual: str) -> float | None:
     """
     Predice la demanda del insumo para el período indicado usando el modelo ML.
 
-    Recupera los 3 meses previos de ConsumoRealInsumo como features.
+    Recupera los 3 meses previos de ConsumoMensualInsumo como features.
     Si no hay datos suficientes devuelve None para que el llamador use
     el fallback de media móvil.
 
@@ -66,7 +72,7 @@ def predecir_demanda_ml(insumo_id: int, periodo_actual: str) -> float | None:
         return None
 
     try:
-        from insumos.models import Insumo, ConsumoRealInsumo
+        from insumos.models import Insumo, ConsumoMensualInsumo
         insumo = Insumo.objects.get(idInsumo=insumo_id)
 
         año, mes = map(int, periodo_actual.split('-'))
@@ -79,16 +85,7 @@ def predecir_demanda_ml(insumo_id: int, periodo_actual: str) -> float | None:
                 y -= 1
             periodos_prev.append(f"{y:04d}-{m:02d}")
 
-        qs = (
-            ConsumoRealInsumo.objects
-            .filter(insumo_id=insumo_id, periodo__in=periodos_prev)
-            .values('periodo', 'cantidad_consumida')
-        )
-        por_periodo = {}
-        for row in qs:
-            por_periodo[row['periodo']] = (
-                por_periodo.get(row['periodo'], 0) + row['cantidad_consumida']
-            )
+        por_periodo = ConsumoMensualInsumo.totales(insumo_id, periodos_prev)
 
         consumos = [float(por_periodo.get(p, 0)) for p in periodos_prev]
         # Si los tres meses previos son cero, no hay base para predecir
@@ -0,0 +1,26 @@
+"""
+Utilidades compartidas de inferencia por lote para los modelos de core/ai_ml.
+
+Los modelos scikit-learn amortizan su costo fijo (validación, conversión a
+array, dispatch) por llamada a predict(); armar la matriz de todos los
+registros y predecir una sola vez es órdenes de magnitud más barato que
+llamar a predict() fila por fila.
+"""
+import numpy as np
+
+
+def matriz_features(filas, features: list, default) -> np.ndarray:
+    """
+    Convierte filas en un array float 2-D de forma (n, len(features)).
+
+    filas: np.ndarray ya armado, lista de listas en el orden de `features`,
+           o lista de dicts (las claves ausentes toman `default`).
+    """
+    if isinstance(filas, np.ndarray):
+        return filas.astype(float, copy=False).reshape(-1, len(features))
+    filas = list(filas)
+    if filas and not isinstance(filas[0], dict):
+        return np.asarray(filas, dtype=float).reshape(-1, len(features))
+    return np.array(
+        [[fila.get(f, default) for f in features] for fila in filas], dtype=float
+    ).reshape(-1, len(features))
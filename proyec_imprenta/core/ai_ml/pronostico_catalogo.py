@@ -0,0 +1,208 @@
+"""
+Pronóstico de demanda de todo el catálogo sobre una matriz insumos × períodos.
+
+Las funciones por insumo de insumos/models.py (predecir_demanda_media_movil,
+predecir_demanda_ets) y DemandaInteligenteEngine._factor_estacional consultan
+la base una vez por insumo. MatrizConsumos carga ConsumoMensualInsumo de
+todos los insumos en una sola consulta a dos matrices densas — total consumido
+y cantidad de registros por (insumo, período) — y resuelve cada método para
+el catálogo completo con unas pocas operaciones por columna:
+
+    - Media móvil ponderada: producto de la ventana por el vector de pesos.
+    - ETS: una pasada por período de la ventana (12) sobre todos los insumos.
+    - Factor estacional: pesos por año a partir de un cumsum de años con datos.
+
+Los resultados son idénticos a los de las funciones escalares: las sumas se
+hacen en enteros, el orden de las operaciones de punto flotante es el mismo y
+np.round redondea igual que round() (mitad al par). Los insumos sin datos
+devuelven NaN donde la versión escalar devuelve None.
+"""
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MatrizConsumos:
+    """
+    Consumos mensuales de un conjunto de insumos en forma matricial.
+
+        insumo_ids: array (I,) con el idInsumo de cada fila.
+        periodos:   lista de P períodos 'YYYY-MM' en orden cronológico.
+        totales:    int64 (I, P), suma consumida de cada celda.
+        conteos:    int64 (I, P), registros de consumo de cada celda.
+    """
+
+    def __init__(self, insumo_ids, periodos, totales, conteos):
+        self.insumo_ids = np.asarray(insumo_ids, dtype=np.int64)
+        self.periodos = list(periodos)
+        self.totales = totales
+        self.conteos = conteos
+        self._columna = {p: j for j, p in enumerate(self.periodos)}
+
+    @classmethod
+    def desde_filas(cls, insumo_ids, filas, periodos=None):
+        """
+        Arma la matriz desde ternas (insumo_id, periodo, total, n).
+
+        Sin `periodos` las columnas son los períodos presentes en `filas`.
+        Las filas de insumos o períodos fuera de la matriz se ignoran.
+        """
+        filas = list(filas)
+        if periodos is None:
+            periodos = sorted({f[1] for f in filas})
+        ids = np.asarray(insumo_ids, dtype=np.int64)
+        totales = np.zeros((len(ids), len(periodos)), dtype=np.int64)
+        conteos = np.zeros_like(totales)
+        if filas and len(ids) and len(periodos):
+            def columna_de_filas(k):
+                return np.fromiter((f[k] for f in filas), dtype=np.int64, count=len(filas))
+
+            columna_de = {p: j for j, p in enumerate(periodos)}
+            columna = np.fromiter((columna_de.get(f[1], -1) for f in filas), dtype=np.int64, count=len(filas))
+            iids = columna_de_filas(0)
+            # Fila de cada insumo_id sin un dict de Python: búsqueda binaria sobre los ids ordenados
+            orden = np.argsort(ids, kind='stable')
+            fila = orden[np.minimum(np.searchsorted(ids, iids, sorter=orden), len(ids) - 1)]
+            validas = (columna >= 0) & (ids[fila] == iids)
+            celda = (fila[validas], columna[validas])
+            np.add.at(totales, celda, columna_de_filas(2)[validas])
+            np.add.at(conteos, celda, columna_de_filas(3)[validas])
+        return cls(ids, periodos, totales, conteos)
+
+    @classmethod
+    def cargar(cls, insumo_ids, desde=None):
+        """
+        Una consulta a ConsumoMensualInsumo para todos los `insumo_ids`.
+        `desde` ('YYYY-MM') acota el historial; sin él se carga completo.
+        """
+        from insumos.models import ConsumoMensualInsumo
+
+        qs = ConsumoMensualInsumo.objects.order_by()
+        if desde is not None:
+            qs = qs.filter(periodo__gte=desde)
+        # Sin filtro por insumo: una lista IN de miles de ids cuesta más que
+        # descartar en memoria las filas de insumos fuera del conjunto.
+        filas = qs.values_list('insumo_id', 'periodo', 'total', 'n')
+        return cls.desde_filas(list(insumo_ids), filas)
+
+    def _columnas(self, periodos):
+        """Posición de cada período presente en la matriz: [(indice_en_periodos, columna)]."""
+        return [(k, self._columna[p]) for k, p in enumerate(periodos) if p in self._columna]
+
+    # ------------------------------------------------------------------ #
+    # Métodos de pronóstico                                                #
+    # ------------------------------------------------------------------ #
+
+    def media_movil(self, periodo_actual: str, meses: int = 3) -> np.ndarray:
+        """predecir_demanda_media_movil() para cada fila (NaN = sin datos en la ventana)."""
+        from insumos.models import periodos_previos
+
+        presentes = self._columnas(periodos_previos(periodo_actual, meses))
+        columnas = [j for _k, j in presentes]
+        pesos = np.array([meses - k for k, _j in presentes], dtype=np.int64)
+        suma_ponderada = self.totales[:, columnas] @ pesos
+        suma_pesos = self.conteos[:, columnas] @ pesos
+
+        resultado = np.full(len(self.insumo_ids), np.nan)
+        con_datos = suma_pesos > 0
+        resultado[con_datos] = np.round(suma_ponderada[con_datos] / suma_pesos[con_datos])
+        return resultado
+
+    def ets(self, periodo_actual: str, alpha: float) -> np.ndarray:
+        """
+        predecir_demanda_ets() para cada fila con `alpha` ya resuelto
+        (insumos.models.alpha_ets). NaN = sin datos en los 12 meses previos.
+        """
+        from insumos.models import periodos_ets
+
+        n_filas = len(self.insumo_ids)
+        nivel = np.full(n_filas, np.nan)
+        iniciado = np.zeros(n_filas, dtype=bool)
+        for _k, j in self._columnas(periodos_ets(periodo_actual)):
+            n = self.conteos[:, j]
+            con_dato = n > 0
+            valor = np.zeros(n_filas)
+            np.divide(self.totales[:, j], n, out=valor, where=con_dato)
+            seguir = con_dato & iniciado
+            nivel[seguir] = alpha * valor[seguir] + (1 - alpha) * nivel[seguir]
+            primero = con_dato & ~iniciado
+            nivel[primero] = valor[primero]
+            iniciado |= con_dato
+        return np.round(nivel)
+
+    def factor_estacional(self, mes_actual: int) -> np.ndarray:
+        """
+        DemandaInteligenteEngine._factor_estacional() para cada fila, sobre el
+        historial cargado en la matriz (idéntico si se cargó sin `desde`).
+        """
+        n_filas = len(self.insumo_ids)
+        factor = np.ones(n_filas)
+        if not self.periodos:
+            return factor
+
+        # Peso de cada año por insumo: 1 al más antiguo con datos, N al más reciente
+        años, año_de_columna = np.unique(
+            np.array([int(p[:4]) for p in self.periodos]), return_inverse=True
+        )
+        registros_por_año = np.zeros((n_filas, len(años)), dtype=np.int64)
+        np.add.at(registros_por_año.T, año_de_columna, self.conteos.T)
+        con_datos = registros_por_año > 0
+        peso_año = np.cumsum(con_datos, axis=1) * con_datos
+        peso = peso_año[:, año_de_columna]
+
+        ponderado = self.totales * peso
+        pesos = self.conteos * peso
+        del_mes = np.array([p.endswith(f'-{mes_actual:02d}') for p in self.periodos])
+        suma_pond_gral = ponderado.sum(axis=1)
+        suma_pesos_gral = pesos.sum(axis=1)
+        suma_pond_mes = ponderado[:, del_mes].sum(axis=1)
+        suma_pesos_mes = pesos[:, del_mes].sum(axis=1)
+
+        validos = (
+            (self.conteos.sum(axis=1) >= 3)
+            & (suma_pesos_gral > 0) & (suma_pond_gral != 0) & (suma_pesos_mes > 0)
+        )
+        avg_general = suma_pond_gral[validos] / suma_pesos_gral[validos]
+        avg_mes = suma_pond_mes[validos] / suma_pesos_mes[validos]
+        factor[validos] = np.clip(avg_mes / avg_general, 0.5, 2.5)
+        return factor
+
+    def total_anual(self, periodo_actual: str = None) -> np.ndarray:
+        """ConsumoMensualInsumo.total_anual() para cada fila."""
+        from insumos.models import periodo_inicio_anual
+
+        inicio = periodo_inicio_anual(periodo_actual)
+        columnas = [j for p, j in self._columna.items() if p >= inicio]
+        return self.totales[:, columnas].sum(axis=1)
+
+
+def stock_minimo_sugerido(calculado, manual, consumo_anual, dias_reposicion: int) -> np.ndarray:
+    """
+    Insumo.stock_minimo_sugerido vectorizado.
+
+    calculado, manual: arrays float con NaN donde el campo es None.
+    consumo_anual:     total de los últimos 12 períodos (MatrizConsumos.total_anual).
+    """
+    consumo_mensual = np.asarray(consumo_anual, dtype=np.int64) / 12
+    resultado = np.where(np.isnan(manual), 0.0, manual)
+    por_consumo = consumo_mensual > 0
+    resultado[por_consumo] = np.round(consumo_mensual[por_consumo] * dias_reposicion / 30)
+    hay_calculado = ~np.isnan(calculado)
+    resultado[hay_calculado] = calculado[hay_calculado]
+    return resultado.astype(np.int64)
+
+
+def desde_para_ventana(periodo_actual: str, meses: int) -> str:
+    """
+    Primer período que necesitan media_movil(meses), ets() y total_anual()
+    para `periodo_actual`: el argumento `desde` de MatrizConsumos.cargar().
+    """
+    from insumos.models import periodo_inicio_anual, periodos_ets, periodos_previos
+
+    return min(
+        periodos_previos(periodo_actual, meses)
+        + periodos_ets(periodo_actual)
+        + [periodo_inicio_anual(periodo_actual)]
+    )
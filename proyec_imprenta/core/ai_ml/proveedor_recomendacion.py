@@ -7,9 +7,12 @@ def recomendar_proveedor(insumo_id=None):
     """
     Recomienda el mejor proveedor activo.
 
-    Intenta usar el modelo ML para calcular el score de cada proveedor
-    (5 features: precio_relativo, cumplimiento, incidencias, disponibilidad, latencia).
-    Si el pkl no existe, cae al motor de reglas.
+    Arma la matriz proveedores × 5 features (precio_relativo, cumplimiento,
+    incidencias, disponibilidad, latencia) con
+    ProveedorInteligenteEngine._features_batch() — un número fijo de queries
+    sin importar cuántos proveedores haya — y la puntúa con una sola llamada
+    al modelo ML. Si el modelo no está disponible, puntúa la misma matriz con
+    la fórmula de pesos del motor de reglas.
 
     Args:
         insumo_id: PK del Insumo para evaluar en contexto (None = global).
@@ -18,9 +21,10 @@ def recomendar_proveedor(insumo_id=None):
         Instancia del Proveedor recomendado, o None si no hay proveedores activos.
     """
     try:
+        import numpy as np
         from proveedores.models import Proveedor
         from core.motor.proveedor_engine import ProveedorInteligenteEngine
-        from core.ai_ml.score_proveedor import predecir_score_proveedor
+        from core.ai_ml.score_proveedor import predecir_scores_proveedores
 
         insumo = None
         if insumo_id is not None:
@@ -32,28 +36,14 @@ def recomendar_proveedor(insumo_id=None):
         if not proveedores:
             return None
 
-        mejor = None
-        mejor_score = -1.0
-        for p in proveedores:
-            try:
-                feats = {
-                    'precio_relativo':  engine._precio_relativo(p, insumo),
-                    'cumplimiento':     engine._cumplimiento(p),
-                    'incidencias':      engine._incidencias(p),
-                    'disponibilidad':   engine._disponibilidad(p, insumo),
-                    'latencia':         engine._latencia_promedio_dias(p),
-                }
-                score = predecir_score_proveedor(feats)
-            except FileNotFoundError:
-                # Fallback a reglas si el modelo no está entrenado
-                score = engine.calcular_score(p, insumo)
-            except Exception:
-                score = engine.calcular_score(p, insumo)
-
-            if score > mejor_score:
-                mejor_score = score
-                mejor = p
-        return mejor
+        X = engine._features_batch(proveedores, insumo)
+        try:
+            scores = predecir_scores_proveedores(X)
+        except Exception:
+            # FileNotFoundError: modelo no entrenado → fallback a reglas
+            scores = engine._scores_desde_features(X)
+
+        # argmax devuelve el primero entre empatados (mismo desempate que antes)
+        return proveedores[int(np.argmax(scores))]
     except Exception:
         return None
-
@@ -121,9 +121,9 @@ def calcular_ranking_clientes() -> dict:
 
     # Modelo ML opcional
     try:
-        from core.ai_ml.valor_cliente import predecir_valor_cliente
+        from core.ai_ml.valor_cliente import predecir_valor_clientes
     except Exception:
-        predecir_valor_cliente = None
+        predecir_valor_clientes = None
 
     actualizado_count = 0
 
@@ -156,7 +156,9 @@ def calcular_ranking_clientes() -> dict:
         peso_crit = float(Parametro.get('RANKING_PESO_CONSUMO_CRITICO', 10)) / 100.0
         peso_margen = float(Parametro.get('RANKING_PESO_MARGEN', 25)) / 100.0
         peso_sum = max(0.0001, peso_cant + peso_valor + peso_freq + peso_crit + peso_margen)
-        _clientes_scores = {}  # acumular para bulk update al final del loop
+        filas = []  # (cliente_id, score, metricas) → persistencia por lotes
+        parciales = []  # (cliente_id, cant, score_reglas, metricas)
+        features_ml = []
 
         for cliente_id, m in cliente_metrics.items():
             total_norm = m['total'] / max_total
@@ -176,98 +178,49 @@ def calcular_ranking_clientes() -> dict:
                 4,
             ) * 100.0
 
-            if predecir_valor_cliente:
-                features = {
-                    'total_compras': m['total'],
-                    'frecuencia': m['freq'],
-                    'margen': margen_norm,
-                    'ofertas_aceptadas': m['ofertas_aceptadas'],
-                }
-                try:
-                    score_ml = predecir_valor_cliente(features)
-                    score = 0.5 * score_reglas + 0.5 * score_ml
-                except Exception:
-                    score = score_reglas
+            # Orden de valor_cliente.FEATURES
+            features_ml.append((m['total'], m['freq'], margen_norm, m['ofertas_aceptadas']))
+            parciales.append((cliente_id, m['cant'], score_reglas, {
+                'total_norm': round(total_norm, 4),
+                'cant_norm': round(cant_norm, 4),
+                'freq_norm': round(freq_norm, 4),
+                'crit_norm': round(crit_norm, 4),
+                'margen_norm': round(margen_norm, 4),
+            }))
+
+        # Una sola llamada al modelo para toda la cohorte
+        scores_ml = None
+        if predecir_valor_clientes:
+            try:
+                scores_ml = predecir_valor_clientes(features_ml)
+            except Exception:
+                scores_ml = None
+
+        for i, (cliente_id, cant, score_reglas, metricas) in enumerate(parciales):
+            if scores_ml is not None:
+                score = 0.5 * score_reglas + 0.5 * float(scores_ml[i])
             else:
                 score = score_reglas
 
-            if m['cant'] > 0 and score < 10:
+            if cant > 0 and score < 10:
                 score = 10.0
             score = round(min(score, 100.0), 2)
+            filas.append((cliente_id, score, metricas))
 
-            RankingCliente.objects.update_or_create(
-                cliente_id=cliente_id,
-                defaults={'score': score},
-            )
-            _clientes_scores[cliente_id] = score
-
-            previo = (
-                RankingHistorico.objects
-                .filter(cliente_id=cliente_id)
-                .order_by('-generado')
-                .first()
-            )
-            variacion = 0.0
-            if previo and previo.periodo != periodo_str:
-                variacion = round(score - float(previo.score), 4)
-
-            RankingHistorico.objects.update_or_create(
-                cliente_id=cliente_id,
-                periodo=periodo_str,
-                defaults={
-                    'score': score,
-                    'variacion': variacion,
-                    'metricas': {
-                        'total_norm': round(total_norm, 4),
-                        'cant_norm': round(cant_norm, 4),
-                        'freq_norm': round(freq_norm, 4),
-                        'crit_norm': round(crit_norm, 4),
-                        'margen_norm': round(margen_norm, 4),
-                    },
-                },
-            )
-            actualizado_count += 1
-
-        # Bulk update puntaje_estrategico para todos los clientes con pedidos (una sola query)
-        if _clientes_scores:
-            from django.db.models import Case, When, Value, FloatField
-            Cliente.objects.filter(id__in=_clientes_scores.keys()).update(
-                puntaje_estrategico=Case(
-                    *[When(id=cid, then=Value(float(s))) for cid, s in _clientes_scores.items()],
-                    output_field=FloatField(),
-                ),
-                fecha_ultima_actualizacion=now,
-            )
+        actualizado_count += _persistir_ranking(filas, periodo_str, now)
 
     # --- Clientes sin pedidos en la ventana ---
     # Se les asigna un score mínimo configurable (por defecto 5) para que
     # aparezcan en el ranking y no queden con datos obsoletos indefinidamente.
     ids_con_pedidos = set(cliente_metrics.keys())
-    clientes_sin_pedidos = Cliente.objects.filter(estado='Activo').exclude(id__in=ids_con_pedidos)
-    _ids_sin_pedidos = []
-    for cliente in clientes_sin_pedidos.iterator(chunk_size=500):
-        RankingCliente.objects.update_or_create(
-            cliente_id=cliente.id,
-            defaults={'score': score_sin_pedidos},
-        )
-        _ids_sin_pedidos.append(cliente.id)
-        RankingHistorico.objects.update_or_create(
-            cliente_id=cliente.id,
-            periodo=periodo_str,
-            defaults={
-                'score': score_sin_pedidos,
-                'variacion': 0.0,
-                'metricas': {'sin_pedidos_en_ventana': True},
-            },
-        )
-        actualizado_count += 1
-
-    # Bulk update puntaje_estrategico para clientes sin pedidos (una sola query)
-    if _ids_sin_pedidos:
-        Cliente.objects.filter(id__in=_ids_sin_pedidos).update(
-            puntaje_estrategico=score_sin_pedidos,
-            fecha_ultima_actualizacion=now,
-        )
+    ids_sin_pedidos = list(
+        Cliente.objects.filter(estado='Activo').exclude(id__in=ids_con_pedidos)
+        .values_list('id', flat=True)
+    )
+    actualizado_count += _persistir_ranking(
+        [(cid, score_sin_pedidos, {'sin_pedidos_en_ventana': True}) for cid in ids_sin_pedidos],
+        periodo_str, now, con_variacion=False,
+    )
 
     return {'actualizados': actualizado_count, 'periodo': periodo_str}
 
@@ -276,6 +229,81 @@ def calcular_ranking_clientes() -> dict:
 # Helpers internos
 # ---------------------------------------------------------------------------
 
+TAM_LOTE_PERSISTENCIA = 500
+
+
+def _persistir_ranking(filas: list, periodo_str: str, now, con_variacion: bool = True) -> int:
+    """
+    Persiste RankingCliente, RankingHistorico y Cliente.puntaje_estrategico
+    por lotes de TAM_LOTE_PERSISTENCIA clientes: por lote, una query para el
+    último histórico de cada cliente, dos upserts (bulk_create con
+    update_conflicts) y un bulk_update de Cliente.
+
+    filas: [(cliente_id, score, metricas), ...]
+    Retorna la cantidad de clientes persistidos.
+    """
+    from clientes.models import Cliente
+    from automatizacion.models import RankingCliente, RankingHistorico
+
+    for i in range(0, len(filas), TAM_LOTE_PERSISTENCIA):
+        lote = filas[i:i + TAM_LOTE_PERSISTENCIA]
+        ids = [cid for cid, _score, _m in lote]
+        previos = _ultimo_historico_por_cliente(ids) if con_variacion else {}
+
+        historicos = []
+        for cid, score, metricas in lote:
+            variacion = 0.0
+            previo = previos.get(cid)
+            if previo and previo[0] != periodo_str:
+                variacion = round(score - float(previo[1]), 4)
+            historicos.append(RankingHistorico(
+                cliente_id=cid, periodo=periodo_str, score=score,
+                variacion=variacion, metricas=metricas,
+            ))
+
+        RankingCliente.objects.bulk_create(
+            [RankingCliente(cliente_id=cid, score=score) for cid, score, _m in lote],
+            update_conflicts=True,
+            unique_fields=['cliente'],
+            update_fields=['score', 'actualizado'],
+        )
+        RankingHistorico.objects.bulk_create(
+            historicos,
+            update_conflicts=True,
+            unique_fields=['cliente', 'periodo'],
+            update_fields=['score', 'variacion', 'metricas'],
+        )
+        Cliente.objects.bulk_update(
+            [Cliente(id=cid, puntaje_estrategico=float(score), fecha_ultima_actualizacion=now)
+             for cid, score, _m in lote],
+            ['puntaje_estrategico', 'fecha_ultima_actualizacion'],
+        )
+    return len(filas)
+
+
+def _ultimo_historico_por_cliente(cliente_ids: list) -> dict:
+    """
+    {cliente_id: (periodo, score)} del RankingHistorico más reciente de cada
+    cliente, en una sola query (ROW_NUMBER particionado por cliente).
+    """
+    from django.db.models import F, Window
+    from django.db.models.functions import RowNumber
+    from automatizacion.models import RankingHistorico
+
+    qs = (
+        RankingHistorico.objects
+        .filter(cliente_id__in=cliente_ids)
+        .annotate(orden=Window(
+            expression=RowNumber(),
+            partition_by=[F('cliente_id')],
+            order_by=[F('generado').desc(), F('id').desc()],
+        ))
+        .filter(orden=1)
+        .values_list('cliente_id', 'periodo', 'score')
+    )
+    return {cid: (periodo, score) for cid, periodo, score in qs}
+
+
 def _actualizar_max_historico(codigo: str, valor_cohort: float) -> float:
     """
     Devuelve el máximo entre el valor histórico guardado en Parametro y el
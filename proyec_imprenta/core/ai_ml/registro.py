@@ -0,0 +1,329 @@
+"""
+Registro de modelos ML: carga segura, memoria compartida y recarga en caliente.
+
+Formato de artefacto (`<modelo>.npz`, junto al .pkl):
+    Un .npz sin compresión con los coeficientes del modelo como arrays NumPy
+    y un array `meta` (JSON en bytes) con tipo, versión y features. No se usa
+    pickle (`allow_pickle=False`), así que cargar un artefacto no ejecuta
+    código. Como los miembros se guardan sin comprimir, cada array se mapea
+    en memoria (np.memmap) directamente desde el archivo: todos los procesos
+    gunicorn/Celery comparten las mismas páginas del page cache.
+
+    Tipos soportados:
+        'lineal' — Ridge / LinearRegression (coef_, intercept_).
+        'gbr'    — GradientBoostingRegressor: árboles aplanados y evaluados
+                   de forma vectorizada con NumPy.
+
+Recarga en caliente:
+    registro.obtener() compara el mtime del artefacto como máximo cada
+    ML_MODELOS_CHECK_SEGUNDOS; si los comandos entrenar_modelo_* lo
+    reescribieron, el modelo se recarga sin reiniciar el proceso.
+
+Si el .npz no existe se usa el .pkl (formato anterior, con pickle).
+
+Métricas: registro.metricas() → versión, formato, tiempo de carga y
+cantidad de recargas por modelo.
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import pickle
+import struct
+import threading
+import time
+import zipfile
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+_CHECK_SEGUNDOS_DEFAULT = 10
+
+
+def _check_segundos() -> float:
+    try:
+        from django.conf import settings
+        return float(getattr(settings, 'ML_MODELOS_CHECK_SEGUNDOS', _CHECK_SEGUNDOS_DEFAULT))
+    except Exception:
+        return _CHECK_SEGUNDOS_DEFAULT
+
+
+def ruta_npz(ruta_pkl: str) -> str:
+    return os.path.splitext(ruta_pkl)[0] + '.npz'
+
+
+# --------------------------------------------------------------------------- #
+# Evaluadores NumPy                                                            #
+# --------------------------------------------------------------------------- #
+
+class ModeloLineal:
+    """y = X·coef + intercept."""
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.coef = arrays['coef']
+        self.intercept = float(arrays['intercept'][0])
+        self.meta = meta
+
+    def predict(self, X) -> np.ndarray:
+        return np.asarray(X, dtype=float) @ self.coef + self.intercept
+
+
+class ModeloGBR:
+    """
+    Ensamble de árboles de regresión (GradientBoostingRegressor):
+        y = init + learning_rate · Σ hoja_t(X)
+
+    Los árboles se guardan apilados en matrices (n_arboles, max_nodos) y se
+    recorren todos a la vez, un nivel por iteración.
+    """
+
+    _LOTE_FILAS = 10000  # acota la matriz (filas × árboles) de nodos activos
+
+    def __init__(self, arrays: dict, meta: dict):
+        self.izq = arrays['izq']
+        self.der = arrays['der']
+        self.feature = arrays['feature']
+        self.umbral = arrays['umbral']
+        self.valor = arrays['valor']
+        self.init = float(arrays['init'][0])
+        self.learning_rate = float(meta['learning_rate'])
+        self.profundidad = int(meta['profundidad'])
+        self.meta = meta
+
+    def predict(self, X) -> np.ndarray:
+        # sklearn compara en float32 contra umbrales float64
+        X = np.asarray(X, dtype=np.float32)
+        salida = np.empty(len(X))
+        arboles = np.arange(self.izq.shape[0])
+        for i in range(0, len(X), self._LOTE_FILAS):
+            bloque = X[i:i + self._LOTE_FILAS]
+            filas = np.arange(len(bloque))[:, None]
+            nodo = np.zeros((len(bloque), len(arboles)), dtype=np.int32)
+            for _ in range(self.profundidad):
+                izq = self.izq[arboles, nodo]
+                hoja = izq < 0
+                va_izq = bloque[filas, np.maximum(self.feature[arboles, nodo], 0)] <= self.umbral[arboles, nodo]
+                nodo = np.where(hoja, nodo, np.where(va_izq, izq, self.der[arboles, nodo]))
+            salida[i:i + len(bloque)] = self.valor[arboles, nodo].sum(axis=1)
+        return self.init + self.learning_rate * salida
+
+
+_EVALUADORES = {'lineal': ModeloLineal, 'gbr': ModeloGBR}
+
+
+# --------------------------------------------------------------------------- #
+# Exportación                                                                  #
+# --------------------------------------------------------------------------- #
+
+def exportar_npz(modelo, ruta: str, features: list | None = None, version: str | None = None) -> str:
+    """
+    Exporta un modelo scikit-learn entrenado al formato .npz del registro.
+    Escribe a un temporal y lo renombra (os.replace), así los lectores nunca
+    ven un archivo a medio escribir.
+
+    Raises:
+        ValueError si el tipo de modelo no está soportado.
+    """
+    meta = {
+        'version': version or datetime.now().strftime('%Y%m%d%H%M%S'),
+        'features': list(features or []),
+        'clase': type(modelo).__name__,
+    }
+    if hasattr(modelo, 'estimators_') and hasattr(modelo, 'learning_rate'):
+        arrays = _aplanar_gbr(modelo, meta)
+        meta['tipo'] = 'gbr'
+    elif hasattr(modelo, 'coef_') and hasattr(modelo, 'intercept_'):
+        coef = np.asarray(modelo.coef_, dtype=float).ravel()
+        arrays = {'coef': coef, 'intercept': np.array([float(np.ravel(modelo.intercept_)[0])])}
+        meta['tipo'] = 'lineal'
+    else:
+        raise ValueError(f'Modelo no soportado para .npz: {type(modelo).__name__}')
+
+    arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+    tmp = f'{ruta}.tmp-{os.getpid()}'
+    with open(tmp, 'wb') as f:
+        np.savez(f, **arrays)  # sin compresión: requisito para mapear en memoria
+    os.replace(tmp, ruta)
+    return meta['version']
+
+
+def descartar_npz(ruta_pkl: str) -> None:
+    """
+    Borra el .npz de un modelo para que el registro vuelva al .pkl (en todos
+    los procesos, al próximo chequeo de mtime). Se usa cuando reentrenar
+    actualizó el .pkl pero no pudo exportar el .npz: el viejo tendría prioridad.
+    """
+    try:
+        os.remove(ruta_npz(ruta_pkl))
+    except FileNotFoundError:
+        pass
+
+
+def _aplanar_gbr(modelo, meta: dict) -> dict:
+    init = modelo.init_
+    if init == 'zero':
+        base = 0.0
+    elif hasattr(init, 'constant_'):
+        base = float(np.ravel(init.constant_)[0])
+    else:
+        raise ValueError('GradientBoostingRegressor con init no constante no soportado')
+
+    arboles = [est[0].tree_ for est in modelo.estimators_]
+    max_nodos = max(t.node_count for t in arboles)
+    n = len(arboles)
+    izq = np.full((n, max_nodos), -1, dtype=np.int32)
+    der = np.full((n, max_nodos), -1, dtype=np.int32)
+    feature = np.zeros((n, max_nodos), dtype=np.int32)
+    umbral = np.zeros((n, max_nodos), dtype=np.float64)
+    valor = np.zeros((n, max_nodos), dtype=np.float64)
+    for i, t in enumerate(arboles):
+        k = t.node_count
+        izq[i, :k] = t.children_left
+        der[i, :k] = t.children_right
+        feature[i, :k] = t.feature
+        umbral[i, :k] = t.threshold
+        valor[i, :k] = t.value[:, 0, 0]
+
+    meta['learning_rate'] = float(modelo.learning_rate)
+    meta['profundidad'] = int(max(t.max_depth for t in arboles))
+    return {
+        'izq': izq, 'der': der, 'feature': feature, 'umbral': umbral,
+        'valor': valor, 'init': np.array([base]),
+    }
+
+
+# --------------------------------------------------------------------------- #
+# Carga                                                                        #
+# --------------------------------------------------------------------------- #
+
+def cargar_npz(ruta: str):
+    """Carga un artefacto .npz del registro (memoria mapeada si es posible)."""
+    try:
+        arrays = _mapear_npz(ruta)
+    except Exception as e:
+        logger.debug('registro: no se pudo mapear %s (%s); lectura normal.', ruta, e)
+        with np.load(ruta, allow_pickle=False) as npz:
+            arrays = {k: npz[k] for k in npz.files}
+    meta = json.loads(bytes(arrays.pop('meta')).decode('utf-8'))
+    return _EVALUADORES[meta['tipo']](arrays, meta)
+
+
+def _mapear_npz(ruta: str) -> dict:
+    """
+    np.load ignora mmap_mode para .npz; los miembros sin compresión se mapean
+    a mano: offset del dato = encabezado local ZIP + encabezado .npy.
+    """
+    arrays = {}
+    with zipfile.ZipFile(ruta) as zf, open(ruta, 'rb') as f:
+        for info in zf.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f'{info.filename} está comprimido')
+            f.seek(info.header_offset)
+            local = f.read(30)
+            largo_nombre, largo_extra = struct.unpack('<HH', local[26:30])
+            f.seek(info.header_offset + 30 + largo_nombre + largo_extra)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError('arrays de objetos no permitidos')
+            nombre = info.filename[:-4] if info.filename.endswith('.npy') else info.filename
+            arrays[nombre] = np.memmap(
+                ruta, dtype=dtype, mode='r', offset=f.tell(), shape=shape,
+                order='F' if fortran else 'C',
+            )
+    return arrays
+
+
+class _Entrada:
+    __slots__ = ('modelo', 'ruta', 'mtime', 'formato', 'version', 'cargado_en',
+                 'tiempo_carga_ms', 'recargas', 'ultimo_chequeo')
+
+
+class RegistroModelos:
+    """Caché de modelos por proceso con recarga por mtime."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entradas: dict[str, _Entrada] = {}
+
+    def obtener(self, nombre: str, ruta_pkl: str):
+        """
+        Retorna el modelo `nombre`, cargándolo (o recargándolo) si hace falta.
+
+        Raises:
+            FileNotFoundError si no existe ni el .npz ni el .pkl.
+        """
+        entrada = self._entradas.get(nombre)
+        ahora = time.monotonic()
+        if entrada is not None and ahora - entrada.ultimo_chequeo < _check_segundos():
+            return entrada.modelo
+
+        with self._lock:
+            entrada = self._entradas.get(nombre)
+            ruta, formato = self._resolver_ruta(ruta_pkl)
+            mtime = os.stat(ruta).st_mtime_ns
+            if entrada is not None and entrada.ruta == ruta and entrada.mtime == mtime:
+                entrada.ultimo_chequeo = ahora
+                return entrada.modelo
+
+            t0 = time.perf_counter()
+            if formato == 'npz':
+                modelo = cargar_npz(ruta)
+                version = modelo.meta.get('version')
+            else:
+                with open(ruta, 'rb') as f:
+                    modelo = pickle.load(f)
+                version = datetime.fromtimestamp(mtime / 1e9).strftime('%Y%m%d%H%M%S')
+
+            nueva = _Entrada()
+            nueva.modelo = modelo
+            nueva.ruta = ruta
+            nueva.mtime = mtime
+            nueva.formato = formato
+            nueva.version = version
+            nueva.cargado_en = datetime.now().isoformat(timespec='seconds')
+            nueva.tiempo_carga_ms = round((time.perf_counter() - t0) * 1000, 3)
+            nueva.recargas = entrada.recargas + 1 if entrada is not None else 0
+            nueva.ultimo_chequeo = ahora
+            self._entradas[nombre] = nueva
+            if entrada is not None:
+                logger.info('registro: modelo %s recargado (versión %s, %s).', nombre, version, formato)
+            return modelo
+
+    def invalidar(self, nombre: str | None = None) -> None:
+        """Fuerza el chequeo de mtime en la próxima lectura."""
+        with self._lock:
+            for clave, entrada in self._entradas.items():
+                if nombre is None or clave == nombre:
+                    entrada.ultimo_chequeo = float('-inf')
+
+    def metricas(self) -> dict:
+        return {
+            nombre: {
+                'version': e.version,
+                'formato': e.formato,
+                'ruta': e.ruta,
+                'cargado_en': e.cargado_en,
+                'tiempo_carga_ms': e.tiempo_carga_ms,
+                'recargas': e.recargas,
+            }
+            for nombre, e in self._entradas.items()
+        }
+
+    @staticmethod
+    def _resolver_ruta(ruta_pkl: str) -> tuple[str, str]:
+        npz = ruta_npz(ruta_pkl)
+        if os.path.exists(npz):
+            return npz, 'npz'
+        if os.path.exists(ruta_pkl):
+            return ruta_pkl, 'pickle'
+        raise FileNotFoundError(ruta_pkl)
+
+
+registro = RegistroModelos()
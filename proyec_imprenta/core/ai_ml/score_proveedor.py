@@ -16,10 +16,11 @@ Model: GradientBoostingRegressor.
 """
 import logging
 import os
-import pickle
 
 import numpy as np
 
+from core.ai_ml.registro import registro
+
 logger = logging.getLogger(__name__)
 
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'modelo_score_proveedor.pkl')
@@ -30,20 +31,25 @@ _warned_missing = False
 
 
 def cargar_modelo():
-    global _model, _warned_missing
-    if _model is None:
-        if not os.path.exists(MODEL_PATH):
-            if not _warned_missing:
-                _warned_missing = True
-                logger.warning(
-                    "Motor ML de proveedores INACTIVO: modelo no encontrado en '%s'. "
-                    "Ejecuta: python manage.py entrenar_modelo_score_proveedor",
-                    MODEL_PATH,
-                )
-            raise FileNotFoundError(MODEL_PATH)
-        with open(MODEL_PATH, 'rb') as f:
-            _model = pickle.load(f)
-    return _model
+    """
+    Modelo vigente desde el registro (core/ai_ml/registro.py): prefiere el
+    artefacto .npz y lo recarga si el comando de entrenamiento lo reescribe.
+    _model permite inyectar un modelo en memoria (tests, benchmark).
+    """
+    global _warned_missing
+    if _model is not None:
+        return _model
+    try:
+        return registro.obtener('score_proveedor', MODEL_PATH)
+    except FileNotFoundError:
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning(
+                "Motor ML de proveedores INACTIVO: modelo no encontrado en '%s'. "
+                "Ejecuta: python manage.py entrenar_modelo_score_proveedor",
+                MODEL_PATH,
+            )
+        raise
 
 
 def predecir_score_proveedor(features_dict: dict) -> float:
@@ -57,7 +63,25 @@ def predecir_score_proveedor(features_dict: dict) -> float:
     Returns:
         float en [0, 100], o lanza FileNotFoundError si no hay modelo.
     """
+    return float(predecir_scores_proveedores([features_dict])[0])
+
+
+def predecir_scores_proveedores(filas) -> np.ndarray:
+    """
+    Predicción por lote: una única llamada a model.predict para todos los proveedores.
+
+    Args:
+        filas: matriz 2-D (n, 5) en el orden de FEATURES, o lista de dicts
+               como los de predecir_score_proveedor (faltantes = 0.5).
+
+    Returns:
+        np.ndarray de n scores en [0, 100], o lanza FileNotFoundError si no hay modelo.
+    """
+    from core.ai_ml.inferencia import matriz_features
+
     model = cargar_modelo()
-    X = np.array([[features_dict.get(f, 0.5) for f in FEATURES]])
+    X = matriz_features(filas, FEATURES, 0.5)
+    if not len(X):
+        return np.zeros(0)
     pred = model.predict(X)
-    return float(np.clip(pred[0], 0.0, 100.0))
+    return np.clip(np.asarray(pred, dtype=float), 0.0, 100.0)
@@ -1,14 +1,17 @@
 # Ejemplo: predicción de valor futuro de cliente usando un modelo ML entrenado (pickle)
 import logging
 import os
-import pickle
 
 import numpy as np
 
+from core.ai_ml.registro import registro
+
 logger = logging.getLogger(__name__)
 
 # Ruta al modelo entrenado (debes entrenarlo y exportarlo con scikit-learn)
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'modelo_valor_cliente.pkl')
+# Orden de los features según el entrenamiento
+FEATURES = ['total_compras', 'frecuencia', 'margen', 'ofertas_aceptadas']
 
 _model = None
 # Bandera para emitir el aviso de modelo ausente una sola vez por proceso,
@@ -17,21 +20,26 @@ _warned_missing = False
 
 
 def cargar_modelo():
-    global _model, _warned_missing
-    if _model is None:
-        if not os.path.exists(MODEL_PATH):
-            if not _warned_missing:
-                _warned_missing = True
-                logger.warning(
-                    "Motor ML de valor de cliente INACTIVO: modelo no encontrado en '%s'. "
-                    "El ranking operará sólo con scoring por reglas. "
-                    "Para activar el ML, entrena y exporta el modelo a esa ruta.",
-                    MODEL_PATH,
-                )
-            raise FileNotFoundError(MODEL_PATH)
-        with open(MODEL_PATH, 'rb') as f:
-            _model = pickle.load(f)
-    return _model
+    """
+    Modelo vigente desde el registro (core/ai_ml/registro.py): prefiere el
+    artefacto .npz y lo recarga si el comando de entrenamiento lo reescribe.
+    _model permite inyectar un modelo en memoria (tests, benchmark).
+    """
+    global _warned_missing
+    if _model is not None:
+        return _model
+    try:
+        return registro.obtener('valor_cliente', MODEL_PATH)
+    except FileNotFoundError:
+        if not _warned_missing:
+            _warned_missing = True
+            logger.warning(
+                "Motor ML de valor de cliente INACTIVO: modelo no encontrado en '%s'. "
+                "El ranking operará sólo con scoring por reglas. "
+                "Para activar el ML, entrena y exporta el modelo a esa ruta.",
+                MODEL_PATH,
+            )
+        raise
 
 def predecir_valor_cliente(features_dict):
     """
@@ -44,9 +52,24 @@ def predecir_valor_cliente(features_dict):
             ...
         }
     """
+    return float(predecir_valor_clientes([features_dict])[0])
+
+
+def predecir_valor_clientes(filas) -> np.ndarray:
+    """
+    Predicción por lote: una única llamada a model.predict para todos los clientes.
+
+    filas: matriz 2-D (n, len(FEATURES)) en el orden de FEATURES, o lista
+           de dicts como los de predecir_valor_cliente (faltantes = 0).
+
+    Returns:
+        np.ndarray de n scores.
+    """
+    from core.ai_ml.inferencia import matriz_features
+
     model = cargar_modelo()
-    # Ordenar los features según el entrenamiento
-    feature_names = ['total_compras', 'frecuencia', 'margen', 'ofertas_aceptadas']
-    X = np.array([[features_dict.get(f, 0) for f in feature_names]])
-    pred = model.predict(X)
-    return float(pred[0])
+    X = matriz_features(filas, FEATURES, 0)
+    if not len(X):
+        return np.zeros(0)
+    return np.asarray(model.predict(X), dtype=float)
+
@@ -3,6 +3,10 @@ Configuración centralizada del Motor de Procesos Inteligentes.
 
 Lee valores desde la BD (Parametro / ProveedorParametro) con fallback a defaults.
 Permite modificar el comportamiento del motor sin desplegar código.
+
+Ambas fuentes se leen del snapshot versionado de configuracion/snapshot.py:
+en régimen estable MotorConfig.get no hace queries, tampoco para claves que
+solo existen en DEFAULTS.
 """
 
 # Valores por defecto — se usan cuando la BD no tiene el parámetro
@@ -60,6 +64,10 @@ DEFAULTS = {
     'LATENCIA_MAX_DIAS': 30.0,
     # peso del criterio latencia en el score final
     'PESO_LATENCIA': 0.1,
+    # vigencia de ScoreProveedorInsumo (cache de scores por insumo) en minutos
+    'SCORE_CACHE_TTL_MINUTOS': 60,
+    # variación mínima de score (0-100) para reescribir ScoreProveedor
+    'SCORE_PROVEEDOR_DELTA_MIN': 0.5,
 }
 
 
@@ -8,6 +8,10 @@ Pipeline:
     3. Delega la evaluación de reglas al motor centralizado (core/ai_rules/rules_engine.py).
     4. Retorna lista de acciones con explicación e intervalo de confianza.
 
+    ejecutar() corre por defecto en modo batch: proyecciones, historial de
+    consumo y compras de todos los insumos se cargan en pocas queries y la
+    configuración se resuelve una sola vez por corrida.
+
 Retroalimentación:
     Registra consumo real en ConsumoRealInsumo para mejorar futuras predicciones.
 """
@@ -97,55 +101,62 @@ class DemandaInteligenteEngine(ProcesoInteligenteBase):
         - Factor acotado a [0.5, 2.5]; requiere al menos 3 registros para activarse.
         """
         try:
-            from insumos.models import ConsumoRealInsumo
-            from collections import defaultdict
+            from insumos.models import ConsumoMensualInsumo
 
-            consumos_vals = list(
-                ConsumoRealInsumo.objects
-                .filter(insumo=insumo)
-                .values_list('periodo', 'cantidad_consumida')
-            )
-            if len(consumos_vals) < 3:
-                return 1.0
-
-            # Calcular pesos por año: año más reciente obtiene mayor peso
-            años = sorted({int(str(p)[:4]) for p, c in consumos_vals if c is not None})
-            if not años:
-                return 1.0
-            peso_por_año = {a: i + 1 for i, a in enumerate(años)}  # año más antiguo=1, más reciente=N
-
-            # Promedio general ponderado por año
-            suma_pond_gral = 0.0
-            suma_pesos_gral = 0.0
-            mes_str = f'-{mes_actual:02d}'
-            suma_pond_mes = 0.0
-            suma_pesos_mes = 0.0
-
-            for periodo_str, c in consumos_vals:
-                if c is None:
-                    continue
-                año_val = int(str(periodo_str)[:4])
-                peso = peso_por_año.get(año_val, 1)
-                val = float(c)
-                suma_pond_gral  += val * peso
-                suma_pesos_gral += peso
-                if str(periodo_str).endswith(mes_str):
-                    suma_pond_mes  += val * peso
-                    suma_pesos_mes += peso
-
-            if suma_pesos_gral == 0 or suma_pond_gral == 0:
-                return 1.0
-            if suma_pesos_mes == 0:
-                return 1.0
-
-            avg_general = suma_pond_gral / suma_pesos_gral
-            avg_mes     = suma_pond_mes  / suma_pesos_mes
-            factor = avg_mes / avg_general
-            return min(2.5, max(0.5, factor))
+            consumos_vals = ConsumoMensualInsumo.serie(insumo)
+            return self._factor_estacional_desde_consumos(consumos_vals, mes_actual)
         except Exception as e:
             logger.warning("_factor_estacional [insumo=%s] error: %s", getattr(insumo, 'idInsumo', '?'), e)
             return 1.0
 
+    @staticmethod
+    def _factor_estacional_desde_consumos(consumos_vals, mes_actual: int) -> float:
+        """
+        Núcleo de _factor_estacional() sobre ternas (periodo, total, n) de
+        ConsumoMensualInsumo ya cargadas. Compartido por la ruta por insumo y
+        la ruta batch de ejecutar().
+
+        Cada registro de consumo cuenta por separado (n registros del período
+        aportan n veces su peso), igual que el cálculo sobre filas crudas.
+        """
+        if sum(n for _p, _t, n in consumos_vals) < 3:
+            return 1.0
+
+        # Calcular pesos por año: año más reciente obtiene mayor peso
+        años = sorted({int(str(p)[:4]) for p, t, n in consumos_vals if n})
+        if not años:
+            return 1.0
+        peso_por_año = {a: i + 1 for i, a in enumerate(años)}  # año más antiguo=1, más reciente=N
+
+        # Promedio general ponderado por año
+        suma_pond_gral = 0.0
+        suma_pesos_gral = 0.0
+        mes_str = f'-{mes_actual:02d}'
+        suma_pond_mes = 0.0
+        suma_pesos_mes = 0.0
+
+        for periodo_str, total, n in consumos_vals:
+            if not n:
+                continue
+            año_val = int(str(periodo_str)[:4])
+            peso = peso_por_año.get(año_val, 1)
+            val = float(total)
+            suma_pond_gral  += val * peso
+            suma_pesos_gral += n * peso
+            if str(periodo_str).endswith(mes_str):
+                suma_pond_mes  += val * peso
+                suma_pesos_mes += n * peso
+
+        if suma_pesos_gral == 0 or suma_pond_gral == 0:
+            return 1.0
+        if suma_pesos_mes == 0:
+            return 1.0
+
+        avg_general = suma_pond_gral / suma_pesos_gral
+        avg_mes     = suma_pond_mes  / suma_pesos_mes
+        factor = avg_mes / avg_general
+        return min(2.5, max(0.5, factor))
+
     # ------------------------------------------------------------------ #
     # Intervalo de confianza                                               #
     # ------------------------------------------------------------------ #
@@ -222,32 +233,58 @@ class DemandaInteligenteEngine(ProcesoInteligenteBase):
     # Motor de reglas (delega al motor centralizado)                       #
     # ------------------------------------------------------------------ #
 
-    def evaluar_reglas(self, insumo, demanda_predicha: int, factor_estacional: float = 1.0) -> list:
+    def _config_reglas(self) -> dict:
+        """
+        Resuelve los umbrales y caps de evaluar_reglas() desde MotorConfig.
+
+        ejecutar() en modo batch lo llama una sola vez por corrida en lugar de
+        repetir ~8 lecturas de configuración por insumo.
+        """
+        return {
+            'umbral_critico':      MotorConfig.get('DEMANDA_UMBRAL_CRITICO', cast=int) or 0,
+            'stock_minimo_global': MotorConfig.get('STOCK_MINIMO_GLOBAL', cast=int) or 10,
+            # Default 1.5: activar alerta preventiva al 150 % de la demanda proyectada,
+            # dando margen de reacción real antes de llegar al límite de stock.
+            'factor_preventivo':   MotorConfig.get('DEMANDA_FACTOR_PREVENTIVO', cast=float) or 1.5,
+            # ── Sanity caps para PYME — valores leídos desde Configuración ─────
+            'cap_max':    int(MotorConfig.get('DEMANDA_CAP_MENSUAL_MAX',      cast=int)   or 100),
+            'cap_piso':   int(MotorConfig.get('DEMANDA_CAP_MENSUAL_PISO',     cast=int)   or 5),
+            'cap_factor': float(MotorConfig.get('DEMANDA_CAP_FACTOR_DEMANDA', cast=float) or 2.0),
+            'cap_smin':   float(MotorConfig.get('DEMANDA_CAP_FACTOR_STOCK_MIN', cast=float) or 1.5),
+        }
+
+    def evaluar_reglas(self, insumo, demanda_predicha: int, factor_estacional: float = 1.0,
+                       config: dict | None = None, stock_minimo: int | None = None) -> list:
         """
         Delega la evaluación al motor centralizado core/ai_rules/rules_engine.py.
 
         Construye el contexto con los umbrales configurables desde BD y enrichece
         la salida con campos adicionales para compatibilidad con el dashboard.
+
+        config: umbrales pre-resueltos con _config_reglas() (None = leer de BD).
+        stock_minimo: stock mínimo sugerido pre-calculado (None = usar la property).
         """
         from core.ai_rules.rules_engine import evaluar_reglas as _evaluar_reglas
 
+        if config is None:
+            config = self._config_reglas()
+
         stock_actual  = int(insumo.stock or 0)
-        stock_minimo  = int(insumo.stock_minimo_sugerido or 0)
+        if stock_minimo is None:
+            stock_minimo = insumo.stock_minimo_sugerido
+        stock_minimo  = int(stock_minimo or 0)
 
-        umbral_critico      = MotorConfig.get('DEMANDA_UMBRAL_CRITICO', cast=int) or 0
-        stock_minimo_global = MotorConfig.get('STOCK_MINIMO_GLOBAL', cast=int) or 10
-        # Default 1.5: activar alerta preventiva al 150 % de la demanda proyectada,
-        # dando margen de reacción real antes de llegar al límite de stock.
-        factor_preventivo   = MotorConfig.get('DEMANDA_FACTOR_PREVENTIVO', cast=float) or 1.5
+        umbral_critico      = config['umbral_critico']
+        stock_minimo_global = config['stock_minimo_global']
+        factor_preventivo   = config['factor_preventivo']
         stock_minimo_efectivo = max(stock_minimo, stock_minimo_global)
 
         demanda_ajustada = max(0, int(demanda_predicha * factor_estacional))
 
-        # ── Sanity caps para PYME — valores leídos desde Configuración ─────────
-        _cap_max    = int(MotorConfig.get('DEMANDA_CAP_MENSUAL_MAX',      cast=int)   or 100)
-        _cap_piso   = int(MotorConfig.get('DEMANDA_CAP_MENSUAL_PISO',     cast=int)   or 5)
-        _cap_factor = float(MotorConfig.get('DEMANDA_CAP_FACTOR_DEMANDA', cast=float) or 2.0)
-        _cap_smin   = float(MotorConfig.get('DEMANDA_CAP_FACTOR_STOCK_MIN', cast=float) or 1.5)
+        _cap_max    = config['cap_max']
+        _cap_piso   = config['cap_piso']
+        _cap_factor = config['cap_factor']
+        _cap_smin   = config['cap_smin']
 
         # Cap 1 — demanda mensual: usa cantidad_compra_sugerida si está cargado,
         # de lo contrario usa stock_actual acotado entre [piso, max].
@@ -293,6 +330,158 @@ class DemandaInteligenteEngine(ProcesoInteligenteBase):
             })
         return resultado
 
+    # ------------------------------------------------------------------ #
+    # Modo batch (set-based)                                               #
+    # ------------------------------------------------------------------ #
+
+    def _cargar_historial_batch(self, insumos, periodo: str) -> dict:
+        """
+        Carga en pocas queries todo lo que predecir_demanda(), _factor_estacional()
+        y stock_minimo_sugerido consultan insumo por insumo:
+
+            proyecciones: {insumo_id: cantidad_proyectada} del período (1 query).
+            matriz:       MatrizConsumos con todo ConsumoMensualInsumo (1 query), de la
+                          que salen media móvil, consumo anual y factor estacional
+                          de todos los insumos en operaciones vectorizadas.
+            compras:      {insumo_id: (total, meses_activos)} últimos 6 meses (2 queries).
+
+        Los parámetros de configuración se resuelven una sola vez por corrida.
+        """
+        from collections import defaultdict
+        from datetime import timedelta
+        from django.db.models import Sum
+        from django.db.models.functions import TruncMonth
+        from django.utils import timezone
+        from core.ai_ml.pronostico_catalogo import MatrizConsumos
+        from insumos.models import ProyeccionInsumo
+        from pedidos.models import OrdenCompra
+
+        ids = [i.idInsumo for i in insumos]
+
+        proyecciones = dict(
+            ProyeccionInsumo.objects
+            .filter(insumo_id__in=ids, periodo=periodo)
+            .values_list('insumo_id', 'cantidad_proyectada')
+        )
+
+        meses = MotorConfig.get('DEMANDA_MESES_HISTORICO', cast=int) or 3
+        matriz = MatrizConsumos.cargar(ids)
+
+        hace_6m = timezone.now() - timedelta(days=180)
+        qs_compras = OrdenCompra.objects.filter(insumo_id__in=ids, fecha_creacion__gte=hace_6m)
+        totales = dict(
+            qs_compras.order_by()
+            .values('insumo_id')
+            .annotate(total=Sum('cantidad'))
+            .values_list('insumo_id', 'total')
+        )
+        meses_activos = defaultdict(int)
+        for insumo_id, _mes in (
+            qs_compras.order_by()
+            .annotate(mes=TruncMonth('fecha_creacion'))
+            .values_list('insumo_id', 'mes')
+            .distinct()
+        ):
+            meses_activos[insumo_id] += 1
+        compras = {iid: (total, meses_activos.get(iid, 0)) for iid, total in totales.items()}
+
+        try:
+            from configuracion.models import Parametro
+            dias_reposicion = int(Parametro.get('DIAS_REPOSICION_INSUMO', 15))
+        except Exception:
+            dias_reposicion = 15
+
+        return {
+            'proyecciones': proyecciones,
+            'matriz': matriz,
+            'fila': {insumo_id: i for i, insumo_id in enumerate(ids)},
+            'media_movil': matriz.media_movil(periodo, meses=meses),
+            'consumo_anual': matriz.total_anual(),
+            'compras': compras,
+            'reglas': self._config_reglas(),
+            'dias_reposicion': dias_reposicion,
+        }
+
+    def _predecir_demanda_batch(self, insumo, periodo: str, historial: dict) -> int:
+        """Misma jerarquía que predecir_demanda(), leyendo de _cargar_historial_batch()."""
+        # 1) ProyeccionInsumo oficial
+        cantidad_proyectada = historial['proyecciones'].get(insumo.idInsumo)
+        if cantidad_proyectada:
+            return int(cantidad_proyectada)
+
+        # 2) Media móvil ponderada de ConsumoRealInsumo
+        cantidad = historial['media_movil'][historial['fila'][insumo.idInsumo]]
+        if cantidad > 0:  # NaN (sin datos) no pasa la comparación
+            return int(cantidad)
+
+        # 3) Media mensual de órdenes de compra últimos 6 meses
+        total, meses_activos = historial['compras'].get(insumo.idInsumo, (None, 0))
+        if total and meses_activos > 0:
+            return int(total / meses_activos)
+
+        # 4) Cantidad típica de compra del catálogo
+        if insumo.cantidad:
+            return int(insumo.cantidad)
+
+        return 0
+
+    def _stock_minimo_batch(self, insumo, historial: dict) -> int:
+        """
+        Equivalente a Insumo.stock_minimo_sugerido sin la query de fallback
+        a ConsumoMensualInsumo: usa el historial ya cargado en memoria.
+        """
+        if insumo.stock_minimo_calculado is not None:
+            return insumo.stock_minimo_calculado
+        total = int(historial['consumo_anual'][historial['fila'][insumo.idInsumo]])
+        consumo_mensual = total / 12 if total > 0 else 0
+        if consumo_mensual > 0:
+            return round(consumo_mensual * historial['dias_reposicion'] / 30)
+        if insumo.stock_minimo_manual is not None:
+            return insumo.stock_minimo_manual
+        return 0
+
+    def _evaluar_insumos_batch(self, insumos, periodo: str, mes_actual: int) -> tuple:
+        """
+        Ruta set-based de ejecutar(): carga el historial de todos los insumos
+        con _cargar_historial_batch() y calcula predicción, factor estacional y
+        reglas en memoria. Produce la misma salida que _evaluar_insumos().
+        """
+        historial = self._cargar_historial_batch(insumos, periodo)
+        factores = historial['matriz'].factor_estacional(mes_actual)
+        acciones_totales = []
+        insumos_procesados = 0
+        for insumo in insumos:
+            try:
+                demanda = self._predecir_demanda_batch(insumo, periodo, historial)
+                factor = float(factores[historial['fila'][insumo.idInsumo]])
+                acciones = self.evaluar_reglas(
+                    insumo, demanda, factor_estacional=factor,
+                    config=historial['reglas'],
+                    stock_minimo=self._stock_minimo_batch(insumo, historial),
+                )
+                acciones_totales.extend(acciones)
+                insumos_procesados += 1
+            except Exception as e:
+                logger.warning("ejecutar: error procesando insumo %s: %s", getattr(insumo, 'idInsumo', '?'), e)
+                continue
+        return acciones_totales, insumos_procesados
+
+    def _evaluar_insumos(self, insumos, periodo: str, mes_actual: int) -> tuple:
+        """Ruta por insumo de ejecutar(): predecir_demanda + _factor_estacional + reglas."""
+        acciones_totales = []
+        insumos_procesados = 0
+        for insumo in insumos:
+            try:
+                demanda         = self.predecir_demanda(insumo, periodo)
+                factor          = self._factor_estacional(insumo, mes_actual)
+                acciones        = self.evaluar_reglas(insumo, demanda, factor_estacional=factor)
+                acciones_totales.extend(acciones)
+                insumos_procesados += 1
+            except Exception as e:
+                logger.warning("ejecutar: error procesando insumo %s: %s", getattr(insumo, 'idInsumo', '?'), e)
+                continue
+        return acciones_totales, insumos_procesados
+
     # ------------------------------------------------------------------ #
     # Ejecución principal                                                  #
     # ------------------------------------------------------------------ #
@@ -302,6 +491,12 @@ class DemandaInteligenteEngine(ProcesoInteligenteBase):
         Itera todos los insumos activos directos, predice demanda con factor
         estacional y aplica reglas delegando al motor centralizado.
 
+        kwargs opcionales:
+            batch: True (default) carga proyecciones, historial de consumo y
+                   compras de todos los insumos en pocas queries y evalúa en
+                   memoria; False usa la ruta por insumo. Ambas rutas producen
+                   la misma salida.
+
         Retorna:
             {
                 'estado': 'ok',
@@ -321,19 +516,18 @@ class DemandaInteligenteEngine(ProcesoInteligenteBase):
         except Exception:
             mes_actual = 1
 
-        acciones_totales = []
-        insumos_procesados = 0
+        insumos = list(Insumo.objects.filter(activo=True, tipo=Insumo.TIPO_DIRECTO))
+        resultado_insumos = None
 
-        for insumo in Insumo.objects.filter(activo=True, tipo=Insumo.TIPO_DIRECTO):
+        if kwargs.get('batch', True):
             try:
-                demanda         = self.predecir_demanda(insumo, periodo)
-                factor          = self._factor_estacional(insumo, mes_actual)
-                acciones        = self.evaluar_reglas(insumo, demanda, factor_estacional=factor)
-                acciones_totales.extend(acciones)
-                insumos_procesados += 1
+                resultado_insumos = self._evaluar_insumos_batch(insumos, periodo, mes_actual)
             except Exception as e:
-                logger.warning("ejecutar: error procesando insumo %s: %s", getattr(insumo, 'idInsumo', '?'), e)
-                continue
+                logger.warning("ejecutar: modo batch no disponible (%s); se usa la ruta por insumo.", e)
+
+        if resultado_insumos is None:
+            resultado_insumos = self._evaluar_insumos(insumos, periodo, mes_actual)
+        acciones_totales, insumos_procesados = resultado_insumos
 
         # R4 — Pedidos retrasados (evaluación global, fuera del bucle por insumo)
         try:
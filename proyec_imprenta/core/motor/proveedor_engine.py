@@ -10,6 +10,13 @@ Criterios:
     incidencias  — ratio órdenes rechazadas / total.
     disponibilidad — ratio consultas positivas / total (ConsultaStockProveedor).
 
+Cache:
+    recomendar() guarda el score de cada (insumo, proveedor) en
+    ScoreProveedorInsumo. Los signals de automatizacion marcan filas como
+    sucias ante cambios de estado de OrdenCompra, consultas de stock y precios
+    de insumos; mientras las filas de un insumo estén vigentes, recomendar()
+    es una sola lectura por índice.
+
 Retroalimentación:
     El administrador puede ajustar los deltas de cada peso tras aceptar/rechazar
     una recomendación. Los nuevos pesos se normalizan y persisten en BD.
@@ -90,34 +97,45 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
         except Exception:
             return 0.5
 
-    def _cumplimiento(self, proveedor, ordenes=None) -> float:
+    def _ponderar_ordenes(self, ordenes) -> tuple:
         """
-        Proporción PONDERADA de órdenes confirmadas con decaimiento temporal exponencial.
-        Órdenes recientes tienen mayor peso; órdenes antiguas impactan menos.
-        Lambda (por día) configurable desde BD (CUMPLIMIENTO_DECAY_LAMBDA).
-        Sin historial → 1.0 (beneficio de la duda).
-
-        ordenes: lista pre-fetched (compartida con _incidencias para evitar 2 queries).
+        (cumplimiento, incidencias) de una lista explícita de órdenes con la
+        misma fórmula que ConfiabilidadProveedor: peso exp(-lambda · días).
         """
-        import math
         from django.utils import timezone
-        if ordenes is None:
-            from pedidos.models import OrdenCompra
-            ordenes = list(
-                OrdenCompra.objects.filter(proveedor=proveedor).order_by('-fecha_creacion')[:100]
-            )
-        if not ordenes:
-            return 1.0
-        lam = MotorConfig.get('CUMPLIMIENTO_DECAY_LAMBDA', cast=float) or 0.01
+        from automatizacion.models import ConfiabilidadProveedor
+        lam = ConfiabilidadProveedor.lam_actual()
         ahora = timezone.now()
-        peso_total = peso_confirmadas = 0.0
+        peso_total = peso_confirmadas = peso_rechazadas = 0.0
         for o in ordenes:
-            dias = max(0, (ahora - o.fecha_creacion).days)
-            w = math.exp(-lam * dias)
+            w = ConfiabilidadProveedor.peso(lam, o.fecha_creacion, ahora)
             peso_total += w
             if o.estado == 'confirmada':
                 peso_confirmadas += w
-        return peso_confirmadas / peso_total if peso_total > 0 else 1.0
+            elif o.estado == 'rechazada':
+                peso_rechazadas += w
+        if peso_total <= 0:
+            return 1.0, 0.0
+        return peso_confirmadas / peso_total, peso_rechazadas / peso_total
+
+    def _confiabilidad(self, proveedor):
+        """Fila de ConfiabilidadProveedor del proveedor (reconstruida si falta)."""
+        from automatizacion.models import ConfiabilidadProveedor
+        return ConfiabilidadProveedor.para_proveedores([proveedor.id])[proveedor.id]
+
+    def _cumplimiento(self, proveedor, ordenes=None) -> float:
+        """
+        Proporción PONDERADA de órdenes confirmadas con decaimiento temporal exponencial.
+        Órdenes recientes tienen mayor peso; órdenes antiguas impactan menos.
+        Lambda (por día) configurable desde BD (CUMPLIMIENTO_DECAY_LAMBDA).
+        Sin historial → 1.0 (beneficio de la duda).
+
+        Se lee de los contadores incrementales de ConfiabilidadProveedor, sin
+        recorrer el historial; `ordenes` permite evaluar una lista explícita.
+        """
+        if ordenes is not None:
+            return self._ponderar_ordenes(ordenes)[0]
+        return self._confiabilidad(proveedor).metricas()[0]
 
     def _incidencias(self, proveedor, ordenes=None) -> float:
         """
@@ -125,27 +143,11 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
         Órdenes recientes tienen mayor peso; órdenes antiguas impactan menos.
         Sin historial → 0.0 (sin incidencias conocidas).
 
-        ordenes: lista pre-fetched (compartida con _cumplimiento para evitar 2 queries).
+        Misma fuente que _cumplimiento (ConfiabilidadProveedor u `ordenes`).
         """
-        import math
-        from django.utils import timezone
-        if ordenes is None:
-            from pedidos.models import OrdenCompra
-            ordenes = list(
-                OrdenCompra.objects.filter(proveedor=proveedor).order_by('-fecha_creacion')[:100]
-            )
-        if not ordenes:
-            return 0.0
-        lam = MotorConfig.get('CUMPLIMIENTO_DECAY_LAMBDA', cast=float) or 0.01
-        ahora = timezone.now()
-        peso_total = peso_rechazadas = 0.0
-        for o in ordenes:
-            dias = max(0, (ahora - o.fecha_creacion).days)
-            w = math.exp(-lam * dias)
-            peso_total += w
-            if o.estado == 'rechazada':
-                peso_rechazadas += w
-        return peso_rechazadas / peso_total if peso_total > 0 else 0.0
+        if ordenes is not None:
+            return self._ponderar_ordenes(ordenes)[1]
+        return self._confiabilidad(proveedor).metricas()[1]
 
     def _disponibilidad(self, proveedor, insumo=None) -> float:
         """
@@ -170,62 +172,51 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
         """
         Latencia media de respuesta (fecha_creacion → fecha_respuesta) normalizada [0, 1].
         0.0 = responde instantáneamente (mejor score); 1.0 = supera LATENCIA_MAX_DIAS.
-        Sin órdenes con fecha_respuesta registrada → 0.5 (neutro).
+        Sin órdenes confirmadas con fecha_respuesta registrada → 0.5 (neutro).
+        Sumas de días y órdenes mantenidas en ConfiabilidadProveedor.
         """
-        from pedidos.models import OrdenCompra
         max_dias = MotorConfig.get('LATENCIA_MAX_DIAS', cast=float) or 30.0
-        qs = OrdenCompra.objects.filter(
-            proveedor=proveedor,
-            estado='confirmada',
-            fecha_respuesta__isnull=False,
-        )
-        if not qs.exists():
+        latencia = self._confiabilidad(proveedor).metricas()[2]
+        if latencia is None:
             return 0.5  # neutro cuando no hay datos históricos de latencia
-        total_dias = 0.0
-        count = 0
-        for o in qs:
-            delta = (o.fecha_respuesta - o.fecha_creacion).days
-            if delta >= 0:
-                total_dias += delta
-                count += 1
-        if count == 0:
-            return 0.5
-        return min(1.0, max(0.0, (total_dias / count) / max_dias))
+        return min(1.0, max(0.0, latencia / max_dias))
 
     # ------------------------------------------------------------------ #
     # Score ponderado (batch + individual)                                 #
     # ------------------------------------------------------------------ #
 
-    def _calcular_scores_batch(self, proveedores, insumo=None) -> dict:
+    def _features_batch(self, proveedores, insumo=None):
         """
-        Calcula scores para una lista de proveedores en batch.
-        Elimina el N+1 de recomendar(): en lugar de N*(4-5 queries) se
-        ejecutan 4-5 queries totales para todos los proveedores.
-        Retorna {proveedor_id: score}.
+        Matriz de features (n_proveedores × 5) en un número constante de queries,
+        con columnas en el orden de core.ai_ml.score_proveedor.FEATURES:
+        precio_relativo, cumplimiento, incidencias, disponibilidad, latencia.
+
+        Mismas métricas que _precio_relativo/_cumplimiento/_incidencias/
+        _disponibilidad/_latencia_promedio_dias; las tres de órdenes se leen de
+        ConfiabilidadProveedor sin recorrer el historial.
         """
-        from pedidos.models import OrdenCompra
-        from automatizacion.models import ConsultaStockProveedor
+        import numpy as np
+        from automatizacion.models import ConfiabilidadProveedor, ConsultaStockProveedor
         from insumos.models import Insumo as InsumoModel
-        from django.db.models import Avg, Min, Max, Count
+        from django.db.models import Avg, Count, Max, Min, Q
         from django.utils import timezone
         from datetime import timedelta
-        import math
 
-        if not proveedores:
-            return {}
+        n = len(proveedores)
+        X = np.empty((n, 5))
+        if not n:
+            return X
 
-        pesos = self._get_pesos()
-        peso_latencia = MotorConfig.get('PESO_LATENCIA', cast=float) or 0.1
-        lam = MotorConfig.get('CUMPLIMIENTO_DECAY_LAMBDA', cast=float) or 0.01
         dias_disp = MotorConfig.get('DISPONIBILIDAD_DIAS', cast=int) or 90
         max_dias_lat = MotorConfig.get('LATENCIA_MAX_DIAS', cast=float) or 30.0
-        peso_sum = sum(pesos.values()) + peso_latencia
 
         prov_ids = [p.id for p in proveedores]
+        fila_de = {pid: i for i, pid in enumerate(prov_ids)}
         ahora = timezone.now()
         desde_disp = ahora - timedelta(days=dias_disp)
 
-        # ── 1) Precios relativos (1–2 queries) ───────────────────────────────────────
+        # ── 1) Precios relativos (1 query) ───────────────────────────────────
+        X[:, 0] = 0.5
         try:
             if insumo is not None:
                 precio_insumo = float(insumo.precio_unitario or 0)
@@ -237,10 +228,8 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
                 min_p = float(stats['min_p'] or 0)
                 max_p = float(stats['max_p'] or 0)
                 rango = max_p - min_p
-                precio_por_prov = {
-                    p.id: (min(1.0, max(0.0, (precio_insumo - min_p) / rango)) if rango > 0.0001 else 0.5)
-                    for p in proveedores
-                }
+                if rango > 0.0001:
+                    X[:, 0] = min(1.0, max(0.0, (precio_insumo - min_p) / rango))
             else:
                 rows = (
                     InsumoModel.objects
@@ -251,89 +240,65 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
                 avg_map = {r['proveedor_id']: float(r['avg_p']) for r in rows if r['avg_p'] is not None}
                 avgs = list(avg_map.values())
                 rango = (max(avgs) - min(avgs)) if avgs else 0
-                min_p = min(avgs) if avgs else 0
-                precio_por_prov = {}
-                for p in proveedores:
-                    v = avg_map.get(p.id)
-                    if v is None or rango < 0.0001:
-                        precio_por_prov[p.id] = 0.5
-                    else:
-                        precio_por_prov[p.id] = min(1.0, max(0.0, (v - min_p) / rango))
+                if rango >= 0.0001:
+                    min_p = min(avgs)
+                    for pid, v in avg_map.items():
+                        if pid in fila_de:
+                            X[fila_de[pid], 0] = min(1.0, max(0.0, (v - min_p) / rango))
         except Exception:
-            precio_por_prov = {p.id: 0.5 for p in proveedores}
-
-        # ── 2) Órdenes históricas: 1 query, agrupadas en Python ────────────────
-        todas_ordenes = list(
-            OrdenCompra.objects
-            .filter(proveedor_id__in=prov_ids)
-            .order_by('proveedor_id', '-fecha_creacion')
-            .values('proveedor_id', 'estado', 'fecha_creacion', 'fecha_respuesta')
-        )
-        ordenes_por_prov: dict = {}
-        conteo: dict = {}
-        for o in todas_ordenes:
-            pid = o['proveedor_id']
-            if conteo.get(pid, 0) < 100:
-                ordenes_por_prov.setdefault(pid, []).append(o)
-                conteo[pid] = conteo.get(pid, 0) + 1
-
-        # ── 3) Disponibilidad: 2 queries ────────────────────────────────────
+            X[:, 0] = 0.5
+
+        # ── 2) Cumplimiento, incidencias y latencia: contadores incrementales ─
+        X[:, 1], X[:, 2], X[:, 4] = 1.0, 0.0, 0.5
+        for pid, fila in ConfiabilidadProveedor.para_proveedores(prov_ids).items():
+            cumplimiento, incidencias, latencia = fila.metricas()
+            X[fila_de[pid], 1] = cumplimiento
+            X[fila_de[pid], 2] = incidencias
+            if latencia is not None:
+                X[fila_de[pid], 4] = min(1.0, max(0.0, latencia / max_dias_lat))
+
+        # ── 3) Disponibilidad: 1 query con conteo condicional ────────────────
+        X[:, 3] = 1.0
         qs_disp = ConsultaStockProveedor.objects.filter(
             proveedor_id__in=prov_ids, creado__gte=desde_disp
         )
         if insumo is not None:
             qs_disp = qs_disp.filter(insumo=insumo)
-        total_disp = dict(
-            qs_disp.values('proveedor_id').annotate(n=Count('id')).values_list('proveedor_id', 'n')
-        )
-        pos_disp = dict(
-            qs_disp.filter(estado__in=['disponible', 'parcial'])
-            .values('proveedor_id').annotate(n=Count('id')).values_list('proveedor_id', 'n')
+        for pid, total, positivas in (
+            qs_disp.order_by()
+            .values('proveedor_id')
+            .annotate(total=Count('id'), positivas=Count('id', filter=Q(estado__in=['disponible', 'parcial'])))
+            .values_list('proveedor_id', 'total', 'positivas')
+        ):
+            if total:
+                X[fila_de[pid], 3] = positivas / total
+        return X
+
+    def _scores_desde_features(self, X) -> list:
+        """Score ponderado [0, 100] de cada fila de _features_batch() (fórmula de calcular_score)."""
+        pesos = self._get_pesos()
+        peso_latencia = MotorConfig.get('PESO_LATENCIA', cast=float) or 0.1
+        peso_sum = sum(pesos.values()) + peso_latencia
+        if peso_sum <= 0:
+            return [0.0] * len(X)
+        score_bruto = (
+            pesos['precio']         * (1 - X[:, 0]) +
+            pesos['cumplimiento']   * X[:, 1] +
+            pesos['incidencias']    * (1 - X[:, 2]) +
+            pesos['disponibilidad'] * X[:, 3] +
+            peso_latencia           * (1 - X[:, 4])
         )
+        return [round(float(v), 2) for v in (score_bruto / peso_sum) * 100]
 
-        # ── 4) Calcular score por proveedor en Python ────────────────────────
-        scores = {}
-        for p in proveedores:
-            try:
-                pid = p.id
-                ordenes = ordenes_por_prov.get(pid, [])
-                if ordenes:
-                    peso_total = peso_conf = peso_rech = 0.0
-                    lat_dias = lat_count = 0
-                    for o in ordenes:
-                        dias = max(0, (ahora - o['fecha_creacion']).days)
-                        w = math.exp(-lam * dias)
-                        peso_total += w
-                        if o['estado'] == 'confirmada':
-                            peso_conf += w
-                            if o['fecha_respuesta'] is not None:
-                                delta = (o['fecha_respuesta'] - o['fecha_creacion']).days
-                                if delta >= 0:
-                                    lat_dias += delta
-                                    lat_count += 1
-                        elif o['estado'] == 'rechazada':
-                            peso_rech += w
-                    cumplimiento = peso_conf / peso_total if peso_total > 0 else 1.0
-                    incidencias = peso_rech / peso_total if peso_total > 0 else 0.0
-                    latencia = min(1.0, max(0.0, (lat_dias / lat_count) / max_dias_lat)) if lat_count > 0 else 0.5
-                else:
-                    cumplimiento, incidencias, latencia = 1.0, 0.0, 0.5
-
-                total = total_disp.get(pid, 0)
-                disponibilidad = (pos_disp.get(pid, 0) / total) if total > 0 else 1.0
-                precio = precio_por_prov.get(pid, 0.5)
-
-                score_bruto = (
-                    pesos['precio']         * (1 - precio) +
-                    pesos['cumplimiento']   * cumplimiento +
-                    pesos['incidencias']    * (1 - incidencias) +
-                    pesos['disponibilidad'] * disponibilidad +
-                    peso_latencia           * (1 - latencia)
-                )
-                scores[pid] = round((score_bruto / peso_sum) * 100, 2) if peso_sum > 0 else 0.0
-            except Exception:
-                scores[p.id] = 0.0
-        return scores
+    def _calcular_scores_batch(self, proveedores, insumo=None) -> dict:
+        """
+        Calcula scores para una lista de proveedores en batch.
+        Elimina el N+1 de recomendar(): las features de todos los proveedores
+        salen de _features_batch() en 4 queries y el score se calcula sobre
+        la matriz. Retorna {proveedor_id: score}.
+        """
+        X = self._features_batch(proveedores, insumo)
+        return dict(zip((p.id for p in proveedores), self._scores_desde_features(X)))
 
     def calcular_score(self, proveedor, insumo=None) -> float:
         """
@@ -342,18 +307,12 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
         incidencias (ponderado temporal), disponibilidad (ventana reciente), latencia.
         Los pesos se normalizan por su suma para mantener la escala 0-100.
         """
-        from pedidos.models import OrdenCompra
         pesos = self._get_pesos()
         peso_latencia = MotorConfig.get('PESO_LATENCIA', cast=float) or 0.1
 
-        # Pre-fetch orders once to avoid duplicate queries in _cumplimiento and _incidencias
-        ordenes = list(
-            OrdenCompra.objects.filter(proveedor=proveedor).order_by('-fecha_creacion')[:100]
-        )
-
         precio        = self._precio_relativo(proveedor, insumo)
-        cumplimiento  = self._cumplimiento(proveedor, ordenes=ordenes)
-        incidencias   = self._incidencias(proveedor, ordenes=ordenes)
+        cumplimiento  = self._cumplimiento(proveedor)
+        incidencias   = self._incidencias(proveedor)
         disponibilidad = self._disponibilidad(proveedor, insumo)
         latencia      = self._latencia_promedio_dias(proveedor)
 
@@ -371,32 +330,137 @@ class ProveedorInteligenteEngine(ProcesoInteligenteBase):
     # Recomendación                                                        #
     # ------------------------------------------------------------------ #
 
-    def recomendar(self, insumo=None):
+    def recomendar(self, insumo=None, usar_cache=True):
         """
-        Calcula el score de todos los proveedores activos en batch, persiste en
-        ScoreProveedor y retorna (mejor_proveedor, score).
-        Usa _calcular_scores_batch() para evitar el N+1 de queries por proveedor.
+        Retorna (mejor_proveedor, score) entre los proveedores activos.
+
+        Con usar_cache, si las filas de ScoreProveedorInsumo del insumo están
+        vigentes la respuesta sale de una sola consulta. Si no, recalcula el
+        score de todos los proveedores activos en batch (_calcular_scores_batch),
+        refresca el cache del insumo y persiste en ScoreProveedor sólo los
+        scores que cambiaron al menos SCORE_PROVEEDOR_DELTA_MIN.
         """
         from proveedores.models import Proveedor
-        from automatizacion.models import ScoreProveedor
         from django.utils import timezone
+        if usar_cache:
+            vigente = self._recomendar_desde_cache(insumo)
+            if vigente is not None:
+                return vigente
+        calculado = timezone.now()
         proveedores = list(Proveedor.objects.filter(activo=True))
         if not proveedores:
             return None, 0.0
         scores = self._calcular_scores_batch(proveedores, insumo)
+        self._guardar_cache(insumo, scores, calculado)
+        self._persistir_scores(scores)
         mejor = None
         mejor_score = -1.0
         for p in proveedores:
             score = scores.get(p.id, 0.0)
-            ScoreProveedor.objects.update_or_create(
-                proveedor=p,
-                defaults={'score': score, 'actualizado': timezone.now()},
-            )
             if score > mejor_score:
                 mejor_score = score
                 mejor = p
         return mejor, mejor_score
 
+    # ------------------------------------------------------------------ #
+    # Cache de scores por insumo (ScoreProveedorInsumo)                    #
+    # ------------------------------------------------------------------ #
+
+    @staticmethod
+    def _version_config() -> int:
+        """Versión del snapshot de configuración: un cambio de pesos invalida el cache."""
+        try:
+            from configuracion.snapshot import get_snapshot
+            snapshot = get_snapshot()
+            return snapshot.version if snapshot is not None else 0
+        except Exception:
+            return 0
+
+    def _recomendar_desde_cache(self, insumo=None):
+        """
+        (mejor_proveedor, score) desde ScoreProveedorInsumo en una consulta
+        por el índice (insumo, -score), o None si alguna fila del insumo está
+        sucia, vencida o calculada con otra versión de configuración.
+        """
+        from automatizacion.models import ScoreProveedorInsumo
+        from django.utils import timezone
+        from datetime import timedelta
+        ttl = MotorConfig.get('SCORE_CACHE_TTL_MINUTOS', cast=float) or 60
+        limite = timezone.now() - timedelta(minutes=ttl)
+        version = self._version_config()
+        filas = list(
+            ScoreProveedorInsumo.objects
+            .filter(insumo=insumo)
+            .select_related('proveedor')
+            .order_by('-score', 'proveedor__nombre')
+        )
+        if not filas or any(
+            f.sucio or f.calculado < limite or f.version_config != version for f in filas
+        ):
+            return None
+        for f in filas:
+            if f.proveedor.activo:
+                return f.proveedor, f.score
+        return None
+
+    def _guardar_cache(self, insumo, scores: dict, calculado) -> None:
+        """
+        Reemplaza las filas de ScoreProveedorInsumo del insumo por `scores`
+        ({proveedor_id: score}). `calculado` es el instante previo al cálculo,
+        así una fila no parece más fresca que los datos con que se calculó.
+        """
+        from automatizacion.models import ScoreProveedorInsumo
+        from django.db import IntegrityError, transaction
+        version = self._version_config()
+        try:
+            with transaction.atomic():
+                qs = ScoreProveedorInsumo.objects.filter(insumo=insumo)
+                qs.exclude(proveedor_id__in=list(scores)).delete()
+                existentes = dict(qs.values_list('proveedor_id', 'id'))
+                filas = [
+                    ScoreProveedorInsumo(
+                        id=existentes.get(pid), insumo=insumo, proveedor_id=pid, score=score,
+                        sucio=False, version_config=version, calculado=calculado,
+                    )
+                    for pid, score in scores.items()
+                ]
+                ScoreProveedorInsumo.objects.bulk_update(
+                    [f for f in filas if f.id is not None],
+                    ['score', 'sucio', 'version_config', 'calculado'], batch_size=500,
+                )
+                ScoreProveedorInsumo.objects.bulk_create(
+                    [f for f in filas if f.id is None], batch_size=500,
+                )
+        except IntegrityError:
+            # Otro proceso llenó el cache del insumo en paralelo: se conserva el suyo
+            pass
+
+    def _persistir_scores(self, scores: dict) -> None:
+        """
+        Persiste {proveedor_id: score} en ScoreProveedor. Omite los proveedores
+        cuyo score guardado difiere menos de SCORE_PROVEEDOR_DELTA_MIN.
+        """
+        from automatizacion.models import ScoreProveedor
+        from django.utils import timezone
+        umbral = MotorConfig.get('SCORE_PROVEEDOR_DELTA_MIN', cast=float) or 0.0
+        ahora = timezone.now()
+        existentes = {
+            pid: (sid, score)
+            for sid, pid, score in ScoreProveedor.objects
+            .filter(proveedor_id__in=list(scores))
+            .values_list('id', 'proveedor_id', 'score')
+        }
+        cambios, nuevos = [], []
+        for pid, score in scores.items():
+            if pid not in existentes:
+                nuevos.append(ScoreProveedor(proveedor_id=pid, score=score, actualizado=ahora))
+            elif abs(existentes[pid][1] - score) >= umbral:
+                cambios.append(ScoreProveedor(id=existentes[pid][0], proveedor_id=pid, score=score, actualizado=ahora))
+        if cambios:
+            ScoreProveedor.objects.bulk_update(cambios, ['score', 'actualizado'], batch_size=500)
+        if nuevos:
+            ScoreProveedor.objects.bulk_create(nuevos, batch_size=500, ignore_conflicts=True)
+
     def ejecutar(self, **kwargs) -> dict:
         """
         Recalcula scores de todos los proveedores activos y retorna el mejor.
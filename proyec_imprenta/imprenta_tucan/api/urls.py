@@ -5,6 +5,7 @@ from automatizacion.api.api_orden_automatica import OrdenCompraAutomaticaAPIView
 from automatizacion.api.api_feedback import FeedbackRecomendacionAPIView
 from automatizacion.api.api_feedback import CriteriosPesosAPIView
 from automatizacion.api import api_tracking
+from automatizacion.api.api_modelos import MetricasModelosAPIView
 
 urlpatterns = [
     path('api/', include(router.urls)),
@@ -12,6 +13,7 @@ urlpatterns = [
     path('api/orden-automatica/', OrdenCompraAutomaticaAPIView.as_view(), name='api_orden_automatica'),
     path('api/feedback-recomendacion/', FeedbackRecomendacionAPIView.as_view(), name='api_feedback_recomendacion'),
     path('api/criterios-pesos/', CriteriosPesosAPIView.as_view(), name='api_criterios_pesos'),
+    path('api/modelos-ml/metricas/', MetricasModelosAPIView.as_view(), name='api_metricas_modelos'),
     
     # Tracking de emails
     path('api/tracking/open/<str:token>/', api_tracking.tracking_open, name='tracking_open'),
@@ -1,12 +1,14 @@
-from django.db.models.signals import pre_save, post_save, pre_delete
+from django.db.models.signals import post_init, pre_save, post_save, pre_delete
 from django.dispatch import receiver
 from django.apps import apps
 from .models import AuditEntry
 from .middleware import get_current_request, get_current_user
+from . import writer
+import copy
 import json
 
 
-EXCLUDE_MODELS = {'AuditEntry'}  # evitar loguear la propia auditoría
+EXCLUDE_MODELS = {'AuditEntry', 'EfectoPedido', 'Secuencia', 'ResumenKPI'}  # evitar loguear la propia auditoría, el outbox, los contadores y los resúmenes
 # Evitar loguear apps/sistemas internos y el registrador de migraciones
 EXCLUDE_APPS = {
     'admin', 'auth', 'contenttypes', 'sessions', 'messages', 'staticfiles',
@@ -41,6 +43,51 @@ def serialize_value(val):
     return str(val)
 
 
+def _excluido(sender):
+    # Incluye el registrador de migraciones (django.db.migrations.recorder)
+    return (
+        sender.__name__ in EXCLUDE_MODELS
+        or sender._meta.app_label in EXCLUDE_APPS
+        or sender.__module__.startswith('django.db.migrations')
+    )
+
+
+_campos_auditables_cache = {}
+
+
+def campos_auditables(sender):
+    """Campos editables, con columna propia y no relacionales múltiples (cacheado por modelo)."""
+    campos = _campos_auditables_cache.get(sender)
+    if campos is None:
+        campos = tuple(
+            f for f in sender._meta.get_fields()
+            if getattr(f, 'editable', False) and hasattr(f, 'attname')
+            and not f.many_to_many and not f.one_to_many
+        )
+        _campos_auditables_cache[sender] = campos
+    return campos
+
+
+def _valores_cargados(instance, campos):
+    """
+    Valores crudos (attname) presentes en la instancia, sin disparar queries:
+    los campos diferidos se omiten y las FK se leen por su columna *_id.
+    """
+    data = instance.__dict__
+    valores = {}
+    for f in campos:
+        if f.attname in data:
+            v = data[f.attname]
+            valores[f.attname] = copy.deepcopy(v) if isinstance(v, (dict, list)) else v
+    return valores
+
+
+def _snapshot_desde_instancia(instance, campos):
+    """Diccionario serializado {field.name: valor} a partir de los attname cargados."""
+    data = instance.__dict__
+    return {f.name: serialize_value(data.get(f.attname)) for f in campos}
+
+
 def get_field_value(instance, field):
     value = getattr(instance, field.name, None)
     if value is None:
@@ -62,59 +109,70 @@ def build_diff(before, after):
     return changes
 
 
+def audit_post_init(sender, instance, **kwargs):
+    """
+    Guarda el estado con que la instancia se leyó de la base de datos.
+
+    Reemplaza el SELECT por PK que antes hacía pre_save en cada actualización:
+    el diff se calcula contra el estado cargado, sin round trip extra.
+    """
+    # from_db marca _state.adding=False recién después de __init__, así que
+    # aquí sólo se distingue por la PK; pre_save descarta instancias no leídas.
+    if instance.pk is None:
+        return
+    instance._audit_loaded = _valores_cargados(instance, campos_auditables(sender))
+
+
+# post_init corre en cada instancia que se construye (también en listados de
+# sólo lectura): se conecta sólo a los modelos auditados al arrancar. Un modelo
+# que deja de estar en AUDITORIA_EXCLUIR_MODELOS después cae al SELECT de pre_save.
+for _modelo in apps.get_models():
+    if not _excluido(_modelo) and not writer.modelo_excluido(_modelo.__name__):
+        post_init.connect(audit_post_init, sender=_modelo, dispatch_uid=f'auditoria_post_init_{_modelo._meta.label}')
+
+
 @receiver(pre_save)
 def audit_pre_save(sender, instance, **kwargs):
-    model_name = sender.__name__
-    if model_name in EXCLUDE_MODELS or sender._meta.app_label in EXCLUDE_APPS:
-        return
-    # Evitar registrar cambios del propio registrador de migraciones
-    # (e.g., django.db.migrations.recorder)
-    if sender.__module__.startswith('django.db.migrations'):
+    if _excluido(sender):
         return
     if not instance.pk:
         # se manejará en post_save como create
         instance._audit_before = None
-    else:
-        # Capturar estado previo desde la base de datos para detectar cambios reales
+        return
+
+    campos = campos_auditables(sender)
+    loaded = getattr(instance, '_audit_loaded', None)
+    data = instance.__dict__
+    # Sin estado cargado (instancia construida a mano con pk) o con campos que
+    # estaban diferidos al cargar y ahora tienen valor: leer desde la BD.
+    if loaded is None or instance._state.adding or any(f.attname in data and f.attname not in loaded for f in campos):
         try:
-            current = sender.objects.get(pk=instance.pk)
+            current = sender._base_manager.get(pk=instance.pk)
         except sender.DoesNotExist:
             instance._audit_before = None
             return
-        before = {}
-        for f in sender._meta.get_fields():
-            if getattr(f, 'editable', False) and hasattr(f, 'attname') and not f.many_to_many and not f.one_to_many:
-                # Obtener valor del registro persistido (current)
-                try:
-                    value = getattr(current, f.name, None)
-                except Exception:
-                    value = None
-                # Serializar valor
-                if value is None:
-                    before[f.name] = None
-                else:
-                    # Representar FK por PK si aplica
-                    if f.many_to_one or f.one_to_one:
-                        try:
-                            before[f.name] = serialize_value(getattr(value, 'pk', None))
-                        except Exception:
-                            before[f.name] = None
-                    else:
-                        before[f.name] = serialize_value(value)
-        instance._audit_before = before
+        instance._audit_before = _snapshot_desde_instancia(current, campos)
+        return
+
+    instance._audit_before = {
+        f.name: serialize_value(loaded[f.attname]) if f.attname in loaded else serialize_value(data.get(f.attname))
+        for f in campos
+    }
 
 
 @receiver(post_save)
 def audit_post_save(sender, instance, created, **kwargs):
     model_name = sender.__name__
-    if model_name in EXCLUDE_MODELS or sender._meta.app_label in EXCLUDE_APPS:
+    if _excluido(sender):
+        return
+    campos = campos_auditables(sender)
+    # El estado guardado pasa a ser la base del próximo diff de esta instancia.
+    instance._audit_loaded = _valores_cargados(instance, campos)
+    if writer.modelo_excluido(model_name):
         return
-    if sender.__module__.startswith('django.db.migrations'):
+    if not created and not writer.muestrear_actualizacion(model_name):
         return
-    after = {}
-    for f in sender._meta.get_fields():
-        if getattr(f, 'editable', False) and hasattr(f, 'attname') and not f.many_to_many and not f.one_to_many:
-            after[f.name] = get_field_value(instance, f)
+    after = _snapshot_desde_instancia(instance, campos)
 
     if created:
         # Para MovimientoStock, usar stock_anterior/stock_posterior como before/after
@@ -192,7 +250,7 @@ def audit_post_save(sender, instance, created, **kwargs):
         # no bloquear auditoría por error en extra
         extra_json = None
 
-    AuditEntry.objects.create(
+    writer.registrar(AuditEntry(
         user=user,
         ip_address=getattr(request, 'META', {}).get('REMOTE_ADDR') if request else None,
         path=getattr(request, 'path', '') if request else '',
@@ -204,24 +262,19 @@ def audit_post_save(sender, instance, created, **kwargs):
         action=action,
         changes=changes_json,
         extra=extra_json or json.dumps({'category': sender._meta.app_label}, ensure_ascii=False),
-    )
+    ), using=kwargs.get('using') or 'default')
 
 
 @receiver(pre_delete)
 def audit_pre_delete(sender, instance, **kwargs):
     model_name = sender.__name__
-    if model_name in EXCLUDE_MODELS or sender._meta.app_label in EXCLUDE_APPS:
-        return
-    if sender.__module__.startswith('django.db.migrations'):
+    if _excluido(sender) or writer.modelo_excluido(model_name):
         return
     request = get_current_request()
     user = get_current_user()
 
     # estado previo para referencia
-    before = {}
-    for f in sender._meta.get_fields():
-        if getattr(f, 'editable', False) and hasattr(f, 'attname') and not f.many_to_many and not f.one_to_many:
-            before[f.name] = get_field_value(instance, f)
+    before = {f.name: get_field_value(instance, f) for f in campos_auditables(sender)}
 
     try:
         changes_json = json.dumps({'before': before}, ensure_ascii=False) if before else None
@@ -230,7 +283,7 @@ def audit_pre_delete(sender, instance, **kwargs):
 
     # Categoría por defecto basada en app
     default_extra = json.dumps({'category': sender._meta.app_label}, ensure_ascii=False)
-    AuditEntry.objects.create(
+    writer.registrar(AuditEntry(
         user=user,
         ip_address=getattr(request, 'META', {}).get('REMOTE_ADDR') if request else None,
         path=getattr(request, 'path', '') if request else '',
@@ -242,4 +295,4 @@ def audit_pre_delete(sender, instance, **kwargs):
         action=AuditEntry.ACTION_DELETE,
         changes=changes_json,
         extra=default_extra,
-    )
+    ), using=kwargs.get('using') or 'default')
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+
+@shared_task
+def registrar_auditoria_lote(entradas):
+    """
+    Escribe un lote de AuditEntry serializado por auditoria.writer (modo 'celery').
+    Un único bulk_create por lote.
+    """
+    from .models import AuditEntry
+    AuditEntry.objects.bulk_create([AuditEntry(**e) for e in entradas], batch_size=500)
+    return f"auditoria: {len(entradas)} entradas registradas"
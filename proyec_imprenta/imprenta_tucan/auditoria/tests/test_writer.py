@@ -0,0 +1,106 @@
+"""
+Tests de la auditoría diferida (auditoria/signals.py + auditoria/writer.py).
+
+Cubre:
+  1. Una actualización no hace el SELECT previo por PK.
+  2. Las entradas de una transacción se escriben una vez, en el commit.
+  3. Un savepoint revertido descarta sus entradas.
+  4. Exclusión por modelo y auditoria_suspendida().
+  5. post_init sólo toma el estado cargado de los modelos auditados.
+  6. Si falla el bulk_create del lote, las entradas se escriben de a una.
+"""
+import json
+from unittest import mock
+
+from django.db import connection, transaction
+from django.db.models.signals import post_init
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from auditoria.models import AuditEntry
+from auditoria.writer import auditoria_suspendida
+from automatizacion.tests.test_procesos_inteligentes import make_proveedor
+from proveedores.models import Proveedor
+
+
+def _entradas(proveedor, action=None):
+    qs = AuditEntry.objects.filter(model='Proveedor', object_id=str(proveedor.pk))
+    return qs.filter(action=action) if action else qs
+
+
+class AuditoriaWriterTest(TestCase):
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.proveedor = make_proveedor()
+
+    def test_actualizacion_sin_select_previo(self):
+        proveedor = Proveedor.objects.get(pk=self.proveedor.pk)
+        proveedor.nombre = 'Otro nombre'
+        with CaptureQueriesContext(connection) as ctx:
+            proveedor.save()
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(selects, [])
+
+    def test_entradas_se_escriben_en_commit(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            proveedor = Proveedor.objects.get(pk=self.proveedor.pk)
+            proveedor.nombre = 'Cambio 1'
+            proveedor.save()
+            proveedor.rubro = 'Tintas'
+            proveedor.save()
+            self.assertEqual(_entradas(proveedor, AuditEntry.ACTION_UPDATE).count(), 0)
+        self.assertEqual(len(callbacks), 1)
+
+        updates = list(_entradas(proveedor, AuditEntry.ACTION_UPDATE).order_by('id'))
+        self.assertEqual(len(updates), 2)
+        self.assertEqual(json.loads(updates[0].changes)['nombre']['after'], 'Cambio 1')
+        # El segundo diff parte del estado guardado, no del leído originalmente.
+        self.assertEqual(set(json.loads(updates[1].changes)), {'rubro'})
+
+    def test_savepoint_revertido_descarta_entradas(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    proveedor = Proveedor.objects.get(pk=self.proveedor.pk)
+                    proveedor.nombre = 'Revertido'
+                    proveedor.save()
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+            proveedor = Proveedor.objects.get(pk=self.proveedor.pk)
+            proveedor.rubro = 'Confirmado'
+            proveedor.save()
+
+        updates = list(_entradas(proveedor, AuditEntry.ACTION_UPDATE))
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(set(json.loads(updates[0].changes)), {'rubro'})
+
+    def test_exclusion_y_suspension(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            with override_settings(AUDITORIA_EXCLUIR_MODELOS={'Proveedor'}):
+                p = Proveedor.objects.get(pk=self.proveedor.pk)
+                p.nombre = 'Excluido'
+                p.save()
+            with auditoria_suspendida():
+                p.nombre = 'Suspendido'
+                p.save()
+        self.assertEqual(_entradas(self.proveedor, AuditEntry.ACTION_UPDATE).count(), 0)
+        self.assertEqual(_entradas(self.proveedor, AuditEntry.ACTION_CREATE).count(), 1)
+
+    def test_post_init_solo_en_modelos_auditados(self):
+        self.assertTrue(post_init.has_listeners(Proveedor))
+        self.assertFalse(post_init.has_listeners(AuditEntry))
+        entrada = AuditEntry.objects.filter(model='Proveedor').first()
+        self.assertFalse(hasattr(entrada, '_audit_loaded'))
+        self.assertTrue(hasattr(Proveedor.objects.get(pk=self.proveedor.pk), '_audit_loaded'))
+
+    def test_lote_fallido_se_escribe_de_a_una(self):
+        with mock.patch.object(AuditEntry.objects, 'bulk_create', side_effect=RuntimeError('lote')), \
+                self.assertLogs('auditoria.writer', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                proveedor = Proveedor.objects.get(pk=self.proveedor.pk)
+                proveedor.nombre = 'Uno'
+                proveedor.save()
+                proveedor.rubro = 'Dos'
+                proveedor.save()
+        self.assertEqual(_entradas(self.proveedor, AuditEntry.ACTION_UPDATE).count(), 2)
@@ -0,0 +1,175 @@
+"""
+Escritura diferida y por lotes de AuditEntry.
+
+Las señales de auditoria/signals.py no insertan filas: arman AuditEntry sin
+guardar y las pasan a registrar(). Según settings.AUDITORIA_MODO:
+
+    'buffer'   (default) — las entradas se acumulan por transacción y se
+               escriben con un único bulk_create en transaction.on_commit.
+               Si la transacción (o el savepoint) se revierte, sus entradas
+               se descartan igual que antes se revertían los INSERT.
+    'celery'   — como 'buffer', pero en el commit el lote se entrega a la
+               tarea auditoria.tasks.registrar_auditoria_lote. Si el broker
+               no responde se escribe en el proceso actual.
+    'sincrono' — un INSERT por entrada (comportamiento original).
+
+Fuera de un bloque atómico (autocommit) la entrada se escribe de inmediato.
+Si el bulk_create de un lote falla, las entradas se escriben de a una y el
+error de las que tampoco se pueden guardar se propaga.
+
+Configuración por modelo:
+    AUDITORIA_EXCLUIR_MODELOS — nombres de modelo que no se auditan.
+    AUDITORIA_MUESTREO        — {'Modelo': tasa} en [0, 1]; fracción de las
+                                actualizaciones que se registran.
+
+Para operaciones masivas que registran su propio resumen, envolver el bloque
+en auditoria_suspendida().
+"""
+import logging
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+MODO_BUFFER = 'buffer'
+MODO_CELERY = 'celery'
+MODO_SINCRONO = 'sincrono'
+
+_suspendida: ContextVar = ContextVar('auditoria_suspendida', default=False)
+
+# Campos de AuditEntry que viajan a la tarea Celery (timestamp lo asigna el INSERT).
+_CAMPOS_SERIALIZABLES = (
+    'user_id', 'ip_address', 'path', 'method', 'app_label', 'model',
+    'object_id', 'object_repr', 'action', 'changes', 'extra',
+)
+
+
+def modo() -> str:
+    return getattr(settings, 'AUDITORIA_MODO', MODO_BUFFER)
+
+
+def modelo_excluido(model_name: str) -> bool:
+    """True si la auditoría está suspendida o el modelo fue excluido por configuración."""
+    if _suspendida.get():
+        return True
+    return model_name in getattr(settings, 'AUDITORIA_EXCLUIR_MODELOS', ())
+
+
+def muestrear_actualizacion(model_name: str) -> bool:
+    """Aplica AUDITORIA_MUESTREO: True si esta actualización debe registrarse."""
+    tasa = getattr(settings, 'AUDITORIA_MUESTREO', {}).get(model_name)
+    if tasa is None:
+        return True
+    return random.random() < float(tasa)
+
+
+@contextmanager
+def auditoria_suspendida():
+    """Desactiva la auditoría por fila dentro del bloque (contexto actual únicamente)."""
+    token = _suspendida.set(True)
+    try:
+        yield
+    finally:
+        _suspendida.reset(token)
+
+
+class _Lote:
+    """Entradas pendientes de una transacción/savepoint concreta."""
+
+    def __init__(self, alias: str):
+        self.alias = alias
+        self.entradas = []
+        self.cerrado = False
+        # Lista run_on_commit de la conexión en la que quedó registrado flush
+        self.callbacks = None
+
+    def flush(self):
+        self.cerrado = True
+        entradas, self.entradas = self.entradas, []
+        if entradas:
+            escribir(entradas)
+
+
+def _lote_pendiente(conn, lotes: dict, clave) -> '_Lote | None':
+    """
+    Retorna el lote de la clave si su callback on_commit sigue registrado.
+
+    Django reemplaza conn.run_on_commit por una lista nueva en cada commit y en
+    cada rollback (también de savepoint): mientras sea la misma lista en la que
+    se registró el lote, su callback sigue ahí, sin recorrerla. Si cambió, se
+    recorre una vez: el rollback de otro savepoint conserva el callback.
+    """
+    lote = lotes.get(clave)
+    if lote is None or lote.cerrado:
+        return None
+    if lote.callbacks is not conn.run_on_commit:
+        if not any(item[1] == lote.flush for item in conn.run_on_commit):
+            return None
+        lote.callbacks = conn.run_on_commit
+    return lote
+
+
+def registrar(entry, using: str = DEFAULT_DB_ALIAS) -> None:
+    """Encola (o escribe) un AuditEntry sin guardar según AUDITORIA_MODO."""
+    if modo() == MODO_SINCRONO:
+        entry.save(using=using)
+        return
+
+    conn = connections[using]
+    if not conn.in_atomic_block:
+        escribir([entry])
+        return
+
+    # Un lote por savepoint: si el savepoint se revierte, Django descarta su
+    # callback on_commit y con él las entradas registradas dentro.
+    lotes = conn.__dict__.setdefault('_auditoria_lotes', {})
+    clave = tuple(conn.savepoint_ids)
+    lote = _lote_pendiente(conn, lotes, clave)
+    if lote is None:
+        for k in [k for k in lotes if _lote_pendiente(conn, lotes, k) is None]:
+            del lotes[k]
+        lote = _Lote(using)
+        lotes[clave] = lote
+        transaction.on_commit(lote.flush, using=using)
+        lote.callbacks = conn.run_on_commit
+    lote.entradas.append(entry)
+
+
+def escribir(entradas: list) -> None:
+    """Persiste un lote de AuditEntry (bulk_create o tarea Celery)."""
+    from .models import AuditEntry
+
+    if modo() == MODO_CELERY:
+        try:
+            from .tasks import registrar_auditoria_lote
+            registrar_auditoria_lote.delay([
+                {campo: getattr(e, campo) for campo in _CAMPOS_SERIALIZABLES}
+                for e in entradas
+            ])
+            return
+        except Exception as e:
+            logger.warning("auditoria: broker no disponible (%s); se escribe el lote en proceso.", e)
+
+    try:
+        with transaction.atomic():
+            AuditEntry.objects.bulk_create(entradas, batch_size=500)
+        return
+    except Exception:
+        logger.exception("auditoria: falló el lote de %d entradas; se escriben de a una.", len(entradas))
+
+    # El lote se revirtió entero: fila por fila, para no perder las que sí se pueden guardar
+    error = None
+    for entry in entradas:
+        entry.pk = None
+        try:
+            with transaction.atomic():
+                entry.save()
+        except Exception as exc:
+            logger.exception("auditoria: no se pudo escribir %s %s/%s.", entry.action, entry.model, entry.object_id)
+            error = exc
+    if error is not None:
+        raise error
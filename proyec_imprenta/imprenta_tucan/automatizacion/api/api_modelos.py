@@ -0,0 +1,12 @@
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+class MetricasModelosAPIView(APIView):
+    """Versión, formato y tiempo de carga de los modelos ML cargados en este proceso."""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        from core.ai_ml.registro import registro
+        return Response(registro.metricas())
@@ -0,0 +1,86 @@
+"""
+Comando de gestión: micro-benchmark de inferencia ML fila por fila vs. por lote.
+
+Uso:
+    python manage.py benchmark_inferencia_ml [--filas 1000 10000 100000] [--muestra 2000]
+
+Para cada modelo disponible (valor de cliente, score de proveedor) compara:
+    - fila por fila: predecir_valor_cliente / predecir_score_proveedor en un loop.
+    - por lote:      predecir_valor_clientes / predecir_scores_proveedores sobre
+                     la matriz completa.
+
+El modo fila por fila se mide sobre --muestra filas y se extrapola al total
+(a 100k filas tardaría minutos sin aportar precisión).
+Los features son sintéticos; no se lee la base de datos.
+
+--modelo-sintetico entrena en memoria un GradientBoostingRegressor sobre datos
+aleatorios en lugar de cargar el .pkl (útil si el artefacto no existe o fue
+generado con otra versión de scikit-learn); no se escribe nada a disco.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compara la inferencia ML fila por fila contra la inferencia por lote.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--filas', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Tamaños de lote a medir.')
+        parser.add_argument('--muestra', type=int, default=2000,
+                            help='Máximo de filas medidas en el modo fila por fila.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--modelo-sintetico', action='store_true',
+                            help='Usar un modelo entrenado en memoria en lugar del .pkl.')
+
+    def handle(self, *args, **options):
+        import numpy as np
+        from core.ai_ml import score_proveedor as sp
+        from core.ai_ml import valor_cliente as vc
+
+        rng = np.random.default_rng(options['seed'])
+        modelos = [
+            ('valor_cliente', vc, vc.predecir_valor_cliente, vc.predecir_valor_clientes,
+             lambda n: np.column_stack([
+                 rng.uniform(0, 50000, n), rng.uniform(0, 10, n),
+                 rng.uniform(0, 1, n), rng.integers(0, 10, n),
+             ])),
+            ('score_proveedor', sp, sp.predecir_score_proveedor, sp.predecir_scores_proveedores,
+             lambda n: rng.uniform(0, 1, (n, len(sp.FEATURES)))),
+        ]
+
+        for nombre, modulo, por_fila, por_lote, generar in modelos:
+            if options['modelo_sintetico']:
+                from sklearn.ensemble import GradientBoostingRegressor
+                X_train = generar(500)
+                modulo._model = GradientBoostingRegressor(n_estimators=100, random_state=0).fit(
+                    X_train, rng.uniform(0, 100, len(X_train))
+                )
+            try:
+                modulo.cargar_modelo()
+            except Exception as e:
+                self.stdout.write(self.style.WARNING(f'{nombre}: modelo no disponible ({e}), se omite.'))
+                continue
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{nombre}'))
+            self.stdout.write(f'{"filas":>8} {"fila x fila (s)":>16} {"lote (s)":>10} {"speedup":>9}')
+            for n in options['filas']:
+                X = generar(n)
+                features = [dict(zip(modulo.FEATURES, fila)) for fila in X]
+
+                muestra = min(n, options['muestra'])
+                t0 = time.perf_counter()
+                for fila in features[:muestra]:
+                    por_fila(fila)
+                t_fila = (time.perf_counter() - t0) * n / muestra
+
+                t0 = time.perf_counter()
+                por_lote(X)
+                t_lote = time.perf_counter() - t0
+
+                estimado = '*' if muestra < n else ' '
+                self.stdout.write(
+                    f'{n:>8} {t_fila:>15.3f}{estimado} {t_lote:>10.4f} {t_fila / max(t_lote, 1e-9):>8.0f}x'
+                )
+        self.stdout.write('\n* extrapolado desde --muestra filas.')
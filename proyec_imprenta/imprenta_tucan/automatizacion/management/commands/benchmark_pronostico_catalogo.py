@@ -0,0 +1,149 @@
+"""
+Comando de gestión: benchmark del pronóstico de demanda insumo por insumo
+vs. la matriz insumos × períodos (core/ai_ml/pronostico_catalogo.py).
+
+Uso:
+    python manage.py benchmark_pronostico_catalogo [--insumos 10000] [--meses 36] [--con-bd]
+
+Genera un historial sintético de ConsumoMensualInsumo y mide, para media
+móvil, ETS y factor estacional:
+    - por insumo: los núcleos escalares (media_movil_ponderada,
+                  suavizado_exponencial, _factor_estacional_desde_consumos)
+                  llamados en un loop sobre el historial en memoria.
+    - matriz:     cada método de MatrizConsumos; el armado de la matriz se
+                  informa aparte porque se hace una vez para todos los métodos.
+
+Sin --con-bd no se toca la base de datos. Con --con-bd se insertan los
+insumos y consumos sintéticos dentro de una transacción que se revierte al
+final, y se compara de punta a punta predecir_demanda_media_movil /
+predecir_demanda_ets (una query por insumo) contra MatrizConsumos.cargar()
+más el método vectorizado. En todos los casos se verifica que ambas rutas
+den los mismos números.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Compara el pronóstico insumo por insumo contra la matriz insumos × períodos.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--insumos', type=int, default=10000)
+        parser.add_argument('--meses', type=int, default=36,
+                            help='Períodos de historial por insumo.')
+        parser.add_argument('--ventana', type=int, default=3,
+                            help='Meses de la media móvil.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--con-bd', action='store_true',
+                            help='Medir también de punta a punta contra la base (transacción revertida).')
+
+    def handle(self, *args, **options):
+        import numpy as np
+        from core.ai_ml.pronostico_catalogo import MatrizConsumos
+        from core.motor.demanda_engine import DemandaInteligenteEngine
+        from insumos.models import media_movil_ponderada, suavizado_exponencial
+
+        rng = np.random.default_rng(options['seed'])
+        n_insumos, n_meses, ventana = options['insumos'], options['meses'], options['ventana']
+        periodo = '2026-07'
+        mes_actual = 7
+        alpha = 0.3
+
+        indice_actual = 2026 * 12 + 6
+        periodos = [
+            f'{(indice_actual - k) // 12:04d}-{(indice_actual - k) % 12 + 1:02d}'
+            for k in range(n_meses, 0, -1)
+        ]
+        # ~20% de celdas vacías y hasta 3 registros por período (uno por pedido)
+        conteos = rng.integers(0, 4, (n_insumos, n_meses)) * (rng.random((n_insumos, n_meses)) > 0.2)
+        totales = conteos * rng.integers(1, 200, (n_insumos, n_meses))
+        series = [
+            [(periodos[j], int(totales[i, j]), int(conteos[i, j])) for j in range(n_meses) if conteos[i, j]]
+            for i in range(n_insumos)
+        ]
+        filas = [(i, per, total, n) for i, serie in enumerate(series) for per, total, n in serie]
+        ids = list(range(n_insumos))
+        self.stdout.write(f'{n_insumos} insumos × {n_meses} meses ({len(filas)} celdas con consumo)')
+
+        t0 = time.perf_counter()
+        matriz = MatrizConsumos.desde_filas(ids, filas)
+        t_armado = time.perf_counter() - t0
+        self.stdout.write(f'Armado de la matriz: {t_armado:.4f} s')
+
+        metodos = [
+            ('media móvil',
+             lambda serie: media_movil_ponderada(serie, periodo, meses=ventana),
+             lambda: matriz.media_movil(periodo, meses=ventana)),
+            ('ETS',
+             lambda serie: suavizado_exponencial(serie, periodo, alpha),
+             lambda: matriz.ets(periodo, alpha)),
+            ('factor estacional',
+             lambda serie: DemandaInteligenteEngine._factor_estacional_desde_consumos(serie, mes_actual),
+             lambda: matriz.factor_estacional(mes_actual)),
+        ]
+
+        self.stdout.write(f'{"método":>18} {"por insumo (s)":>15} {"matriz (s)":>11} {"speedup":>9}  iguales')
+        for nombre, por_insumo, vectorizado in metodos:
+            t0 = time.perf_counter()
+            escalar = [por_insumo(serie) for serie in series]
+            t_insumo = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            resultado = vectorizado()
+            t_matriz = time.perf_counter() - t0
+
+            self._fila(nombre, t_insumo, t_matriz, escalar, resultado)
+
+        if options['con_bd']:
+            self._benchmark_bd(filas, n_insumos, periodo, ventana, alpha)
+
+    def _fila(self, nombre, t_insumo, t_matriz, escalar, resultado):
+        import numpy as np
+        esperado = np.array([np.nan if v is None else v for v in escalar], dtype=float)
+        iguales = np.array_equal(esperado, resultado, equal_nan=True)
+        self.stdout.write(
+            f'{nombre:>18} {t_insumo:>15.3f} {t_matriz:>11.4f} '
+            f'{t_insumo / max(t_matriz, 1e-9):>8.0f}x  {"sí" if iguales else "NO"}'
+        )
+
+    def _benchmark_bd(self, filas, n_insumos, periodo, ventana, alpha):
+        from django.db import transaction
+        from core.ai_ml.pronostico_catalogo import MatrizConsumos, desde_para_ventana
+        from insumos.models import (
+            ConsumoMensualInsumo, Insumo, predecir_demanda_ets, predecir_demanda_media_movil,
+        )
+
+        self.stdout.write(self.style.MIGRATE_HEADING('\nDe punta a punta contra la base'))
+        with transaction.atomic():
+            creados = Insumo.objects.bulk_create(
+                [Insumo(nombre=f'bench-{i}', codigo=f'BENCH-{i:06d}') for i in range(n_insumos)],
+                batch_size=2000,
+            )
+            if creados[0].pk is None:
+                creados = list(Insumo.objects.filter(codigo__startswith='BENCH-').order_by('codigo'))
+            ids = [ins.idInsumo for ins in creados]
+            ConsumoMensualInsumo.objects.bulk_create(
+                [ConsumoMensualInsumo(insumo_id=ids[i], periodo=per, total=total, n=n)
+                 for i, per, total, n in filas],
+                batch_size=5000,
+            )
+
+            self.stdout.write(f'{"método":>18} {"por insumo (s)":>15} {"matriz (s)":>11} {"speedup":>9}  iguales')
+            for nombre, por_insumo, metodo in [
+                ('media móvil',
+                 lambda ins: predecir_demanda_media_movil(ins, periodo, meses=ventana),
+                 lambda m: m.media_movil(periodo, meses=ventana)),
+                ('ETS',
+                 lambda ins: predecir_demanda_ets(ins, periodo, alpha=alpha),
+                 lambda m: m.ets(periodo, alpha)),
+            ]:
+                t0 = time.perf_counter()
+                escalar = [por_insumo(ins) for ins in creados]
+                t_insumo = time.perf_counter() - t0
+
+                t0 = time.perf_counter()
+                resultado = metodo(MatrizConsumos.cargar(ids, desde=desde_para_ventana(periodo, ventana)))
+                t_matriz = time.perf_counter() - t0
+                self._fila(nombre, t_insumo, t_matriz, escalar, resultado)
+            transaction.set_rollback(True)
@@ -5,7 +5,7 @@ Uso:
     python manage.py entrenar_modelo_demanda_insumo [--min-muestras 10]
 
 Proceso:
-    1. Para cada insumo con historial en ConsumoRealInsumo, construye pares
+    1. Para cada insumo con historial en ConsumoMensualInsumo, construye pares
        (consumo_mes-3, consumo_mes-2, consumo_mes-1, tipo_directo) → consumo_mes.
     2. Si hay < --min-muestras pares reales, genera datos sintéticos.
     3. Entrena un Ridge regression (scikit-learn).
@@ -16,7 +16,7 @@ import os
 import pickle
 import logging
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 logger = logging.getLogger(__name__)
 
@@ -32,19 +32,11 @@ def _model_path():
 
 def _periodos_de_insumo(insumo_id):
     """
-    Retorna dict {periodo: cantidad_consumida} para el insumo dado.
-    Agrega registros del mismo periodo (puede haber varios con misma FK/periodo).
+    Retorna dict {periodo: cantidad_consumida} para el insumo dado, con los
+    registros del mismo período ya sumados en ConsumoMensualInsumo.
     """
-    from insumos.models import ConsumoRealInsumo
-    qs = (
-        ConsumoRealInsumo.objects
-        .filter(insumo_id=insumo_id)
-        .values('periodo', 'cantidad_consumida')
-    )
-    acum = {}
-    for row in qs:
-        acum[row['periodo']] = acum.get(row['periodo'], 0) + row['cantidad_consumida']
-    return acum
+    from insumos.models import ConsumoMensualInsumo
+    return ConsumoMensualInsumo.totales(insumo_id)
 
 
 def _periodos_ordenados(mapa_periodos: dict) -> list:
@@ -77,7 +69,7 @@ class Command(BaseCommand):
             return
 
         min_muestras = options['min_muestras']
-        self.stdout.write('Construyendo pares de series temporales desde ConsumoRealInsumo...')
+        self.stdout.write('Construyendo pares de series temporales desde ConsumoMensualInsumo...')
 
         X_real, y_real = self._construir_pares()
         self.stdout.write(f'  Pares reales encontrados: {len(y_real)}')
@@ -125,15 +117,32 @@ class Command(BaseCommand):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, 'wb') as f:
             pickle.dump(model, f)
+
+        # Artefacto .npz (sin pickle, mapeable en memoria) que el registro
+        # prefiere sobre el .pkl; su mtime dispara la recarga en los workers.
+        # Si falla se borra el .npz anterior: tendría prioridad sobre el .pkl nuevo.
+        from core.ai_ml.registro import descartar_npz, exportar_npz, ruta_npz
+        error_npz = None
+        try:
+            version = exportar_npz(model, ruta_npz(path), features=FEATURES)
+            self.stdout.write(f'Artefacto .npz versión {version} guardado en: {ruta_npz(path)}')
+        except Exception as e:
+            error_npz = e
+            descartar_npz(path)
         self.stdout.write(self.style.SUCCESS(f'Modelo guardado en: {path}'))
 
         # Invalidar caché en memoria
         try:
             from core.ai_ml import demanda_insumo as di
             di._model = None
+            from core.ai_ml.registro import registro
+            registro.invalidar('demanda_insumo')
         except Exception:
             pass
 
+        if error_npz is not None:
+            raise CommandError(f'No se pudo exportar el .npz ({error_npz}); se descartó el anterior y queda el .pkl.')
+
     def _construir_pares(self):
         """
         Para cada insumo con ≥ 4 períodos de historial, genera ventanas deslizantes:
@@ -16,7 +16,7 @@ import os
 import pickle
 import logging
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 logger = logging.getLogger(__name__)
 
@@ -106,15 +106,32 @@ class Command(BaseCommand):
         os.makedirs(os.path.dirname(path), exist_ok=True)
         with open(path, 'wb') as f:
             pickle.dump(model, f)
+
+        # Artefacto .npz (sin pickle, mapeable en memoria) que el registro
+        # prefiere sobre el .pkl; su mtime dispara la recarga en los workers.
+        # Si falla se borra el .npz anterior: tendría prioridad sobre el .pkl nuevo.
+        from core.ai_ml.registro import descartar_npz, exportar_npz, ruta_npz
+        error_npz = None
+        try:
+            version = exportar_npz(model, ruta_npz(path), features=FEATURES)
+            self.stdout.write(f'Artefacto .npz versión {version} guardado en: {ruta_npz(path)}')
+        except Exception as e:
+            error_npz = e
+            descartar_npz(path)
         self.stdout.write(self.style.SUCCESS(f'Modelo guardado en: {path}'))
 
         # Invalidar caché en memoria
         try:
             from core.ai_ml import score_proveedor as sp
             sp._model = None
+            from core.ai_ml.registro import registro
+            registro.invalidar('score_proveedor')
         except Exception:
             pass
 
+        if error_npz is not None:
+            raise CommandError(f'No se pudo exportar el .npz ({error_npz}); se descartó el anterior y queda el .pkl.')
+
     def _recolectar_datos_reales(self):
         """
         Para cada proveedor activo con ScoreProveedor en BD,
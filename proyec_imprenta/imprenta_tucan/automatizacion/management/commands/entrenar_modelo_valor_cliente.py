@@ -16,7 +16,7 @@ import os
 import pickle
 import logging
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 
 logger = logging.getLogger(__name__)
 
@@ -102,16 +102,33 @@ class Command(BaseCommand):
         with open(MODEL_PATH, 'wb') as f:
             pickle.dump(model, f)
 
+        # Artefacto .npz (sin pickle, mapeable en memoria) que el registro
+        # prefiere sobre el .pkl; su mtime dispara la recarga en los workers.
+        # Si falla se borra el .npz anterior: tendría prioridad sobre el .pkl nuevo.
+        from core.ai_ml.registro import descartar_npz, exportar_npz, ruta_npz
+        error_npz = None
+        try:
+            version = exportar_npz(model, ruta_npz(MODEL_PATH), features=FEATURES)
+            self.stdout.write(f'Artefacto .npz versión {version} guardado en: {ruta_npz(MODEL_PATH)}')
+        except Exception as e:
+            error_npz = e
+            descartar_npz(MODEL_PATH)
+
         self.stdout.write(self.style.SUCCESS(f'Modelo guardado en: {MODEL_PATH}'))
 
         # Invalidar caché en memoria del módulo valor_cliente
         try:
             from core.ai_ml import valor_cliente as vc
             vc._model = None
+            from core.ai_ml.registro import registro
+            registro.invalidar('valor_cliente')
             vc._warned_missing = False
         except Exception:
             pass
 
+        if error_npz is not None:
+            raise CommandError(f'No se pudo exportar el .npz ({error_npz}); se descartó el anterior y queda el .pkl.')
+
     # ------------------------------------------------------------------
     # Recolección de datos reales
     # ------------------------------------------------------------------
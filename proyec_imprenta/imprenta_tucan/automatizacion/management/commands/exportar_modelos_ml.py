@@ -0,0 +1,47 @@
+"""
+Comando de gestión: exportar los modelos ML existentes (.pkl) al formato .npz.
+
+Uso:
+    python manage.py exportar_modelos_ml
+
+Convierte cada modelo_*.pkl de core/ai_ml al artefacto .npz del registro
+(core/ai_ml/registro.py), que se carga sin pickle, se mapea en memoria y
+tiene prioridad sobre el .pkl. Los comandos entrenar_modelo_* ya escriben
+ambos formatos; este comando sirve para modelos entrenados antes del cambio.
+"""
+import os
+import pickle
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+class Command(BaseCommand):
+    help = 'Exporta los modelos ML .pkl existentes al formato .npz del registro.'
+
+    def handle(self, *args, **options):
+        from core.ai_ml import demanda_insumo, score_proveedor, valor_cliente
+        from core.ai_ml.registro import exportar_npz, registro, ruta_npz
+
+        fallidos = []
+        for nombre, modulo in (
+            ('valor_cliente', valor_cliente),
+            ('score_proveedor', score_proveedor),
+            ('demanda_insumo', demanda_insumo),
+        ):
+            if not os.path.exists(modulo.MODEL_PATH):
+                self.stdout.write(self.style.WARNING(f'{nombre}: no existe {modulo.MODEL_PATH}'))
+                continue
+            try:
+                with open(modulo.MODEL_PATH, 'rb') as f:
+                    model = pickle.load(f)
+                version = exportar_npz(model, ruta_npz(modulo.MODEL_PATH), features=modulo.FEATURES)
+                registro.invalidar(nombre)
+                self.stdout.write(self.style.SUCCESS(
+                    f'{nombre}: versión {version} → {ruta_npz(modulo.MODEL_PATH)}'
+                ))
+            except Exception as e:
+                self.stderr.write(self.style.ERROR(f'{nombre}: no se pudo exportar ({e})'))
+                fallidos.append(nombre)
+
+        if fallidos:
+            raise CommandError(f'No se pudieron exportar: {", ".join(fallidos)}')
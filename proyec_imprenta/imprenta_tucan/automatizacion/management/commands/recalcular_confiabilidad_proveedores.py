@@ -0,0 +1,80 @@
+"""
+Backfill / verificación de ConfiabilidadProveedor desde OrdenCompra.
+
+Los contadores con decaimiento se mantienen solos con cada alta, cambio o baja
+de órdenes; este comando los reconstruye para cargas que no pasan por
+save()/delete() (QuerySet.update, bulk_create, SQL directo), después de
+cambiar CUMPLIMIENTO_DECAY_LAMBDA, o para verificar que no divergieron.
+
+Uso:
+    python manage.py recalcular_confiabilidad_proveedores
+    python manage.py recalcular_confiabilidad_proveedores --proveedor 3 --proveedor 8
+    python manage.py recalcular_confiabilidad_proveedores --verificar
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger(__name__)
+
+# Diferencia tolerada entre métricas incrementales y reconstruidas (redondeo)
+TOLERANCIA = 1e-9
+
+
+class Command(BaseCommand):
+    help = "Reconstruye ConfiabilidadProveedor (pesos con decaimiento y latencia) desde OrdenCompra."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--proveedor',
+            type=int,
+            action='append',
+            dest='proveedores',
+            help='ID de proveedor a reconstruir (repetible). Sin este flag se reconstruyen todos.',
+        )
+        parser.add_argument(
+            '--verificar',
+            action='store_true',
+            help='Compara los contadores guardados con los reconstruidos, sin escribir.',
+        )
+
+    def handle(self, *args, **options):
+        from django.utils import timezone
+        from automatizacion.models import ConfiabilidadProveedor
+
+        ahora = timezone.now()
+        filas = ConfiabilidadProveedor.reconstruir(
+            options['proveedores'], ahora=ahora, guardar=not options['verificar'],
+        )
+        if options['verificar']:
+            self._verificar(filas)
+            return
+        alcance = f"{len(options['proveedores'])} proveedores" if options['proveedores'] else "todos los proveedores"
+        resumen = f"Completado: {len(filas)} contadores reconstruidos para {alcance}"
+        self.stdout.write(self.style.SUCCESS(resumen))
+        logger.info("recalcular_confiabilidad_proveedores: %s", resumen)
+
+    def _verificar(self, esperadas):
+        from automatizacion.models import ConfiabilidadProveedor
+
+        guardadas = {
+            f.proveedor_id: f
+            for f in ConfiabilidadProveedor.objects.filter(proveedor_id__in=list(esperadas))
+        }
+        divergentes = []
+        for pid, esperada in esperadas.items():
+            guardada = guardadas.get(pid)
+            if guardada is None or guardada.lam != esperada.lam:
+                divergentes.append((pid, 'sin contadores vigentes'))
+                continue
+            for nombre, g, e in zip(
+                ('cumplimiento', 'incidencias', 'latencia'), guardada.metricas(), esperada.metricas(),
+            ):
+                if (g is None) != (e is None) or (g is not None and abs(g - e) > TOLERANCIA):
+                    divergentes.append((pid, f'{nombre}: guardado={g} reconstruido={e}'))
+        for pid, detalle in divergentes:
+            self.stdout.write(self.style.WARNING(f'Proveedor {pid}: {detalle}'))
+        resumen = f"{len(esperadas) - len({pid for pid, _ in divergentes})}/{len(esperadas)} proveedores coinciden"
+        estilo = self.style.SUCCESS if not divergentes else self.style.ERROR
+        self.stdout.write(estilo(resumen))
+        logger.info("recalcular_confiabilidad_proveedores --verificar: %s", resumen)
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:04
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automatizacion', '0020_comprapropuesta_borrador_oc_to_compras'),
+        ('clientes', '0017_add_ciudad_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaMontoCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(max_length=7)),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('suma', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('ultimo_pedido_id', models.BigIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='clientes.cliente')),
+            ],
+            options={
+                'unique_together': {('cliente', 'periodo')},
+            },
+        ),
+    ]
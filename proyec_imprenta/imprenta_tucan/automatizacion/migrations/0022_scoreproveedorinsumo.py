@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automatizacion', '0021_estadisticamontocliente'),
+        ('insumos', '0016_consumomensualinsumo'),
+        ('proveedores', '0016_add_ciudad_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ScoreProveedorInsumo',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(default=0)),
+                ('sucio', models.BooleanField(default=False)),
+                ('version_config', models.PositiveIntegerField(default=0)),
+                ('calculado', models.DateTimeField()),
+                ('insumo', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='scores_proveedor', to='insumos.insumo')),
+                ('proveedor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='proveedores.proveedor')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['insumo', '-score'], name='scoreprovinsumo_ins_score')],
+                'unique_together': {('insumo', 'proveedor')},
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.7 on 2026-10-18 13:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automatizacion', '0022_scoreproveedorinsumo'),
+        ('proveedores', '0016_add_ciudad_fk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConfiabilidadProveedor',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lam', models.FloatField()),
+                ('referencia', models.DateTimeField()),
+                ('peso_total', models.FloatField(default=0)),
+                ('peso_confirmadas', models.FloatField(default=0)),
+                ('peso_rechazadas', models.FloatField(default=0)),
+                ('latencia_dias', models.BigIntegerField(default=0)),
+                ('latencia_n', models.PositiveIntegerField(default=0)),
+                ('proveedor', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='confiabilidad', to='proveedores.proveedor')),
+            ],
+        ),
+    ]
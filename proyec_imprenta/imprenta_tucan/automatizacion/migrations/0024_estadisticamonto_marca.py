@@ -0,0 +1,45 @@
+# Generated by Django 5.2.7 on 2026-10-18 19:10
+
+from django.db import migrations, models
+
+
+def marca_desde_estadisticas(apps, schema_editor):
+    """Las estadísticas ya cargadas pasan a la fila de marca de agua con el mayor id procesado."""
+    from django.db.models import Max
+    EstadisticaMontoCliente = apps.get_model('automatizacion', 'EstadisticaMontoCliente')
+    EstadisticaMontoEstado = apps.get_model('automatizacion', 'EstadisticaMontoEstado')
+    ultimo = EstadisticaMontoCliente.objects.aggregate(m=Max('ultimo_pedido_id'))['m']
+    if ultimo is not None:
+        EstadisticaMontoEstado.objects.create(pk=1, hasta_pedido_id=ultimo)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automatizacion', '0023_confiabilidadproveedor'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadisticaMontoEstado',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hasta_pedido_id', models.BigIntegerField(default=0)),
+                ('candidato_id', models.BigIntegerField(default=0)),
+                ('candidato_en', models.DateTimeField(blank=True, null=True)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EstadisticaMontoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pedido_id', models.BigIntegerField(unique=True)),
+            ],
+        ),
+        migrations.RunPython(marca_desde_estadisticas, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='estadisticamontocliente',
+            name='ultimo_pedido_id',
+        ),
+    ]
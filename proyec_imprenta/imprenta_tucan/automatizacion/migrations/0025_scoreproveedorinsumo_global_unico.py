@@ -0,0 +1,30 @@
+# Generated by Django 5.2.7 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+def quitar_globales_duplicados(apps, schema_editor):
+    """Deja una sola fila sin insumo por proveedor (la más reciente) antes de crear la restricción."""
+    from django.db.models import Max
+    ScoreProveedorInsumo = apps.get_model('automatizacion', 'ScoreProveedorInsumo')
+    globales = ScoreProveedorInsumo.objects.filter(insumo__isnull=True)
+    conservar = globales.values('proveedor_id').annotate(ultimo=Max('id')).values_list('ultimo', flat=True)
+    globales.exclude(id__in=list(conservar)).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('automatizacion', '0024_estadisticamonto_marca'),
+    ]
+
+    operations = [
+        migrations.RunPython(quitar_globales_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='scoreproveedorinsumo',
+            constraint=models.UniqueConstraint(
+                condition=models.Q(('insumo__isnull', True)), fields=('proveedor',),
+                name='scoreprovinsumo_global_unico',
+            ),
+        ),
+    ]
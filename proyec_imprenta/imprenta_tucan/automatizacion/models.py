@@ -43,6 +43,277 @@ class ScoreProveedor(models.Model):
         return f"{self.proveedor} - Score: {self.score}"
 
 
+class ScoreProveedorInsumo(models.Model):
+    """
+    Cache persistente del score PI-2 por (insumo, proveedor); insumo nulo es
+    el score sin contexto de insumo. ProveedorInteligenteEngine.recomendar()
+    lo lee con una sola consulta mientras las filas del insumo estén vigentes:
+    sin marcar como sucias (automatizacion/signals.py), dentro de
+    SCORE_CACHE_TTL_MINUTOS y calculadas con la versión de configuración actual.
+    """
+    insumo = models.ForeignKey(
+        'insumos.Insumo', on_delete=models.CASCADE, null=True, blank=True,
+        related_name='scores_proveedor',
+    )
+    proveedor = models.ForeignKey('proveedores.Proveedor', on_delete=models.CASCADE)
+    score = models.FloatField(default=0)
+    sucio = models.BooleanField(default=False)
+    version_config = models.PositiveIntegerField(default=0)
+    calculado = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('insumo', 'proveedor')
+        # NULL no colisiona en unique_together: el score global (sin insumo) va aparte
+        constraints = [
+            models.UniqueConstraint(
+                fields=['proveedor'], condition=models.Q(insumo__isnull=True),
+                name='scoreprovinsumo_global_unico',
+            ),
+        ]
+        indexes = [models.Index(fields=['insumo', '-score'], name='scoreprovinsumo_ins_score')]
+
+    def __str__(self):
+        return f"{self.proveedor} / {self.insumo_id or 'global'} - Score: {self.score}"
+
+    @classmethod
+    def marcar_sucios(cls, *filtros, **kwargs) -> int:
+        """Marca para recálculo las filas que cumplen los filtros. Retorna cuántas."""
+        return cls.objects.filter(*filtros, **kwargs).update(sucio=True)
+
+
+class ConfiabilidadProveedor(models.Model):
+    """
+    Órdenes de compra de un proveedor resumidas en sumas con decaimiento
+    exponencial referidas al instante `referencia`:
+
+        peso_* = Σ exp(-lam · días entre fecha_creacion y referencia)
+
+    El decaimiento compone, así que una orden nueva o un cambio de estado se
+    aplican en O(1): se decaen las sumas hasta ahora y se suma el evento.
+    Cumplimiento e incidencias son cocientes de estas sumas y no dependen de
+    la referencia. La latencia son sumas simples (días y cantidad) de las
+    órdenes confirmadas con fecha_respuesta.
+
+    Lo mantienen los signals de automatizacion/signals.py; reconstruir() lo
+    recalcula desde OrdenCompra (comando recalcular_confiabilidad_proveedores).
+    """
+    proveedor = models.OneToOneField(
+        'proveedores.Proveedor', on_delete=models.CASCADE, related_name='confiabilidad',
+    )
+    lam = models.FloatField()
+    referencia = models.DateTimeField()
+    peso_total = models.FloatField(default=0)
+    peso_confirmadas = models.FloatField(default=0)
+    peso_rechazadas = models.FloatField(default=0)
+    latencia_dias = models.BigIntegerField(default=0)
+    latencia_n = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.proveedor} - confiabilidad (total={self.peso_total:.2f})"
+
+    @staticmethod
+    def contribucion(estado, fecha_creacion, fecha_respuesta) -> tuple:
+        """
+        Aporte sin decaer de una orden:
+        (total, confirmada, rechazada, días de latencia, con latencia).
+        """
+        latencia = None
+        if estado == 'confirmada' and fecha_respuesta is not None and fecha_creacion is not None:
+            latencia = (fecha_respuesta - fecha_creacion).days
+        con_latencia = latencia is not None and latencia >= 0
+        return (
+            1, int(estado == 'confirmada'), int(estado == 'rechazada'),
+            latencia if con_latencia else 0, int(con_latencia),
+        )
+
+    @staticmethod
+    def peso(lam: float, fecha_creacion, referencia) -> float:
+        """exp(-lam · días) con días fraccionarios, sin negativos."""
+        import math
+        dias = (referencia - fecha_creacion).total_seconds() / 86400 if fecha_creacion else 0.0
+        return math.exp(-lam * max(0.0, dias))
+
+    @staticmethod
+    def lam_actual() -> float:
+        from core.motor.config import MotorConfig
+        return MotorConfig.get('CUMPLIMIENTO_DECAY_LAMBDA', cast=float) or 0.01
+
+    def metricas(self) -> tuple:
+        """
+        (cumplimiento, incidencias, latencia media en días o None), con los
+        mismos neutros que el motor: sin órdenes → 1.0 y 0.0.
+        """
+        if self.peso_total > 0:
+            cumplimiento = self.peso_confirmadas / self.peso_total
+            incidencias = self.peso_rechazadas / self.peso_total
+        else:
+            cumplimiento, incidencias = 1.0, 0.0
+        latencia = self.latencia_dias / self.latencia_n if self.latencia_n else None
+        return cumplimiento, incidencias, latencia
+
+    @classmethod
+    def aplicar(cls, proveedor_id, fecha_creacion, delta, lam=None, ahora=None) -> None:
+        """
+        Suma `delta` (contribucion() nueva menos la previa) de una orden creada
+        en `fecha_creacion`. Sin fila o con otro lambda, reconstruye el
+        proveedor desde sus órdenes, que ya incluyen el cambio.
+        """
+        from django.db import transaction
+        from django.utils import timezone
+        lam = cls.lam_actual() if lam is None else lam
+        ahora = ahora or timezone.now()
+        with transaction.atomic():
+            cls._bloquear_proveedores([proveedor_id])
+            fila = cls.objects.filter(proveedor_id=proveedor_id).first()
+            if fila is None or fila.lam != lam:
+                cls.reconstruir([proveedor_id], lam=lam, ahora=ahora)
+                return
+            referencia = max(fila.referencia, ahora)
+            decaimiento = cls.peso(lam, fila.referencia, referencia)
+            w = cls.peso(lam, fecha_creacion, referencia)
+            total, confirmada, rechazada, lat_dias, lat_n = delta
+            fila.peso_total = fila.peso_total * decaimiento + w * total
+            fila.peso_confirmadas = fila.peso_confirmadas * decaimiento + w * confirmada
+            fila.peso_rechazadas = fila.peso_rechazadas * decaimiento + w * rechazada
+            fila.latencia_dias += lat_dias
+            fila.latencia_n = max(0, fila.latencia_n + lat_n)
+            fila.referencia = referencia
+            fila.save(update_fields=[
+                'peso_total', 'peso_confirmadas', 'peso_rechazadas',
+                'latencia_dias', 'latencia_n', 'referencia',
+            ])
+
+    @staticmethod
+    def _bloquear_proveedores(proveedor_ids) -> None:
+        """
+        Bloquea las filas de Proveedor (FOR NO KEY UPDATE, que no choca con el
+        alta de órdenes). aplicar() y reconstruir() toman este lock, así que un
+        delta nunca cae entre la lectura de órdenes y la escritura de otro.
+        """
+        from proveedores.models import Proveedor
+        list(
+            Proveedor.objects.select_for_update(no_key=True)
+            .filter(id__in=proveedor_ids).order_by('id').values_list('id', flat=True)
+        )
+
+    @classmethod
+    def reconstruir(cls, proveedor_ids=None, lam=None, ahora=None, guardar=True) -> dict:
+        """
+        Recalcula los contadores desde OrdenCompra (todos los proveedores si
+        `proveedor_ids` es None). Retorna {proveedor_id: fila}; con
+        guardar=False no toca la tabla. Al guardar, lee las órdenes con los
+        proveedores bloqueados y escribe con upsert.
+        """
+        from contextlib import nullcontext
+
+        from django.db import transaction
+        from django.utils import timezone
+        from pedidos.models import OrdenCompra
+        from proveedores.models import Proveedor
+        lam = cls.lam_actual() if lam is None else lam
+        ahora = ahora or timezone.now()
+
+        with transaction.atomic() if guardar else nullcontext():
+            if proveedor_ids is None:
+                proveedor_ids = list(Proveedor.objects.values_list('id', flat=True))
+                ordenes = OrdenCompra.objects.all()
+            else:
+                proveedor_ids = list(proveedor_ids)
+                ordenes = OrdenCompra.objects.filter(proveedor_id__in=proveedor_ids)
+            if guardar:
+                cls._bloquear_proveedores(proveedor_ids)
+            filas = {
+                pid: cls(proveedor_id=pid, lam=lam, referencia=ahora) for pid in proveedor_ids
+            }
+            for pid, estado, creada, respuesta in ordenes.order_by().values_list(
+                'proveedor_id', 'estado', 'fecha_creacion', 'fecha_respuesta',
+            ):
+                fila = filas[pid]
+                w = cls.peso(lam, creada, ahora)
+                total, confirmada, rechazada, lat_dias, lat_n = cls.contribucion(estado, creada, respuesta)
+                fila.peso_total += w * total
+                fila.peso_confirmadas += w * confirmada
+                fila.peso_rechazadas += w * rechazada
+                fila.latencia_dias += lat_dias
+                fila.latencia_n += lat_n
+
+            if guardar:
+                cls.objects.bulk_create(
+                    filas.values(), batch_size=500,
+                    update_conflicts=True, unique_fields=['proveedor'],
+                    update_fields=[
+                        'lam', 'referencia', 'peso_total', 'peso_confirmadas', 'peso_rechazadas',
+                        'latencia_dias', 'latencia_n',
+                    ],
+                )
+        return filas
+
+    @classmethod
+    def para_proveedores(cls, proveedor_ids) -> dict:
+        """
+        {proveedor_id: fila} leyendo los contadores vigentes en una consulta;
+        los proveedores sin fila o acumulados con otro lambda se reconstruyen.
+        """
+        lam = cls.lam_actual()
+        proveedor_ids = list(proveedor_ids)
+        filas = {
+            f.proveedor_id: f
+            for f in cls.objects.filter(proveedor_id__in=proveedor_ids, lam=lam)
+        }
+        faltantes = [pid for pid in proveedor_ids if pid not in filas]
+        if faltantes:
+            filas.update(cls.reconstruir(faltantes, lam=lam))
+        return filas
+
+
+class EstadisticaMontoCliente(models.Model):
+    """
+    Momentos del monto de pedidos por cliente y mes (n, suma y M2 = suma de
+    cuadrados de desvíos respecto de la media del mes). Los meses se combinan
+    para obtener media y desvío de la ventana histórica sin releer pedidos;
+    los mantiene core.ai_ml.anomaly (pasada incremental y signals de Pedido).
+    """
+    cliente = models.ForeignKey('clientes.Cliente', on_delete=models.CASCADE)
+    periodo = models.CharField(max_length=7)  # 'YYYY-MM'
+    n = models.PositiveIntegerField(default=0)
+    suma = models.FloatField(default=0)
+    m2 = models.FloatField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('cliente', 'periodo')
+
+    def __str__(self):
+        return f"{self.cliente} - {self.periodo}: n={self.n}"
+
+
+class EstadisticaMontoEstado(models.Model):
+    """
+    Marca de agua de EstadisticaMontoCliente (fila única, pk=1).
+
+    Todo pedido con id <= hasta_pedido_id ya está incorporado; los de id mayor
+    lo están si figuran en EstadisticaMontoPedido. candidato_id es el mayor id
+    que existía en candidato_en: pasado core.ai_ml.anomaly.MARGEN_CONFIRMACION
+    ya no queda ninguna transacción abierta con un id menor y la marca avanza
+    hasta él. Sin fila, las estadísticas todavía no se cargaron.
+    """
+    hasta_pedido_id = models.BigIntegerField(default=0)
+    candidato_id = models.BigIntegerField(default=0)
+    candidato_en = models.DateTimeField(null=True, blank=True)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Estadísticas de monto hasta el pedido {self.hasta_pedido_id}"
+
+
+class EstadisticaMontoPedido(models.Model):
+    """Pedido con id mayor a la marca de agua ya incorporado a EstadisticaMontoCliente."""
+    pedido_id = models.BigIntegerField(unique=True)
+
+    def __str__(self):
+        return f"Pedido {self.pedido_id}"
+
+
 class OrdenSugerida(models.Model):
     pedido = models.ForeignKey('pedidos.Pedido', on_delete=models.CASCADE, related_name='ordenes_sugeridas')
     insumo = models.ForeignKey('insumos.Insumo', on_delete=models.CASCADE)
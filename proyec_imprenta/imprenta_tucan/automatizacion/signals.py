@@ -6,10 +6,23 @@ FeedbackRecomendacion.post_save → actualiza pesos del motor PI-2.
 Cuando el administrador registra un FeedbackRecomendacion con deltas de criterios,
 los pesos del ProveedorInteligenteEngine se ajustan automáticamente y persisten
 en ProveedorParametro (BD), sin necesidad de intervención manual.
+
+OrdenCompra.post_save/post_delete → ConfiabilidadProveedor por delta, en O(1).
+
+Pedido.post_save/post_delete → EstadisticaMontoCliente (anomalías) por delta.
+
+Invalidación del cache ScoreProveedorInsumo: los cambios que alteran el score
+PI-2 marcan como sucias sólo las filas afectadas. Los valores con que se leyó
+cada instancia se guardan en post_init (sin queries) para detectar cambios.
 """
-from django.db.models.signals import post_save
+import logging
+
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 
+logger = logging.getLogger(__name__)
+
 
 @receiver(post_save, sender='automatizacion.FeedbackRecomendacion')
 def feedback_recomendacion_actualiza_pesos(sender, instance, created, **kwargs):
@@ -33,3 +46,181 @@ def feedback_recomendacion_actualiza_pesos(sender, instance, created, **kwargs):
         ProveedorInteligenteEngine().retroalimentar(deltas)
     except Exception:
         pass  # fallo silencioso: el feedback ya quedó guardado en BD
+
+
+# --------------------------------------------------------------------------- #
+# Invalidación de ScoreProveedorInsumo                                          #
+# --------------------------------------------------------------------------- #
+
+def _cargados(instance, *attnames):
+    """Valores presentes en la instancia; None si alguno está diferido."""
+    data = instance.__dict__
+    if instance.pk is None or any(a not in data for a in attnames):
+        return None
+    return tuple(data[a] for a in attnames)
+
+
+def _marcar_sucios(*filtros, **kwargs):
+    try:
+        from automatizacion.models import ScoreProveedorInsumo
+        ScoreProveedorInsumo.marcar_sucios(*filtros, **kwargs)
+    except Exception as exc:
+        logger.warning('No se pudo invalidar el cache de scores de proveedores: %s', exc)
+
+
+_CAMPOS_ORDEN = ('proveedor_id', 'estado', 'fecha_creacion', 'fecha_respuesta')
+
+
+@receiver(post_init, sender='pedidos.OrdenCompra')
+def _orden_compra_cargada(sender, instance, **kwargs):
+    instance._orden_cargada = _cargados(instance, *_CAMPOS_ORDEN)
+
+
+def _aplicar_confiabilidad(valores, signo):
+    """Suma (signo=1) o resta (signo=-1) el aporte de una orden a ConfiabilidadProveedor."""
+    from automatizacion.models import ConfiabilidadProveedor
+    proveedor_id, estado, creada, respuesta = valores
+    aporte = ConfiabilidadProveedor.contribucion(estado, creada, respuesta)
+    ConfiabilidadProveedor.aplicar(proveedor_id, creada, tuple(signo * v for v in aporte))
+
+
+@receiver(post_save, sender='pedidos.OrdenCompra')
+def _orden_compra_actualiza_proveedor(sender, instance, created, **kwargs):
+    """
+    Alta o cambio de estado, respuesta o proveedor de una orden: ajusta
+    ConfiabilidadProveedor por delta y marca sucios los scores cacheados del
+    proveedor (cumplimiento, incidencias y latencia no dependen del insumo).
+    Si la orden se cargó con campos diferidos no hay valores previos contra
+    los que calcular el delta y se reconstruye el proveedor.
+    """
+    from automatizacion.models import ConfiabilidadProveedor
+    actual = tuple(getattr(instance, a) for a in _CAMPOS_ORDEN)
+    previo = None if created else getattr(instance, '_orden_cargada', None)
+    instance._orden_cargada = actual
+    if previo == actual:
+        return
+    try:
+        if not created and previo is None:
+            ConfiabilidadProveedor.reconstruir([actual[0]])
+        elif previo is None or previo[0] != actual[0] or previo[2] != actual[2]:
+            if previo is not None:
+                _aplicar_confiabilidad(previo, -1)
+            _aplicar_confiabilidad(actual, 1)
+        else:
+            delta = tuple(
+                n - v for n, v in zip(
+                    ConfiabilidadProveedor.contribucion(*actual[1:]),
+                    ConfiabilidadProveedor.contribucion(*previo[1:]),
+                )
+            )
+            if any(delta):
+                ConfiabilidadProveedor.aplicar(actual[0], actual[2], delta)
+    except Exception as exc:
+        logger.warning('No se pudo actualizar la confiabilidad del proveedor %s: %s', instance.proveedor_id, exc)
+    _marcar_sucios(proveedor_id__in={actual[0]} | ({previo[0]} if previo else set()))
+
+
+@receiver(post_delete, sender='pedidos.OrdenCompra')
+def _orden_compra_borrada_actualiza_proveedor(sender, instance, **kwargs):
+    try:
+        _aplicar_confiabilidad(tuple(getattr(instance, a) for a in _CAMPOS_ORDEN), -1)
+    except Exception as exc:
+        logger.warning('No se pudo actualizar la confiabilidad del proveedor %s: %s', instance.proveedor_id, exc)
+    _marcar_sucios(proveedor_id=instance.proveedor_id)
+
+
+@receiver(post_save, sender='automatizacion.ConsultaStockProveedor')
+@receiver(post_delete, sender='automatizacion.ConsultaStockProveedor')
+def _consulta_stock_invalida_scores(sender, instance, **kwargs):
+    """
+    Alta o respuesta de una consulta de stock: cambia la disponibilidad del
+    proveedor para ese insumo y para el score sin contexto. Las pendientes
+    también cuentan en el total de consultas.
+    """
+    _marcar_sucios(
+        Q(insumo_id=instance.insumo_id) | Q(insumo__isnull=True),
+        proveedor_id=instance.proveedor_id,
+    )
+
+
+_CAMPOS_PRECIO_INSUMO = ('precio_unitario', 'nombre', 'proveedor_id')
+
+
+@receiver(post_init, sender='insumos.Insumo')
+def _insumo_cargado(sender, instance, **kwargs):
+    instance._score_cargado = _cargados(instance, *_CAMPOS_PRECIO_INSUMO)
+
+
+@receiver(post_save, sender='insumos.Insumo')
+def _precio_insumo_invalida_scores(sender, instance, created, **kwargs):
+    """
+    Precio, nombre o proveedor de un insumo: el precio relativo se normaliza
+    contra los insumos del mismo nombre y, sin contexto, contra el precio
+    promedio de cada proveedor, así que se invalidan ambos grupos.
+    """
+    actual = tuple(getattr(instance, a) for a in _CAMPOS_PRECIO_INSUMO)
+    previo = getattr(instance, '_score_cargado', None)
+    if created or previo != actual:
+        nombres = {instance.nombre} | ({previo[1]} if previo else set())
+        _marcar_sucios(Q(insumo__nombre__in=nombres) | Q(insumo__isnull=True))
+    instance._score_cargado = actual
+
+
+@receiver(post_init, sender='proveedores.Proveedor')
+def _proveedor_cargado(sender, instance, **kwargs):
+    instance._score_cargado = _cargados(instance, 'activo')
+
+
+@receiver(post_save, sender='proveedores.Proveedor')
+def _proveedor_invalida_scores(sender, instance, created, **kwargs):
+    """Alta o (des)activación: cambia el conjunto de candidatos de todos los insumos."""
+    actual = (instance.activo,)
+    if created or getattr(instance, '_score_cargado', None) != actual:
+        _marcar_sucios()
+    instance._score_cargado = actual
+
+
+# --------------------------------------------------------------------------- #
+# Estadísticas de montos por cliente (core/ai_ml/anomaly.py)                    #
+# --------------------------------------------------------------------------- #
+
+_CAMPOS_MONTO_PEDIDO = ('cliente_id', 'monto_total', 'fecha_pedido')
+
+
+@receiver(post_init, sender='pedidos.Pedido')
+def _pedido_cargado(sender, instance, **kwargs):
+    instance._monto_cargado = _cargados(instance, *_CAMPOS_MONTO_PEDIDO)
+
+
+@receiver(pre_save, sender='pedidos.Pedido')
+def _pedido_monto_previo(sender, instance, using, **kwargs):
+    if instance.pk is None or getattr(instance, '_monto_cargado', None) is not None:
+        return
+    # Campos diferidos o instancia armada a mano con pk existente
+    instance._monto_cargado = (
+        sender._base_manager.using(using).filter(pk=instance.pk)
+        .values_list(*_CAMPOS_MONTO_PEDIDO).first()
+    )
+
+
+def _aplicar_estadisticas(instance, previo, actual):
+    try:
+        from core.ai_ml.anomaly import aplicar_cambio_pedido
+        aplicar_cambio_pedido(instance.pk, previo, actual)
+    except Exception as exc:
+        logger.warning('No se pudieron actualizar las estadísticas del pedido %s: %s', instance.pk, exc)
+
+
+@receiver(post_save, sender='pedidos.Pedido')
+def _pedido_actualiza_estadisticas(sender, instance, created, **kwargs):
+    """Alta o cambio de cliente, monto o fecha: mueve la muestra entre meses."""
+    actual = tuple(getattr(instance, a) for a in _CAMPOS_MONTO_PEDIDO)
+    previo = None if created else instance._monto_cargado
+    instance._monto_cargado = actual
+    if previo != actual:
+        _aplicar_estadisticas(instance, previo, actual)
+
+
+@receiver(post_delete, sender='pedidos.Pedido')
+def _pedido_borrado_actualiza_estadisticas(sender, instance, **kwargs):
+    _aplicar_estadisticas(instance, tuple(getattr(instance, a) for a in _CAMPOS_MONTO_PEDIDO), None)
@@ -246,6 +246,25 @@ def tarea_ranking_clientes():
     return msg
 
 
+@shared_task
+def tarea_estadisticas_anomalias(reconstruir=False):
+    """
+    Pone al día EstadisticaMontoCliente (core/ai_ml/anomaly.py) con los pedidos
+    que no pasaron por save(); con reconstruir=True la recalcula completa para
+    corregir los update() que no disparan signals.
+    """
+    try:
+        from core.ai_ml.anomaly import actualizar_estadisticas_incrementales, reconstruir_estadisticas
+        resultado = reconstruir_estadisticas() if reconstruir else actualizar_estadisticas_incrementales()
+    except Exception:
+        logger.exception("tarea_estadisticas_anomalias: error al actualizar estadísticas")
+        return "estadisticas_anomalias: error — ver logs"
+    return (
+        f"estadisticas_anomalias: {resultado['pedidos']} pedidos, "
+        f"{resultado['meses_actualizados']} meses actualizados, {resultado['meses_expirados']} expirados"
+    )
+
+
 @shared_task
 def tarea_recalcular_scores_proveedores():
     """
@@ -255,9 +274,10 @@ def tarea_recalcular_scores_proveedores():
     """
     try:
         from core.motor.proveedor_engine import ProveedorInteligenteEngine
-        # recomendar() usa _calcular_scores_batch(): 4-5 queries totales en lugar de N*5
+        # recomendar() usa _calcular_scores_batch(): 4-5 queries totales en lugar de N*5.
+        # Recalcula siempre: es el refresco periódico que el cache no debe saltear.
         engine = ProveedorInteligenteEngine()
-        engine.recomendar(insumo=None)
+        engine.recomendar(insumo=None, usar_cache=False)
         count = Proveedor.objects.filter(activo=True).count()
         return f"scores_proveedores: {count} proveedores actualizados"
     except Exception as e:
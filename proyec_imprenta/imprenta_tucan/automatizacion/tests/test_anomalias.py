@@ -0,0 +1,186 @@
+"""
+Tests de detección de anomalías (core/ai_ml/anomaly.py).
+
+Cubre:
+  1. Pedido con monto atípico respecto del historial del cliente.
+  2. Cantidad de queries constante respecto de los clientes.
+  3. Modo incremental: mismas estadísticas que el recálculo completo.
+  4. Altas, ediciones de monto o fecha y bajas por save()/delete() se aplican
+     al momento y dejan lo mismo que reconstruir.
+  5. Anomalías de stock sin query por insumo.
+  6. La pasada incremental levanta pedidos con id menor a los ya procesados,
+     la marca de agua avanza tras el margen y reconstruir es atómico.
+"""
+import statistics
+from datetime import date, timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from automatizacion.models import EstadisticaMontoCliente, EstadisticaMontoEstado, EstadisticaMontoPedido
+from insumos.models import Insumo
+from pedidos.models import Pedido
+from utils.pruebas import assert_queries_no_crecen
+
+from .test_procesos_inteligentes import make_cliente, make_estado, make_insumo
+
+
+def _pedido(cliente, estado, hace_dias, monto):
+    hoy = date.today()
+    p = Pedido.objects.bulk_create([Pedido(
+        cliente=cliente, fecha_entrega=hoy, monto_total=monto, estado=estado,
+    )])[0]
+    Pedido.objects.filter(pk=p.pk).update(fecha_pedido=hoy - timedelta(days=hace_dias))
+    return p
+
+
+class AnomaliasPedidosTest(TestCase):
+    def setUp(self):
+        self.estado = make_estado('Pendiente')
+        self.cliente = make_cliente()
+        # Historial en meses completos anteriores a la ventana reciente
+        self.montos_hist = [100, 110, 95, 105, 90, 120, 100]
+        for i, monto in enumerate(self.montos_hist):
+            _pedido(self.cliente, self.estado, 70 + 30 * i, monto)
+        self.atipico = _pedido(self.cliente, self.estado, 2, 1000)
+        self.normal = _pedido(self.cliente, self.estado, 3, 104)
+
+    def test_detecta_monto_alto(self):
+        from core.ai_ml.anomaly import detectar_anomalias_pedidos
+        res = detectar_anomalias_pedidos()
+        self.assertEqual([a['pedido_id'] for a in res], [self.atipico.pk])
+        a = res[0]
+        self.assertEqual(a['tipo_anomalia'], 'monto_alto')
+        self.assertEqual(a['valor_esperado'], round(statistics.mean(self.montos_hist), 2))
+        self.assertEqual(a['desvio_estandar'], round(statistics.stdev(self.montos_hist), 2))
+
+    def test_queries_no_crecen_con_clientes(self):
+        from core.ai_ml.anomaly import detectar_anomalias_pedidos
+
+        def mas_clientes():
+            for _ in range(5):
+                otro = make_cliente()
+                for d in (40, 80, 120, 160, 200, 1):
+                    _pedido(otro, self.estado, d, 50 + d)
+
+        assert_queries_no_crecen(self, detectar_anomalias_pedidos, detectar_anomalias_pedidos, entre=mas_clientes)
+
+    def test_modo_incremental(self):
+        from core.ai_ml.anomaly import (
+            actualizar_estadisticas_incrementales, detectar_anomalias_pedidos,
+        )
+        # Carga en dos tandas: la segunda sólo procesa los pedidos nuevos
+        r1 = actualizar_estadisticas_incrementales()
+        self.assertEqual(r1['pedidos'], len(self.montos_hist) + 2)
+        _pedido(self.cliente, self.estado, 1, 101)
+        r2 = actualizar_estadisticas_incrementales()
+        self.assertEqual(r2['pedidos'], 1)
+
+        res = detectar_anomalias_pedidos(incremental=True)
+        self.assertEqual([a['pedido_id'] for a in res], [self.atipico.pk])
+        self.assertAlmostEqual(res[0]['desvio_estandar'], round(statistics.stdev(self.montos_hist), 2))
+
+
+def _momentos():
+    return {
+        (e.cliente_id, e.periodo): (e.n, round(e.suma, 6), round(e.m2, 6))
+        for e in EstadisticaMontoCliente.objects.filter(n__gt=0)
+    }
+
+
+class EstadisticasPorSignalsTest(TestCase):
+    def setUp(self):
+        from core.ai_ml.anomaly import actualizar_estadisticas_incrementales
+        self.estado = make_estado('Pendiente')
+        self.cliente = make_cliente()
+        self.otro = make_cliente()
+        for i, monto in enumerate((100, 110, 95, 105)):
+            _pedido(self.cliente, self.estado, 40 + 30 * i, monto)
+        actualizar_estadisticas_incrementales()
+
+    def _assert_igual_a_reconstruir(self):
+        from core.ai_ml.anomaly import reconstruir_estadisticas
+        aplicadas = _momentos()
+        reconstruir_estadisticas()
+        self.assertEqual(aplicadas, _momentos())
+
+    def test_altas_cambios_y_bajas(self):
+        nuevo = Pedido.objects.create(
+            cliente=self.cliente, fecha_entrega=date.today(), monto_total=130, estado=self.estado,
+        )
+        viejo = Pedido.objects.filter(cliente=self.cliente).order_by('fecha_pedido').first()
+        viejo.monto_total = 300
+        viejo.save()
+        nuevo.fecha_pedido = date.today() - timedelta(days=45)
+        nuevo.cliente = self.otro
+        nuevo.save()
+        diferido = Pedido.objects.only('pk').get(pk=viejo.pk)
+        diferido.monto_total = 80
+        diferido.save()
+        Pedido.objects.filter(cliente=self.cliente).order_by('-fecha_pedido').first().delete()
+        self._assert_igual_a_reconstruir()
+
+    def test_pasada_incremental_no_duplica_lo_aplicado(self):
+        from core.ai_ml.anomaly import actualizar_estadisticas_incrementales
+        Pedido.objects.create(cliente=self.cliente, fecha_entrega=date.today(), monto_total=120, estado=self.estado)
+        self.assertEqual(actualizar_estadisticas_incrementales()['pedidos'], 0)
+        self._assert_igual_a_reconstruir()
+
+    def test_pedido_con_id_menor_confirmado_despues(self):
+        from core.ai_ml.anomaly import actualizar_estadisticas_incrementales
+        ultimo = Pedido.objects.order_by('-id').first().pk
+        hoy = date.today()
+        Pedido.objects.bulk_create([Pedido(
+            id=ultimo + 10, cliente=self.cliente, fecha_entrega=hoy, monto_total=90, estado=self.estado,
+        )])
+        self.assertEqual(actualizar_estadisticas_incrementales()['pedidos'], 1)
+        # Otra transacción confirma un id menor al ya procesado
+        Pedido.objects.bulk_create([Pedido(
+            id=ultimo + 5, cliente=self.cliente, fecha_entrega=hoy, monto_total=70, estado=self.estado,
+        )])
+        self.assertEqual(actualizar_estadisticas_incrementales()['pedidos'], 1)
+        self._assert_igual_a_reconstruir()
+
+    def test_marca_avanza_tras_el_margen(self):
+        from core.ai_ml.anomaly import MARGEN_CONFIRMACION, actualizar_estadisticas_incrementales
+        EstadisticaMontoEstado.objects.filter(pk=1).update(candidato_en=timezone.now() - MARGEN_CONFIRMACION)
+        actualizar_estadisticas_incrementales()
+        estado = EstadisticaMontoEstado.objects.get(pk=1)
+        self.assertEqual(estado.hasta_pedido_id, Pedido.objects.order_by('-id').first().pk)
+        self.assertFalse(EstadisticaMontoPedido.objects.exists())
+
+        # Los pedidos debajo de la marca se siguen actualizando por signals, sin MAX por save
+        pedido = Pedido.objects.filter(cliente=self.cliente).first()
+        pedido.monto_total = 400
+        with CaptureQueriesContext(connection) as ctx:
+            pedido.save()
+        self.assertFalse([q['sql'] for q in ctx.captured_queries if 'MAX(' in q['sql'].upper()])
+        self._assert_igual_a_reconstruir()
+
+    def test_reconstruir_es_atomico(self):
+        from core.ai_ml import anomaly
+        antes = _momentos()
+        with mock.patch.object(anomaly, 'actualizar_estadisticas_incrementales', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                anomaly.reconstruir_estadisticas()
+        self.assertEqual(_momentos(), antes)
+        self.assertTrue(EstadisticaMontoEstado.objects.filter(pk=1).exists())
+
+
+class AnomaliasStockTest(TestCase):
+    def test_stock_bajo_minimo(self):
+        from core.ai_ml.anomaly import detectar_anomalias_stock
+        critico = make_insumo(stock=0)
+        bajo = make_insumo(stock=1)
+        ok = make_insumo(stock=50)
+        Insumo.objects.filter(pk__in=[critico.pk, bajo.pk, ok.pk]).update(stock_minimo_calculado=20)
+        with CaptureQueriesContext(connection) as ctx:
+            res = detectar_anomalias_stock()
+        self.assertLessEqual(len(ctx), 3)
+        por_id = {a['insumo_id']: a for a in res}
+        self.assertEqual(por_id[critico.idInsumo]['severidad'], 'critica')
+        self.assertEqual(por_id[bajo.idInsumo]['ratio'], 0.05)
+        self.assertNotIn(ok.idInsumo, por_id)
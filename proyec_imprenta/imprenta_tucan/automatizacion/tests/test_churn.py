@@ -0,0 +1,81 @@
+"""
+Tests de detección de churn (core/ai_ml/churn.py).
+
+Cubre:
+  1. Scoring de los casos típicos (inactivo, caída de frecuencia/monto, sin pedidos).
+  2. La cantidad de queries no crece con los clientes.
+  3. Subconjunto por cliente_ids y salida streaming por lotes.
+"""
+from datetime import date, timedelta
+
+from django.test import TestCase
+
+from pedidos.models import Pedido
+from utils.pruebas import assert_queries_no_crecen
+
+from .test_procesos_inteligentes import make_cliente, make_estado
+
+
+def _pedidos(cliente, estado, hace_dias, monto=100):
+    """Crea pedidos sin disparar Pedido.save (fecha_pedido es auto_now_add)."""
+    hoy = date.today()
+    for dias in hace_dias:
+        p = Pedido.objects.bulk_create([Pedido(
+            cliente=cliente, fecha_entrega=hoy, monto_total=monto, estado=estado,
+        )])[0]
+        Pedido.objects.filter(pk=p.pk).update(fecha_pedido=hoy - timedelta(days=dias))
+
+
+class ChurnMasivoTest(TestCase):
+    def setUp(self):
+        self.estado = make_estado('Pendiente')
+        # Activo y estable: pedidos en ambas ventanas
+        self.estable = make_cliente()
+        _pedidos(self.estable, self.estado, [5, 30, 100, 120])
+        # Inactivo 100 días con caída de frecuencia y de monto
+        self.inactivo = make_cliente()
+        _pedidos(self.inactivo, self.estado, [100, 110, 130], monto=500)
+        # Sin pedidos
+        self.nuevo = make_cliente()
+
+    def test_scoring(self):
+        from core.ai_ml.churn import detectar_churn_masivo
+        res = {r['cliente_id']: r for r in detectar_churn_masivo()}
+
+        self.assertEqual(res[self.estable.id]['riesgo'], 'bajo')
+        self.assertEqual(res[self.estable.id]['freq_reciente'], 2)
+        self.assertEqual(res[self.estable.id]['freq_anterior'], 2)
+
+        r = res[self.inactivo.id]
+        self.assertEqual(r['dias_inactivo'], 100)
+        self.assertEqual(r['score'], 0.95)
+        self.assertEqual(r['riesgo'], 'alto')
+        self.assertEqual(len(r['motivos']), 3)
+
+        self.assertEqual(res[self.nuevo.id]['score'], 1.0)
+        self.assertEqual(res[self.nuevo.id]['dias_inactivo'], -1)
+
+    def test_riesgo_individual_coincide_con_masivo(self):
+        from core.ai_ml.churn import detectar_churn_masivo, detectar_riesgo_churn
+        masivo = {r['cliente_id']: r for r in detectar_churn_masivo()}
+        for cliente in (self.estable, self.inactivo, self.nuevo):
+            self.assertEqual(detectar_riesgo_churn(cliente.id), masivo[cliente.id])
+
+    def test_queries_no_crecen_con_clientes(self):
+        from core.ai_ml.churn import detectar_churn_masivo
+
+        def mas_clientes():
+            for _ in range(8):
+                _pedidos(make_cliente(), self.estado, [10, 95])
+
+        assert_queries_no_crecen(self, detectar_churn_masivo, detectar_churn_masivo, entre=mas_clientes)
+
+    def test_subconjunto_y_streaming(self):
+        from core.ai_ml.churn import detectar_churn_masivo, iterar_churn
+        subset = detectar_churn_masivo(cliente_ids=[self.inactivo.id])
+        self.assertEqual([r['cliente_id'] for r in subset], [self.inactivo.id])
+
+        lotes = list(iterar_churn(tam_lote=2))
+        self.assertTrue(all(len(l) <= 2 for l in lotes))
+        ids = {r['cliente_id'] for l in lotes for r in l}
+        self.assertTrue({self.estable.id, self.inactivo.id, self.nuevo.id} <= ids)
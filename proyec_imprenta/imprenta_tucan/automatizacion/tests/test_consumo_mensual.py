@@ -0,0 +1,137 @@
+"""
+Tests del agregado ConsumoMensualInsumo (insumos/models.py, insumos/signals.py).
+
+Cubre:
+  1. Altas, cambios y bajas de ConsumoRealInsumo se reflejan por delta y
+     coinciden con una reconstrucción completa.
+  2. retroalimentar() del motor de demanda actualiza el agregado.
+  3. Los pronósticos sobre el agregado dan lo mismo que sobre las filas crudas
+     cuando hay varios registros por período.
+  4. recalcular_consumo_mensual repara cargas que no pasan por save().
+  5. Un cambio no relee el registro previo salvo que esté diferido.
+"""
+
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from insumos.models import (
+    ConsumoMensualInsumo, ConsumoRealInsumo, media_movil_ponderada,
+    predecir_demanda_media_movil, periodos_previos,
+)
+
+from .test_procesos_inteligentes import make_insumo
+
+
+def _agregado(insumo=None):
+    qs = ConsumoMensualInsumo.objects.all()
+    if insumo is not None:
+        qs = qs.filter(insumo=insumo)
+    return {(i, p): (t, n) for i, p, t, n in qs.values_list('insumo_id', 'periodo', 'total', 'n')}
+
+
+class ConsumoMensualSyncTest(TestCase):
+    def setUp(self):
+        self.insumo = make_insumo()
+        self.otro = make_insumo()
+
+    def test_altas_cambios_y_bajas(self):
+        a = ConsumoRealInsumo.objects.create(insumo=self.insumo, periodo='2026-01', cantidad_consumida=10)
+        ConsumoRealInsumo.objects.create(insumo=self.insumo, periodo='2026-01', cantidad_consumida=5)
+        c = ConsumoRealInsumo.objects.create(insumo=self.insumo, periodo='2026-02', cantidad_consumida=7)
+        self.assertEqual(_agregado(self.insumo)[(self.insumo.pk, '2026-01')], (15, 2))
+
+        a.cantidad_consumida = 4
+        a.save(update_fields=['cantidad_consumida'])
+        self.assertEqual(_agregado(self.insumo)[(self.insumo.pk, '2026-01')], (9, 2))
+
+        c.periodo = '2026-01'
+        c.save()
+        agregado = _agregado(self.insumo)
+        self.assertEqual(agregado[(self.insumo.pk, '2026-01')], (16, 3))
+        self.assertNotIn((self.insumo.pk, '2026-02'), agregado)
+
+        ConsumoRealInsumo.objects.get(pk=c.pk).delete()
+        ConsumoRealInsumo.objects.filter(insumo=self.insumo, cantidad_consumida=5).delete()
+        self.assertEqual(_agregado(self.insumo), {(self.insumo.pk, '2026-01'): (4, 1)})
+
+        esperado = _agregado()
+        ConsumoMensualInsumo.reconstruir()
+        self.assertEqual(_agregado(), esperado)
+
+    def test_cambio_sin_select_previo(self):
+        creado = ConsumoRealInsumo.objects.create(insumo=self.insumo, periodo='2026-05', cantidad_consumida=6)
+        registro = ConsumoRealInsumo.objects.get(pk=creado.pk)
+        registro.cantidad_consumida = 9
+        with CaptureQueriesContext(connection) as ctx:
+            registro.save()
+        selects = [q['sql'] for q in ctx.captured_queries if 'insumos_consumorealinsumo' in q['sql']
+                   and q['sql'].lstrip().upper().startswith('SELECT')]
+        self.assertEqual(selects, [])
+        self.assertEqual(_agregado(self.insumo), {(self.insumo.pk, '2026-05'): (9, 1)})
+
+        # Con la cantidad diferida se lee la anterior de la base
+        diferido = ConsumoRealInsumo.objects.defer('cantidad_consumida').get(pk=creado.pk)
+        diferido.cantidad_consumida = 2
+        diferido.save()
+        self.assertEqual(_agregado(self.insumo), {(self.insumo.pk, '2026-05'): (2, 1)})
+
+    def test_retroalimentar_actualiza_agregado(self):
+        from core.motor.demanda_engine import DemandaInteligenteEngine
+        engine = DemandaInteligenteEngine()
+        engine.retroalimentar({'insumo_id': self.insumo.pk, 'periodo': '2026-03', 'cantidad_real': 30})
+        engine.retroalimentar({'insumo_id': self.insumo.pk, 'periodo': '2026-03', 'cantidad_real': 45})
+        self.assertEqual(_agregado(self.insumo), {(self.insumo.pk, '2026-03'): (45, 1)})
+
+    def test_recalcular_repara_cargas_masivas(self):
+        ConsumoRealInsumo.objects.bulk_create([
+            ConsumoRealInsumo(insumo=self.otro, periodo='2026-04', cantidad_consumida=8),
+            ConsumoRealInsumo(insumo=self.otro, periodo='2026-04', cantidad_consumida=2),
+        ])
+        self.assertEqual(_agregado(self.otro), {})
+        out = StringIO()
+        call_command('recalcular_consumo_mensual', '--insumo', str(self.otro.pk), stdout=out)
+        self.assertEqual(_agregado(self.otro), {(self.otro.pk, '2026-04'): (10, 2)})
+        self.assertIn('1 filas', out.getvalue())
+
+
+class PronosticosSobreAgregadoTest(TestCase):
+    def setUp(self):
+        self.insumo = make_insumo()
+        self.periodo = '2026-07'
+        self.crudos = []
+        for i, per in enumerate(periodos_previos(self.periodo, 12) + periodos_previos('2025-07', 12)):
+            # Varios registros por período, como deja un pedido por fila
+            for k in range(1 + i % 3):
+                cantidad = 10 + 3 * i + k
+                ConsumoRealInsumo.objects.create(insumo=self.insumo, periodo=per, cantidad_consumida=cantidad)
+                self.crudos.append((per, cantidad))
+
+    def test_media_movil_igual_a_filas_crudas(self):
+        for meses in (3, 6):
+            esperado = media_movil_ponderada(
+                [(per, cant, 1) for per, cant in self.crudos], self.periodo, meses=meses
+            )
+            self.assertEqual(
+                predecir_demanda_media_movil(self.insumo, self.periodo, meses=meses), esperado
+            )
+
+    def test_factor_estacional_igual_a_filas_crudas(self):
+        from core.motor.demanda_engine import DemandaInteligenteEngine
+        engine = DemandaInteligenteEngine()
+        crudos = [(per, cant, 1) for per, cant in self.crudos]
+        for mes in (1, 6, 11):
+            self.assertAlmostEqual(
+                engine._factor_estacional(self.insumo, mes),
+                engine._factor_estacional_desde_consumos(crudos, mes),
+            )
+
+    def test_totales_por_periodo(self):
+        totales = ConsumoMensualInsumo.totales(self.insumo)
+        esperado = {}
+        for per, cant in self.crudos:
+            esperado[per] = esperado.get(per, 0) + cant
+        self.assertEqual(totales, esperado)
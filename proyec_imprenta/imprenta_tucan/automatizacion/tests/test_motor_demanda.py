@@ -0,0 +1,67 @@
+"""
+Tests del motor de demanda (core/motor/demanda_engine.py).
+
+Cubre:
+  1. Modo batch de DemandaInteligenteEngine.ejecutar produce la misma salida
+     que la ruta por insumo.
+  2. El modo batch no escala la cantidad de queries con los insumos.
+"""
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from insumos.models import ConsumoRealInsumo, Insumo, ProyeccionInsumo, periodos_previos
+from pedidos.models import OrdenCompra
+
+from .test_procesos_inteligentes import make_insumo, make_proveedor
+
+
+def _poblar_historial(insumo, base, con_proyeccion=False):
+    periodo = timezone.now().strftime('%Y-%m')
+    for i, per in enumerate(periodos_previos(periodo, 14)):
+        ConsumoRealInsumo.objects.create(
+            insumo=insumo, periodo=per, cantidad_consumida=base + 7 * (i % 5),
+        )
+    if con_proyeccion:
+        ProyeccionInsumo.objects.create(
+            insumo=insumo, periodo=periodo, cantidad_proyectada=base * 3,
+        )
+
+
+class DemandaEngineBatchTest(TestCase):
+    def setUp(self):
+        self.proveedor = make_proveedor()
+        self.insumos = []
+        for n in range(6):
+            insumo = make_insumo(stock=10 * n)
+            self.insumos.append(insumo)
+            if n % 3 == 0:
+                _poblar_historial(insumo, base=20 + n, con_proyeccion=True)
+            elif n % 3 == 1:
+                _poblar_historial(insumo, base=5 + n)
+            else:
+                # Sin consumo: la demanda sale de las órdenes de compra
+                OrdenCompra.objects.create(insumo=insumo, cantidad=40 + n, proveedor=self.proveedor)
+        Insumo.objects.filter(pk=self.insumos[1].pk).update(stock_minimo_calculado=25)
+
+    def _ejecutar(self, batch):
+        from core.motor.demanda_engine import DemandaInteligenteEngine
+        return DemandaInteligenteEngine().ejecutar(batch=batch)
+
+    def test_batch_produce_misma_salida_que_por_insumo(self):
+        por_insumo = self._ejecutar(batch=False)
+        batch = self._ejecutar(batch=True)
+        self.assertEqual(batch, por_insumo)
+        self.assertGreater(batch['insumos_procesados'], 0)
+
+    def test_batch_queries_no_crecen_con_insumos(self):
+        with CaptureQueriesContext(connection) as pocos:
+            self._ejecutar(batch=True)
+        for n in range(10):
+            insumo = make_insumo(stock=n)
+            _poblar_historial(insumo, base=3 + n)
+        with CaptureQueriesContext(connection) as muchos:
+            self._ejecutar(batch=True)
+        self.assertEqual(len(muchos), len(pocos))
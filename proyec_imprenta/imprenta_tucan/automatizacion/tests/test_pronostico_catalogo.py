@@ -0,0 +1,158 @@
+"""
+Tests del pronóstico matricial del catálogo (core/ai_ml/pronostico_catalogo.py).
+
+Cubre:
+  1. MatrizConsumos da los mismos números que las funciones por insumo
+     (media móvil, ETS, factor estacional).
+  2. generar_proyecciones_insumos(batch=True) persiste las mismas proyecciones
+     que la ruta por insumo, con una cantidad de queries que no crece con el
+     catálogo.
+  3. benchmark_pronostico_catalogo corre y verifica igualdad.
+"""
+
+import random
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.ai_ml.pronostico_catalogo import MatrizConsumos, desde_para_ventana
+from insumos.models import (
+    ConsumoRealInsumo, Insumo, ProyeccionInsumo, periodos_previos,
+    predecir_demanda_ets, predecir_demanda_media_movil,
+)
+from utils.pruebas import assert_queries_no_crecen
+
+from .test_procesos_inteligentes import make_insumo
+
+
+def _poblar(insumo, periodo, rng):
+    for per in periodos_previos(periodo, 12) + periodos_previos(periodos_previos(periodo, 12)[-1], 12):
+        if rng.random() < 0.25:
+            continue
+        for _ in range(rng.randint(1, 3)):
+            ConsumoRealInsumo.objects.create(
+                insumo=insumo, periodo=per, cantidad_consumida=rng.randint(1, 90),
+            )
+
+
+def _config(algoritmo, meses=3):
+    valores = {'PROYECCION_MESES': meses, 'ALGORITMO_PROYECCION': algoritmo}
+    return mock.patch(
+        'core.motor.config.MotorConfig.get',
+        side_effect=lambda clave, cast=None: valores.get(clave),
+    )
+
+
+class MatrizConsumosTest(TestCase):
+    def setUp(self):
+        rng = random.Random(7)
+        self.periodo = timezone.now().strftime('%Y-%m')
+        self.insumos = [make_insumo() for _ in range(8)]
+        for insumo in self.insumos[:-1]:
+            _poblar(insumo, self.periodo, rng)
+        self.ids = [i.idInsumo for i in self.insumos]
+
+    def _escalar(self, valores):
+        return np.array([np.nan if v is None else v for v in valores], dtype=float)
+
+    def test_media_movil_y_ets_iguales_a_por_insumo(self):
+        for meses in (3, 6):
+            matriz = MatrizConsumos.cargar(self.ids, desde=desde_para_ventana(self.periodo, meses))
+            esperado = self._escalar(
+                predecir_demanda_media_movil(i, self.periodo, meses=meses) for i in self.insumos
+            )
+            np.testing.assert_array_equal(matriz.media_movil(self.periodo, meses=meses), esperado)
+        for alpha in (0.3, 0.75):
+            esperado = self._escalar(predecir_demanda_ets(i, self.periodo, alpha=alpha) for i in self.insumos)
+            np.testing.assert_array_equal(matriz.ets(self.periodo, alpha), esperado)
+        self.assertTrue(np.isnan(matriz.media_movil(self.periodo)[-1]))
+
+    def test_factor_estacional_igual_a_por_insumo(self):
+        from core.motor.demanda_engine import DemandaInteligenteEngine
+        engine = DemandaInteligenteEngine()
+        matriz = MatrizConsumos.cargar(self.ids)
+        for mes in range(1, 13):
+            esperado = [engine._factor_estacional(i, mes) for i in self.insumos]
+            np.testing.assert_array_equal(matriz.factor_estacional(mes), esperado)
+
+
+class GenerarProyeccionesBatchTest(TestCase):
+    def setUp(self):
+        rng = random.Random(11)
+        self.periodo = timezone.now().strftime('%Y-%m')
+        for n in range(9):
+            insumo = make_insumo()
+            if n % 3 == 0:
+                _poblar(insumo, self.periodo, rng)
+            elif n % 3 == 1:
+                # Sin consumo: cae al stock mínimo sugerido (o se omite)
+                Insumo.objects.filter(pk=insumo.pk).update(
+                    stock_minimo_calculado=None, stock_minimo_manual=(n * 4 if n != 4 else None),
+                )
+            else:
+                # Sólo consumos del mes en curso: no entran en la ventana pero sí en el mínimo
+                ConsumoRealInsumo.objects.create(insumo=insumo, periodo=self.periodo, cantidad_consumida=60 + n)
+                Insumo.objects.filter(pk=insumo.pk).update(stock_minimo_calculado=None)
+
+    def _proyecciones(self):
+        return sorted(
+            ProyeccionInsumo.objects.filter(periodo=self.periodo)
+            .values_list('insumo_id', 'cantidad_proyectada', 'proveedor_sugerido_id', 'estado', 'fuente')
+        )
+
+    def _ejecutar(self, batch, algoritmo):
+        from insumos.tasks import generar_proyecciones_insumos
+        ProyeccionInsumo.objects.all().delete()
+        with _config(algoritmo):
+            resumen = generar_proyecciones_insumos(batch=batch)
+        return resumen, self._proyecciones()
+
+    def test_batch_igual_a_por_insumo(self):
+        for algoritmo in ('media_movil', 'ets'):
+            with self.subTest(algoritmo=algoritmo):
+                por_insumo = self._ejecutar(False, algoritmo)
+                batch = self._ejecutar(True, algoritmo)
+                self.assertEqual(batch, por_insumo)
+                self.assertTrue(batch[1])
+
+    def test_upsert_conserva_validacion(self):
+        from insumos.tasks import generar_proyecciones_insumos
+        with _config('media_movil'):
+            generar_proyecciones_insumos(batch=True)
+            proyeccion = ProyeccionInsumo.objects.filter(periodo=self.periodo).first()
+            ProyeccionInsumo.objects.filter(pk=proyeccion.pk).update(
+                cantidad_validada=999, estado='aceptada', cantidad_proyectada=1,
+            )
+            generar_proyecciones_insumos(batch=True)
+        proyeccion.refresh_from_db()
+        self.assertEqual(proyeccion.cantidad_validada, 999)
+        self.assertEqual(proyeccion.estado, 'pendiente')
+        self.assertNotEqual(proyeccion.cantidad_proyectada, 1)
+
+    def test_queries_no_crecen_con_el_catalogo(self):
+        from insumos.tasks import generar_proyecciones_insumos
+        rng = random.Random(3)
+
+        def generar():
+            with _config('media_movil'):
+                generar_proyecciones_insumos(batch=True)
+
+        def mas_insumos():
+            for _ in range(10):
+                _poblar(make_insumo(), self.periodo, rng)
+
+        assert_queries_no_crecen(self, generar, generar, entre=mas_insumos)
+
+
+class BenchmarkPronosticoTest(TestCase):
+    def test_benchmark_reporta_resultados_iguales(self):
+        out = StringIO()
+        call_command('benchmark_pronostico_catalogo', '--insumos', '50', '--meses', '24', '--con-bd', stdout=out)
+        salida = out.getvalue()
+        self.assertEqual(salida.count(' sí'), 5)
+        self.assertNotIn(' NO', salida)
+        self.assertFalse(Insumo.objects.filter(codigo__startswith='BENCH-').exists())
@@ -0,0 +1,93 @@
+"""
+Tests de persistencia del ranking de clientes (core/ai_ml/ranking.py).
+
+Cubre:
+  1. Upsert de RankingCliente/RankingHistorico y puntaje_estrategico.
+  2. Variación respecto del histórico de un período anterior.
+  3. La cantidad de queries no crece con los clientes.
+"""
+from datetime import date
+
+from django.test import TestCase
+
+from automatizacion.models import RankingCliente, RankingHistorico
+from clientes.models import Cliente
+from configuracion.models import GrupoParametro
+from pedidos.models import Pedido
+from utils.pruebas import assert_queries_no_crecen
+
+from .test_procesos_inteligentes import make_cliente, make_estado
+
+
+def _pedido(cliente, estado, monto):
+    Pedido.objects.bulk_create([Pedido(
+        cliente=cliente, fecha_entrega=date.today(), monto_total=monto, estado=estado,
+    )])
+
+
+class RankingPersistenciaTest(TestCase):
+    def setUp(self):
+        # Parametro.set (máximos históricos) requiere un grupo existente
+        GrupoParametro.objects.create(codigo='RANKING', nombre='Ranking')
+        self.estado = make_estado('Pendiente')
+        self.grande = make_cliente()
+        _pedido(self.grande, self.estado, 5000)
+        _pedido(self.grande, self.estado, 5000)
+        self.chico = make_cliente()
+        _pedido(self.chico, self.estado, 100)
+        self.inactivo = make_cliente()
+
+    def _calcular(self):
+        from core.ai_ml.ranking import calcular_ranking_clientes
+        return calcular_ranking_clientes()
+
+    def test_upsert_y_puntaje(self):
+        r1 = self._calcular()
+        r2 = self._calcular()
+        self.assertEqual(r1['actualizados'], 3)
+        self.assertEqual(r2['actualizados'], 3)
+        self.assertEqual(RankingCliente.objects.count(), 3)
+        self.assertEqual(RankingHistorico.objects.filter(periodo=r1['periodo']).count(), 3)
+
+        scores = dict(RankingCliente.objects.values_list('cliente_id', 'score'))
+        self.assertGreater(scores[self.grande.id], scores[self.chico.id])
+        self.assertEqual(scores[self.inactivo.id], 5.0)
+        puntajes = dict(Cliente.objects.values_list('id', 'puntaje_estrategico'))
+        self.assertEqual(puntajes, {cid: s for cid, s in scores.items()})
+        hist = RankingHistorico.objects.get(cliente=self.inactivo, periodo=r1['periodo'])
+        self.assertEqual(hist.metricas, {'sin_pedidos_en_ventana': True})
+
+    def test_variacion_respecto_periodo_anterior(self):
+        RankingHistorico.objects.create(cliente=self.grande, periodo='2000-01', score=40.0)
+        res = self._calcular()
+        actual = RankingHistorico.objects.get(cliente=self.grande, periodo=res['periodo'])
+        self.assertEqual(actual.variacion, round(actual.score - 40.0, 4))
+
+    def test_queries_no_crecen_con_clientes(self):
+        self._calcular()
+
+        def mas_clientes():
+            for _ in range(6):
+                _pedido(make_cliente(), self.estado, 50)
+                make_cliente()
+
+        assert_queries_no_crecen(self, self._calcular, self._calcular, entre=mas_clientes)
+
+    def test_modelo_ml_se_invoca_una_vez_por_cohorte(self):
+        from unittest import mock
+        import numpy as np
+        from core.ai_ml import valor_cliente as vc
+
+        for _ in range(4):
+            _pedido(make_cliente(), self.estado, 300)
+
+        class _Modelo:
+            llamadas = 0
+
+            def predict(self, X):
+                _Modelo.llamadas += 1
+                return np.full(len(X), 80.0)
+
+        with mock.patch.object(vc, '_model', _Modelo()):
+            self._calcular()
+        self.assertEqual(_Modelo.llamadas, 1)
@@ -0,0 +1,212 @@
+"""
+Tests de la recomendación de proveedores por matriz de features
+(core/motor/proveedor_engine.py, core/ai_ml/proveedor_recomendacion.py).
+
+Cubre:
+  1. _features_batch coincide con las métricas individuales del motor.
+  2. _calcular_scores_batch coincide con calcular_score.
+  3. recomendar_proveedor hace una sola llamada al modelo y una cantidad de
+     queries que no crece con los proveedores; sin modelo cae a reglas.
+  4. Cache ScoreProveedorInsumo: lectura en una query, invalidación por
+     signals y escrituras de ScoreProveedor con umbral.
+"""
+from datetime import timedelta
+from unittest import mock
+
+import numpy as np
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from automatizacion.models import ConsultaStockProveedor, ScoreProveedor, ScoreProveedorInsumo
+from core.ai_ml import score_proveedor as sp
+from core.ai_ml.proveedor_recomendacion import recomendar_proveedor
+from core.motor.proveedor_engine import ProveedorInteligenteEngine
+from insumos.models import Insumo
+from pedidos.models import OrdenCompra
+from utils.pruebas import assert_queries_no_crecen
+
+from .test_inferencia_ml import _ModeloContador
+from .test_procesos_inteligentes import make_insumo, make_proveedor
+
+
+def _historial(proveedor, insumo, confirmadas, rechazadas, pendientes=0, latencia=2):
+    ahora = timezone.now()
+    OrdenCompra.objects.bulk_create(
+        [OrdenCompra(insumo=insumo, proveedor=proveedor, cantidad=5, estado='confirmada')
+         for _ in range(confirmadas)]
+        + [OrdenCompra(insumo=insumo, proveedor=proveedor, cantidad=5, estado='rechazada')
+           for _ in range(rechazadas)]
+        + [OrdenCompra(insumo=insumo, proveedor=proveedor, cantidad=5) for _ in range(pendientes)]
+    )
+    for k, orden in enumerate(OrdenCompra.objects.filter(proveedor=proveedor).order_by('id')):
+        creada = ahora - timedelta(days=7 * k + 1)
+        OrdenCompra.objects.filter(pk=orden.pk).update(
+            fecha_creacion=creada,
+            fecha_respuesta=creada + timedelta(days=latencia + k % 3) if orden.estado == 'confirmada' else None,
+        )
+
+
+class FeaturesBatchTest(TestCase):
+    def setUp(self):
+        self.insumo = make_insumo()
+        self.proveedores = [make_proveedor() for _ in range(4)]
+        for k, prov in enumerate(self.proveedores[:3]):
+            _historial(prov, self.insumo, confirmadas=4 - k, rechazadas=k, pendientes=1, latencia=k * 3)
+            Insumo.objects.filter(pk=make_insumo().pk).update(proveedor=prov, precio_unitario=10 + 5 * k)
+            for estado in ('disponible', 'sin_stock', 'parcial')[:k + 1]:
+                ConsultaStockProveedor.objects.create(
+                    proveedor=prov, insumo=self.insumo, cantidad=3, estado=estado,
+                )
+        self.engine = ProveedorInteligenteEngine()
+
+    def test_features_iguales_a_metricas_individuales(self):
+        for insumo in (None, self.insumo):
+            X = self.engine._features_batch(self.proveedores, insumo)
+            for fila, prov in zip(X, self.proveedores):
+                esperado = [
+                    self.engine._precio_relativo(prov, insumo),
+                    self.engine._cumplimiento(prov),
+                    self.engine._incidencias(prov),
+                    self.engine._disponibilidad(prov, insumo),
+                    self.engine._latencia_promedio_dias(prov),
+                ]
+                np.testing.assert_allclose(fila, esperado)
+
+    def test_scores_batch_iguales_a_calcular_score(self):
+        for insumo in (None, self.insumo):
+            scores = self.engine._calcular_scores_batch(self.proveedores, insumo)
+            for prov in self.proveedores:
+                self.assertAlmostEqual(scores[prov.id], self.engine.calcular_score(prov, insumo), places=2)
+
+
+class RecomendarProveedorTest(TestCase):
+    def setUp(self):
+        self.insumo = make_insumo()
+        self.bueno = make_proveedor()
+        self.malo = make_proveedor()
+        _historial(self.bueno, self.insumo, confirmadas=5, rechazadas=0)
+        _historial(self.malo, self.insumo, confirmadas=0, rechazadas=4)
+
+    def test_una_llamada_al_modelo(self):
+        # Pondera cumplimiento y penaliza incidencias
+        modelo = _ModeloContador([0, 100, -100, 0, 0])
+        with mock.patch.object(sp, '_model', modelo):
+            self.assertEqual(recomendar_proveedor(self.insumo.pk), self.bueno)
+        self.assertEqual(modelo.llamadas, 1)
+
+    def test_sin_modelo_usa_reglas(self):
+        with mock.patch.object(sp, 'predecir_scores_proveedores', side_effect=FileNotFoundError):
+            self.assertEqual(recomendar_proveedor(self.insumo.pk), self.bueno)
+            self.assertEqual(recomendar_proveedor(), self.bueno)
+
+    def test_queries_no_crecen_con_proveedores(self):
+        modelo = _ModeloContador([0, 100, -100, 0, 0])
+
+        def recomendar():
+            recomendar_proveedor(self.insumo.pk)
+
+        def mas_proveedores():
+            for k in range(15):
+                _historial(make_proveedor(), self.insumo, confirmadas=k % 4, rechazadas=k % 3)
+
+        with mock.patch.object(sp, '_model', modelo):
+            assert_queries_no_crecen(self, recomendar, recomendar, entre=mas_proveedores)
+
+
+class CacheScoresProveedorTest(TestCase):
+    def setUp(self):
+        self.insumo = make_insumo()
+        self.otro_insumo = make_insumo()
+        self.bueno = make_proveedor()
+        self.malo = make_proveedor()
+        _historial(self.bueno, self.insumo, confirmadas=5, rechazadas=0)
+        _historial(self.malo, self.insumo, confirmadas=3, rechazadas=1)
+        self.engine = ProveedorInteligenteEngine()
+        self.engine.recomendar(self.insumo)
+        self.engine.recomendar(self.otro_insumo)
+
+    def _sucios(self, insumo):
+        return set(
+            ScoreProveedorInsumo.objects.filter(insumo=insumo, sucio=True).values_list('proveedor_id', flat=True)
+        )
+
+    def test_insumo_vigente_es_una_lectura(self):
+        esperado = self.engine.recomendar(self.insumo, usar_cache=False)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.engine.recomendar(self.insumo), esperado)
+        self.assertEqual(len(queries), 1)
+
+    def test_cambio_de_estado_de_orden_invalida_al_proveedor(self):
+        orden = OrdenCompra.objects.filter(proveedor=self.bueno).first()
+        orden.comentario = 'sin cambio de estado'
+        orden.save()
+        self.assertEqual(self._sucios(self.insumo), set())
+
+        OrdenCompra.objects.filter(proveedor=self.bueno).update(estado='sugerida')
+        for orden in OrdenCompra.objects.filter(proveedor=self.bueno)[:4]:
+            orden.estado = 'rechazada'
+            orden.save()
+        self.assertEqual(self._sucios(self.insumo), {self.bueno.id})
+        self.assertEqual(self._sucios(self.otro_insumo), {self.bueno.id})
+        self.assertEqual(self.engine.recomendar(self.insumo)[0], self.malo)
+        self.assertEqual(self._sucios(self.insumo), set())
+
+    def test_consulta_de_stock_invalida_su_insumo(self):
+        consulta = ConsultaStockProveedor.objects.create(
+            proveedor=self.malo, insumo=self.insumo, cantidad=1,
+        )
+        self.assertEqual(self._sucios(self.insumo), {self.malo.id})
+        self.assertEqual(self._sucios(self.otro_insumo), set())
+        self.engine.recomendar(self.insumo)
+        consulta.estado = 'disponible'
+        consulta.save()
+        self.assertEqual(self._sucios(self.insumo), {self.malo.id})
+
+    def test_precio_invalida_insumos_del_mismo_nombre(self):
+        self.engine.recomendar()
+        insumo = Insumo.objects.get(pk=self.insumo.pk)
+        insumo.stock = 5
+        insumo.save()
+        self.assertFalse(ScoreProveedorInsumo.objects.filter(sucio=True).exists())
+        insumo.precio_unitario = 99
+        insumo.save()
+        self.assertEqual(self._sucios(self.insumo), {self.bueno.id, self.malo.id})
+        self.assertEqual(self._sucios(None), {self.bueno.id, self.malo.id})
+        self.assertEqual(self._sucios(self.otro_insumo), set())
+
+    def test_ttl_version_y_proveedor_nuevo_recalculan(self):
+        vencido = timezone.now() - timedelta(days=1)
+        ScoreProveedorInsumo.objects.filter(insumo=self.insumo).update(calculado=vencido)
+        self.assertIsNone(self.engine._recomendar_desde_cache(self.insumo))
+        self.engine.recomendar(self.insumo)
+        self.assertIsNotNone(self.engine._recomendar_desde_cache(self.insumo))
+
+        with mock.patch.object(ProveedorInteligenteEngine, '_version_config', return_value=999):
+            self.assertIsNone(self.engine._recomendar_desde_cache(self.insumo))
+
+        nuevo = make_proveedor()
+        self.assertIsNone(self.engine._recomendar_desde_cache(self.insumo))
+        self.engine.recomendar(self.insumo)
+        self.assertTrue(ScoreProveedorInsumo.objects.filter(insumo=self.insumo, proveedor=nuevo).exists())
+
+    def test_score_proveedor_no_se_reescribe_bajo_el_umbral(self):
+        antes = dict(ScoreProveedor.objects.values_list('proveedor_id', 'actualizado'))
+        self.assertEqual(set(antes), {self.bueno.id, self.malo.id})
+        self.engine.recomendar(self.insumo, usar_cache=False)
+        self.assertEqual(dict(ScoreProveedor.objects.values_list('proveedor_id', 'actualizado')), antes)
+
+        ScoreProveedor.objects.filter(proveedor=self.malo).update(score=0)
+        self.engine.recomendar(self.insumo, usar_cache=False)
+        self.assertEqual(
+            ScoreProveedor.objects.get(proveedor=self.malo).score,
+            self.engine.calcular_score(self.malo, self.insumo),
+        )
+
+    def test_score_global_no_se_duplica(self):
+        self.engine.recomendar()
+        self.engine._guardar_cache(None, {self.bueno.id: 1.0, self.malo.id: 0.5}, timezone.now())
+        self.assertEqual(ScoreProveedorInsumo.objects.filter(insumo__isnull=True, proveedor=self.bueno).count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            ScoreProveedorInsumo.objects.create(proveedor=self.bueno, calculado=timezone.now())
@@ -0,0 +1,93 @@
+"""
+Tests del registro de modelos ML (core/ai_ml/registro.py).
+
+Cubre:
+  1. Export .npz de Ridge y GradientBoostingRegressor: mismas predicciones que sklearn.
+  2. Los arrays se cargan mapeados en memoria y sin pickle.
+  3. Recarga en caliente al reescribir el artefacto; métricas de versión y carga.
+  4. Si entrenar_modelo_* no puede exportar el .npz, borra el anterior y falla.
+"""
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, override_settings
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import Ridge
+
+from core.ai_ml.registro import RegistroModelos, _mapear_npz, cargar_npz, exportar_npz, ruta_npz
+
+
+class RegistroModelosTest(SimpleTestCase):
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.dir)
+        rng = np.random.default_rng(0)
+        self.X = rng.uniform(0, 10, (300, 4))
+        self.y = self.X @ [1.0, -2.0, 0.5, 3.0] + rng.normal(0, 1, 300)
+
+    def _ruta(self, nombre='modelo.npz'):
+        return os.path.join(self.dir, nombre)
+
+    def test_ridge_npz_igual_a_sklearn(self):
+        modelo = Ridge(alpha=1.0).fit(self.X, self.y)
+        exportar_npz(modelo, self._ruta(), features=['a', 'b', 'c', 'd'], version='v1')
+        cargado = cargar_npz(self._ruta())
+        np.testing.assert_allclose(cargado.predict(self.X), modelo.predict(self.X))
+        self.assertEqual(cargado.meta['version'], 'v1')
+
+    def test_gbr_npz_igual_a_sklearn(self):
+        modelo = GradientBoostingRegressor(n_estimators=50, max_depth=3, random_state=0).fit(self.X, self.y)
+        exportar_npz(modelo, self._ruta())
+        cargado = cargar_npz(self._ruta())
+        np.testing.assert_allclose(cargado.predict(self.X), modelo.predict(self.X), rtol=1e-9, atol=1e-9)
+
+    def test_arrays_mapeados_en_memoria(self):
+        exportar_npz(Ridge().fit(self.X, self.y), self._ruta())
+        arrays = _mapear_npz(self._ruta())
+        self.assertIsInstance(arrays['coef'], np.memmap)
+
+    @override_settings(ML_MODELOS_CHECK_SEGUNDOS=0)
+    def test_recarga_por_mtime_y_metricas(self):
+        pkl = self._ruta('modelo_x.pkl')
+        registro = RegistroModelos()
+        exportar_npz(Ridge().fit(self.X, self.y), ruta_npz(pkl), version='v1')
+        primero = registro.obtener('x', pkl)
+        self.assertIs(registro.obtener('x', pkl), primero)
+
+        exportar_npz(Ridge().fit(self.X, -self.y), ruta_npz(pkl), version='v2')
+        st = os.stat(ruta_npz(pkl))
+        os.utime(ruta_npz(pkl), ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+        segundo = registro.obtener('x', pkl)
+        self.assertIsNot(segundo, primero)
+
+        metricas = registro.metricas()['x']
+        self.assertEqual(metricas['version'], 'v2')
+        self.assertEqual(metricas['formato'], 'npz')
+        self.assertEqual(metricas['recargas'], 1)
+        self.assertGreaterEqual(metricas['tiempo_carga_ms'], 0)
+
+    def test_sin_artefacto_lanza_file_not_found(self):
+        with self.assertRaises(FileNotFoundError):
+            RegistroModelos().obtener('x', self._ruta('no_existe.pkl'))
+
+
+class EntrenarModeloSinNpzTest(TestCase):
+    def test_falla_y_descarta_el_npz_viejo(self):
+        directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directorio)
+        pkl = os.path.join(directorio, 'modelo_demanda_insumo.pkl')
+        with open(ruta_npz(pkl), 'wb') as f:
+            f.write(b'viejo')
+
+        with mock.patch('automatizacion.management.commands.entrenar_modelo_demanda_insumo._model_path',
+                        return_value=pkl), \
+                mock.patch('core.ai_ml.registro.exportar_npz', side_effect=OSError('disco lleno')):
+            with self.assertRaisesMessage(CommandError, 'disco lleno'):
+                call_command('entrenar_modelo_demanda_insumo', stdout=StringIO())
+        self.assertTrue(os.path.exists(pkl))
+        self.assertFalse(os.path.exists(ruta_npz(pkl)))
@@ -311,15 +311,21 @@ class OrdenPago(models.Model):
         return f"OP-{self.numero} | {self.proveedor} | {self.get_estado_display()}"
 
     def save(self, *args, **kwargs):
-        if not self.numero:
-            # C-5: select_for_update() evita race condition cuando dos OPs se crean simultáneamente.
-            from django.db import transaction
-            with transaction.atomic():
-                ultimo = OrdenPago.objects.select_for_update().order_by('-id').first()
-                siguiente = (ultimo.id + 1) if ultimo else 1
-                self.numero = f'{siguiente:05d}'
+        from django.db import transaction
         self.monto_neto = self.monto_total - self.monto_retenciones
-        super().save(*args, **kwargs)
+        if self.numero:
+            super().save(*args, **kwargs)
+            return
+        # C-5: número y alta en la misma transacción; la secuencia serializa
+        # las OPs simultáneas y un rollback no deja huecos.
+        from configuracion import secuencias
+        with transaction.atomic():
+            siguiente = secuencias.siguiente(
+                'orden_pago',
+                inicial=lambda: OrdenPago.objects.order_by('-id').values_list('id', flat=True).first(),
+            )
+            self.numero = f'{siguiente:05d}'
+            super().save(*args, **kwargs)
 
     def recalcular_totales(self):
         self.monto_total = sum(c.importe for c in self.comprobantes.all())
@@ -0,0 +1,158 @@
+"""
+Ajuste masivo de precios de insumos por conjuntos.
+
+ajustar_precios() aplica un porcentaje a todos los insumos de un queryset sin
+pasar por Insumo.save() fila por fila:
+
+    1. Una lectura (SELECT ... FOR UPDATE donde la base lo soporta) de los
+       precios actuales: valores "antes" y filas bloqueadas hasta el commit.
+    2. Un único UPDATE precio_unitario = ROUND(precio_unitario * factor, 2).
+    3. Una lectura de los precios guardados: los "después" son los que
+       calculó la base, no una réplica en Python de su redondeo.
+    4. Un bulk_create de HistorialPrecioInsumo con variacion_pct calculada
+       en la misma pasada (bulk_create no llama a su save()).
+    5. Un único AuditEntry resumen en lugar de uno por insumo.
+    6. Los ScoreProveedorInsumo de esos insumos (y los sin insumo) quedan
+       sucios, como los marcaría el post_save de Insumo al cambiar el precio.
+       Se marcan antes del UPDATE, con el queryset como subconsulta.
+
+Con simular=True sólo se hace la lectura y se calculan los precios nuevos
+en Python (ROUND_HALF_UP, el redondeo de ROUND en la base) para previsualizar
+el cambio sin escribir nada.
+
+Los insumos sin precio (0) no se ajustan.
+"""
+import json
+import logging
+from decimal import ROUND_HALF_UP, Decimal
+
+logger = logging.getLogger(__name__)
+
+CENTAVO = Decimal('0.01')
+PORCENTAJE_MINIMO = -30
+PORCENTAJE_MAXIMO = 100
+
+
+def factor_ajuste(porcentaje) -> Decimal:
+    return Decimal('1') + Decimal(str(porcentaje)) / Decimal('100')
+
+
+def _variacion(anterior: Decimal, nuevo: Decimal):
+    if not anterior:
+        return None
+    return ((nuevo - anterior) / anterior * 100).quantize(CENTAVO)
+
+
+def ajustar_precios(queryset, porcentaje, motivo: str = '', usuario=None, simular: bool = False) -> dict:
+    """
+    Aplica `porcentaje` (entre -30 y 100) al precio de los insumos de `queryset`.
+
+    Retorna {'cantidad', 'factor', 'simulado', 'cambios'} donde cambios es
+    una lista de (idInsumo, codigo, nombre, precio_anterior, precio_nuevo,
+    variacion_pct) ordenada por idInsumo.
+    """
+    from django.db import transaction
+    from django.db.models import F, Value
+    from django.db.models.functions import Round
+    from django.utils import timezone
+    from .models import HistorialPrecioInsumo
+
+    if not PORCENTAJE_MINIMO <= float(porcentaje) <= PORCENTAJE_MAXIMO:
+        raise ValueError(f"El porcentaje debe estar entre {PORCENTAJE_MINIMO}% y {PORCENTAJE_MAXIMO}%")
+    factor = factor_ajuste(porcentaje)
+    queryset = queryset.filter(precio_unitario__gt=0).order_by('idInsumo')
+    motivo = motivo or f'Ajuste masivo {float(porcentaje):+.2f}%'
+
+    if simular:
+        filas = queryset.values_list('idInsumo', 'codigo', 'nombre', 'precio_unitario')
+        cambios = []
+        for pk, codigo, nombre, anterior in filas:
+            nuevo = (anterior * factor).quantize(CENTAVO, rounding=ROUND_HALF_UP)
+            cambios.append((pk, codigo, nombre, anterior, nuevo, _variacion(anterior, nuevo)))
+        return {'cantidad': len(cambios), 'factor': factor, 'simulado': True, 'cambios': cambios}
+
+    with transaction.atomic():
+        antes = list(
+            queryset.select_for_update()
+            .values_list('idInsumo', 'codigo', 'nombre', 'precio_unitario')
+        )
+        if not antes:
+            return {'cantidad': 0, 'factor': factor, 'simulado': False, 'cambios': []}
+        # Antes del UPDATE: el queryset todavía selecciona exactamente las filas bloqueadas
+        _invalidar_scores(queryset)
+        queryset.update(
+            precio_unitario=Round(F('precio_unitario') * Value(factor), 2),
+            updated_at=timezone.now(),
+        )
+        # Los filtros siguen valiendo: con factor >= 0.7 ningún precio llega a 0
+        despues = dict(queryset.values_list('idInsumo', 'precio_unitario'))
+
+        cambios = []
+        historial = []
+        for pk, codigo, nombre, anterior in antes:
+            nuevo = despues[pk].quantize(CENTAVO)
+            variacion = _variacion(anterior, nuevo)
+            cambios.append((pk, codigo, nombre, anterior, nuevo, variacion))
+            historial.append(HistorialPrecioInsumo(
+                insumo_id=pk,
+                precio_anterior=anterior,
+                precio_nuevo=nuevo,
+                variacion_pct=variacion,
+                origen='ajuste_masivo',
+                motivo=motivo,
+                usuario=usuario,
+            ))
+        HistorialPrecioInsumo.objects.bulk_create(historial, batch_size=1000)
+        _auditar_ajuste(cambios, porcentaje, motivo, usuario)
+
+    logger.info('Ajuste masivo %+.2f%%: %d insumos actualizados', float(porcentaje), len(cambios))
+    return {'cantidad': len(cambios), 'factor': factor, 'simulado': False, 'cambios': cambios}
+
+
+def _invalidar_scores(queryset) -> None:
+    """
+    El UPDATE no dispara post_save: se invalidan a mano los ScoreProveedorInsumo
+    que el receiver de precios (automatizacion/signals.py) marcaría por insumo.
+    Los nombres van como subconsulta (un parámetro por insumo superaría el límite
+    de variables de SQLite) y un error no se silencia: dejaría scores viejos y,
+    en PostgreSQL, la transacción del ajuste abortada.
+    """
+    from django.db.models import Q
+    from automatizacion.models import ScoreProveedorInsumo
+
+    ScoreProveedorInsumo.marcar_sucios(Q(insumo__nombre__in=queryset.values('nombre')) | Q(insumo__isnull=True))
+
+
+def _auditar_ajuste(cambios, porcentaje, motivo, usuario) -> None:
+    """Un AuditEntry resumen del ajuste (el detalle por insumo queda en HistorialPrecioInsumo)."""
+    from auditoria import writer
+    from auditoria.middleware import get_current_request, get_current_user
+    from auditoria.models import AuditEntry
+
+    request = get_current_request()
+    variaciones = [c[5] for c in cambios if c[5] is not None]
+    writer.registrar(AuditEntry(
+        user=usuario or get_current_user(),
+        ip_address=getattr(request, 'META', {}).get('REMOTE_ADDR') if request else None,
+        path=getattr(request, 'path', '') if request else '',
+        method=getattr(request, 'method', '') if request else '',
+        app_label='insumos',
+        model='Insumo',
+        object_id='*',
+        object_repr=f'Ajuste masivo de precios ({len(cambios)} insumos)',
+        action=AuditEntry.ACTION_UPDATE,
+        changes=json.dumps({
+            'precio_unitario': {
+                'total_antes': str(sum(c[3] for c in cambios)),
+                'total_despues': str(sum(c[4] for c in cambios)),
+            },
+        }),
+        extra=json.dumps({
+            'category': 'ajuste-masivo-precios',
+            'porcentaje': float(porcentaje),
+            'motivo': motivo,
+            'cantidad': len(cambios),
+            'variacion_min': str(min(variaciones)) if variaciones else None,
+            'variacion_max': str(max(variaciones)) if variaciones else None,
+        }),
+    ))
@@ -0,0 +1,128 @@
+"""
+Tests del ajuste masivo de precios (compras/precios.py y la vista
+ajuste_masivo_precios).
+
+Cubre:
+  1. Un UPDATE para todos los insumos: cantidad de queries independiente de
+     la cantidad de filas; historial con variacion_pct y un AuditEntry resumen.
+  2. La simulación coincide con lo que se aplica y no escribe nada.
+  3. Invalida el cache de scores de proveedor como lo haría el post_save de Insumo.
+  4. La vista: "Simular" no cambia precios, "Aplicar" sí.
+"""
+import json
+from decimal import Decimal
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from auditoria.models import AuditEntry
+from automatizacion.models import ScoreProveedorInsumo
+from compras.models import HistorialPrecioInsumo
+from compras.precios import ajustar_precios
+from insumos.models import Insumo
+from proveedores.models import Proveedor
+from usuarios.models import Usuario
+from utils.pruebas import queries_estables
+
+
+def _insumos(cantidad, desde=0, categoria="Papel"):
+    return Insumo.objects.bulk_create([
+        Insumo(
+            nombre=f"Insumo {i}", codigo=f"AJ-{i}", categoria=categoria, stock=10,
+            precio_unitario=Decimal("10.00") + Decimal(i) / 100, activo=True,
+        )
+        for i in range(desde, desde + cantidad)
+    ])
+
+
+class AjustarPreciosTests(TestCase):
+    def setUp(self):
+        _insumos(20)
+        Insumo.objects.create(nombre="Sin precio", codigo="AJ-CERO", stock=1, precio_unitario=0, activo=True)
+
+    def test_aplicar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            resultado = ajustar_precios(Insumo.objects.filter(activo=True), 10, motivo="Inflación")
+        self.assertEqual(resultado["cantidad"], 20)
+        self.assertEqual(Insumo.objects.get(codigo="AJ-7").precio_unitario, Decimal("11.08"))
+        self.assertEqual(Insumo.objects.get(codigo="AJ-CERO").precio_unitario, Decimal("0"))
+
+        historial = HistorialPrecioInsumo.objects.get(insumo__codigo="AJ-7")
+        self.assertEqual((historial.precio_anterior, historial.precio_nuevo), (Decimal("10.07"), Decimal("11.08")))
+        self.assertEqual(historial.variacion_pct, Decimal("10.03"))
+        self.assertEqual(historial.origen, "ajuste_masivo")
+        self.assertEqual(HistorialPrecioInsumo.objects.count(), 20)
+
+        auditoria = AuditEntry.objects.get(model="Insumo")
+        extra = json.loads(auditoria.extra)
+        self.assertEqual((extra["category"], extra["cantidad"]), ("ajuste-masivo-precios", 20))
+
+    def test_queries_no_crecen_con_las_filas(self):
+        _insumos(200, desde=100)
+        with queries_estables() as queries:
+            ajustar_precios(Insumo.objects.all(), 5)
+        sentencias = [q["sql"].split()[0] for q in queries]
+        # El de los precios y el que marca sucios los scores de proveedor
+        self.assertEqual(sentencias.count("UPDATE"), 2)
+        # Los insumos ajustados van como subconsulta, no un parámetro por nombre
+        scores = next(q["sql"] for q in queries if q["sql"].startswith("UPDATE") and "sucio" in q["sql"])
+        self.assertIn("IN (SELECT", scores)
+        self.assertEqual(sentencias.count("SELECT"), 2)
+        # Sólo el bulk_create del historial crece (por lotes, no por fila)
+        self.assertLessEqual(sentencias.count("INSERT"), 3)
+
+    def test_invalida_scores_de_proveedor(self):
+        proveedor = Proveedor.objects.create(
+            nombre="Prov Ajuste", apellido="SA", cuit="30-77777777-1", email="aj@prov.com",
+            telefono="1", direccion="Calle 1", rubro="Papeleria",
+        )
+        ajustado = Insumo.objects.get(codigo="AJ-3")
+        sin_precio = Insumo.objects.get(codigo="AJ-CERO")
+        for insumo in (ajustado, sin_precio, None):
+            ScoreProveedorInsumo.objects.create(
+                insumo=insumo, proveedor=proveedor, score=50, sucio=False, calculado=timezone.now(),
+            )
+
+        ajustar_precios(Insumo.objects.filter(codigo__in=["AJ-3", "AJ-CERO"]), 10)
+        sucios = dict(ScoreProveedorInsumo.objects.values_list("insumo_id", "sucio"))
+        self.assertEqual(sucios, {ajustado.pk: True, sin_precio.pk: False, None: True})
+
+    def test_simulacion_igual_a_lo_aplicado(self):
+        qs = Insumo.objects.filter(categoria="Papel")
+        for porcentaje in (-30, -12.5, 7.77, 100):
+            with CaptureQueriesContext(connection) as queries:
+                simulado = ajustar_precios(qs, porcentaje, simular=True)
+            self.assertEqual(len(queries), 1)
+            self.assertFalse(HistorialPrecioInsumo.objects.exists())
+            aplicado = ajustar_precios(qs, porcentaje)
+            self.assertEqual(simulado["cambios"], aplicado["cambios"])
+            HistorialPrecioInsumo.objects.all().delete()
+
+    def test_porcentaje_fuera_de_rango(self):
+        with self.assertRaises(ValueError):
+            ajustar_precios(Insumo.objects.all(), 150)
+
+
+class AjusteMasivoPreciosViewTests(TestCase):
+    def setUp(self):
+        user = Usuario.objects.create_user(
+            email="precios@test.com", password="testpass", nombre="Test", apellido="Precios", telefono="1",
+        )
+        self.client.force_login(user)
+        _insumos(3)
+
+    def test_simular_y_aplicar(self):
+        url = reverse("compras:ajuste_masivo_precios")
+        resp = self.client.post(url, {"porcentaje": "20", "filtro_tipo": "todos", "accion": "simular"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.context["vista_previa_total"], 3)
+        self.assertEqual(resp.context["vista_previa"][0][4], Decimal("12.00"))
+        self.assertEqual(Insumo.objects.get(codigo="AJ-0").precio_unitario, Decimal("10.00"))
+
+        resp = self.client.post(url, {"porcentaje": "20", "filtro_tipo": "todos", "accion": "aplicar"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(Insumo.objects.get(codigo="AJ-0").precio_unitario, Decimal("12.00"))
+        self.assertEqual(HistorialPrecioInsumo.objects.filter(usuario__email="precios@test.com").count(), 3)
@@ -792,27 +792,46 @@ def lista_remitos(request):
 
 
 
+def _serie_remito(anio):
+    return f"remito-{anio}"
+
+
+def _ultimo_remito_del_anio(anio):
+    """Último número R-AAAA-NNNN cargado antes de usar configuracion.Secuencia."""
+    from .models import Remito
+    ultimo = (
+        Remito.objects.filter(numero__startswith=f"R-{anio}-")
+        .order_by("-id").values_list("numero", flat=True).first()
+    )
+    try:
+        return int(ultimo.split("-")[-1]) if ultimo else 0
+    except (ValueError, IndexError):
+        return 0
+
+
 def _generar_numero_remito():
-    """Genera el próximo número de remito del año en curso. Thread-safe con select_for_update."""
+    """
+    Sugiere el próximo número de remito del año en curso sin reservarlo: el
+    número es editable en el formulario. Al guardar, _registrar_numero_remito
+    avanza la secuencia del año.
+    """
     from django.utils import timezone
-    from .models import Remito
+    from configuracion import secuencias
     anio = timezone.now().year
-    prefijo = f"R-{anio}-"
-    with transaction.atomic():
-        ultimo = (
-            Remito.objects.select_for_update()
-            .filter(numero__startswith=prefijo)
-            .order_by("-id")
-            .first()
-        )
-        if ultimo:
-            try:
-                seq = int(ultimo.numero.split("-")[-1]) + 1
-            except (ValueError, IndexError):
-                seq = 1
-        else:
-            seq = 1
-        return f"{prefijo}{seq:04d}"
+    seq = secuencias.proximo(_serie_remito(anio), inicial=lambda: _ultimo_remito_del_anio(anio))
+    return f"R-{anio}-{seq:04d}"
+
+
+def _registrar_numero_remito(numero):
+    """Si el remito usa la numeración R-AAAA-NNNN, avanza la secuencia de ese año."""
+    from configuracion import secuencias
+    partes = (numero or "").split("-")
+    if len(partes) != 3 or partes[0] != "R" or not (partes[1].isdigit() and partes[2].isdigit()):
+        return
+    anio = int(partes[1])
+    secuencias.registrar_usado(
+        _serie_remito(anio), int(partes[2]), inicial=lambda: _ultimo_remito_del_anio(anio),
+    )
 
 @login_required
 @require_perm('Compras', 'Crear')
@@ -884,6 +903,7 @@ def nuevo_remito(request):
                         remito = form.save(commit=False)
                         remito.usuario = request.user
                         remito.save()
+                        _registrar_numero_remito(remito.numero)
                         actualizados = []
                         for df in filas_validas:
                             insumo = df.cleaned_data["insumo"]
@@ -1315,6 +1335,10 @@ def home_compras(request):
 
 
 # ── Ajuste Masivo de Precios de Insumos ──────────────────────────────────────
+# Filas de la vista previa (simulación) que se muestran en la página
+MAX_FILAS_VISTA_PREVIA = 200
+
+
 @login_required
 def ajuste_masivo_precios(request):
     from insumos.models import Insumo
@@ -1378,48 +1402,29 @@ def ajuste_masivo_precios(request):
         if filtro_tipo == 'con_precio':
             queryset = queryset.filter(precio_unitario__gt=0)
 
-        from decimal import Decimal
-        from django.db import transaction
+        from .precios import ajustar_precios
 
-        factor = Decimal('1') + Decimal(str(porcentaje)) / Decimal('100')
+        motivo_masivo = request.POST.get('motivo', '').strip()
+        simular = request.POST.get('accion') == 'simular'
+        resultado = ajustar_precios(
+            queryset, porcentaje, motivo=motivo_masivo, usuario=request.user, simular=simular,
+        )
+        insumos_actualizados = resultado['cantidad']
 
-        insumos_actualizados = 0
-        errores = []
-        motivo_masivo = request.POST.get('motivo', '').strip() or f'Ajuste masivo {porcentaje:+.2f}%'
+        if simular:
+            return render(request, "compras/ajuste_masivo_precios.html", {
+                'categorias': categorias,
+                'proveedores': proveedores,
+                'ultimos_insumos': ultimos_insumos,
+                'insumos_count': insumos_count,
+                'vista_previa': resultado['cambios'][:MAX_FILAS_VISTA_PREVIA],
+                'vista_previa_total': resultado['cantidad'],
+                'valores': request.POST,
+            })
+
+        mensaje_resultado = f"Se actualizaron {insumos_actualizados} insumos con un {'aumento' if porcentaje > 0 else 'descuento'} del {abs(porcentaje)}%"
+        messages.success(request, mensaje_resultado)
 
-        with transaction.atomic():
-            from .models import HistorialPrecioInsumo
-            registros_historial = []
-            for insumo in queryset:
-                try:
-                    if insumo.precio_unitario:
-                        precio_anterior = insumo.precio_unitario
-                        nuevo_precio = (precio_anterior * factor).quantize(Decimal('0.01'))
-                        if nuevo_precio < 0:
-                            errores.append(f"{insumo.nombre}: precio no puede ser negativo")
-                            continue
-                        insumo.precio_unitario = nuevo_precio
-                        insumo.save(update_fields=['precio_unitario'])
-                        registros_historial.append(HistorialPrecioInsumo(
-                            insumo=insumo,
-                            precio_anterior=precio_anterior,
-                            precio_nuevo=nuevo_precio,
-                            origen='ajuste_masivo',
-                            motivo=motivo_masivo,
-                            usuario=request.user,
-                        ))
-                        insumos_actualizados += 1
-                except Exception as e:
-                    errores.append(f"{insumo.nombre}: {str(e)}")
-            if registros_historial:
-                HistorialPrecioInsumo.objects.bulk_create(registros_historial)
-        
-        if errores:
-            messages.warning(request, f"Actualizados {insumos_actualizados} insumos. Errores: {', '.join(errores[:5])}")
-        else:
-            mensaje_resultado = f"Se actualizaron {insumos_actualizados} insumos con un {'aumento' if porcentaje > 0 else 'descuento'} del {abs(porcentaje)}%"
-            messages.success(request, mensaje_resultado)
-    
     context = {
         'categorias': categorias,
         'proveedores': proveedores,
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configuracion', '0009_configversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Secuencia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('serie', models.CharField(max_length=40)),
+                ('punto_venta', models.PositiveIntegerField(default=0)),
+                ('ultimo', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Secuencia de numeración',
+                'verbose_name_plural': 'Secuencias de numeración',
+                'constraints': [models.UniqueConstraint(fields=('serie', 'punto_venta'), name='secuencia_serie_pv_unica')],
+            },
+        ),
+    ]
@@ -134,9 +134,20 @@ class Parametro(models.Model):
         super().save(*args, **kwargs)
         # Invalida y repuebla caché inmediata para coherencia.
         cache.set(self.cache_key(), self.parse_value(), timeout=None)
+        ConfigVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        cache.delete(self.cache_key())
+        ConfigVersion.bump()
+        return resultado
 
     @classmethod
     def get(cls, codigo: str, default=None):
+        from .snapshot import get_snapshot
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.parametro(codigo, default)
         key = f"{cls.CACHE_PREFIX}{codigo}"
         val = cache.get(key)
         if val is not None:
@@ -186,6 +197,62 @@ def _dump_json(value):  # pragma: no cover - util simple
     return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
 
 
+class ConfigVersion(models.Model):
+    """Contador global de versión de la configuración (fila única, pk=1).
+
+    Se incrementa en cada save()/delete() de Parametro, ProveedorParametro,
+    FeatureFlag y ListaConfig. Cada proceso (gunicorn, Celery) compara su
+    snapshot en memoria contra este contador para saber cuándo recargar.
+    """
+
+    version = models.PositiveBigIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Versión de Configuración"
+        verbose_name_plural = "Versión de Configuración"
+
+    def __str__(self):  # pragma: no cover - simple
+        return f"v{self.version}"
+
+    @classmethod
+    def actual(cls) -> int:
+        return cls.objects.filter(pk=1).values_list("version", flat=True).first() or 0
+
+    @classmethod
+    def bump(cls) -> None:
+        """Incrementa la versión (UPDATE atómico) e invalida el snapshot local."""
+        from django.db.models import F
+        from .snapshot import invalidar_snapshot
+
+        if not cls.objects.filter(pk=1).update(version=F("version") + 1):
+            cls.objects.get_or_create(pk=1, defaults={"version": 1})
+        invalidar_snapshot()
+        # Otros hilos del proceso pueden haber recargado antes del commit.
+        transaction.on_commit(invalidar_snapshot)
+
+
+class Secuencia(models.Model):
+    """Último número emitido de una serie de comprobantes (por punto de venta).
+
+    Se lee y se incrementa sólo a través de configuracion/secuencias.py.
+    """
+
+    serie = models.CharField(max_length=40)
+    punto_venta = models.PositiveIntegerField(default=0)
+    ultimo = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de numeración"
+        verbose_name_plural = "Secuencias de numeración"
+        constraints = [
+            models.UniqueConstraint(fields=["serie", "punto_venta"], name="secuencia_serie_pv_unica"),
+        ]
+
+    def __str__(self):  # pragma: no cover - simple
+        return f"{self.serie}/{self.punto_venta}: {self.ultimo}"
+
+
 class FeatureFlag(models.Model):
     codigo = models.CharField(max_length=80, unique=True)
     descripcion = models.CharField(max_length=200, blank=True)
@@ -205,9 +272,20 @@ class FeatureFlag(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         cache.set(f"{self.CACHE_PREFIX}{self.codigo}", self.activo, timeout=None)
+        ConfigVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        cache.delete(f"{self.CACHE_PREFIX}{self.codigo}")
+        ConfigVersion.bump()
+        return resultado
 
     @classmethod
     def is_active(cls, codigo: str, default=False):
+        from .snapshot import get_snapshot
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.feature_flag(codigo, default)
         key = f"{cls.CACHE_PREFIX}{codigo}"
         cached = cache.get(key)
         if cached is not None:
@@ -245,6 +323,13 @@ class ListaConfig(models.Model):
     def save(self, *args, **kwargs):
         super().save(*args, **kwargs)
         cache.set(self.cache_key(), self.to_dict(), timeout=None)
+        ConfigVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        cache.delete(self.cache_key())
+        ConfigVersion.bump()
+        return resultado
 
     def cache_key(self):
         return f"{self.CACHE_PREFIX}{self.codigo}"
@@ -260,6 +345,10 @@ class ListaConfig(models.Model):
 
     @classmethod
     def get(cls, codigo: str, default=None):
+        from .snapshot import get_snapshot
+        snapshot = get_snapshot()
+        if snapshot is not None:
+            return snapshot.lista(codigo, default)
         key = f"{cls.CACHE_PREFIX}{codigo}"
         data = cache.get(key)
         if data is not None:
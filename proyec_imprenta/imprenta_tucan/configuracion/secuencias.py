@@ -0,0 +1,112 @@
+"""Numeración correlativa de comprobantes (facturas, presupuestos, órdenes de pago).
+
+Cada serie (y punto de venta) tiene una fila Secuencia con el último número
+emitido. siguiente() la incrementa con un único UPDATE ... RETURNING: no hay
+que buscar el máximo por prefijo entre los comprobantes ni parsear textos, y
+dos transacciones concurrentes nunca obtienen el mismo número porque el
+UPDATE toma el lock de escritura de la fila (PostgreSQL) o de la base (SQLite)
+hasta el commit.
+
+Sin huecos: el incremento forma parte de la transacción de quien lo pide. Si
+el comprobante no llega a guardarse y la transacción se revierte, el número
+vuelve a quedar libre. Por eso hay que pedir el número dentro del mismo
+transaction.atomic() que crea el comprobante.
+
+Todas las funciones aceptan `using` para operar sobre otra base configurada.
+
+reservar() asigna un bloque de números consecutivos con un solo UPDATE, para
+generar muchos comprobantes juntos. Los números del bloque que no se usen
+antes del commit quedan como huecos.
+
+La primera vez que se usa una serie, `inicial` (un callable) indica el último
+número ya emitido con el esquema anterior, para continuar la numeración.
+"""
+from __future__ import annotations
+
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections, transaction
+
+
+def _soporta_returning(connection) -> bool:
+    if connection.vendor == 'postgresql':
+        return True
+    if connection.vendor == 'sqlite':
+        return connection.Database.sqlite_version_info >= (3, 35, 0)
+    return False
+
+
+def _incrementar(serie: str, punto_venta: int, cantidad: int, using: str):
+    """Suma `cantidad` al contador y retorna el nuevo último número (None si la fila no existe)."""
+    from .models import Secuencia
+
+    connection = connections[using]
+    tabla = connection.ops.quote_name(Secuencia._meta.db_table)
+    sql = f"UPDATE {tabla} SET ultimo = ultimo + %s WHERE serie = %s AND punto_venta = %s"
+    with connection.cursor() as cursor:
+        if _soporta_returning(connection):
+            cursor.execute(sql + " RETURNING ultimo", [cantidad, serie, punto_venta])
+            fila = cursor.fetchone()
+            return fila[0] if fila else None
+        cursor.execute(sql, [cantidad, serie, punto_venta])
+        if not cursor.rowcount:
+            return None
+    # El UPDATE ya bloqueó la fila: la lectura ve el valor propio
+    return (
+        Secuencia.objects.using(using).filter(serie=serie, punto_venta=punto_venta)
+        .values_list('ultimo', flat=True).get()
+    )
+
+
+def _crear(serie: str, punto_venta: int, inicial, using: str) -> None:
+    from .models import Secuencia
+
+    ultimo = int(inicial() or 0) if inicial else 0
+    try:
+        with transaction.atomic(using=using):
+            Secuencia.objects.using(using).create(serie=serie, punto_venta=punto_venta, ultimo=ultimo)
+    except IntegrityError:
+        pass  # otra transacción la creó primero
+
+
+def reservar(serie: str, cantidad: int, punto_venta: int = 0, inicial=None,
+             using: str = DEFAULT_DB_ALIAS) -> range:
+    """Asigna `cantidad` números consecutivos de la serie y los retorna como range."""
+    if cantidad < 1:
+        raise ValueError("cantidad debe ser mayor que cero")
+    with transaction.atomic(using=using):
+        ultimo = _incrementar(serie, punto_venta, cantidad, using)
+        if ultimo is None:
+            _crear(serie, punto_venta, inicial, using)
+            ultimo = _incrementar(serie, punto_venta, cantidad, using)
+    return range(ultimo - cantidad + 1, ultimo + 1)
+
+
+def siguiente(serie: str, punto_venta: int = 0, inicial=None, using: str = DEFAULT_DB_ALIAS) -> int:
+    """Asigna y retorna el próximo número de la serie."""
+    return reservar(serie, 1, punto_venta, inicial, using)[0]
+
+
+def proximo(serie: str, punto_venta: int = 0, inicial=None, using: str = DEFAULT_DB_ALIAS) -> int:
+    """Número que asignaría siguiente(), sin consumirlo (vistas previas, sugerencias)."""
+    from .models import Secuencia
+
+    ultimo = (
+        Secuencia.objects.using(using).filter(serie=serie, punto_venta=punto_venta)
+        .values_list('ultimo', flat=True).first()
+    )
+    if ultimo is None:
+        ultimo = int(inicial() or 0) if inicial else 0
+    return ultimo + 1
+
+
+def registrar_usado(serie: str, numero: int, punto_venta: int = 0, inicial=None,
+                    using: str = DEFAULT_DB_ALIAS) -> None:
+    """Avanza la serie hasta `numero` si se emitió un comprobante con número cargado a mano."""
+    from django.db.models import Value
+    from django.db.models.functions import Greatest
+    from .models import Secuencia
+
+    with transaction.atomic(using=using):
+        qs = Secuencia.objects.using(using).filter(serie=serie, punto_venta=punto_venta)
+        if not qs.update(ultimo=Greatest('ultimo', Value(numero))):
+            _crear(serie, punto_venta, inicial, using)
+            qs.update(ultimo=Greatest('ultimo', Value(numero)))
@@ -0,0 +1,132 @@
+"""Snapshot de configuración en memoria, versionado y local al proceso.
+
+Carga de una sola pasada todas las filas de Parametro, ProveedorParametro,
+FeatureFlag y ListaConfig. Las lecturas posteriores (Parametro.get,
+FeatureFlag.is_active, ListaConfig.get, proveedores.services.get_parametro y
+por lo tanto MotorConfig.get) son búsquedas en diccionarios: en régimen
+estable no cuestan queries, incluidas las claves inexistentes (lookups
+negativos), que antes pagaban un round trip por llamada.
+
+Invalidación:
+    - save()/delete() de los modelos de configuración incrementan
+      ConfigVersion e invalidan el snapshot del proceso actual.
+    - Los demás procesos (gunicorn, Celery) comparan su versión contra
+      ConfigVersion como máximo cada CONFIG_SNAPSHOT_CHECK_SEGUNDOS.
+    - Cada CONFIG_SNAPSHOT_TTL_SEGUNDOS se recarga igual, para cubrir
+      escrituras que no pasan por save() (queryset.update, bulk_create).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_SIN_VALOR = object()
+
+_lock = threading.Lock()
+_snapshot: "ConfigSnapshot | None" = None
+_ultimo_chequeo = 0.0
+
+
+def _check_segundos() -> float:
+    return float(getattr(settings, "CONFIG_SNAPSHOT_CHECK_SEGUNDOS", 5))
+
+
+def _ttl_segundos() -> float:
+    return float(getattr(settings, "CONFIG_SNAPSHOT_TTL_SEGUNDOS", 300))
+
+
+class ConfigSnapshot:
+    """Vista inmutable de la configuración para una versión dada."""
+
+    def __init__(self, version: int, parametros: dict, proveedor_parametros: dict,
+                 feature_flags: dict, listas: dict):
+        self.version = version
+        self.cargado = time.monotonic()
+        self._parametros = parametros
+        self._proveedor_parametros = proveedor_parametros
+        self._feature_flags = feature_flags
+        self._listas = listas
+
+    @classmethod
+    def cargar(cls, version: int) -> "ConfigSnapshot":
+        """Lee las cuatro tablas de configuración (4 queries)."""
+        from proveedores.models import ProveedorParametro
+        from .models import FeatureFlag, ListaConfig, Parametro
+
+        parametros = {p.codigo: p.parse_value() for p in Parametro.objects.filter(activo=True)}
+        proveedor_parametros = dict(
+            ProveedorParametro.objects.filter(activo=True).values_list("clave", "valor")
+        )
+        feature_flags = dict(FeatureFlag.objects.values_list("codigo", "activo"))
+        listas = {l.codigo: l.to_dict() for l in ListaConfig.objects.filter(activo=True)}
+        return cls(version, parametros, proveedor_parametros, feature_flags, listas)
+
+    def parametro(self, codigo: str, default=None):
+        valor = self._parametros.get(codigo, _SIN_VALOR)
+        return default if valor is _SIN_VALOR else valor
+
+    def proveedor_parametro(self, clave: str, default=None):
+        return self._proveedor_parametros.get(clave, default)
+
+    def feature_flag(self, codigo: str, default=False):
+        return self._feature_flags.get(codigo, default)
+
+    def lista(self, codigo: str, default=None):
+        data = self._listas.get(codigo)
+        # Copia: los llamadores pueden mutar el dict (columnas, orden).
+        return dict(data, columnas=list(data["columnas"])) if data is not None else default
+
+
+def get_snapshot() -> ConfigSnapshot | None:
+    """
+    Retorna el snapshot vigente, recargándolo si la versión en BD cambió.
+
+    Retorna None si la BD no está disponible (p. ej. durante migrate); en ese
+    caso los llamadores usan su ruta de lectura directa. Las lecturas van en
+    un savepoint para que un error no deje rota la transacción del llamador,
+    y si esa transacción ya está marcada para rollback no se consulta la BD:
+    se devuelve el snapshot que haya.
+    """
+    from django.db import DatabaseError, connection, transaction
+
+    global _snapshot, _ultimo_chequeo
+    ahora = time.monotonic()
+    snapshot = _snapshot
+    if (
+        snapshot is not None
+        and ahora - _ultimo_chequeo < _check_segundos()
+        and ahora - snapshot.cargado < _ttl_segundos()
+    ):
+        return snapshot
+    if connection.needs_rollback:
+        return snapshot
+
+    with _lock:
+        try:
+            from .models import ConfigVersion
+            with transaction.atomic():
+                version = ConfigVersion.actual()
+                snapshot = _snapshot
+                if (
+                    snapshot is None
+                    or snapshot.version != version
+                    or ahora - snapshot.cargado >= _ttl_segundos()
+                ):
+                    snapshot = ConfigSnapshot.cargar(version)
+                    _snapshot = snapshot
+            _ultimo_chequeo = ahora
+        except DatabaseError as e:
+            logger.debug("get_snapshot: configuración no disponible (%s)", e)
+            return None
+    return snapshot
+
+
+def invalidar_snapshot() -> None:
+    """Descarta el snapshot del proceso; la próxima lectura lo recarga."""
+    global _snapshot
+    _snapshot = None
@@ -1,6 +1,9 @@
+import json
+
 import pytest
 from configuracion.utils.safe_eval import safe_eval
 from django.test import Client
+from django.urls import reverse
 
 
 def test_safe_eval_basic():
@@ -24,21 +27,70 @@ def test_safe_eval_funciones():
     assert res == 4
 
 
-def test_validar_formula_api(client: Client):
-    c = Client()
-    resp = c.post('/api/configuracion/formula/validate/',
-                  data='{"expresion": "(tiraje*area)/rendimiento", "variables": {"tiraje":1000,"area":0.21,"rendimiento":5}}',
-                  content_type='application/json')
+def _validar(client, cuerpo):
+    return client.post(reverse('validar_formula'), data=cuerpo, content_type='application/json')
+
+
+@pytest.mark.django_db
+def test_validar_formula_api(admin_client: Client):
+    resp = _validar(admin_client, '{"expresion": "(tiraje*area)/rendimiento", "variables": {"tiraje":1000,"area":0.21,"rendimiento":5}}')
     assert resp.status_code == 200
     data = resp.json()
     assert data['ok'] and abs(data['resultado'] - 42.0) < 1e-6
 
 
-def test_validar_formula_api_error(client: Client):
-    c = Client()
-    resp = c.post('/api/configuracion/formula/validate/',
-                  data='{"expresion": "import os", "variables": {}}',
-                  content_type='application/json')
+@pytest.mark.django_db
+def test_validar_formula_api_error(admin_client: Client):
+    resp = _validar(admin_client, '{"expresion": "import os", "variables": {}}')
     assert resp.status_code == 400
     data = resp.json()
     assert not data['ok']
+
+
+@pytest.mark.django_db
+def test_validar_formula_api_vector(admin_client: Client):
+    expr = "ceil(tiraje / rendimiento) * area"
+    resp = _validar(admin_client, json.dumps(
+        {'expresion': expr, 'variables': {'tiraje': [1, 100, 1000], 'rendimiento': [33, 33, 0], 'area': 0.5}}
+    ))
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data['ok']
+    assert data['resultado'][:2] == [safe_eval(expr, {'tiraje': t, 'rendimiento': 33, 'area': 0.5}) for t in (1, 100)]
+    # División por cero en un elemento: None en vez de un Infinity que JSON no admite
+    assert data['resultado'][2] is None
+
+
+@pytest.mark.django_db
+def test_validar_formula_api_requiere_login(client: Client):
+    resp = _validar(client, '{"expresion": "1 + 1", "variables": {}}')
+    assert resp.status_code == 302
+
+
+def test_safe_eval_cache_compilado():
+    from configuracion.utils.safe_eval import estadisticas_cache, limpiar_cache
+    limpiar_cache()
+    for tiraje in (100, 200, 300):
+        safe_eval("ceil(tiraje / rendimiento) + 1", {'tiraje': tiraje, 'rendimiento': 33})
+    stats = estadisticas_cache()
+    assert stats['misses'] == 1 and stats['hits'] == 2
+
+
+def test_safe_eval_variables_tienen_prioridad():
+    assert safe_eval("min * 2", {'min': 5}) == 10
+
+
+def test_evaluar_vector_igual_a_escalar():
+    from configuracion.utils.safe_eval import evaluar_vector
+    expr = "max(ceil(tiraje / rendimiento), 2) * area + abs(-1) % 3"
+    tirajes = [1, 50, 99, 1000]
+    res = evaluar_vector(expr, {'tiraje': tirajes, 'rendimiento': 33, 'area': 0.21})
+    assert res.shape == (4,)
+    for t, r in zip(tirajes, res):
+        assert abs(r - safe_eval(expr, {'tiraje': t, 'rendimiento': 33, 'area': 0.21})) < 1e-9
+
+
+def test_evaluar_vector_division_por_cero():
+    from configuracion.utils.safe_eval import evaluar_vector
+    res = evaluar_vector("tiraje / rendimiento", {'tiraje': [10, 10], 'rendimiento': [0, 5]})
+    assert res[0] == float('inf') and res[1] == 2
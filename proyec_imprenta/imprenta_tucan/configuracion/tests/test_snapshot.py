@@ -0,0 +1,67 @@
+"""Tests del snapshot de configuración (configuracion/snapshot.py)."""
+from unittest import mock
+
+from django.db import OperationalError, connection, transaction
+from django.test import TestCase
+
+from configuracion import snapshot as snapshot_mod
+from configuracion.models import ConfigVersion, FeatureFlag, GrupoParametro, ListaConfig, Parametro
+from proveedores.models import ProveedorParametro
+from proveedores.services import get_parametro
+
+
+class ConfigSnapshotTest(TestCase):
+    def setUp(self):
+        snapshot_mod.invalidar_snapshot()
+        self.grupo = GrupoParametro.objects.create(codigo="TEST", nombre="Test")
+
+    def test_lecturas_en_regimen_estable_no_hacen_queries(self):
+        Parametro.objects.create(codigo="P_INT", grupo=self.grupo, nombre="p", tipo=Parametro.TIPO_INT, valor="7")
+        ProveedorParametro.objects.create(clave="PESO_PRECIO", valor="0.35")
+        Parametro.get("P_INT")  # carga el snapshot
+        with self.assertNumQueries(0):
+            self.assertEqual(Parametro.get("P_INT"), 7)
+            self.assertEqual(Parametro.get("NO_EXISTE", "def"), "def")
+            self.assertEqual(Parametro.get("NO_EXISTE", "def"), "def")
+            self.assertEqual(get_parametro("PESO_PRECIO"), "0.35")
+            self.assertIsNone(get_parametro("NO_EXISTE"))
+            self.assertFalse(FeatureFlag.is_active("FLAG_X"))
+            self.assertIsNone(ListaConfig.get("LISTA_X"))
+
+    def test_save_invalida_snapshot_local(self):
+        self.assertIsNone(Parametro.get("P_NUEVO"))
+        Parametro.objects.create(codigo="P_NUEVO", grupo=self.grupo, nombre="p", valor="hola")
+        self.assertEqual(Parametro.get("P_NUEVO"), "hola")
+        FeatureFlag.objects.create(codigo="FLAG_Y", activo=True)
+        self.assertTrue(FeatureFlag.is_active("FLAG_Y"))
+        Parametro.objects.get(codigo="P_NUEVO").delete()
+        self.assertIsNone(Parametro.get("P_NUEVO"))
+
+    def test_cambio_de_version_en_otro_proceso_recarga(self):
+        p = Parametro.objects.create(codigo="P_REMOTO", grupo=self.grupo, nombre="p", valor="a")
+        self.assertEqual(Parametro.get("P_REMOTO"), "a")
+        # Simula la escritura desde otro proceso: sin pasar por save() local.
+        Parametro.objects.filter(pk=p.pk).update(valor="b")
+        self.assertEqual(Parametro.get("P_REMOTO"), "a")
+        ConfigVersion.objects.filter(pk=1).update(version=ConfigVersion.actual() + 1)
+        snapshot_mod._ultimo_chequeo = 0.0
+        self.assertEqual(Parametro.get("P_REMOTO"), "b")
+
+    def test_transaccion_rota_no_consulta_la_bd(self):
+        Parametro.objects.create(codigo="P_ROLLBACK", grupo=self.grupo, nombre="p", valor="x")
+        vigente = snapshot_mod.get_snapshot()
+        snapshot_mod._ultimo_chequeo = 0.0
+        with transaction.atomic():
+            transaction.set_rollback(True)
+            with self.assertNumQueries(0):
+                self.assertIs(snapshot_mod.get_snapshot(), vigente)
+                self.assertEqual(Parametro.get("P_ROLLBACK"), "x")
+
+    def test_error_de_bd_no_rompe_la_transaccion(self):
+        snapshot_mod._ultimo_chequeo = 0.0
+        with mock.patch.object(ConfigVersion, "actual", side_effect=OperationalError("tabla bloqueada")):
+            self.assertIsNone(snapshot_mod.get_snapshot())
+        self.assertFalse(connection.needs_rollback)
+        with mock.patch.object(ConfigVersion, "actual", side_effect=ValueError("bug")):
+            with self.assertRaises(ValueError):
+                snapshot_mod.get_snapshot()
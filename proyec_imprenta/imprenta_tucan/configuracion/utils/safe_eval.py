@@ -1,4 +1,17 @@
+"""
+Evaluación segura de las expresiones de Formula.
+
+Las expresiones se validan contra ALLOWED_NODES y se compilan una sola vez:
+compilar() guarda en un LRU (por texto de la expresión) los code objects ya
+validados, así que evaluar la misma fórmula con otras variables no vuelve a
+parsear ni recorrer el AST. estadisticas_cache() expone aciertos y fallos.
+
+evaluar_vector() evalúa una expresión sobre arrays de variables (muchas
+tiradas o productos a la vez) con las funciones permitidas en su versión
+NumPy elemento a elemento.
+"""
 import ast
+import functools
 import operator as op
 import math
 
@@ -17,6 +30,13 @@ SAFE_FUNCTIONS = {
     'abs': abs,
 }
 
+# Expresiones distintas que se conservan compiladas
+CACHE_MAXSIZE = 512
+
+# Las variables se pasan como locals: tienen prioridad sobre SAFE_FUNCTIONS,
+# igual que cuando se armaba un único dict por evaluación.
+_GLOBALS = {"__builtins__": {}, **SAFE_FUNCTIONS}
+
 
 def _check_node(node):
     if type(node) not in ALLOWED_NODES:
@@ -25,11 +45,75 @@ def _check_node(node):
         _check_node(child)
 
 
-def safe_eval(expr: str, variables: dict):
+@functools.lru_cache(maxsize=CACHE_MAXSIZE)
+def compilar(expr: str):
+    """Valida la expresión y devuelve su code object, listo para evaluar()."""
     parsed = ast.parse(expr, mode='eval')
     _check_node(parsed)
-    code = compile(parsed, '<string>', 'eval')
-    env = {}
-    env.update(SAFE_FUNCTIONS)
-    env.update(variables)
-    return eval(code, {"__builtins__": {}}, env)
+    return compile(parsed, '<string>', 'eval')
+
+
+def evaluar(code, variables: dict):
+    """Evalúa un code object de compilar() con las funciones permitidas."""
+    return eval(code, _GLOBALS, variables)
+
+
+def safe_eval(expr: str, variables: dict):
+    return evaluar(compilar(expr), variables)
+
+
+def estadisticas_cache() -> dict:
+    """Aciertos, fallos y ocupación del cache de expresiones compiladas."""
+    info = compilar.cache_info()
+    return {'hits': info.hits, 'misses': info.misses, 'tamaño': info.currsize, 'maximo': info.maxsize}
+
+
+def limpiar_cache() -> None:
+    compilar.cache_clear()
+
+
+# ---------------------------------------------------------------------------
+# Evaluación vectorizada
+# ---------------------------------------------------------------------------
+
+@functools.lru_cache(maxsize=1)
+def _globals_vectoriales() -> dict:
+    import numpy as np
+
+    def _reducir(ufunc):
+        def aplicar(*args):
+            # min([a, b]) y min(a, b) como en Python, pero elemento a elemento
+            if len(args) == 1:
+                args = tuple(args[0])
+            return functools.reduce(ufunc, args)
+        return aplicar
+
+    return {
+        "__builtins__": {},
+        'min': _reducir(np.minimum),
+        'max': _reducir(np.maximum),
+        'round': np.round,
+        'ceil': np.ceil,
+        'floor': np.floor,
+        'abs': np.abs,
+    }
+
+
+def evaluar_vector(expr: str, variables: dict):
+    """
+    Evalúa `expr` elemento a elemento. Cada variable es un escalar o una
+    secuencia; las secuencias deben poder combinarse entre sí (mismo largo).
+    Retorna un ndarray float con la forma común de las variables.
+
+    A diferencia de safe_eval, un elemento inválido (división por cero, raíz
+    de un negativo) da inf/NaN en su posición en lugar de una excepción, y
+    round/ceil/floor devuelven float.
+    """
+    import numpy as np
+
+    code = compilar(expr)
+    arrays = {nombre: np.asarray(valor, dtype=float) for nombre, valor in variables.items()}
+    forma = np.broadcast_shapes(*(a.shape for a in arrays.values()))
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        resultado = eval(code, _globals_vectoriales(), arrays)
+    return np.broadcast_to(np.asarray(resultado, dtype=float), forma).copy()
@@ -2,7 +2,7 @@ import json
 from django.http import JsonResponse
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.http import require_POST
-from configuracion.utils.safe_eval import safe_eval
+from configuracion.utils.safe_eval import evaluar_vector, safe_eval
 
 
 @login_required
@@ -14,7 +14,12 @@ def formula_validate_api(request):
         variables = data.get('variables', {})
         if not expresion:
             return JsonResponse({'ok': False, 'error': 'Expresión vacía'}, status=400)
-        resultado = safe_eval(expresion, variables)
+        if any(isinstance(v, list) for v in variables.values()):
+            # Variables con listas de valores (ej. un rango de tiradas): una evaluación vectorizada
+            import math
+            resultado = [r if math.isfinite(r) else None for r in evaluar_vector(expresion, variables).tolist()]
+        else:
+            resultado = safe_eval(expresion, variables)
         return JsonResponse({'ok': True, 'resultado': resultado})
     except ValueError as e:
         return JsonResponse({'ok': False, 'error': str(e)}, status=400)
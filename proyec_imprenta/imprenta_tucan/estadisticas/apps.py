@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class EstadisticasConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'estadisticas'
+
+    def ready(self):
+        from . import signals  # noqa: F401 — mantiene los resúmenes de KPI
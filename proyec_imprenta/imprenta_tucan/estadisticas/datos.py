@@ -0,0 +1,294 @@
+"""
+Datos de los informes de estadística descriptiva.
+
+Cada función devuelve, para un rango desde/hasta, la estructura que consumen
+tanto las APIs api_estadistica_* (que la serializan con JsonResponse) como
+los informes_pdf_* (que la usan directamente para tablas y gráficos):
+
+    {"variables": {clave: {"label", "stats"}},
+     "categoricas": {clave: {"labels", "values"}},
+     "resumen": {...}}            # sólo facturas
+
+Los valores son tipos de Python (int, float, str, listas y dicts), sin pasar
+por JSON. Los informes ya no arman un request falso ni decodifican la
+respuesta de la API.
+
+Los resultados se memorizan por (informe, desde, hasta) en el request actual
+(auditoria.middleware), de modo que dentro de un mismo request las tablas
+del PDF y sus gráficos salen de una sola tanda de queries. Fuera de un
+request (tareas, shell) se calculan en cada llamada. Los resultados son
+compartidos: quien los consume no debe modificarlos.
+"""
+import functools
+import logging
+
+logger = logging.getLogger(__name__)
+
+ATRIBUTO_MEMO = "_datos_informes"
+
+
+def _memorizado(func):
+    """Memoriza func(desde, hasta) en el request actual, por nombre y rango."""
+
+    @functools.wraps(func)
+    def envoltura(desde=None, hasta=None):
+        from auditoria.middleware import get_current_request
+
+        request = get_current_request()
+        if request is None:
+            return func(desde, hasta)
+        memo = request.__dict__.setdefault(ATRIBUTO_MEMO, {})
+        clave = (func.__name__, desde, hasta)
+        if clave not in memo:
+            memo[clave] = func(desde, hasta)
+        return memo[clave]
+
+    return envoltura
+
+
+def _serie(filas, etiqueta, valor="n"):
+    return {"labels": [etiqueta(d) for d in filas], "values": [d[valor] for d in filas]}
+
+
+def _por_mes(filas):
+    return _serie(filas, lambda d: d["mes"].strftime("%Y-%m"), "cantidad")
+
+
+def sumar_por_nombre(valores, nombres, sin_nombre):
+    """Agrupa {pk: valor} por nombre (como un GROUP BY nombre) y ordena de mayor a menor."""
+    nombres = dict(nombres)
+    totales = {}
+    for pk, valor in valores.items():
+        nombre = nombres.get(pk) or sin_nombre
+        totales[nombre] = totales.get(nombre, 0) + valor
+    return sorted(totales.items(), key=lambda t: t[1], reverse=True)
+
+
+# ── Clientes ──────────────────────────────────────────────────────────────────
+
+@_memorizado
+def clientes(desde=None, hasta=None):
+    from clientes.models import Cliente
+    from django.db.models import Count
+
+    from .descriptiva import estadisticas_columna
+
+    qs = Cliente.objects.all()
+    if desde: qs = qs.filter(fecha_ultima_actualizacion__date__gte=desde)
+    if hasta: qs = qs.filter(fecha_ultima_actualizacion__date__lte=hasta)
+    por_tipo = list(qs.values("tipo_cliente").annotate(n=Count("id")).order_by("-n"))
+    por_estado = list(qs.values("estado").annotate(n=Count("id")))
+    return {
+        "variables": {"puntaje_estrategico": {"label": "Puntaje Estrategico", "stats": estadisticas_columna(qs, "puntaje_estrategico")}},
+        "categoricas": {
+            "por_tipo_cliente": _serie(por_tipo, lambda d: d["tipo_cliente"]),
+            "por_estado": _serie(por_estado, lambda d: d["estado"]),
+        },
+    }
+
+
+# ── Pedidos ───────────────────────────────────────────────────────────────────
+
+@_memorizado
+def pedidos_por_estado(desde=None, hasta=None):
+    """[{dimension, cantidad, monto}] por nombre de estado, de mayor a menor cantidad (resúmenes KPI)."""
+    from . import resumen
+    from .models import ResumenKPI
+
+    return sorted(resumen.por_dimension(ResumenKPI.METRICA_PEDIDOS, desde, hasta), key=lambda d: -d["cantidad"])
+
+
+@_memorizado
+def pedidos(desde=None, hasta=None):
+    from pedidos.models import Pedido
+
+    from . import resumen
+    from .descriptiva import estadisticas_columna
+    from .models import ResumenKPI
+
+    qs = Pedido.objects.all()
+    if desde: qs = qs.filter(fecha_pedido__gte=desde)
+    if hasta: qs = qs.filter(fecha_pedido__lte=hasta)
+    return {
+        "variables": {
+            "monto_total": {"label": "Monto Total ($)", "stats": estadisticas_columna(qs, "monto_total")},
+            "descuento": {"label": "Descuento (%)", "stats": estadisticas_columna(qs, "descuento")},
+        },
+        "categoricas": {
+            "por_estado": _serie(pedidos_por_estado(desde, hasta), lambda d: d["dimension"] or "Sin estado", "cantidad"),
+            "pedidos_por_mes": _por_mes(resumen.por_mes(ResumenKPI.METRICA_PEDIDOS, desde, hasta)),
+        },
+    }
+
+
+# ── Productos ─────────────────────────────────────────────────────────────────
+
+@_memorizado
+def productos(desde=None, hasta=None):
+    """Catálogo activo; el rango no aplica (se acepta por simetría con el resto)."""
+    from django.db.models import Count
+    from productos.models import Producto
+
+    from .descriptiva import estadisticas_columna
+
+    qs = Producto.objects.filter(activo=True)
+    por_cat = list(qs.values("categoriaProducto__nombreCategoria").annotate(n=Count("idProducto")).order_by("-n"))
+    por_tipo = list(qs.values("tipoProducto__nombreTipoProducto").annotate(n=Count("idProducto")).order_by("-n"))
+    return {
+        "variables": {"precio_unitario": {"label": "Precio Unitario ($)", "stats": estadisticas_columna(qs, "precioUnitario")}},
+        "categoricas": {
+            "por_categoria": _serie(por_cat, lambda d: d["categoriaProducto__nombreCategoria"] or "Sin categoria"),
+            "por_tipo": _serie(por_tipo, lambda d: d["tipoProducto__nombreTipoProducto"] or "Sin tipo"),
+        },
+    }
+
+
+# ── Insumos ───────────────────────────────────────────────────────────────────
+
+@_memorizado
+def insumos(desde=None, hasta=None):
+    from django.db.models import Count
+    from insumos.models import Insumo
+
+    from .descriptiva import estadisticas_columna
+
+    qs = Insumo.objects.filter(activo=True)
+    if desde: qs = qs.filter(created_at__date__gte=desde)
+    if hasta: qs = qs.filter(created_at__date__lte=hasta)
+    por_cat = list(qs.values("categoria").annotate(n=Count("idInsumo")).order_by("-n")[:10])
+    por_tipo = list(qs.values("tipo").annotate(n=Count("idInsumo")))
+    return {
+        "variables": {
+            "stock": {"label": "Stock Actual (unidades)", "stats": estadisticas_columna(qs, "stock")},
+            "precio_unitario": {"label": "Precio Unitario ($)", "stats": estadisticas_columna(qs, "precio_unitario", solo_positivos=True)},
+        },
+        "categoricas": {
+            "por_categoria": _serie(por_cat, lambda d: d["categoria"] or "Sin categoria"),
+            "por_tipo": _serie(por_tipo, lambda d: d["tipo"]),
+        },
+    }
+
+
+# ── Presupuestos ──────────────────────────────────────────────────────────────
+
+@_memorizado
+def presupuestos(desde=None, hasta=None):
+    from django.db.models import Count
+    from presupuestos.models import Presupuesto, PresupuestoDetalle
+
+    from .descriptiva import estadisticas_columna
+
+    pqs = Presupuesto.objects.all()
+    if desde: pqs = pqs.filter(fecha__gte=desde)
+    if hasta: pqs = pqs.filter(fecha__lte=hasta)
+    dqs = PresupuestoDetalle.objects.filter(presupuesto__in=pqs)
+    por_respuesta = list(pqs.values("respuesta_cliente").annotate(n=Count("id")))
+    por_estado = list(pqs.values("estado").annotate(n=Count("id")))
+    return {
+        "variables": {
+            "total": {"label": "Total Presupuesto ($)", "stats": estadisticas_columna(pqs, "total")},
+            "cantidad_linea": {"label": "Cantidad por Linea", "stats": estadisticas_columna(dqs, "cantidad")},
+            "precio_unitario": {"label": "Precio Unitario ($)", "stats": estadisticas_columna(dqs, "precio_unitario")},
+            "descuento": {"label": "Descuento (%)", "stats": estadisticas_columna(dqs, "descuento")},
+        },
+        "categoricas": {
+            "por_respuesta": _serie(por_respuesta, lambda d: d["respuesta_cliente"]),
+            "por_estado": _serie(por_estado, lambda d: d["estado"]),
+        },
+    }
+
+
+# ── Proveedores ───────────────────────────────────────────────────────────────
+
+@_memorizado
+def proveedores(desde=None, hasta=None):
+    from django.db.models import Count
+    from insumos.models import Insumo
+    from proveedores.models import Proveedor
+
+    from .descriptiva import calcular
+
+    pvqs = Proveedor.objects.filter(activo=True)
+    if desde: pvqs = pvqs.filter(fecha_creacion__date__gte=desde)
+    if hasta: pvqs = pvqs.filter(fecha_creacion__date__lte=hasta)
+    por_rubro = list(pvqs.values("rubro").annotate(n=Count("id")).order_by("-n")[:10])
+    insumos_por_prov = list(
+        Insumo.objects.filter(activo=True, proveedor__isnull=False)
+        .values("proveedor__nombre").annotate(n=Count("idInsumo")).order_by("-n")[:10]
+    )
+    return {
+        "variables": {"insumos_por_proveedor": {"label": "Insumos por Proveedor", "stats": calcular([d["n"] for d in insumos_por_prov])}},
+        "categoricas": {
+            "por_rubro": _serie(por_rubro, lambda d: d["rubro"] or "Sin rubro"),
+            "activos_vs_inactivos": {"labels": ["Activo", "Inactivo"], "values": [pvqs.count(), Proveedor.objects.filter(activo=False).count()]},
+            "insumos_por_proveedor": _serie(insumos_por_prov, lambda d: d["proveedor__nombre"]),
+        },
+    }
+
+
+# ── Compras ───────────────────────────────────────────────────────────────────
+
+@_memorizado
+def compras(desde=None, hasta=None):
+    from compras.models import OrdenCompra
+    from proveedores.models import Proveedor
+
+    from . import resumen
+    from .descriptiva import estadisticas_columna
+    from .models import ResumenKPI
+
+    qs = OrdenCompra.objects.all()
+    if desde: qs = qs.filter(fecha_creacion__gte=desde)
+    if hasta: qs = qs.filter(fecha_creacion__lte=hasta)
+    por_estado = sorted(resumen.por_dimension(ResumenKPI.METRICA_COMPRAS, desde, hasta), key=lambda d: -d["cantidad"])
+    por_proveedor = {int(d["dimension"]): d["cantidad"] for d in resumen.por_dimension(ResumenKPI.METRICA_COMPRAS_PROVEEDOR, desde, hasta)}
+    por_prov = sumar_por_nombre(por_proveedor, Proveedor.objects.filter(pk__in=por_proveedor).values_list("pk", "nombre"), "Sin proveedor")[:10]
+    return {
+        "variables": {"monto_total": {"label": "Monto Total por Orden ($)", "stats": estadisticas_columna(qs, "monto_total")}},
+        "categoricas": {
+            "por_estado": _serie(por_estado, lambda d: d["dimension"] or "Sin estado", "cantidad"),
+            "por_proveedor": {"labels": [nombre for nombre, _ in por_prov], "values": [n for _, n in por_prov]},
+            "ordenes_por_mes": _por_mes(resumen.por_mes(ResumenKPI.METRICA_COMPRAS, desde, hasta)),
+        },
+    }
+
+
+# ── Facturas ──────────────────────────────────────────────────────────────────
+
+@_memorizado
+def facturas(desde=None, hasta=None):
+    from pedidos.models import Factura
+
+    from . import resumen
+    from .descriptiva import estadisticas_columna
+    from .models import ResumenKPI
+
+    qs = Factura.objects.all()
+    if desde: qs = qs.filter(fecha_emision__date__gte=desde)
+    if hasta: qs = qs.filter(fecha_emision__date__lte=hasta)
+
+    # Estado de cobro, meses y cobros desde los resúmenes (estadisticas/resumen.py)
+    por_estado = {d["dimension"]: d for d in resumen.por_dimension(ResumenKPI.METRICA_FACTURAS, desde, hasta)}
+    estado_counts = {estado: por_estado[estado]["cantidad"] if estado in por_estado else 0 for estado in resumen.ESTADOS_COBRO}
+    por_mes = resumen.por_mes(ResumenKPI.METRICA_FACTURAS, desde, hasta)
+    total_cobrado = float(resumen.totales(ResumenKPI.METRICA_COBROS, desde, hasta)["monto"])
+    total_facturado = float(sum(d["monto"] for estado, d in por_estado.items() if estado != "Anulada"))
+    meses = [d["mes"].strftime("%Y-%m") for d in por_mes]
+
+    return {
+        "variables": {
+            "monto_total": {"label": "Monto Total Facturado ($)", "stats": estadisticas_columna(qs, "monto_total")},
+        },
+        "categoricas": {
+            "por_estado_cobro": {"labels": list(estado_counts.keys()), "values": list(estado_counts.values())},
+            "facturas_por_mes": {"labels": meses, "values": [d["cantidad"] for d in por_mes]},
+            "monto_por_mes": {"labels": meses, "values": [float(d["monto"]) for d in por_mes]},
+        },
+        "resumen": {
+            "total": sum(estado_counts.values()),
+            "total_facturado": total_facturado,
+            "total_cobrado": total_cobrado,
+            "saldo_pendiente": round(total_facturado - total_cobrado, 2),
+            "anuladas": estado_counts["Anulada"],
+        },
+    }
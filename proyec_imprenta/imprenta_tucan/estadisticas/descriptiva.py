@@ -0,0 +1,192 @@
+"""
+Estadística descriptiva de una variable numérica.
+
+calcular() resume una secuencia de valores con NumPy: un único argsort
+(estable) alimenta mínimo, máximo, cuantiles y moda, los momentos salen de
+operaciones vectorizadas sobre el mismo arreglo y el histograma de
+np.histogram. Sin el recorrido por bin ni los min()/max() repetidos del
+cálculo anterior en Python puro.
+
+estadisticas_columna() resume una columna de un queryset:
+
+    - Hasta UMBRAL_SQL filas, trae la columna como arreglo float y usa calcular().
+    - Por encima, no trae la columna: cantidad, suma, mínimo, máximo y media
+      salen de un aggregate; varianza (en dos pasadas, alrededor de la media)
+      y conteos del histograma de un segundo aggregate; los cuantiles de un
+      ROW_NUMBER() filtrado a las posiciones que necesita la interpolación, y
+      la moda de un GROUP BY. Cuatro queries, independientes del tamaño.
+
+Ambos caminos devuelven el mismo diccionario (las claves de siempre de
+estadisticas.views) o None si no hay valores.
+"""
+import logging
+
+logger = logging.getLogger(__name__)
+
+UMBRAL_SQL = 20000
+MAX_BINS = 10
+PERCENTILES = {"p10": 10, "q1": 25, "q2": 50, "q3": 75, "p90": 90}
+
+
+def _posiciones(n, p):
+    """Posiciones (ordenadas) a interpolar para el percentil p: (lo, hi, fracción)."""
+    idx = (n - 1) * p / 100
+    lo = int(idx)
+    hi = lo + 1 if lo + 1 < n else lo
+    return lo, hi, idx - lo
+
+
+def _interpolar(ordenados, n, p):
+    """Percentil por interpolación lineal; `ordenados` admite índice posicional."""
+    lo, hi, frac = _posiciones(n, p)
+    if hi == lo:
+        return ordenados[lo]
+    return ordenados[lo] + frac * (ordenados[hi] - ordenados[lo])
+
+
+def _bordes(minimo, maximo, n):
+    """Bordes del histograma (los mismos que usa np.histogram con range=(min, max))."""
+    import numpy as np
+
+    return np.linspace(minimo, maximo, min(MAX_BINS, n) + 1)
+
+
+def _resultado(n, media, varianza, minimo, maximo, cuantiles, mediana, moda, histograma):
+    q1, q3 = cuantiles["q1"], cuantiles["q3"]
+    return {
+        "n": int(n), "media": round(float(media), 2), "mediana": round(float(mediana), 2),
+        "moda": round(float(moda), 2) if moda is not None else None,
+        "desv_std": round(float(varianza) ** 0.5, 2), "varianza": round(float(varianza), 2),
+        "rango": round(float(maximo - minimo), 2), "minimo": round(float(minimo), 2),
+        "maximo": round(float(maximo), 2),
+        "q1": round(float(q1), 2), "q2": round(float(cuantiles["q2"]), 2), "q3": round(float(q3), 2),
+        "p10": round(float(cuantiles["p10"]), 2), "p90": round(float(cuantiles["p90"]), 2),
+        "iqr": round(float(q3 - q1), 2), "histograma": histograma,
+    }
+
+
+def _histograma(bordes, conteos):
+    return [
+        {"label": f"{lo:.1f}-{hi:.1f}", "count": int(c)}
+        for lo, hi, c in zip(bordes[:-1], bordes[1:], conteos)
+    ]
+
+
+def calcular(valores):
+    """
+    Estadísticas descriptivas de `valores` (secuencia o ndarray numérico).
+
+    La moda es el valor más frecuente y, ante empate, el que aparece primero
+    (como statistics.mode). Retorna None si no hay valores.
+    """
+    import numpy as np
+
+    arr = np.asarray(valores, dtype=float).ravel()
+    n = arr.size
+    if n == 0:
+        return None
+
+    orden = np.argsort(arr, kind="stable")
+    ordenados = arr[orden]
+    minimo, maximo = ordenados[0], ordenados[-1]
+    media = arr.sum() / n
+    desvios = arr - media
+    varianza = float(np.dot(desvios, desvios)) / (n - 1) if n > 1 else 0.0
+
+    cuantiles = {k: _interpolar(ordenados, n, p) for k, p in PERCENTILES.items()}
+    mitad = n // 2
+    mediana = ordenados[mitad] if n % 2 else (ordenados[mitad - 1] + ordenados[mitad]) / 2
+
+    # Moda sobre las corridas de valores iguales del arreglo ya ordenado; con
+    # orden estable, el primer índice de cada corrida es su primera aparición.
+    inicios = np.flatnonzero(np.r_[True, ordenados[1:] != ordenados[:-1]])
+    repeticiones = np.diff(np.r_[inicios, n])
+    empatados = inicios[repeticiones == repeticiones.max()]
+    moda = ordenados[empatados[np.argmin(orden[empatados])]]
+
+    if maximo > minimo:
+        bordes = _bordes(minimo, maximo, n)
+        conteos, _ = np.histogram(arr, bins=bordes)
+        histograma = _histograma(bordes, conteos)
+    else:
+        histograma = [{"label": str(round(float(media), 2)), "count": int(n)}]
+
+    return _resultado(n, media, varianza, minimo, maximo, cuantiles, mediana, moda, histograma)
+
+
+def estadisticas_columna(queryset, campo, solo_positivos=False, umbral_sql=None):
+    """
+    calcular() sobre los valores no nulos de `campo` en `queryset` (los > 0 si
+    `solo_positivos`), delegando en la base los agregados cuando la columna
+    supera `umbral_sql` filas (por defecto UMBRAL_SQL).
+    """
+    import numpy as np
+    from django.db.models import Avg, Count, Max, Min, Sum
+
+    filtros = {f"{campo}__isnull": False}
+    if solo_positivos:
+        filtros[f"{campo}__gt"] = 0
+    qs = queryset.filter(**filtros).order_by()
+
+    base = qs.aggregate(n=Count(campo), suma=Sum(campo), minimo=Min(campo), maximo=Max(campo), media=Avg(campo))
+    n = base["n"]
+    if not n:
+        return None
+    if n <= (UMBRAL_SQL if umbral_sql is None else umbral_sql):
+        return calcular(np.fromiter(qs.values_list(campo, flat=True), dtype=float, count=n))
+
+    try:
+        return _estadisticas_sql(qs, campo, n, base)
+    except Exception:
+        # Backends sin funciones de ventana: se trae la columna
+        logger.exception("Estadísticas de %s.%s en SQL fallaron; se calculan en memoria", qs.model.__name__, campo)
+        return calcular(np.fromiter(qs.values_list(campo, flat=True), dtype=float, count=n))
+
+
+def _estadisticas_sql(qs, campo, n, base):
+    from django.db.models import Count, F, FloatField, Min, Q, Sum, Value, Window
+    from django.db.models.functions import Cast, RowNumber
+
+    minimo, maximo = float(base["minimo"]), float(base["maximo"])
+    media = float(base["media"])
+    qs_float = qs.annotate(_v=Cast(campo, FloatField()))
+
+    # Varianza y histograma en la misma pasada
+    segunda = {"ss": Sum((F("_v") - Value(media)) * (F("_v") - Value(media)), output_field=FloatField())}
+    bordes = _bordes(minimo, maximo, n) if maximo > minimo else None
+    if bordes is not None:
+        ultimo = len(bordes) - 2
+        for i in range(ultimo + 1):
+            filtro = Q(_v__gte=float(bordes[i]))
+            if i < ultimo:
+                filtro &= Q(_v__lt=float(bordes[i + 1]))
+            segunda[f"b{i}"] = Count("pk", filter=filtro)
+    agregados = qs_float.aggregate(**segunda)
+    varianza = (agregados["ss"] or 0.0) / (n - 1) if n > 1 else 0.0
+    if bordes is not None:
+        histograma = _histograma(bordes, [agregados[f"b{i}"] for i in range(len(bordes) - 1)])
+    else:
+        histograma = [{"label": str(round(media, 2)), "count": n}]
+
+    # Sólo las filas (1-based) que necesitan cuantiles y mediana
+    posiciones = {(n - 1) // 2, n // 2}
+    for p in PERCENTILES.values():
+        lo, hi, _frac = _posiciones(n, p)
+        posiciones.update((lo, hi))
+    filas = dict(
+        qs_float.annotate(_fila=Window(RowNumber(), order_by=F("_v").asc()))
+        .filter(_fila__in=[i + 1 for i in posiciones])
+        .values_list("_fila", "_v")
+    )
+    ordenados = {i: filas[i + 1] for i in posiciones}
+    cuantiles = {k: _interpolar(ordenados, n, p) for k, p in PERCENTILES.items()}
+    mitad = n // 2
+    mediana = ordenados[mitad] if n % 2 else (ordenados[mitad - 1] + ordenados[mitad]) / 2
+
+    # Moda: el valor más repetido; ante empate, el de la fila más antigua
+    moda = (
+        qs.values(campo).annotate(_veces=Count("pk"), _primera=Min("pk"))
+        .order_by("-_veces", "_primera").values_list(campo, flat=True).first()
+    )
+
+    return _resultado(n, media, varianza, minimo, maximo, cuantiles, mediana, moda, histograma)
@@ -0,0 +1,350 @@
+"""
+Gráficos PNG de los informes PDF (matplotlib).
+
+renderizar() recibe todas las especificaciones (tipo, datos) de un informe y
+devuelve sus PNG en el mismo orden:
+
+    1. Cada gráfico se identifica por un hash (sha256) de su tipo y sus datos;
+       los que ya están en la cache de Django (GRAFICOS_CACHE_SEGUNDOS) no se
+       vuelven a dibujar.
+    2. Los faltantes se dibujan en paralelo en un ProcessPoolExecutor de
+       GRAFICOS_PROCESOS procesos ("spawn": sin heredar conexiones ni hilos
+       del worker), creado en el primer informe que lo necesita. Cada proceso
+       es un intérprete con Django y matplotlib cargados, así que el pool es
+       opcional (default 0). Con un solo faltante, o GRAFICOS_PROCESOS = 0,
+       se dibujan en el mismo hilo. Si se rompe el pool (BrokenProcessPool: un proceso
+       murió) se dibujan en el hilo y se recrea en la próxima llamada; el
+       error de un gráfico se propaga. Los gráficos del pool se esperan como
+       máximo GRAFICOS_TIMEOUT_SEGUNDOS en total: al vencer se descarta el
+       pool y se propaga el TimeoutError.
+
+El dibujo usa la API orientada a objetos (matplotlib.figure.Figure), sin
+pyplot: no hay estado global de figuras entre gráficos ni entre hilos.
+
+precalentar() importa matplotlib, carga la cache de fuentes con un gráfico
+mínimo y levanta los procesos del pool (cada uno se precalienta al iniciar);
+se llama al cargar impre_tucan/wsgi.py en cada worker si GRAFICOS_PRECALENTAR
+(default False: sin él matplotlib se carga en el primer informe).
+
+Tiempos: cada resultado trae los segundos de dibujo (0 si vino de cache),
+el request actual los acumula para el header Server-Timing del PDF y
+metricas() → por tipo: dibujados, desde cache, ms totales y máximo.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import NamedTuple
+
+logger = logging.getLogger(__name__)
+
+# Cambiarla invalida los PNG cacheados (p. ej. al modificar estilos)
+VERSION = 1
+PREFIJO_CACHE = "grafico"
+ATRIBUTO_TIEMPOS = "_tiempos_graficos"
+
+COLORES = ["#3498DB", "#2ECC71", "#E74C3C", "#F39C12", "#9B59B6",
+           "#1ABC9C", "#E67E22", "#34495E", "#E91E63", "#00BCD4"]
+COLOR_TITULO = "#1E3A5F"
+
+
+class Resultado(NamedTuple):
+    png: bytes
+    tipo: str
+    clave: str
+    segundos: float
+    en_cache: bool
+
+
+# ── Dibujo (se ejecuta en los procesos del pool: sin Django) ───────────────────
+
+def _ejes_limpios(ax, grilla="y", labelsize=7):
+    ax.tick_params(axis="both", labelsize=labelsize)
+    ax.spines["top"].set_visible(False)
+    ax.spines["right"].set_visible(False)
+    getattr(ax, f"{grilla}axis").grid(True, alpha=0.3)
+    ax.set_axisbelow(True)
+
+
+def _torta(ax, labels, values, colores, ancho_anillo=None, texto_blanco=True):
+    estilo = {"edgecolor": "white", "linewidth": 1.5}
+    if ancho_anillo:
+        estilo["width"] = ancho_anillo
+    _, textos, porcentajes = ax.pie(
+        values, labels=labels, autopct="%1.1f%%", colors=colores[:len(labels)], startangle=90, wedgeprops=estilo,
+    )
+    for t in textos:
+        t.set_fontsize(8)
+    for t in porcentajes:
+        t.set_fontsize(7)
+        t.set_fontweight("bold")
+        if texto_blanco:
+            t.set_color("white")
+
+
+def _dibujar_histograma(ax, labels, values, titulo, color="#3498DB"):
+    ax.bar(labels, values, color=color, edgecolor="white", linewidth=0.5)
+    _ejes_limpios(ax)
+    ax.tick_params(axis="x", rotation=35)
+    ax.set_title(titulo, fontsize=10, fontweight="bold", pad=8, color=COLOR_TITULO)
+
+
+def _dibujar_categorico(ax, labels, values, titulo, tipo="bar"):
+    xs = list(range(len(labels)))
+    if tipo == "barh":
+        ax.barh(labels, values, color=COLORES[:len(labels)], edgecolor="white", linewidth=0.5)
+        _ejes_limpios(ax, grilla="x")
+    elif tipo == "line":
+        ax.plot(xs, values, color=COLORES[0], linewidth=2,
+                marker="o", markersize=5, markerfacecolor="white", markeredgewidth=2)
+        ax.fill_between(xs, values, alpha=0.1, color=COLORES[0])
+        ax.set_xticks(xs)
+        ax.set_xticklabels(labels, rotation=30, fontsize=7)
+        _ejes_limpios(ax)
+    elif tipo in ("pie", "doughnut"):
+        _torta(ax, labels, values, COLORES, ancho_anillo=0.5 if tipo == "doughnut" else None,
+               texto_blanco=tipo == "pie")
+    elif tipo == "scatter":
+        ax.scatter(xs, values, color=COLORES[:len(labels)], s=80, zorder=3)
+        ax.set_xticks(xs)
+        ax.set_xticklabels(labels, rotation=30, fontsize=7)
+        _ejes_limpios(ax)
+    else:
+        barras = ax.bar(labels, values, color=COLORES[:len(labels)], edgecolor="white", linewidth=0.5)
+        _ejes_limpios(ax)
+        ax.tick_params(axis="x", rotation=30)
+        for barra, valor in zip(barras, values):
+            ax.text(barra.get_x() + barra.get_width() / 2, barra.get_height() + max(values) * 0.01,
+                    str(valor), ha="center", va="bottom", fontsize=7)
+    ax.set_title(titulo, fontsize=10, fontweight="bold", pad=8, color=COLOR_TITULO)
+
+
+def _dibujar_barras(ax, labels, values, titulo, color="#3498DB"):
+    barras = ax.bar(labels, values, color=color, edgecolor="white", linewidth=0.5)
+    _ejes_limpios(ax, labelsize=8)
+    ax.tick_params(axis="x", rotation=30)
+    for barra, valor in zip(barras, values):
+        ax.text(barra.get_x() + barra.get_width() / 2, barra.get_height() + max(values) * 0.01,
+                f"{valor:,.0f}", ha="center", va="bottom", fontsize=7, color="#2C3E50")
+    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color=COLOR_TITULO)
+
+
+def _dibujar_torta(ax, labels, values, titulo):
+    _torta(ax, labels, values, COLORES[:8])
+    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color=COLOR_TITULO)
+
+
+def _dibujar_linea(ax, labels, values, titulo, color="#3498DB"):
+    xs = list(range(len(labels)))
+    ax.plot(xs, values, color=color, linewidth=2, marker="o", markersize=5, markerfacecolor="white", markeredgewidth=2)
+    ax.fill_between(xs, values, alpha=0.1, color=color)
+    _ejes_limpios(ax, labelsize=8)
+    ax.set_xticks(xs)
+    ax.set_xticklabels(labels, rotation=30)
+    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color=COLOR_TITULO)
+
+
+# tipo → (función de dibujo, dpi)
+TIPOS = {
+    "histograma": (_dibujar_histograma, 130),
+    "categorico": (_dibujar_categorico, 130),
+    "barras": (_dibujar_barras, 150),
+    "torta": (_dibujar_torta, 150),
+    "linea": (_dibujar_linea, 150),
+}
+
+
+def dibujar(tipo, datos):
+    """(png, segundos) del gráfico `tipo` con `datos` (labels, values, titulo, ancho, alto, ...)."""
+    from io import BytesIO
+
+    from matplotlib.figure import Figure
+
+    inicio = time.perf_counter()
+    datos = dict(datos)
+    funcion, dpi = TIPOS[tipo]
+    fig = Figure(figsize=(datos.pop("ancho", 13), datos.pop("alto", 4)))
+    funcion(fig.subplots(), **datos)
+    fig.tight_layout()
+    buf = BytesIO()
+    fig.savefig(buf, format="png", dpi=dpi, bbox_inches="tight")
+    return buf.getvalue(), time.perf_counter() - inicio
+
+
+def _precalentar_proceso():
+    """Importa matplotlib y carga la cache de fuentes dibujando un gráfico mínimo."""
+    dibujar("categorico", {"labels": ["a"], "values": [1], "titulo": "", "ancho": 1, "alto": 1})
+
+
+# ── Pool de procesos ──────────────────────────────────────────────────────────
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _procesos():
+    from django.conf import settings
+
+    return getattr(settings, "GRAFICOS_PROCESOS", 0)
+
+
+def _obtener_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+            from concurrent.futures import ProcessPoolExecutor
+
+            _pool = ProcessPoolExecutor(
+                max_workers=_procesos(), mp_context=multiprocessing.get_context("spawn"),
+                initializer=_precalentar_proceso,
+            )
+        return _pool
+
+
+def _timeout():
+    from django.conf import settings
+
+    return getattr(settings, "GRAFICOS_TIMEOUT_SEGUNDOS", 60)
+
+
+def cerrar_pool(esperar=True):
+    """
+    Termina los procesos del pool (se recrea en el próximo uso). Con
+    esperar=False no espera las tareas en curso: mata los procesos, porque
+    shutdown(wait=False) dejaría vivo a uno colgado.
+    """
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is None:
+        return
+    if not esperar:
+        if hasattr(pool, "terminate_workers"):  # Python 3.14+
+            pool.terminate_workers()
+            return
+        for proceso in list((pool._processes or {}).values()):
+            proceso.terminate()
+    pool.shutdown(wait=esperar, cancel_futures=True)
+
+
+def precalentar():
+    """Precalienta matplotlib en este proceso y levanta los procesos del pool."""
+    try:
+        _precalentar_proceso()
+        if _procesos() > 0:
+            pool = _obtener_pool()
+            for _ in range(_procesos()):
+                pool.submit(_precalentar_proceso)
+    except Exception:
+        logger.exception("No se pudo precalentar matplotlib")
+
+
+# ── Cache y métricas ──────────────────────────────────────────────────────────
+
+_metricas = {}
+_metricas_lock = threading.Lock()
+
+
+def clave(tipo, datos) -> str:
+    contenido = json.dumps([VERSION, tipo, datos], sort_keys=True, default=str)
+    return f"{PREFIJO_CACHE}:{hashlib.sha256(contenido.encode()).hexdigest()}"
+
+
+def _registrar(resultados):
+    from auditoria.middleware import get_current_request
+
+    with _metricas_lock:
+        for r in resultados:
+            m = _metricas.setdefault(r.tipo, {"dibujados": 0, "desde_cache": 0, "ms_total": 0.0, "ms_max": 0.0})
+            if r.en_cache:
+                m["desde_cache"] += 1
+            else:
+                ms = r.segundos * 1000
+                m["dibujados"] += 1
+                m["ms_total"] = round(m["ms_total"] + ms, 1)
+                m["ms_max"] = round(max(m["ms_max"], ms), 1)
+    request = get_current_request()
+    if request is not None:
+        request.__dict__.setdefault(ATRIBUTO_TIEMPOS, []).extend(resultados)
+
+
+def metricas() -> dict:
+    with _metricas_lock:
+        return {tipo: dict(m) for tipo, m in _metricas.items()}
+
+
+def server_timing(request) -> str:
+    """Valor del header Server-Timing con los gráficos dibujados en `request`."""
+    partes = []
+    for i, r in enumerate(getattr(request, ATRIBUTO_TIEMPOS, ()), 1):
+        desc = f"{r.tipo} (cache)" if r.en_cache else r.tipo
+        partes.append(f'grafico-{i};dur={r.segundos * 1000:.1f};desc="{desc}"')
+    return ", ".join(partes)
+
+
+# ── API ───────────────────────────────────────────────────────────────────────
+
+def renderizar(especificaciones) -> list:
+    """
+    PNG de cada (tipo, datos) de `especificaciones`, en el mismo orden, como
+    Resultado(png, tipo, clave, segundos, en_cache).
+    """
+    from django.conf import settings
+    from django.core.cache import cache
+
+    especificaciones = [(tipo, datos) for tipo, datos in especificaciones]
+    claves = [clave(tipo, datos) for tipo, datos in especificaciones]
+    try:
+        cacheados = cache.get_many(set(claves))
+    except Exception:
+        logger.exception("Cache de gráficos no disponible")
+        cacheados = {}
+
+    resultados = [
+        Resultado(cacheados[k], tipo, k, 0.0, True) if k in cacheados else None
+        for (tipo, _datos), k in zip(especificaciones, claves)
+    ]
+    faltantes = {}
+    for i, k in enumerate(claves):
+        if resultados[i] is None:
+            faltantes.setdefault(k, []).append(i)
+
+    dibujados = _dibujar_todos({k: especificaciones[indices[0]] for k, indices in faltantes.items()})
+    for k, (png, segundos) in dibujados.items():
+        for i in faltantes[k]:
+            resultados[i] = Resultado(png, especificaciones[i][0], k, segundos, False)
+
+    if dibujados:
+        try:
+            cache.set_many(
+                {k: png for k, (png, _s) in dibujados.items()},
+                getattr(settings, "GRAFICOS_CACHE_SEGUNDOS", 600),
+            )
+        except Exception:
+            logger.exception("No se pudieron cachear %d gráficos", len(dibujados))
+    _registrar(resultados)
+    return resultados
+
+
+def _dibujar_todos(pendientes) -> dict:
+    """{clave: (tipo, datos)} → {clave: (png, segundos)}, en paralelo si conviene."""
+    if len(pendientes) > 1 and _procesos() > 0:
+        from concurrent.futures import TimeoutError
+        from concurrent.futures.process import BrokenProcessPool
+
+        try:
+            pool = _obtener_pool()
+            futuros = {k: pool.submit(dibujar, tipo, datos) for k, (tipo, datos) in pendientes.items()}
+            limite = time.monotonic() + _timeout()
+            return {k: f.result(timeout=max(0.0, limite - time.monotonic())) for k, f in futuros.items()}
+        except BrokenProcessPool:
+            logger.exception("Pool de gráficos roto; se dibujan en el hilo del request")
+            cerrar_pool()
+        except TimeoutError:
+            # Un proceso colgado dejaría el pool ocupado: se matan sus procesos sin esperarlos
+            logger.error("Gráficos sin terminar tras %s s; se descarta el pool", _timeout())
+            cerrar_pool(esperar=False)
+            raise
+    return {k: dibujar(tipo, datos) for k, (tipo, datos) in pendientes.items()}
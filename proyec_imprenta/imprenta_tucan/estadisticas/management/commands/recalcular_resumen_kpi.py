@@ -0,0 +1,44 @@
+"""
+Management command: recalcular_resumen_kpi
+
+Reconstruye los resúmenes de KPI del tablero de estadísticas
+(estadisticas/resumen.py) desde Pedido, Factura, LineaPedido y OrdenCompra.
+Sin argumentos carga toda la historia (hace falta una vez después de migrar,
+si no corre la compactación, y tras update() masivos o SQL sobre registros
+más viejos que KPI_RESUMEN_DIAS_COMPACTAR días). --compactar es lo que hace
+la tarea nocturna; sin celery beat se programa desde cron.
+
+Uso:
+    python manage.py recalcular_resumen_kpi
+    python manage.py recalcular_resumen_kpi --desde 2025-01-01 --hasta 2025-03-31
+    python manage.py recalcular_resumen_kpi --compactar
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from estadisticas.resumen import compactar, recalcular
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye los resúmenes diarios y mensuales de KPI del tablero de estadísticas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--desde', help='Primer día a recalcular (YYYY-MM-DD); default: toda la historia')
+        parser.add_argument('--hasta', help='Último día a recalcular (YYYY-MM-DD)')
+        parser.add_argument(
+            '--compactar', action='store_true',
+            help='Sólo los últimos KPI_RESUMEN_DIAS_COMPACTAR días (lo que hace la tarea nocturna)',
+        )
+
+    def handle(self, *args, **options):
+        if options['compactar']:
+            escritos = compactar()
+        else:
+            fechas = {}
+            for clave in ('desde', 'hasta'):
+                valor = options[clave]
+                fechas[clave] = parse_date(valor) if valor else None
+                if valor and fechas[clave] is None:
+                    raise CommandError(f'Fecha inválida para --{clave}: {valor}')
+            escritos = recalcular(**fechas)
+        self.stdout.write(self.style.SUCCESS(f'Resúmenes de KPI recalculados: {escritos} buckets diarios.'))
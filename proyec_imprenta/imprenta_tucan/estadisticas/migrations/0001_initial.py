@@ -0,0 +1,32 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumenKPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularidad', models.CharField(choices=[('dia', 'Día'), ('mes', 'Mes')], max_length=3)),
+                ('metrica', models.CharField(max_length=30)),
+                ('fecha', models.DateField(help_text='Día del bucket, o primer día del mes')),
+                ('dimension', models.CharField(blank=True, default='', max_length=100)),
+                ('cantidad', models.BigIntegerField(default=0)),
+                ('monto', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('actualizado_en', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Resumen de KPI',
+                'verbose_name_plural': 'Resúmenes de KPI',
+                'constraints': [models.UniqueConstraint(fields=('granularidad', 'metrica', 'fecha', 'dimension'), name='resumenkpi_bucket_unico')],
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.7 on 2026-10-18 18:30
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+    """
+    Sin operaciones: la historia ya no se carga durante migrate. La carga
+    compactar() la primera vez que corre (estadisticas/models.EstadoResumenKPI)
+    o el comando recalcular_resumen_kpi.
+    """
+
+    dependencies = [
+        ('estadisticas', '0001_initial'),
+    ]
+
+    operations = []
@@ -0,0 +1,20 @@
+# Generated by Django 5.2.7 on 2026-10-18 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('estadisticas', '0002_poblar_resumenkpi'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EstadoResumenKPI',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('historia_cargada', models.DateTimeField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,65 @@
+from django.db import models
+
+
+class ResumenKPI(models.Model):
+    """Bucket pre-agregado de un indicador del tablero de estadísticas.
+
+    Una fila por (granularidad, métrica, fecha, dimensión). Se mantiene sólo a
+    través de estadisticas/resumen.py; los endpoints suman buckets en lugar de
+    recorrer Pedido, Factura, LineaPedido y OrdenCompra.
+    """
+
+    GRANULARIDAD_DIA = "dia"
+    GRANULARIDAD_MES = "mes"
+    GRANULARIDAD_CHOICES = [
+        (GRANULARIDAD_DIA, "Día"),
+        (GRANULARIDAD_MES, "Mes"),
+    ]
+
+    # dimensión: nombre del estado del pedido; monto = monto_total
+    METRICA_PEDIDOS = "pedidos"
+    # dimensión: id del cliente; monto = monto_total de sus pedidos
+    METRICA_CLIENTES = "clientes"
+    # dimensión: id del producto; cantidad = unidades, monto = suma de precio_unitario de las líneas
+    METRICA_PRODUCTOS = "productos"
+    # dimensión: estado de cobro (Pagada, Pago parcial, Pendiente, Anulada); monto = monto_total
+    METRICA_FACTURAS = "facturas"
+    # sin dimensión: pagos de facturas no anuladas, por fecha de emisión de la factura
+    METRICA_COBROS = "cobros"
+    # dimensión: nombre del estado de la orden de compra; monto = monto_total
+    METRICA_COMPRAS = "compras"
+    # dimensión: id del proveedor de la orden de compra
+    METRICA_COMPRAS_PROVEEDOR = "compras_proveedor"
+
+    granularidad = models.CharField(max_length=3, choices=GRANULARIDAD_CHOICES)
+    metrica = models.CharField(max_length=30)
+    fecha = models.DateField(help_text="Día del bucket, o primer día del mes")
+    dimension = models.CharField(max_length=100, blank=True, default="")
+    cantidad = models.BigIntegerField(default=0)
+    monto = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    actualizado_en = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Resumen de KPI"
+        verbose_name_plural = "Resúmenes de KPI"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["granularidad", "metrica", "fecha", "dimension"], name="resumenkpi_bucket_unico",
+            ),
+        ]
+
+    def __str__(self):  # pragma: no cover - simple
+        return f"{self.metrica}/{self.granularidad} {self.fecha} {self.dimension}: {self.cantidad} ({self.monto})"
+
+
+class EstadoResumenKPI(models.Model):
+    """Fila única (pk=1) con la última reconstrucción completa de ResumenKPI.
+
+    Sin fila, compactar() reconstruye toda la historia aunque las señales ya
+    hayan escrito los buckets de algunos días.
+    """
+
+    historia_cargada = models.DateTimeField()
+
+    def __str__(self):  # pragma: no cover - simple
+        return f"Resúmenes de KPI cargados el {self.historia_cargada}"
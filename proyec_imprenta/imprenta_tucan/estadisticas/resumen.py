@@ -0,0 +1,394 @@
+"""
+Resúmenes pre-agregados (ResumenKPI) del tablero de estadísticas.
+
+Mantenimiento:
+
+    - Las señales de estadisticas/signals.py llaman a marcar_*() al guardar o
+      borrar Pedido, LineaPedido, Factura, PagoFactura y OrdenCompra. Los días
+      afectados se acumulan por conexión y se recalculan una sola vez en
+      transaction.on_commit (settings.KPI_RESUMEN_EN_LINEA); fuera de un
+      atomic() (autocommit) se recalculan en el momento. Un cambio de fecha
+      marca el día nuevo y el anterior; renombrar un EstadoPedido o
+      EstadoCompra marca todos los días con buckets de ese estado.
+    - recalcular() reconstruye los buckets diarios de unos días (o de un rango)
+      desde las tablas de origen, y los mensuales que los contienen a partir de
+      los diarios. Recalcular un día cuesta lo que las filas de ese día. Los
+      buckets se escriben con upsert y sólo se borran las dimensiones que
+      desaparecieron, así que dos commits concurrentes del mismo mes no chocan.
+    - compactar() (tarea compactar_resumen_kpi, 3:30 con celery beat; sin
+      beat, `manage.py recalcular_resumen_kpi --compactar` desde cron)
+      recalcula los últimos KPI_RESUMEN_DIAS_COMPACTAR días: cubre cambios
+      recientes que no pasan por señales, como update() masivos. Si todavía
+      no hubo una reconstrucción completa (EstadoResumenKPI) carga toda la
+      historia. Lo que no pasa por señales y es más viejo que esa ventana
+      (update() o SQL sobre registros antiguos) se repara con
+      `recalcular_resumen_kpi --desde/--hasta`, o sin argumentos para todo.
+
+Lectura: totales(), por_dimension() y por_mes() suman buckets de un rango
+desde/hasta usando los mensuales para los meses completos y los diarios sólo
+para los bordes, así que el costo no depende de la historia acumulada.
+"""
+import calendar
+import logging
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, OperationalError, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+ESTADOS_COBRO = ("Pagada", "Pago parcial", "Pendiente", "Anulada")
+
+
+# ── Mantenimiento ──────────────────────────────────────────────────────────────
+
+class _Pendientes:
+    """Días (y pedidos/facturas cuyos días resolver) a recalcular en el próximo commit."""
+
+    def __init__(self):
+        self.fechas = set()
+        self.pedidos = set()
+        self.facturas = set()
+        self.cerrado = False
+        # Lista run_on_commit de la conexión en la que quedó registrado flush
+        self.callbacks = None
+
+    def flush(self):
+        self.cerrado = True
+        fechas, pedidos, facturas = self.fechas, self.pedidos, self.facturas
+        self.fechas, self.pedidos, self.facturas = set(), set(), set()
+        try:
+            from pedidos.models import Factura, Pedido
+            from django.db.models.functions import TruncDate
+
+            if pedidos:
+                fechas.update(Pedido.objects.filter(pk__in=pedidos).values_list("fecha_pedido", flat=True))
+            if facturas:
+                fechas.update(
+                    Factura.objects.filter(pk__in=facturas)
+                    .annotate(dia=TruncDate("fecha_emision")).values_list("dia", flat=True)
+                )
+            fechas.discard(None)
+            if fechas:
+                _recalcular_con_reintentos(fechas)
+        except Exception:
+            # Los resúmenes nunca deben romper la operación que los disparó;
+            # la compactación nocturna los repara.
+            logger.exception("No se pudieron actualizar los resúmenes de KPI de %d días", len(fechas))
+
+
+def _recalcular_con_reintentos(fechas, intentos=3) -> None:
+    """recalcular() de `fechas`, reintentando si un commit concurrente del mismo mes choca (clave o deadlock)."""
+    for intento in range(1, intentos + 1):
+        try:
+            recalcular(fechas=fechas)
+            return
+        except (IntegrityError, OperationalError):
+            if intento == intentos:
+                raise
+            logger.warning("Conflicto al actualizar resúmenes de KPI; reintento %d de %d", intento, intentos - 1)
+
+
+def en_linea() -> bool:
+    return getattr(settings, "KPI_RESUMEN_EN_LINEA", True)
+
+
+def _pendientes(using=DEFAULT_DB_ALIAS) -> _Pendientes:
+    conn = connections[using]
+    pendientes = conn.__dict__.get("_kpi_pendientes")
+    # Ya ejecutado, o la transacción se revirtió y su callback no está: se arranca
+    # otro lote. Django reemplaza conn.run_on_commit en cada commit y rollback
+    # (también de savepoint): mientras sea la misma lista el callback sigue ahí, y
+    # sólo cuando cambió se recorre una vez para ver si sobrevivió.
+    if pendientes is not None and not pendientes.cerrado and pendientes.callbacks is not conn.run_on_commit:
+        if any(item[1] == pendientes.flush for item in conn.run_on_commit):
+            pendientes.callbacks = conn.run_on_commit
+        else:
+            pendientes = None
+    if pendientes is None or pendientes.cerrado:
+        pendientes = _Pendientes()
+        conn.__dict__["_kpi_pendientes"] = pendientes
+        transaction.on_commit(pendientes.flush, using=using)
+        pendientes.callbacks = conn.run_on_commit
+    return pendientes
+
+
+def _marcar(conjunto, valores, using) -> None:
+    """Agrega `valores` al conjunto pendiente; en autocommit recalcula en el momento."""
+    if not connections[using].in_atomic_block:
+        # Fuera de atomic() on_commit ejecutaría el flush antes de agregar los valores
+        pendientes = _Pendientes()
+        getattr(pendientes, conjunto).update(valores)
+        pendientes.flush()
+        return
+    getattr(_pendientes(using), conjunto).update(valores)
+
+
+def marcar_fecha(fecha, using=DEFAULT_DB_ALIAS) -> None:
+    if fecha is not None:
+        _marcar("fechas", {fecha}, using)
+
+
+def marcar_pedido(pedido_id, using=DEFAULT_DB_ALIAS) -> None:
+    _marcar("pedidos", {pedido_id}, using)
+
+
+def marcar_factura(factura_id, using=DEFAULT_DB_ALIAS) -> None:
+    _marcar("facturas", {factura_id}, using)
+
+
+def marcar_dimension(metrica, dimension, using=DEFAULT_DB_ALIAS) -> None:
+    """Marca los días con buckets diarios de `dimension` en `metrica` (ej. un estado renombrado)."""
+    from .models import ResumenKPI
+
+    fechas = set(
+        ResumenKPI.objects.using(using)
+        .filter(granularidad=ResumenKPI.GRANULARIDAD_DIA, metrica=metrica, dimension=dimension)
+        .values_list("fecha", flat=True)
+    )
+    if fechas:
+        _marcar("fechas", fechas, using)
+
+
+def _inicio_mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _mes_siguiente(d: date) -> date:
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _filtro_dias(campo, fechas, desde, hasta) -> dict:
+    if fechas is not None:
+        return {f"{campo}__in": fechas}
+    filtro = {}
+    if desde:
+        filtro[f"{campo}__gte"] = desde
+    if hasta:
+        filtro[f"{campo}__lte"] = hasta
+    return filtro
+
+
+def _buckets_diarios(fechas=None, desde=None, hasta=None) -> list:
+    """ResumenKPI diarios (sin guardar) calculados desde las tablas de origen."""
+    from compras.models import OrdenCompra
+    from django.db.models import Count, F, Sum
+    from django.db.models.functions import TruncDate
+    from pedidos.models import Factura, LineaPedido, Pedido
+
+    from .models import ResumenKPI
+
+    dia = ResumenKPI.GRANULARIDAD_DIA
+    filas = []
+
+    def agrupar(metrica, qs, campo_fecha, campo_dimension, cantidad, monto):
+        for fecha, dimension, c, m in (
+            qs.order_by().values(campo_fecha, campo_dimension)
+            .annotate(c=cantidad, m=monto).values_list(campo_fecha, campo_dimension, "c", "m")
+        ):
+            filas.append(ResumenKPI(
+                granularidad=dia, metrica=metrica, fecha=fecha,
+                dimension="" if dimension is None else str(dimension), cantidad=c or 0, monto=m or 0,
+            ))
+
+    pedidos = Pedido.objects.filter(**_filtro_dias("fecha_pedido", fechas, desde, hasta))
+    agrupar(ResumenKPI.METRICA_PEDIDOS, pedidos, "fecha_pedido", "estado__nombre", Count("id"), Sum("monto_total"))
+    agrupar(ResumenKPI.METRICA_CLIENTES, pedidos, "fecha_pedido", "cliente_id", Count("id"), Sum("monto_total"))
+
+    lineas = LineaPedido.objects.filter(**_filtro_dias("pedido__fecha_pedido", fechas, desde, hasta))
+    agrupar(
+        ResumenKPI.METRICA_PRODUCTOS, lineas, "pedido__fecha_pedido", "producto_id",
+        Sum("cantidad"), Sum("precio_unitario"),
+    )
+
+    ordenes = OrdenCompra.objects.filter(**_filtro_dias("fecha_creacion", fechas, desde, hasta))
+    agrupar(ResumenKPI.METRICA_COMPRAS, ordenes, "fecha_creacion", "estado__nombre", Count("id"), Sum("monto_total"))
+    agrupar(
+        ResumenKPI.METRICA_COMPRAS_PROVEEDOR, ordenes, "fecha_creacion", "proveedor_id",
+        Count("id"), Sum("monto_total"),
+    )
+
+    # Estado de cobro anotado en la base (Factura.objects.with_cobro()), agrupado por día y estado
+    cobros = {}
+    for fecha, estado, c, m, pagado in (
+        Factura.objects.filter(**_filtro_dias("fecha_emision__date", fechas, desde, hasta))
+        .with_cobro().order_by().values(dia=TruncDate("fecha_emision"), estado=F("cobro_estado"))
+        .annotate(c=Count("pk"), m=Sum("monto_total"), p=Sum("cobro_pagado"))
+        .values_list("dia", "estado", "c", "m", "p")
+    ):
+        filas.append(ResumenKPI(
+            granularidad=dia, metrica=ResumenKPI.METRICA_FACTURAS, fecha=fecha,
+            dimension=Factura.ESTADO_COBRO_DISPLAY[estado], cantidad=c, monto=m or 0,
+        ))
+        if estado != "anulada":
+            cobro = cobros.setdefault(fecha, [0, Decimal("0")])
+            cobro[0] += c
+            cobro[1] += pagado or 0
+    for fecha, (c, m) in cobros.items():
+        filas.append(ResumenKPI(
+            granularidad=dia, metrica=ResumenKPI.METRICA_COBROS, fecha=fecha, cantidad=c, monto=m,
+        ))
+    return filas
+
+
+_CLAVE_BUCKET = ("granularidad", "metrica", "fecha", "dimension")
+
+
+def _reemplazar(alcance, filas) -> None:
+    """
+    Deja en `alcance` (queryset de ResumenKPI) exactamente los buckets de
+    `filas`: upsert sobre resumenkpi_bucket_unico y borrado sólo de las claves
+    que ya no existen. Sin DELETE + INSERT de las filas vigentes, dos commits
+    concurrentes del mismo mes no chocan contra la restricción única.
+    """
+    from .models import ResumenKPI
+
+    ResumenKPI.objects.bulk_create(
+        filas, batch_size=1000, update_conflicts=True, unique_fields=_CLAVE_BUCKET,
+        update_fields=["cantidad", "monto", "actualizado_en"],
+    )
+    vigentes = {tuple(getattr(f, campo) for campo in _CLAVE_BUCKET) for f in filas}
+    obsoletos = [
+        pk for pk, *clave in alcance.order_by().values_list("pk", *_CLAVE_BUCKET)
+        if tuple(clave) not in vigentes
+    ]
+    for i in range(0, len(obsoletos), 1000):
+        ResumenKPI.objects.filter(pk__in=obsoletos[i:i + 1000]).delete()
+
+
+def recalcular(fechas=None, desde=None, hasta=None) -> int:
+    """
+    Reconstruye los buckets diarios de `fechas` (iterable de date) o del rango
+    desde/hasta (sin límites: toda la historia) y los mensuales que los
+    contienen. Idempotente. Retorna la cantidad de buckets diarios escritos.
+    Sin argumentos registra la reconstrucción completa en EstadoResumenKPI.
+    """
+    from django.db.models import Q, Sum
+    from django.db.models.functions import TruncMonth
+    from django.utils import timezone
+
+    from .models import EstadoResumenKPI, ResumenKPI
+
+    if fechas is not None:
+        fechas = sorted(set(fechas))
+        if not fechas:
+            return 0
+
+    with transaction.atomic():
+        filas = _buckets_diarios(fechas, desde, hasta)
+        diarios = ResumenKPI.objects.filter(granularidad=ResumenKPI.GRANULARIDAD_DIA)
+        _reemplazar(diarios.filter(**_filtro_dias("fecha", fechas, desde, hasta)), filas)
+
+        # Meses afectados, rehechos a partir de sus buckets diarios
+        if fechas is not None:
+            meses = Q()
+            for mes in {_inicio_mes(f) for f in fechas}:
+                meses |= Q(fecha__gte=mes, fecha__lt=_mes_siguiente(mes))
+        else:
+            meses = Q(**_filtro_dias(
+                "fecha", None, desde and _inicio_mes(desde), hasta and (_mes_siguiente(hasta) - timedelta(days=1)),
+            ))
+        _reemplazar(
+            ResumenKPI.objects.filter(meses, granularidad=ResumenKPI.GRANULARIDAD_MES),
+            [
+                ResumenKPI(
+                    granularidad=ResumenKPI.GRANULARIDAD_MES, metrica=b["metrica"], fecha=b["mes"],
+                    dimension=b["dimension"], cantidad=b["c"], monto=b["m"],
+                )
+                for b in diarios.filter(meses).order_by()
+                .values("metrica", "dimension", mes=TruncMonth("fecha"))
+                .annotate(c=Sum("cantidad"), m=Sum("monto"))
+            ],
+        )
+        if fechas is None and desde is None and hasta is None:
+            EstadoResumenKPI.objects.update_or_create(pk=1, defaults={"historia_cargada": timezone.now()})
+    return len(filas)
+
+
+def compactar(dias=None) -> int:
+    """
+    Recalcula los últimos `dias` días (KPI_RESUMEN_DIAS_COMPACTAR), o toda la
+    historia si nunca se hizo una reconstrucción completa.
+    """
+    from django.utils import timezone
+
+    from .models import EstadoResumenKPI
+
+    if not EstadoResumenKPI.objects.filter(pk=1).exists():
+        logger.info("Resúmenes de KPI sin carga completa: se reconstruye toda la historia")
+        return recalcular()
+    dias = dias or getattr(settings, "KPI_RESUMEN_DIAS_COMPACTAR", 3)
+    hoy = timezone.localdate()
+    return recalcular(desde=hoy - timedelta(days=dias - 1), hasta=hoy)
+
+
+# ── Lectura ────────────────────────────────────────────────────────────────────
+
+def _filtro_rango(desde=None, hasta=None):
+    """
+    Q sobre ResumenKPI que cubre [desde, hasta] una sola vez: buckets
+    mensuales para los meses completos y diarios para los días restantes.
+    """
+    from django.db.models import Q
+
+    from .models import ResumenKPI
+
+    if desde and hasta and desde > hasta:
+        return Q(pk__in=[])
+    # Meses completos: [mes_desde, mes_hasta)
+    mes_desde = None if desde is None else (desde if desde.day == 1 else _mes_siguiente(desde))
+    if hasta is None:
+        mes_hasta = None
+    elif hasta.day == calendar.monthrange(hasta.year, hasta.month)[1]:
+        mes_hasta = _mes_siguiente(hasta)
+    else:
+        mes_hasta = _inicio_mes(hasta)
+
+    diarios = Q(granularidad=ResumenKPI.GRANULARIDAD_DIA, **_filtro_dias("fecha", None, desde, hasta))
+    if mes_desde and mes_hasta and mes_desde >= mes_hasta:
+        return diarios
+    completos = Q()
+    if mes_desde:
+        completos &= Q(fecha__gte=mes_desde)
+    if mes_hasta:
+        completos &= Q(fecha__lt=mes_hasta)
+    return (
+        Q(completos, granularidad=ResumenKPI.GRANULARIDAD_MES)
+        | (diarios & ~completos if completos else Q(pk__in=[]))
+    )
+
+
+def _buckets(metrica, desde, hasta):
+    from .models import ResumenKPI
+
+    return ResumenKPI.objects.filter(_filtro_rango(desde, hasta), metrica=metrica).order_by()
+
+
+def totales(metrica, desde=None, hasta=None) -> dict:
+    """{'cantidad', 'monto'} de `metrica` en el rango (extremos incluidos)."""
+    from django.db.models import Sum
+
+    r = _buckets(metrica, desde, hasta).aggregate(cantidad=Sum("cantidad"), monto=Sum("monto"))
+    return {"cantidad": r["cantidad"] or 0, "monto": r["monto"] or Decimal("0")}
+
+
+def por_dimension(metrica, desde=None, hasta=None) -> list:
+    """[{'dimension', 'cantidad', 'monto'}] de `metrica` en el rango."""
+    from django.db.models import Sum
+
+    return list(
+        _buckets(metrica, desde, hasta).values("dimension")
+        .annotate(cantidad=Sum("cantidad"), monto=Sum("monto")).order_by("dimension")
+    )
+
+
+def por_mes(metrica, desde=None, hasta=None) -> list:
+    """[{'mes', 'cantidad', 'monto'}] de `metrica` en el rango, por mes calendario."""
+    from django.db.models import Sum
+    from django.db.models.functions import TruncMonth
+
+    return list(
+        _buckets(metrica, desde, hasta).values(mes=TruncMonth("fecha"))
+        .annotate(cantidad=Sum("cantidad"), monto=Sum("monto")).order_by("mes")
+    )
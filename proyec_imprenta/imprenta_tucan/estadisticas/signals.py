@@ -0,0 +1,105 @@
+"""
+Marcan los días cuyos resúmenes de KPI (estadisticas/resumen.py) hay que
+recalcular al confirmar la transacción.
+
+Si se edita la fecha de un pedido, factura u orden de compra se marcan el día
+nuevo y el anterior: la fecha con que se cargó la instancia se guarda en
+post_init (o se lee en pre_save si estaba diferida). Renombrar un estado de
+pedido o de compra marca los días con buckets del nombre anterior.
+"""
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from compras.models import EstadoCompra, OrdenCompra
+from pedidos.models import EstadoPedido, Factura, LineaPedido, PagoFactura, Pedido
+
+from . import resumen
+from .models import ResumenKPI
+
+# Modelo → campo de fecha que define su bucket
+_CAMPO_FECHA = {Pedido: "fecha_pedido", Factura: "fecha_emision", OrdenCompra: "fecha_creacion"}
+
+# Estado → métrica cuya dimensión es su nombre
+_METRICA_ESTADO = {EstadoPedido: ResumenKPI.METRICA_PEDIDOS, EstadoCompra: ResumenKPI.METRICA_COMPRAS}
+
+
+def _dia(valor):
+    if valor is None or not hasattr(valor, "hour"):
+        return valor
+    return timezone.localdate(valor) if timezone.is_aware(valor) else valor.date()
+
+
+@receiver(post_init, sender=Pedido)
+@receiver(post_init, sender=Factura)
+@receiver(post_init, sender=OrdenCompra)
+def _fecha_cargada(sender, instance, **kwargs):
+    campo = _CAMPO_FECHA[sender]
+    if instance.pk is not None and campo in instance.__dict__:
+        instance._kpi_dia = _dia(instance.__dict__[campo])
+
+
+@receiver(pre_save, sender=Pedido)
+@receiver(pre_save, sender=Factura)
+@receiver(pre_save, sender=OrdenCompra)
+def _fecha_previa(sender, instance, using, **kwargs):
+    if not resumen.en_linea() or instance.pk is None or "_kpi_dia" in instance.__dict__:
+        return
+    # Fecha diferida (.only()/.defer()) o instancia armada a mano con pk existente
+    previa = sender._base_manager.using(using).filter(pk=instance.pk).values_list(_CAMPO_FECHA[sender], flat=True).first()
+    instance._kpi_dia = _dia(previa)
+
+
+@receiver(post_save, sender=Pedido)
+@receiver(post_delete, sender=Pedido)
+@receiver(post_save, sender=Factura)
+@receiver(post_delete, sender=Factura)
+@receiver(post_save, sender=OrdenCompra)
+@receiver(post_delete, sender=OrdenCompra)
+def resumen_por_fecha(sender, instance, using, **kwargs):
+    if not resumen.en_linea():
+        return
+    dia = _dia(getattr(instance, _CAMPO_FECHA[sender]))
+    previo = instance.__dict__.get("_kpi_dia")
+    instance._kpi_dia = dia
+    resumen.marcar_fecha(dia, using=using)
+    if previo is not None and previo != dia:
+        resumen.marcar_fecha(previo, using=using)
+
+
+@receiver(post_save, sender=LineaPedido)
+@receiver(post_delete, sender=LineaPedido)
+def resumen_linea_pedido(sender, instance, using, **kwargs):
+    if resumen.en_linea():
+        resumen.marcar_pedido(instance.pedido_id, using=using)
+
+
+@receiver(post_save, sender=PagoFactura)
+@receiver(post_delete, sender=PagoFactura)
+def resumen_pago_factura(sender, instance, using, **kwargs):
+    if resumen.en_linea():
+        resumen.marcar_factura(instance.factura_id, using=using)
+
+
+@receiver(post_init, sender=EstadoPedido)
+@receiver(post_init, sender=EstadoCompra)
+def _nombre_cargado(sender, instance, **kwargs):
+    if instance.pk is not None and "nombre" in instance.__dict__:
+        instance._kpi_nombre = instance.__dict__["nombre"]
+
+
+@receiver(pre_save, sender=EstadoPedido)
+@receiver(pre_save, sender=EstadoCompra)
+def _nombre_previo(sender, instance, using, **kwargs):
+    if not resumen.en_linea() or instance.pk is None or "_kpi_nombre" in instance.__dict__:
+        return
+    instance._kpi_nombre = sender._base_manager.using(using).filter(pk=instance.pk).values_list("nombre", flat=True).first()
+
+
+@receiver(post_save, sender=EstadoPedido)
+@receiver(post_save, sender=EstadoCompra)
+def resumen_estado_renombrado(sender, instance, using, **kwargs):
+    previo = instance.__dict__.get("_kpi_nombre")
+    instance._kpi_nombre = instance.nombre
+    if resumen.en_linea() and previo is not None and previo != instance.nombre:
+        resumen.marcar_dimension(_METRICA_ESTADO[sender], previo, using=using)
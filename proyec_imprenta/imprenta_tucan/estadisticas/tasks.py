@@ -0,0 +1,12 @@
+from celery import shared_task
+
+
+@shared_task
+def compactar_resumen_kpi(dias=None):
+    """
+    Recalcula los resúmenes de KPI de los últimos días (estadisticas/resumen.py):
+    repara lo que no pasó por señales. Sin carga completa previa reconstruye todo.
+    """
+    from .resumen import compactar
+    escritos = compactar(dias)
+    return f"resúmenes de KPI: {escritos} buckets diarios recalculados"
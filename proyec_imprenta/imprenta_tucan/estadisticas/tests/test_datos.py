@@ -0,0 +1,82 @@
+"""
+Tests de la capa de datos de los informes (estadisticas/datos.py).
+
+Cubre:
+  1. Dentro de un request, cada (informe, desde, hasta) se calcula una vez.
+  2. Las APIs api_estadistica_* devuelven exactamente lo que arma datos.
+  3. El informe PDF de facturas se genera desde los mismos datos.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from auditoria.middleware import _current_request
+from clientes.models import Cliente
+from estadisticas import datos, graficos
+from pedidos.models import EstadoPedido, Factura, PagoFactura, Pedido
+from usuarios.models import Usuario
+
+
+@override_settings(PEDIDOS_EFECTOS_MODO="sincrono")
+class DatosInformesTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(
+            nombre="Test", apellido="Datos", email="d@test.com", telefono="1", cuit="20-55555555-5",
+        )
+        estado = EstadoPedido.objects.create(nombre="pendiente")
+        with self.captureOnCommitCallbacks(execute=True):
+            for i, monto in enumerate(("100.00", "250.00", "40.00")):
+                pedido = Pedido.objects.create(
+                    cliente=cliente, fecha_entrega=date.today() + timedelta(days=5),
+                    monto_total=Decimal(monto), estado=estado,
+                )
+                factura = Factura.objects.create(pedido=pedido, numero=f"0001-0000000{i}", monto_total=Decimal(monto))
+            PagoFactura.objects.create(factura=factura, monto=Decimal("15.00"))
+
+    def _en_request(self):
+        token = _current_request.set(RequestFactory().get("/"))
+        self.addCleanup(_current_request.reset, token)
+
+    def test_memoriza_por_informe_y_rango(self):
+        self._en_request()
+        primero = datos.pedidos()
+        with self.assertNumQueries(0):
+            self.assertIs(datos.pedidos(), primero)
+            # pedidos() ya consultó los estados para su gráfico
+            datos.pedidos_por_estado()
+        with CaptureQueriesContext(connection) as queries:
+            datos.pedidos(date.today(), None)
+        self.assertGreater(len(queries), 0)
+
+    def test_sin_request_no_memoriza(self):
+        primero = datos.facturas()
+        segundo = datos.facturas()
+        self.assertIsNot(segundo, primero)
+        self.assertEqual(segundo, primero)
+
+    def test_api_devuelve_los_datos(self):
+        for nombre in ("pedidos", "facturas", "clientes", "presupuestos"):
+            with self.subTest(nombre=nombre):
+                resp = self.client.get(reverse(f"estadisticas:api_desc_{nombre}"))
+                esperado = json.loads(json.dumps(getattr(datos, nombre)()))
+                self.assertEqual(resp.json(), esperado)
+
+        resumen = datos.facturas()["resumen"]
+        self.assertEqual((resumen["total"], resumen["anuladas"]), (3, 0))
+        self.assertEqual((resumen["total_facturado"], resumen["total_cobrado"]), (390.0, 15.0))
+
+    @override_settings(GRAFICOS_PROCESOS=0)
+    def test_informe_pdf_facturas(self):
+        self.addCleanup(graficos.cerrar_pool)
+        user = Usuario.objects.create_user(
+            email="informes@test.com", password="testpass", nombre="Test", apellido="Informes", telefono="1",
+        )
+        self.client.force_login(user)
+        resp = self.client.get(reverse("estadisticas:informe_pdf_facturas"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp["Content-Type"], "application/pdf")
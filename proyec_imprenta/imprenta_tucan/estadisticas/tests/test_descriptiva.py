@@ -0,0 +1,92 @@
+"""
+Tests del cálculo de estadística descriptiva (estadisticas/descriptiva.py).
+
+Cubre:
+  1. calcular(): valores contra el módulo statistics, moda con empates e
+     histograma sin contar dos veces el máximo.
+  2. estadisticas_columna(): el camino en SQL da lo mismo que traer la
+     columna, con una cantidad de queries fija.
+  3. El endpoint de insumos conserva las claves de siempre.
+"""
+import random
+import statistics
+from decimal import Decimal
+
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from estadisticas.descriptiva import calcular, estadisticas_columna
+from insumos.models import Insumo
+
+CLAVES = [
+    "n", "media", "mediana", "moda", "desv_std", "varianza", "rango", "minimo", "maximo",
+    "q1", "q2", "q3", "p10", "p90", "iqr", "histograma",
+]
+
+
+class CalcularTests(SimpleTestCase):
+    def test_coincide_con_statistics(self):
+        rnd = random.Random(7)
+        valores = [round(rnd.uniform(0, 5000), 2) for _ in range(501)]
+        r = calcular(valores)
+        self.assertEqual(list(r), CLAVES)
+        self.assertEqual(r["n"], 501)
+        self.assertAlmostEqual(r["media"], round(statistics.fmean(valores), 2), delta=0.011)
+        self.assertEqual(r["mediana"], round(statistics.median(valores), 2))
+        self.assertAlmostEqual(r["desv_std"], round(statistics.stdev(valores), 2), delta=0.011)
+        self.assertAlmostEqual(r["varianza"], round(statistics.variance(valores), 2), delta=0.011)
+        q1, q2, q3 = statistics.quantiles(valores, n=4, method="inclusive")
+        self.assertEqual((r["q1"], r["q2"], r["q3"]), (round(q1, 2), round(q2, 2), round(q3, 2)))
+        self.assertEqual(r["minimo"], min(valores))
+        self.assertEqual(r["maximo"], max(valores))
+        self.assertEqual(len(r["histograma"]), 10)
+        self.assertEqual(sum(b["count"] for b in r["histograma"]), 501)
+
+    def test_moda_primera_aparicion(self):
+        self.assertEqual(calcular([3, 1, 1, 3, 2])["moda"], 3)
+        self.assertEqual(calcular([5, 2, 2, 9])["moda"], 2)
+
+    def test_casos_borde(self):
+        self.assertIsNone(calcular([]))
+        r = calcular([4.5])
+        self.assertEqual((r["n"], r["desv_std"], r["varianza"], r["iqr"]), (1, 0, 0, 0))
+        self.assertEqual(r["histograma"], [{"label": "4.5", "count": 1}])
+        r = calcular([0, 10])
+        self.assertEqual(r["histograma"], [{"label": "0.0-5.0", "count": 1}, {"label": "5.0-10.0", "count": 1}])
+
+
+class EstadisticasColumnaTests(TestCase):
+    def setUp(self):
+        rnd = random.Random(11)
+        Insumo.objects.bulk_create([
+            Insumo(
+                nombre=f"Insumo {i}", codigo=f"ES-{i}", stock=rnd.randint(0, 300),
+                precio_unitario=Decimal(rnd.randint(0, 90000)) / 100, activo=True,
+            )
+            for i in range(400)
+        ])
+
+    def test_sql_igual_a_memoria(self):
+        qs = Insumo.objects.filter(activo=True)
+        for campo, positivos in (("stock", False), ("precio_unitario", True)):
+            memoria = estadisticas_columna(qs, campo, solo_positivos=positivos)
+            with CaptureQueriesContext(connection) as queries:
+                sql = estadisticas_columna(qs, campo, solo_positivos=positivos, umbral_sql=0)
+            self.assertEqual(len(queries), 4)
+            self.assertEqual(list(sql), CLAVES)
+            self.assertEqual(sql["histograma"], memoria["histograma"])
+            for clave in CLAVES[:-1]:
+                self.assertAlmostEqual(sql[clave], memoria[clave], delta=0.011, msg=clave)
+
+    def test_sin_valores(self):
+        self.assertIsNone(estadisticas_columna(Insumo.objects.none(), "stock"))
+        self.assertIsNone(estadisticas_columna(Insumo.objects.none(), "stock", umbral_sql=0))
+
+    def test_endpoint_insumos(self):
+        resp = self.client.get(reverse("estadisticas:api_desc_insumos"))
+        self.assertEqual(resp.status_code, 200)
+        variables = resp.json()["variables"]
+        self.assertEqual(list(variables["stock"]["stats"]), CLAVES)
+        self.assertEqual(variables["stock"]["stats"]["n"], 400)
@@ -0,0 +1,124 @@
+"""
+Tests del dibujo de gráficos de los informes (estadisticas/graficos.py).
+
+Cubre:
+  1. Todos los tipos producen PNG con la API de Figure.
+  2. Cache por hash de tipo y datos: el segundo pedido no vuelve a dibujar.
+  3. El pool de procesos devuelve lo mismo que el dibujo en el hilo; sólo un
+     pool roto cae al hilo, los errores de un gráfico y el timeout se propagan.
+     Descartar el pool sin esperar mata sus procesos, aunque estén colgados.
+  4. Los tiempos por gráfico llegan al header Server-Timing del PDF.
+"""
+import time
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from estadisticas import graficos
+from usuarios.models import Usuario
+
+PNG = b"\x89PNG"
+
+
+def _datos(titulo="Prueba", **extra):
+    return dict({"labels": ["a", "b", "c"], "values": [3, 1, 2], "titulo": titulo, "ancho": 3, "alto": 2}, **extra)
+
+
+@override_settings(GRAFICOS_PROCESOS=0)
+class GraficosTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_todos_los_tipos(self):
+        especificaciones = [(tipo, _datos()) for tipo in graficos.TIPOS]
+        especificaciones += [("categorico", _datos(tipo=t)) for t in ("barh", "line", "pie", "doughnut", "scatter")]
+        for resultado in graficos.renderizar(especificaciones):
+            self.assertTrue(resultado.png.startswith(PNG), resultado.tipo)
+            self.assertFalse(resultado.en_cache)
+
+    def test_cache_por_datos_y_tipo(self):
+        primero, = graficos.renderizar([("histograma", _datos())])
+        segundo, otro_tipo, otros_datos = graficos.renderizar([
+            ("histograma", _datos()), ("barras", _datos()), ("histograma", _datos("Otro")),
+        ])
+        self.assertTrue(segundo.en_cache)
+        self.assertEqual((segundo.png, segundo.clave, segundo.segundos), (primero.png, primero.clave, 0.0))
+        self.assertFalse(otro_tipo.en_cache)
+        self.assertFalse(otros_datos.en_cache)
+        self.assertEqual(len({primero.clave, otro_tipo.clave, otros_datos.clave}), 3)
+
+    def test_repetidos_se_dibujan_una_vez(self):
+        antes = graficos.metricas().get("torta", {}).get("dibujados", 0)
+        a, b = graficos.renderizar([("torta", _datos()), ("torta", _datos())])
+        self.assertEqual(a.png, b.png)
+        self.assertEqual(graficos.metricas()["torta"]["dibujados"], antes + 2)
+
+    @override_settings(GRAFICOS_PROCESOS=2)
+    def test_pool_igual_que_en_el_hilo(self):
+        self.addCleanup(graficos.cerrar_pool)
+        especificaciones = [("linea", _datos()), ("categorico", _datos(tipo="pie"))]
+        en_paralelo = [r.png for r in graficos.renderizar(especificaciones)]
+        en_hilo = [graficos.dibujar(tipo, datos)[0] for tipo, datos in especificaciones]
+        self.assertEqual(en_paralelo, en_hilo)
+
+    @override_settings(GRAFICOS_PROCESOS=2)
+    def test_error_de_un_grafico_se_propaga(self):
+        self.addCleanup(graficos.cerrar_pool)
+        with self.assertRaises(KeyError):
+            graficos.renderizar([("linea", _datos()), ("no_existe", _datos())])
+        self.assertIsNotNone(graficos._pool)
+
+    @override_settings(GRAFICOS_PROCESOS=2)
+    def test_pool_roto_dibuja_en_el_hilo(self):
+        pool = mock.Mock(**{"submit.side_effect": BrokenProcessPool("murió un proceso")})
+        with mock.patch.object(graficos, "_obtener_pool", return_value=pool), \
+                mock.patch.object(graficos, "cerrar_pool") as cerrar, \
+                self.assertLogs("estadisticas.graficos", "ERROR"):
+            resultados = graficos.renderizar([("linea", _datos()), ("barras", _datos())])
+        self.assertTrue(all(r.png.startswith(PNG) for r in resultados))
+        cerrar.assert_called_once_with()
+
+    @override_settings(GRAFICOS_PROCESOS=2, GRAFICOS_TIMEOUT_SEGUNDOS=5)
+    def test_timeout_descarta_el_pool(self):
+        futuro = mock.Mock(**{"result.side_effect": TimeoutError()})
+        pool = mock.Mock(**{"submit.return_value": futuro})
+        with mock.patch.object(graficos, "_obtener_pool", return_value=pool), \
+                mock.patch.object(graficos, "cerrar_pool") as cerrar, \
+                self.assertLogs("estadisticas.graficos", "ERROR"):
+            with self.assertRaises(TimeoutError):
+                graficos.renderizar([("linea", _datos()), ("barras", _datos())])
+        self.assertLessEqual(futuro.result.call_args.kwargs["timeout"], 5)
+        cerrar.assert_called_once_with(esperar=False)
+
+    @override_settings(GRAFICOS_PROCESOS=1)
+    def test_cerrar_sin_esperar_mata_los_procesos(self):
+        self.addCleanup(graficos.cerrar_pool)
+        pool = graficos._obtener_pool()
+        colgado = pool.submit(time.sleep, 600)
+        limite = time.monotonic() + 30
+        while not colgado.running() and time.monotonic() < limite:
+            time.sleep(0.05)
+        procesos = list(pool._processes.values())
+        self.assertTrue(procesos)
+
+        graficos.cerrar_pool(esperar=False)
+        for proceso in procesos:
+            proceso.join(10)
+            self.assertFalse(proceso.is_alive())
+        self.assertIsNone(graficos._pool)
+
+    def test_server_timing_del_pdf(self):
+        user = Usuario.objects.create_user(
+            email="graficos@test.com", password="testpass", nombre="Test", apellido="Graficos", telefono="1",
+        )
+        self.client.force_login(user)
+        resp = self.client.get(reverse("estadisticas:informe_pdf_facturas"))
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn('desc="categorico"', resp["Server-Timing"])
+
+        resp = self.client.get(reverse("estadisticas:informe_pdf_facturas"))
+        self.assertIn('desc="categorico (cache)"', resp["Server-Timing"])
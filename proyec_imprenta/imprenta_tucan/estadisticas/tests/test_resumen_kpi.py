@@ -0,0 +1,274 @@
+"""
+Tests de los resúmenes de KPI (estadisticas/resumen.py) y de los endpoints
+del tablero que los leen.
+
+Cubre:
+  1. Las señales recalculan los días tocados al confirmar la transacción.
+  2. Sumar buckets (mensuales + diarios de borde) da lo mismo que agregar
+     las tablas de origen, para cualquier rango.
+  3. Los endpoints devuelven lo mismo que antes y su costo no crece con la historia.
+  4. Cambiar la fecha de un registro recalcula también el día anterior.
+  5. Fuera de atomic() (autocommit) los días se recalculan en el momento.
+  6. Recalcular actualiza los buckets en su lugar, borra sólo las dimensiones
+     que desaparecieron y reintenta si choca con un commit concurrente.
+  7. Renombrar un estado recalcula sus días; compactar() carga la historia
+     si nunca se reconstruyó completa, aunque haya buckets; un savepoint
+     revertido no pierde los días marcados después.
+"""
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Sum
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from clientes.models import Cliente
+from compras.models import EstadoCompra, OrdenCompra
+from estadisticas import resumen
+from estadisticas.models import EstadoResumenKPI, ResumenKPI
+from pedidos.models import EstadoPedido, Factura, LineaPedido, PagoFactura, Pedido
+from productos.models import Producto
+from proveedores.models import Proveedor
+
+
+@override_settings(PEDIDOS_EFECTOS_MODO="sincrono")
+class ResumenKPITests(TestCase):
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            nombre="Test", apellido="Resumen", email="r@test.com", telefono="1", cuit="20-44444444-4",
+        )
+        self.pendiente = EstadoPedido.objects.create(nombre="pendiente")
+        self.proceso = EstadoPedido.objects.create(nombre="en proceso")
+        self.producto = Producto.objects.create(nombreProducto="Folleto", precioUnitario=10, activo=True)
+
+    def _pedido(self, monto, estado=None):
+        return Pedido.objects.create(
+            cliente=self.cliente, fecha_entrega=date.today() + timedelta(days=5),
+            monto_total=Decimal(monto), estado=estado or self.pendiente,
+        )
+
+    def test_senales_actualizan_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            p1 = self._pedido("100.00")
+            p2 = self._pedido("50.50", self.proceso)
+            LineaPedido.objects.create(pedido=p1, producto=self.producto, cantidad=3, precio_unitario=Decimal("20.00"))
+            factura = Factura.objects.create(pedido=p1, numero="0001-00000001", monto_total=Decimal("100.00"))
+            Factura.objects.create(pedido=p2, numero="0001-00000002", monto_total=Decimal("50.50"))
+            PagoFactura.objects.create(factura=factura, monto=Decimal("40.00"))
+            proveedor = Proveedor.objects.create(nombre="Papelera", email="papelera@test.com")
+            OrdenCompra.objects.create(
+                proveedor=proveedor, estado=EstadoCompra.objects.create(nombre="borrador"), monto_total=Decimal("75.00"),
+            )
+
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS), {"cantidad": 2, "monto": Decimal("150.50")})
+        data = self.client.get(reverse("estadisticas:api_pedidos_por_estado")).json()
+        self.assertEqual(data, {"labels": ["en proceso", "pendiente"], "values": [1, 1]})
+
+        data = self.client.get(reverse("estadisticas:api_top_productos")).json()
+        self.assertEqual(data, {"labels": ["Folleto"], "values": [20.0]})
+
+        data = self.client.get(reverse("estadisticas:api_desc_facturas")).json()
+        self.assertEqual(data["categoricas"]["por_estado_cobro"]["values"], [0, 1, 1, 0])
+        self.assertEqual(data["resumen"]["total_facturado"], 150.5)
+        self.assertEqual(data["resumen"]["total_cobrado"], 40.0)
+
+        data = self.client.get(reverse("estadisticas:api_desc_compras")).json()
+        self.assertEqual(data["categoricas"]["por_proveedor"], {"labels": ["Papelera"], "values": [1]})
+
+        kpis = self.client.get(reverse("estadisticas:api_kpis")).json()
+        self.assertEqual((kpis["pedidos"], kpis["pedidos_hoy"], kpis["ingresos_totales"]), (2, 2, 150.5))
+
+        # Borrar también recalcula el día
+        with self.captureOnCommitCallbacks(execute=True):
+            p2.delete()
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS), {"cantidad": 1, "monto": Decimal("100.00")})
+
+    def test_rangos_iguales_a_las_tablas(self):
+        rnd = random.Random(3)
+        with self.captureOnCommitCallbacks(execute=False):
+            pedidos = [self._pedido(f"{rnd.randint(1, 500)}.00") for _ in range(60)]
+        inicio = date(2025, 11, 20)
+        for pedido in pedidos:
+            Pedido.objects.filter(pk=pedido.pk).update(fecha_pedido=inicio + timedelta(days=rnd.randint(0, 120)))
+        resumen.recalcular()
+
+        fin = inicio + timedelta(days=120)
+        rangos = [(None, None), (inicio, None), (None, fin), (date(2025, 12, 1), date(2026, 1, 31))]
+        for _ in range(25):
+            a = inicio + timedelta(days=rnd.randint(-5, 125))
+            rangos.append((a, a + timedelta(days=rnd.randint(0, 70))))
+        for desde, hasta in rangos:
+            qs = Pedido.objects.all()
+            if desde:
+                qs = qs.filter(fecha_pedido__gte=desde)
+            if hasta:
+                qs = qs.filter(fecha_pedido__lte=hasta)
+            esperado = qs.aggregate(cantidad=Count("id"), monto=Sum("monto_total"))
+            obtenido = resumen.totales(ResumenKPI.METRICA_PEDIDOS, desde, hasta)
+            self.assertEqual(obtenido["cantidad"], esperado["cantidad"], (desde, hasta))
+            self.assertEqual(obtenido["monto"], esperado["monto"] or 0, (desde, hasta))
+
+        # Recalcular un tramo es idempotente
+        filas = ResumenKPI.objects.count()
+        resumen.recalcular(desde=date(2025, 12, 10), hasta=date(2026, 1, 5))
+        self.assertEqual(ResumenKPI.objects.count(), filas)
+
+    def test_queries_independientes_de_la_historia(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            for _ in range(30):
+                self._pedido("10.00")
+        url = reverse("estadisticas:api_ingresos_por_mes")
+        with CaptureQueriesContext(connection) as queries:
+            data = self.client.get(url, {"desde": "2020-01-01"}).json()
+        self.assertEqual(data["values"], [300.0])
+        consultas = [q["sql"] for q in queries if "pedidos_pedido" in q["sql"]]
+        self.assertEqual(consultas, [])
+
+    def test_cambio_de_fecha_recalcula_el_dia_anterior(self):
+        hace_un_mes = date.today() - timedelta(days=30)
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = self._pedido("80.00")
+            factura = Factura.objects.create(pedido=pedido, numero="0001-00000009", monto_total=Decimal("80.00"))
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.fecha_pedido = hace_un_mes
+            pedido.save()
+            factura.fecha_emision = factura.fecha_emision - timedelta(days=30)
+            factura.save()
+        hoy = date.today()
+        for metrica in (ResumenKPI.METRICA_PEDIDOS, ResumenKPI.METRICA_FACTURAS):
+            self.assertEqual(resumen.totales(metrica, hoy, hoy)["cantidad"], 0, metrica)
+            self.assertEqual(resumen.totales(metrica, hace_un_mes, hace_un_mes)["cantidad"], 1, metrica)
+
+        # Con la fecha diferida se lee la anterior de la base
+        with self.captureOnCommitCallbacks(execute=True):
+            diferido = Pedido.objects.only("pk", "monto_total").get(pk=pedido.pk)
+            diferido.fecha_pedido = hoy
+            diferido.save()
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS, hace_un_mes, hace_un_mes)["cantidad"], 0)
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS, hoy, hoy)["cantidad"], 1)
+
+    def test_recalcular_actualiza_en_su_lugar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = self._pedido("30.00")
+        hoy = date.today()
+        dia = ResumenKPI.objects.get(
+            granularidad=ResumenKPI.GRANULARIDAD_DIA, metrica=ResumenKPI.METRICA_CLIENTES, fecha=hoy,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido.estado = self.proceso
+            pedido.save()
+        # El bucket del cliente se actualiza sin reinsertarse; el del estado viejo desaparece
+        self.assertTrue(ResumenKPI.objects.filter(pk=dia.pk).exists())
+        estados = resumen.por_dimension(ResumenKPI.METRICA_PEDIDOS, hoy, hoy)
+        self.assertEqual([e["dimension"] for e in estados], ["en proceso"])
+
+    def test_flush_reintenta_ante_conflicto(self):
+        original = resumen.recalcular
+        llamadas = []
+
+        def choca_una_vez(**kwargs):
+            llamadas.append(kwargs)
+            if len(llamadas) == 1:
+                raise IntegrityError("resumenkpi_bucket_unico")
+            return original(**kwargs)
+
+        with mock.patch.object(resumen, "recalcular", side_effect=choca_una_vez):
+            with self.captureOnCommitCallbacks(execute=True):
+                self._pedido("45.00")
+        self.assertEqual(len(llamadas), 2)
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS)["monto"], Decimal("45.00"))
+
+
+    def test_renombrar_estado_recalcula_sus_dias(self):
+        hace_un_anio = date.today() - timedelta(days=365)
+        with self.captureOnCommitCallbacks(execute=True):
+            pedido = self._pedido("20.00")
+        Pedido.objects.filter(pk=pedido.pk).update(fecha_pedido=hace_un_anio)
+        resumen.recalcular(fechas=[hace_un_anio, date.today()])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pendiente.nombre = "en espera"
+            self.pendiente.save()
+        estados = resumen.por_dimension(ResumenKPI.METRICA_PEDIDOS, hace_un_anio, hace_un_anio)
+        self.assertEqual([e["dimension"] for e in estados], ["en espera"])
+        self.assertFalse(ResumenKPI.objects.filter(dimension="pendiente").exists())
+
+    def test_compactar_carga_la_historia_una_vez(self):
+        hace_un_anio = date.today() - timedelta(days=365)
+        with self.captureOnCommitCallbacks(execute=True):
+            viejo = self._pedido("70.00")
+        Pedido.objects.filter(pk=viejo.pk).update(fecha_pedido=hace_un_anio)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._pedido("5.00")
+        # Las señales ya escribieron buckets, pero la historia nunca se cargó
+        self.assertFalse(EstadoResumenKPI.objects.exists())
+        resumen.compactar()
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS)["monto"], Decimal("75.00"))
+        self.assertTrue(EstadoResumenKPI.objects.filter(pk=1).exists())
+
+        Pedido.objects.filter(pk=viejo.pk).update(monto_total=Decimal("1.00"))
+        with mock.patch.object(resumen, "recalcular", wraps=resumen.recalcular) as recalcular:
+            resumen.compactar(dias=3)
+        self.assertIsNotNone(recalcular.call_args.kwargs["desde"])
+
+    def test_savepoint_revertido_arranca_otro_lote(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self._pedido("11.00")
+                    raise RuntimeError("se revierte")
+            except RuntimeError:
+                pass
+            self._pedido("22.00")
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS), {"cantidad": 1, "monto": Decimal("22.00")})
+
+    def test_rollback_de_otro_savepoint_conserva_el_lote(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self._pedido("11.00")
+            try:
+                with transaction.atomic():
+                    raise RuntimeError("se revierte")
+            except RuntimeError:
+                pass
+            self._pedido("22.00")
+        lotes = [c for c in callbacks if isinstance(getattr(c, "__self__", None), resumen._Pendientes)]
+        self.assertEqual(len(lotes), 1)
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS)["cantidad"], 2)
+
+
+@override_settings(PEDIDOS_EFECTOS_MODO="sincrono")
+class ResumenKPIAutocommitTests(TransactionTestCase):
+    """Sin atomic() on_commit corre en el acto: el día tiene que quedar recalculado igual."""
+
+    def test_autocommit_recalcula_en_el_momento(self):
+        cliente = Cliente.objects.create(
+            nombre="Test", apellido="Autocommit", email="a@test.com", telefono="1", cuit="20-66666666-6",
+        )
+        pedido = Pedido.objects.create(
+            cliente=cliente, fecha_entrega=date.today() + timedelta(days=5),
+            monto_total=Decimal("60.00"), estado=EstadoPedido.objects.create(nombre="pendiente"),
+        )
+        factura = Factura.objects.create(pedido=pedido, numero="0001-00000001", monto_total=Decimal("60.00"))
+        PagoFactura.objects.create(factura=factura, monto=Decimal("25.00"))
+        OrdenCompra.objects.create(
+            proveedor=Proveedor.objects.create(nombre="Papelera", email="p@test.com"),
+            estado=EstadoCompra.objects.create(nombre="borrador"), monto_total=Decimal("75.00"),
+        )
+
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_PEDIDOS), {"cantidad": 1, "monto": Decimal("60.00")})
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_FACTURAS)["cantidad"], 1)
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_COBROS)["monto"], Decimal("25.00"))
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_COMPRAS)["monto"], Decimal("75.00"))
+
+        # Y el cambio de fecha fuera de atomic() también recalcula el día anterior
+        hace_diez = date.today() - timedelta(days=10)
+        OrdenCompra.objects.update(fecha_creacion=hace_diez)
+        resumen.recalcular()
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_COMPRAS, hace_diez, hace_diez)["cantidad"], 1)
+        orden = OrdenCompra.objects.get()
+        orden.fecha_creacion = date.today()
+        orden.save()
+        self.assertEqual(resumen.totales(ResumenKPI.METRICA_COMPRAS, hace_diez, hace_diez)["cantidad"], 0)
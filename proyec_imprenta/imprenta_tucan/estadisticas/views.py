@@ -5,15 +5,17 @@ from django.utils.dateparse import parse_date
 from django.db.models import Count, Sum
 from django.db.models.functions import TruncMonth
 from datetime import timedelta
-import statistics as stats_lib
 
 from pedidos.models import Pedido, LineaPedido
 from productos.models import Producto
 from clientes.models import Cliente
 from insumos.models import Insumo
-from presupuestos.models import Presupuesto, PresupuestoDetalle
+from presupuestos.models import Presupuesto
 from proveedores.models import Proveedor
 
+from . import datos, graficos, resumen
+from .models import ResumenKPI
+
 
 def _get_date_range(request):
     desde = parse_date(request.GET.get("desde") or "")
@@ -21,57 +23,6 @@ def _get_date_range(request):
     return desde, hasta
 
 
-def _calc_stats(valores):
-    if not valores:
-        return None
-    n = len(valores)
-    vs = sorted(valores)
-    media = sum(valores) / n
-    mediana = stats_lib.median(valores)
-    try:
-        moda = stats_lib.mode(valores)
-    except stats_lib.StatisticsError:
-        moda = None
-    desv_std = stats_lib.stdev(valores) if n > 1 else 0
-    varianza = stats_lib.variance(valores) if n > 1 else 0
-    rango = max(valores) - min(valores)
-
-    def pct(data, p):
-        idx = (len(data) - 1) * p / 100
-        lo = int(idx)
-        hi = lo + 1
-        if hi >= len(data):
-            return data[lo]
-        return data[lo] + (idx - lo) * (data[hi] - data[lo])
-
-    q1 = pct(vs, 25); q2 = pct(vs, 50); q3 = pct(vs, 75)
-    p10 = pct(vs, 10); p90 = pct(vs, 90)
-
-    if rango > 0:
-        n_bins = min(10, n)
-        bin_size = rango / n_bins
-        bins = []
-        for i in range(n_bins):
-            lo = min(valores) + i * bin_size
-            hi = lo + bin_size
-            cnt = sum(1 for v in valores if lo <= v < hi)
-            bins.append({"label": f"{lo:.1f}-{hi:.1f}", "count": cnt})
-        bins[-1]["count"] += sum(1 for v in valores if v == max(valores))
-    else:
-        bins = [{"label": str(round(media, 2)), "count": n}]
-
-    return {
-        "n": n, "media": round(media, 2), "mediana": round(mediana, 2),
-        "moda": round(moda, 2) if moda is not None else None,
-        "desv_std": round(desv_std, 2), "varianza": round(varianza, 2),
-        "rango": round(rango, 2), "minimo": round(min(valores), 2),
-        "maximo": round(max(valores), 2),
-        "q1": round(q1, 2), "q2": round(q2, 2), "q3": round(q3, 2),
-        "p10": round(p10, 2), "p90": round(p90, 2),
-        "iqr": round(q3 - q1, 2), "histograma": bins,
-    }
-
-
 def dashboard_estadisticas(request):
     modulos = [
         {"key": "clientes",     "label": "Clientes"},
@@ -86,51 +37,47 @@ def dashboard_estadisticas(request):
     return render(request, "estadisticas/dashboard.html", {"modulos": modulos})
 
 
+def _pedidos_entre(desde, hasta, inicio, fin=None):
+    """Cantidad de pedidos en [inicio, fin] dentro del rango pedido."""
+    inicio = max(inicio, desde) if desde else inicio
+    fin = min(fin, hasta) if fin and hasta else (fin or hasta)
+    return resumen.totales(ResumenKPI.METRICA_PEDIDOS, inicio, fin)["cantidad"]
+
+
 def api_kpis(request):
     desde, hasta = _get_date_range(request)
-    qs = Pedido.objects.all()
-    if desde: qs = qs.filter(fecha_pedido__gte=desde)
-    if hasta: qs = qs.filter(fecha_pedido__lte=hasta)
-    ingresos = qs.aggregate(total=Sum("monto_total"))["total"] or 0
+    pedidos = resumen.totales(ResumenKPI.METRICA_PEDIDOS, desde, hasta)
     hoy = timezone.now().date()
     return JsonResponse({
         "clientes": Cliente.objects.count(),
         "productos": Producto.objects.count(),
-        "pedidos": Pedido.objects.count(),
-        "ingresos_totales": float(ingresos),
-        "pedidos_hoy": qs.filter(fecha_pedido=hoy).count(),
-        "pedidos_semana": qs.filter(fecha_pedido__gte=hoy - timedelta(days=hoy.weekday())).count(),
-        "pedidos_mes": qs.filter(fecha_pedido__gte=hoy.replace(day=1)).count(),
+        "pedidos": resumen.totales(ResumenKPI.METRICA_PEDIDOS)["cantidad"],
+        "ingresos_totales": float(pedidos["monto"]),
+        "pedidos_hoy": _pedidos_entre(desde, hasta, hoy, hoy),
+        "pedidos_semana": _pedidos_entre(desde, hasta, hoy - timedelta(days=hoy.weekday())),
+        "pedidos_mes": _pedidos_entre(desde, hasta, hoy.replace(day=1)),
     })
 
 
 def api_pedidos_por_estado(request):
     desde, hasta = _get_date_range(request)
-    qs = Pedido.objects.all()
-    if desde: qs = qs.filter(fecha_pedido__gte=desde)
-    if hasta: qs = qs.filter(fecha_pedido__lte=hasta)
-    data = qs.values("estado__nombre").annotate(n=Count("id")).order_by("estado__nombre")
-    return JsonResponse({"labels": [d["estado__nombre"] or "Sin estado" for d in data], "values": [d["n"] for d in data]})
+    data = resumen.por_dimension(ResumenKPI.METRICA_PEDIDOS, desde, hasta)
+    return JsonResponse({"labels": [d["dimension"] or "Sin estado" for d in data], "values": [d["cantidad"] for d in data]})
 
 
 def api_ingresos_por_mes(request):
     hoy = timezone.now().date()
     desde, hasta = _get_date_range(request)
-    qs = Pedido.objects.all()
     if not desde and not hasta: desde = hoy - timedelta(days=186)
-    if desde: qs = qs.filter(fecha_pedido__gte=desde)
-    if hasta: qs = qs.filter(fecha_pedido__lte=hasta)
-    data = qs.annotate(mes=TruncMonth("fecha_pedido")).values("mes").annotate(total=Sum("monto_total")).order_by("mes")
-    return JsonResponse({"labels": [d["mes"].strftime("%Y-%m") if d["mes"] else "N/A" for d in data], "values": [float(d["total"] or 0) for d in data]})
+    data = resumen.por_mes(ResumenKPI.METRICA_PEDIDOS, desde, hasta)
+    return JsonResponse({"labels": [d["mes"].strftime("%Y-%m") for d in data], "values": [float(d["monto"]) for d in data]})
 
 
 def api_top_productos(request):
     desde, hasta = _get_date_range(request)
-    qs = LineaPedido.objects.all()
-    if desde: qs = qs.filter(pedido__fecha_pedido__gte=desde)
-    if hasta: qs = qs.filter(pedido__fecha_pedido__lte=hasta)
-    data = qs.values("producto__nombreProducto").annotate(total=Sum("precio_unitario")).order_by("-total")[:5]
-    return JsonResponse({"labels": [d["producto__nombreProducto"] or "Desconocido" for d in data], "values": [float(d["total"] or 0) for d in data]})
+    por_producto = {int(d["dimension"]): d["monto"] for d in resumen.por_dimension(ResumenKPI.METRICA_PRODUCTOS, desde, hasta)}
+    data = datos.sumar_por_nombre(por_producto, Producto.objects.filter(pk__in=por_producto).values_list("pk", "nombreProducto"), "Desconocido")[:5]
+    return JsonResponse({"labels": [nombre for nombre, _ in data], "values": [float(total) for _, total in data]})
 
 
 def api_top_clientes_score(request):
@@ -249,207 +196,35 @@ def api_resumen_inteligencia(request):
 # ── Estadistica Descriptiva ────────────────────────────────────────────────────
 
 def api_estadistica_clientes(request):
-    desde, hasta = _get_date_range(request)
-    qs = Cliente.objects.all()
-    if desde: qs = qs.filter(fecha_ultima_actualizacion__date__gte=desde)
-    if hasta: qs = qs.filter(fecha_ultima_actualizacion__date__lte=hasta)
-    scores = [float(s) for s in qs.values_list("puntaje_estrategico", flat=True) if s is not None]
-    por_tipo = list(qs.values("tipo_cliente").annotate(n=Count("id")).order_by("-n"))
-    por_estado = list(qs.values("estado").annotate(n=Count("id")))
-    return JsonResponse({
-        "variables": {"puntaje_estrategico": {"label": "Puntaje Estrategico", "stats": _calc_stats(scores)}},
-        "categoricas": {
-            "por_tipo_cliente": {"labels": [d["tipo_cliente"] for d in por_tipo], "values": [d["n"] for d in por_tipo]},
-            "por_estado": {"labels": [d["estado"] for d in por_estado], "values": [d["n"] for d in por_estado]},
-        }
-    })
+    return JsonResponse(datos.clientes(*_get_date_range(request)))
 
 
 def api_estadistica_pedidos(request):
-    desde, hasta = _get_date_range(request)
-    qs = Pedido.objects.all()
-    if desde: qs = qs.filter(fecha_pedido__gte=desde)
-    if hasta: qs = qs.filter(fecha_pedido__lte=hasta)
-    montos = [float(v) for v in qs.values_list("monto_total", flat=True) if v is not None]
-    descuentos = [float(v) for v in qs.values_list("descuento", flat=True) if v is not None]
-    por_estado = list(qs.values("estado__nombre").annotate(n=Count("id")).order_by("-n"))
-    por_mes = list(qs.annotate(mes=TruncMonth("fecha_pedido")).values("mes").annotate(n=Count("id")).order_by("mes"))
-    return JsonResponse({
-        "variables": {
-            "monto_total": {"label": "Monto Total ($)", "stats": _calc_stats(montos)},
-            "descuento": {"label": "Descuento (%)", "stats": _calc_stats(descuentos)},
-        },
-        "categoricas": {
-            "por_estado": {"labels": [d["estado__nombre"] or "Sin estado" for d in por_estado], "values": [d["n"] for d in por_estado]},
-            "pedidos_por_mes": {"labels": [d["mes"].strftime("%Y-%m") if d["mes"] else "N/A" for d in por_mes], "values": [d["n"] for d in por_mes]},
-        }
-    })
+    return JsonResponse(datos.pedidos(*_get_date_range(request)))
 
 
 def api_estadistica_productos(request):
-    desde, hasta = _get_date_range(request)
-    qs = Producto.objects.filter(activo=True)
-    precios = [float(v) for v in qs.values_list("precioUnitario", flat=True) if v is not None]
-    por_cat = list(qs.values("categoriaProducto__nombreCategoria").annotate(n=Count("idProducto")).order_by("-n"))
-    por_tipo = list(qs.values("tipoProducto__nombreTipoProducto").annotate(n=Count("idProducto")).order_by("-n"))
-    return JsonResponse({
-        "variables": {"precio_unitario": {"label": "Precio Unitario ($)", "stats": _calc_stats(precios)}},
-        "categoricas": {
-            "por_categoria": {"labels": [d["categoriaProducto__nombreCategoria"] or "Sin categoria" for d in por_cat], "values": [d["n"] for d in por_cat]},
-            "por_tipo": {"labels": [d["tipoProducto__nombreTipoProducto"] or "Sin tipo" for d in por_tipo], "values": [d["n"] for d in por_tipo]},
-        }
-    })
+    return JsonResponse(datos.productos(*_get_date_range(request)))
 
 
 def api_estadistica_insumos(request):
-    desde, hasta = _get_date_range(request)
-    qs = Insumo.objects.filter(activo=True)
-    if desde: qs = qs.filter(created_at__date__gte=desde)
-    if hasta: qs = qs.filter(created_at__date__lte=hasta)
-    stocks = [float(v) for v in qs.values_list("stock", flat=True) if v is not None]
-    precios = [float(v) for v in qs.values_list("precio_unitario", flat=True) if v is not None and float(v) > 0]
-    por_cat = list(qs.values("categoria").annotate(n=Count("idInsumo")).order_by("-n")[:10])
-    por_tipo = list(qs.values("tipo").annotate(n=Count("idInsumo")))
-    return JsonResponse({
-        "variables": {
-            "stock": {"label": "Stock Actual (unidades)", "stats": _calc_stats(stocks)},
-            "precio_unitario": {"label": "Precio Unitario ($)", "stats": _calc_stats(precios)},
-        },
-        "categoricas": {
-            "por_categoria": {"labels": [d["categoria"] or "Sin categoria" for d in por_cat], "values": [d["n"] for d in por_cat]},
-            "por_tipo": {"labels": [d["tipo"] for d in por_tipo], "values": [d["n"] for d in por_tipo]},
-        }
-    })
+    return JsonResponse(datos.insumos(*_get_date_range(request)))
 
 
 def api_estadistica_presupuestos(request):
-    desde, hasta = _get_date_range(request)
-    pqs = Presupuesto.objects.all()
-    if desde: pqs = pqs.filter(fecha__gte=desde)
-    if hasta: pqs = pqs.filter(fecha__lte=hasta)
-    totales = [float(v) for v in pqs.values_list("total", flat=True) if v is not None]
-    dqs = PresupuestoDetalle.objects.filter(presupuesto__in=pqs)
-    cantidades = [float(v) for v in dqs.values_list("cantidad", flat=True) if v is not None]
-    precios = [float(v) for v in dqs.values_list("precio_unitario", flat=True) if v is not None]
-    descuentos = [float(v) for v in dqs.values_list("descuento", flat=True) if v is not None]
-    por_respuesta = list(pqs.values("respuesta_cliente").annotate(n=Count("id")))
-    por_estado = list(pqs.values("estado").annotate(n=Count("id")))
-    return JsonResponse({
-        "variables": {
-            "total": {"label": "Total Presupuesto ($)", "stats": _calc_stats(totales)},
-            "cantidad_linea": {"label": "Cantidad por Linea", "stats": _calc_stats(cantidades)},
-            "precio_unitario": {"label": "Precio Unitario ($)", "stats": _calc_stats(precios)},
-            "descuento": {"label": "Descuento (%)", "stats": _calc_stats(descuentos)},
-        },
-        "categoricas": {
-            "por_respuesta": {"labels": [d["respuesta_cliente"] for d in por_respuesta], "values": [d["n"] for d in por_respuesta]},
-            "por_estado": {"labels": [d["estado"] for d in por_estado], "values": [d["n"] for d in por_estado]},
-        }
-    })
+    return JsonResponse(datos.presupuestos(*_get_date_range(request)))
 
 
 def api_estadistica_proveedores(request):
-    desde, hasta = _get_date_range(request)
-    pvqs = Proveedor.objects.filter(activo=True)
-    if desde: pvqs = pvqs.filter(fecha_creacion__date__gte=desde)
-    if hasta: pvqs = pvqs.filter(fecha_creacion__date__lte=hasta)
-    por_rubro = list(pvqs.values("rubro").annotate(n=Count("id")).order_by("-n")[:10])
-    insumos_por_prov = list(Insumo.objects.filter(activo=True, proveedor__isnull=False).values("proveedor__nombre").annotate(n=Count("idInsumo")).order_by("-n")[:10])
-    n_insumos = [d["n"] for d in insumos_por_prov]
-    return JsonResponse({
-        "variables": {"insumos_por_proveedor": {"label": "Insumos por Proveedor", "stats": _calc_stats(n_insumos)}},
-        "categoricas": {
-            "por_rubro": {"labels": [d["rubro"] or "Sin rubro" for d in por_rubro], "values": [d["n"] for d in por_rubro]},
-            "activos_vs_inactivos": {"labels": ["Activo", "Inactivo"], "values": [pvqs.filter(activo=True).count(), Proveedor.objects.filter(activo=False).count()]},
-            "insumos_por_proveedor": {"labels": [d["proveedor__nombre"] for d in insumos_por_prov], "values": [d["n"] for d in insumos_por_prov]},
-        }
-    })
+    return JsonResponse(datos.proveedores(*_get_date_range(request)))
 
 
 def api_estadistica_compras(request):
-    desde, hasta = _get_date_range(request)
-    from compras.models import OrdenCompra
-    qs = OrdenCompra.objects.all()
-    if desde: qs = qs.filter(fecha_creacion__gte=desde)
-    if hasta: qs = qs.filter(fecha_creacion__lte=hasta)
-    montos = [float(v) for v in qs.values_list("monto_total", flat=True) if v is not None]
-    por_estado = list(qs.values("estado__nombre").annotate(n=Count("id")).order_by("-n"))
-    por_prov = list(qs.values("proveedor__nombre").annotate(n=Count("id")).order_by("-n")[:10])
-    por_mes = list(qs.annotate(mes=TruncMonth("fecha_creacion")).values("mes").annotate(n=Count("id")).order_by("mes"))
-    return JsonResponse({
-        "variables": {"monto_total": {"label": "Monto Total por Orden ($)", "stats": _calc_stats(montos)}},
-        "categoricas": {
-            "por_estado": {"labels": [d["estado__nombre"] or "Sin estado" for d in por_estado], "values": [d["n"] for d in por_estado]},
-            "por_proveedor": {"labels": [d["proveedor__nombre"] or "Sin proveedor" for d in por_prov], "values": [d["n"] for d in por_prov]},
-            "ordenes_por_mes": {"labels": [d["mes"].strftime("%Y-%m") if d["mes"] else "N/A" for d in por_mes], "values": [d["n"] for d in por_mes]},
-        }
-    })
+    return JsonResponse(datos.compras(*_get_date_range(request)))
 
 
 def api_estadistica_facturas(request):
-    desde, hasta = _get_date_range(request)
-    from pedidos.models import Factura
-    from django.db.models import Sum as _Sum
-
-    qs = Factura.objects.all()
-    if desde: qs = qs.filter(fecha_emision__date__gte=desde)
-    if hasta: qs = qs.filter(fecha_emision__date__lte=hasta)
-
-    montos = [float(v) for v in qs.values_list("monto_total", flat=True) if v is not None]
-
-    # Estado de cobro: calculado en Python porque es una propiedad
-    estado_counts = {"Pagada": 0, "Pago parcial": 0, "Pendiente": 0, "Anulada": 0}
-    for f in qs.prefetch_related("pagos"):
-        if f.anulada:
-            estado_counts["Anulada"] += 1
-        else:
-            pagado = f.total_pagado
-            if pagado >= f.monto_total:
-                estado_counts["Pagada"] += 1
-            elif pagado > 0:
-                estado_counts["Pago parcial"] += 1
-            else:
-                estado_counts["Pendiente"] += 1
-
-    por_mes = list(
-        qs.annotate(mes=TruncMonth("fecha_emision"))
-          .values("mes")
-          .annotate(n=Count("id"), total=_Sum("monto_total"))
-          .order_by("mes")
-    )
-
-    total_cobrado = float(
-        qs.filter(anulada=False)
-          .prefetch_related("pagos")
-          .aggregate(t=_Sum("pagos__monto"))["t"] or 0
-    )
-    total_facturado = float(qs.filter(anulada=False).aggregate(t=_Sum("monto_total"))["t"] or 0)
-
-    return JsonResponse({
-        "variables": {
-            "monto_total": {"label": "Monto Total Facturado ($)", "stats": _calc_stats(montos)},
-        },
-        "categoricas": {
-            "por_estado_cobro": {
-                "labels": list(estado_counts.keys()),
-                "values": list(estado_counts.values()),
-            },
-            "facturas_por_mes": {
-                "labels": [d["mes"].strftime("%Y-%m") if d["mes"] else "N/A" for d in por_mes],
-                "values": [d["n"] for d in por_mes],
-            },
-            "monto_por_mes": {
-                "labels": [d["mes"].strftime("%Y-%m") if d["mes"] else "N/A" for d in por_mes],
-                "values": [float(d["total"] or 0) for d in por_mes],
-            },
-        },
-        "resumen": {
-            "total_facturado": total_facturado,
-            "total_cobrado": total_cobrado,
-            "saldo_pendiente": round(total_facturado - total_cobrado, 2),
-            "anuladas": estado_counts["Anulada"],
-        },
-    })
+    return JsonResponse(datos.facturas(*_get_date_range(request)))
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -468,123 +243,9 @@ def api_estadistica_facturas(request):
 # GRAFICOS DESDE API DESCRIPTIVA
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def _get_api_data(view_func, desde=None, hasta=None):
-    from django.test import RequestFactory
-    import json
-    rf = RequestFactory()
-    params = {}
-    if desde: params["desde"] = str(desde)
-    if hasta: params["hasta"] = str(hasta)
-    req = rf.get("/api/", params)
-    resp = view_func(req)
-    return json.loads(resp.content)
-
-
-def _grafico_histograma(bins, titulo, color="#3498DB", ancho=13, alto=4):
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    from io import BytesIO
-    labels = [b["label"] for b in bins]
-    values = [b["count"] for b in bins]
-    fig, ax = plt.subplots(figsize=(ancho, alto))
-    ax.bar(labels, values, color=color, edgecolor="white", linewidth=0.5)
-    ax.set_title(titulo, fontsize=10, fontweight="bold", pad=8, color="#1E3A5F")
-    ax.tick_params(axis="x", rotation=35, labelsize=7)
-    ax.tick_params(axis="y", labelsize=7)
-    ax.spines["top"].set_visible(False)
-    ax.spines["right"].set_visible(False)
-    ax.yaxis.grid(True, alpha=0.3)
-    ax.set_axisbelow(True)
-    plt.tight_layout()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=130, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-
-def _grafico_categorico(labels, values, titulo, tipo="bar", ancho=13, alto=4):
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    from io import BytesIO
-    COLORS = ["#3498DB","#2ECC71","#E74C3C","#F39C12","#9B59B6",
-              "#1ABC9C","#E67E22","#34495E","#E91E63","#00BCD4"]
-    fig, ax = plt.subplots(figsize=(ancho, alto))
-    if tipo == "barh":
-        ax.barh(labels, values, color=COLORS[:len(labels)], edgecolor="white", linewidth=0.5)
-        ax.tick_params(axis="y", labelsize=7)
-        ax.tick_params(axis="x", labelsize=7)
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.xaxis.grid(True, alpha=0.3)
-        ax.set_axisbelow(True)
-    elif tipo == "line":
-        ax.plot(range(len(labels)), values, color=COLORS[0], linewidth=2,
-                marker="o", markersize=5, markerfacecolor="white", markeredgewidth=2)
-        ax.fill_between(range(len(labels)), values, alpha=0.1, color=COLORS[0])
-        ax.set_xticks(range(len(labels)))
-        ax.set_xticklabels(labels, rotation=30, fontsize=7)
-        ax.tick_params(axis="y", labelsize=7)
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.yaxis.grid(True, alpha=0.3)
-    elif tipo == "pie":
-        wedges, texts, autotexts = ax.pie(
-            values, labels=labels, autopct="%1.1f%%",
-            colors=COLORS[:len(labels)], startangle=90,
-            wedgeprops={"edgecolor": "white", "linewidth": 1.5}
-        )
-        for t in texts: t.set_fontsize(8)
-        for at in autotexts:
-            at.set_fontsize(7)
-            at.set_color("white")
-            at.set_fontweight("bold")
-    elif tipo == "doughnut":
-        wedges, texts, autotexts = ax.pie(
-            values, labels=labels, autopct="%1.1f%%",
-            colors=COLORS[:len(labels)], startangle=90,
-            wedgeprops={"edgecolor": "white", "linewidth": 1.5, "width": 0.5}
-        )
-        for t in texts: t.set_fontsize(8)
-        for at in autotexts:
-            at.set_fontsize(7)
-            at.set_fontweight("bold")
-    elif tipo == "scatter":
-        xs = list(range(len(labels)))
-        ax.scatter(xs, values, color=COLORS[:len(labels)], s=80, zorder=3)
-        ax.set_xticks(xs)
-        ax.set_xticklabels(labels, rotation=30, fontsize=7)
-        ax.tick_params(axis="y", labelsize=7)
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.yaxis.grid(True, alpha=0.3)
-        ax.set_axisbelow(True)
-    else:
-        bars = ax.bar(labels, values, color=COLORS[:len(labels)],
-                      edgecolor="white", linewidth=0.5)
-        ax.tick_params(axis="x", rotation=30, labelsize=7)
-        ax.tick_params(axis="y", labelsize=7)
-        ax.spines["top"].set_visible(False)
-        ax.spines["right"].set_visible(False)
-        ax.yaxis.grid(True, alpha=0.3)
-        ax.set_axisbelow(True)
-        for bar, val in zip(bars, values):
-            ax.text(bar.get_x() + bar.get_width()/2,
-                    bar.get_height() + max(values)*0.01,
-                    str(val), ha="center", va="bottom", fontsize=7)
-    ax.set_title(titulo, fontsize=10, fontweight="bold", pad=8, color="#1E3A5F")
-    plt.tight_layout()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=130, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-
 def _agregar_graficos_api(story, data, st, ancho=10, alto_hist=2.8, alto_cat=2.8, request=None):
-    from reportlab.platypus import Paragraph, Spacer, CondPageBreak
+    from io import BytesIO
+    from reportlab.platypus import Paragraph, Spacer
 
     variables = data.get("variables", {})
     categoricas = data.get("categoricas", {})
@@ -603,6 +264,10 @@ def _agregar_graficos_api(story, data, st, ancho=10, alto_hist=2.8, alto_cat=2.8
     def _normalizar_tipo(t):
         return {"horizontalBar": "barh"}.get(t, t)
 
+    # Se arman todas las especificaciones y se dibujan juntas (estadisticas/graficos.py):
+    # en paralelo y reutilizando los PNG cacheados
+    secciones = []
+
     # Histogramas de variables numericas
     for idx_h, (key, vdata) in enumerate(variables.items()):
         if not vdata or not vdata.get("stats"): continue
@@ -613,23 +278,14 @@ def _agregar_graficos_api(story, data, st, ancho=10, alto_hist=2.8, alto_cat=2.8
         tipo_hist = _normalizar_tipo(
             tipos_request.get(f"hist_{idx_h}", tipos_request.get("tipo_global", tipo_global))
         )
-        story.append(Paragraph(f"Histograma: {label}", st["seccion"]))
-        hist_labels = [b["label"] for b in bins]
-        hist_vals   = [b["count"] for b in bins]
-        if tipo_hist in ("pie", "doughnut"):
-            h = alto_hist + 2
-            buf = _grafico_categorico(hist_labels, hist_vals, f"Distribucion de {label}",
-                                      tipo=tipo_hist, ancho=ancho / 2.54, alto=h / 2.54)
-        elif tipo_hist in ("barh", "line", "scatter"):
-            h = alto_hist
-            buf = _grafico_categorico(hist_labels, hist_vals, f"Distribucion de {label}",
-                                      tipo=tipo_hist, ancho=ancho / 2.54, alto=h / 2.54)
+        h = alto_hist + 2 if tipo_hist in ("pie", "doughnut") else alto_hist
+        datos_grafico = {"labels": [b["label"] for b in bins], "values": [b["count"] for b in bins],
+                         "titulo": f"Distribucion de {label}", "ancho": ancho / 2.54, "alto": h / 2.54}
+        if tipo_hist in ("pie", "doughnut", "barh", "line", "scatter"):
+            especificacion = ("categorico", dict(datos_grafico, tipo=tipo_hist))
         else:  # bar (default)
-            h = alto_hist
-            buf = _grafico_histograma(bins, f"Distribucion de {label}",
-                                      ancho=ancho / 2.54, alto=h / 2.54)
-        story.append(_img_flowable(buf, ancho, h))
-        story.append(Spacer(1, 0.3*cm))
+            especificacion = ("histograma", datos_grafico)
+        secciones.append((f"Histograma: {label}", especificacion, h))
 
     # Graficos categoricos
     for idx_c, (key, cdata) in enumerate(categoricas.items()):
@@ -642,90 +298,18 @@ def _agregar_graficos_api(story, data, st, ancho=10, alto_hist=2.8, alto_cat=2.8
             tipos_request.get(f"cat_{idx_c}", tipos_request.get("tipo_global", tipo_global))
         )
         h = alto_cat + 2 if tipo in ("pie", "doughnut") else alto_cat
-        story.append(Paragraph(f"Grafico: {titulo}", st["seccion"]))
-        buf = _grafico_categorico(labels, values, titulo, tipo=tipo,
-                                  ancho=ancho / 2.54, alto=h / 2.54)
-        story.append(_img_flowable(buf, ancho, h))
+        secciones.append((f"Grafico: {titulo}", ("categorico", {
+            "labels": labels, "values": values, "titulo": titulo, "tipo": tipo,
+            "ancho": ancho / 2.54, "alto": h / 2.54,
+        }), h))
+
+    resultados = graficos.renderizar([especificacion for _t, especificacion, _h in secciones])
+    for (encabezado, _especificacion, h), resultado in zip(secciones, resultados):
+        story.append(Paragraph(encabezado, st["seccion"]))
+        story.append(_img_flowable(BytesIO(resultado.png), ancho, h))
         story.append(Spacer(1, 0.3*cm))
 
 
-def _grafico_barras(labels, values, titulo, color="#3498DB", ancho=14, alto=4):
-    """Genera un grafico de barras y retorna un ImageReader para ReportLab."""
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    from io import BytesIO
-    fig, ax = plt.subplots(figsize=(ancho, alto))
-    bars = ax.bar(labels, values, color=color, edgecolor="white", linewidth=0.5)
-    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color="#1E3A5F")
-    ax.set_xlabel("")
-    ax.tick_params(axis="x", rotation=30, labelsize=8)
-    ax.tick_params(axis="y", labelsize=8)
-    ax.spines["top"].set_visible(False)
-    ax.spines["right"].set_visible(False)
-    ax.yaxis.grid(True, alpha=0.3)
-    ax.set_axisbelow(True)
-    for bar, val in zip(bars, values):
-        ax.text(bar.get_x() + bar.get_width()/2, bar.get_height() + max(values)*0.01,
-                f"{val:,.0f}", ha="center", va="bottom", fontsize=7, color="#2C3E50")
-    plt.tight_layout()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-
-def _grafico_torta(labels, values, titulo, ancho=6, alto=4):
-    """Genera un grafico de torta y retorna un ImageReader para ReportLab."""
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    from io import BytesIO
-    COLORS = ["#3498DB","#2ECC71","#E74C3C","#F39C12","#9B59B6","#1ABC9C","#E67E22","#34495E"]
-    fig, ax = plt.subplots(figsize=(ancho, alto))
-    wedges, texts, autotexts = ax.pie(
-        values, labels=labels, autopct="%1.1f%%",
-        colors=COLORS[:len(labels)], startangle=90,
-        wedgeprops={"edgecolor": "white", "linewidth": 1.5}
-    )
-    for t in texts: t.set_fontsize(8)
-    for at in autotexts: at.set_fontsize(7); at.set_color("white"); at.set_fontweight("bold")
-    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color="#1E3A5F")
-    plt.tight_layout()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-
-def _grafico_linea(labels, values, titulo, color="#3498DB", ancho=14, alto=4):
-    """Genera un grafico de linea y retorna un ImageReader para ReportLab."""
-    import matplotlib
-    matplotlib.use("Agg")
-    import matplotlib.pyplot as plt
-    from io import BytesIO
-    fig, ax = plt.subplots(figsize=(ancho, alto))
-    ax.plot(labels, values, color=color, linewidth=2, marker="o", markersize=5, markerfacecolor="white", markeredgewidth=2)
-    ax.fill_between(range(len(labels)), values, alpha=0.1, color=color)
-    ax.set_title(titulo, fontsize=11, fontweight="bold", pad=10, color="#1E3A5F")
-    ax.tick_params(axis="x", rotation=30, labelsize=8)
-    ax.tick_params(axis="y", labelsize=8)
-    ax.spines["top"].set_visible(False)
-    ax.spines["right"].set_visible(False)
-    ax.yaxis.grid(True, alpha=0.3)
-    ax.set_axisbelow(True)
-    ax.set_xticks(range(len(labels)))
-    ax.set_xticklabels(labels)
-    plt.tight_layout()
-    buf = BytesIO()
-    fig.savefig(buf, format="png", dpi=150, bbox_inches="tight")
-    plt.close(fig)
-    buf.seek(0)
-    return buf
-
-
 def _img_flowable(buf, ancho_cm, alto_cm):
     """Convierte un BytesIO de imagen a un flowable de ReportLab."""
     from reportlab.platypus import Image as RLImage
@@ -892,6 +476,9 @@ def _pdf_response(buffer, nombre_archivo, request=None):
     resp = HttpResponse(buffer, content_type="application/pdf")
     resp["Content-Disposition"] = (disposition + '; filename="' +
         nombre_archivo + '_' + hoy.strftime("%Y%m%d") + '.pdf"')
+    if request is not None:
+        tiempos = graficos.server_timing(request)
+        if tiempos: resp["Server-Timing"] = tiempos
     return resp
 
 
@@ -911,7 +498,6 @@ from django.contrib.auth.decorators import login_required
 
 @login_required
 def informe_pdf_pedidos(request):
-    from estadisticas.views import api_estadistica_pedidos
     from reportlab.platypus import Paragraph, Spacer, Table, HRFlowable
     from django.db.models import Count, Sum
     from django.db.models.functions import TruncMonth
@@ -928,7 +514,8 @@ def informe_pdf_pedidos(request):
     story += [hdr, hr]
     # KPIs
     story.append(Paragraph("Resumen Ejecutivo", st["seccion"]))
-    total = qs.count(); ingresos = qs.aggregate(t=Sum("monto_total"))["t"] or 0
+    por_estado = datos.pedidos_por_estado(desde, hasta)
+    total = sum(r["cantidad"] for r in por_estado); ingresos = sum(r["monto"] for r in por_estado)
     kpi_data = [
         [Paragraph("<b>Indicador</b>", st["bold"]), Paragraph("<b>Valor</b>", st["bold"])],
         [Paragraph("Total pedidos", st["normal"]), Paragraph(f"<b>{total}</b>", st["bold"])],
@@ -938,10 +525,9 @@ def informe_pdf_pedidos(request):
     t = Table(kpi_data, colWidths=[cw*0.6, cw*0.4]); t.setStyle(_tbl_style(st)); story.append(t)
     # Por estado
     story.append(Paragraph("Pedidos por Estado", st["seccion"]))
-    por_estado = qs.values("estado__nombre").annotate(n=Count("id"), total=Sum("monto_total")).order_by("-n")
     rows = [[Paragraph("<b>Estado</b>",st["bold"]), Paragraph("<b>Cantidad</b>",st["bold"]), Paragraph("<b>Ingresos</b>",st["bold"])]]
     for r in por_estado:
-        rows.append([Paragraph(str(r["estado__nombre"] or "-"),st["normal"]), Paragraph(str(r["n"]),st["normal"]), Paragraph(f"${float(r['total'] or 0):,.2f}",st["normal"])])
+        rows.append([Paragraph(str(r["dimension"] or "-"),st["normal"]), Paragraph(str(r["cantidad"]),st["normal"]), Paragraph(f"${float(r['monto'] or 0):,.2f}",st["normal"])])
     t2 = Table(rows, colWidths=[cw*0.5,cw*0.2,cw*0.3]); t2.setStyle(_tbl_style(st)); story.append(t2)
     # Listado reciente
     story.append(Paragraph("Ultimos 20 Pedidos", st["seccion"]))
@@ -950,7 +536,7 @@ def informe_pdf_pedidos(request):
     for p in recientes:
         rows2.append([Paragraph(str(p.id),st["normal"]),Paragraph(str(p.cliente)[:30],st["normal"]),Paragraph(p.fecha_pedido.strftime("%d/%m/%y"),st["normal"]),Paragraph(str(p.estado),st["normal"]),Paragraph(f"${float(p.monto_total):,.2f}",st["normal"])])
     t3 = Table(rows2, colWidths=[cw*0.08,cw*0.32,cw*0.15,cw*0.2,cw*0.25]); t3.setStyle(_tbl_style(st)); story.append(t3)
-    _data_api = _get_api_data(api_estadistica_pedidos, desde, hasta)
+    _data_api = datos.pedidos(desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -986,7 +572,6 @@ def informe_pdf_pedidos(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_clientes(request):
-    from estadisticas.views import api_estadistica_clientes
     from reportlab.platypus import Paragraph, Spacer, Table, HRFlowable
     from django.db.models import Count, Sum, Avg
     from django.utils.dateparse import parse_date
@@ -1022,7 +607,7 @@ def informe_pdf_clientes(request):
     for c in top:
         rows2.append([Paragraph(str(c)[:35],st["normal"]),Paragraph(str(c.tipo_cliente or "-"),st["normal"]),Paragraph(str(c.n_pedidos),st["normal"]),Paragraph(f"${float(c.total_ing or 0):,.2f}",st["normal"])])
     t2 = Table(rows2,colWidths=[cw*0.4,cw*0.2,cw*0.15,cw*0.25]); t2.setStyle(_tbl_style(st)); story.append(t2)
-    _data_api = _get_api_data(api_estadistica_clientes, desde, hasta)
+    _data_api = datos.clientes(desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -1058,7 +643,6 @@ def informe_pdf_clientes(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_productos(request):
-    from estadisticas.views import api_estadistica_productos
     from reportlab.platypus import Paragraph, Table
     from django.db.models import Count, Sum
     from django.utils.dateparse import parse_date
@@ -1083,7 +667,7 @@ def informe_pdf_productos(request):
     for i,r in enumerate(top,1):
         rows2.append([Paragraph(str(i),st["normal"]),Paragraph(str(r["producto__nombreProducto"] or "-")[:30],st["normal"]),Paragraph(str(r["producto__categoriaProducto__nombreCategoria"] or "-"),st["normal"]),Paragraph(str(r["veces"]),st["normal"]),Paragraph(f"${float(r['ingresos'] or 0):,.2f}",st["normal"])])
     t2 = Table(rows2,colWidths=[cw*0.06,cw*0.36,cw*0.2,cw*0.12,cw*0.26]); t2.setStyle(_tbl_style(st)); story.append(t2)
-    _data_api = _get_api_data(api_estadistica_productos, desde, hasta)
+    _data_api = datos.productos(desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -1119,7 +703,6 @@ def informe_pdf_productos(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_proveedores(request):
-    from estadisticas.views import api_estadistica_proveedores
     from reportlab.platypus import Paragraph, Table
     from django.db.models import Count
     from django.utils.dateparse import parse_date
@@ -1143,7 +726,7 @@ def informe_pdf_proveedores(request):
     for p in provs:
         rows2.append([Paragraph(str(p.nombre)[:35],st["normal"]),Paragraph(str(p.email or "-"),st["normal"]),Paragraph(str(p.n_insumos),st["normal"]),Paragraph("Activo" if p.activo else "Inactivo",st["normal"])])
     t2 = Table(rows2,colWidths=[cw*0.35,cw*0.35,cw*0.15,cw*0.15]); t2.setStyle(_tbl_style(st)); story.append(t2)
-    _data_api = _get_api_data(api_estadistica_proveedores, desde, hasta)
+    _data_api = datos.proveedores(desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -1179,7 +762,6 @@ def informe_pdf_proveedores(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_insumos(request):
-    from estadisticas.views import api_estadistica_insumos
     from reportlab.platypus import Paragraph, Table
     from django.db.models import Count, Sum
     buffer, doc, st, cw, _total_pages = _pdf_setup("Informe de Insumos y Stock", request)
@@ -1214,7 +796,7 @@ def informe_pdf_insumos(request):
         rows2.append([Paragraph(str(ins.codigo),st["normal"]),Paragraph(str(ins.nombre)[:35],st["normal"]),Paragraph(str(ins.stock),st["normal"]),Paragraph(f"${float(ins.precio_unitario):,.2f}",st["normal"])])
     if len(rows2)==1: rows2.append([Paragraph("Sin insumos criticos",st["normal"]),Paragraph("-",st["normal"]),Paragraph("-",st["normal"]),Paragraph("-",st["normal"])])
     t2 = Table(rows2,colWidths=[cw*0.2,cw*0.45,cw*0.1,cw*0.25]); t2.setStyle(_tbl_style(st)); story.append(t2)
-    _data_api = _get_api_data(api_estadistica_insumos)
+    _data_api = datos.insumos()
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -1250,7 +832,6 @@ def informe_pdf_insumos(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_compras(request):
-    from estadisticas.views import api_estadistica_compras
     from reportlab.platypus import Paragraph, Table
     from django.db.models import Count, Sum
     from django.utils.dateparse import parse_date
@@ -1270,9 +851,10 @@ def informe_pdf_compras(request):
     if hasta:
         qs_oc = qs_oc.filter(fecha_creacion__lte=hasta)
         qs_rem = qs_rem.filter(fecha__lte=hasta)
+    _data_api = datos.compras(desde, hasta)
     story.append(Paragraph("Resumen de Compras", st["seccion"]))
     rows = [[Paragraph("<b>Indicador</b>",st["bold"]),Paragraph("<b>Valor</b>",st["bold"])],
-            [Paragraph("Ordenes de Compra",st["normal"]),Paragraph(f"<b>{qs_oc.count()}</b>",st["bold"])],
+            [Paragraph("Ordenes de Compra",st["normal"]),Paragraph(f"<b>{sum(_data_api['categoricas']['por_estado']['values'])}</b>",st["bold"])],
             [Paragraph("Remitos registrados",st["normal"]),Paragraph(f"<b>{qs_rem.count()}</b>",st["bold"])],
             [Paragraph("Movimientos de stock",st["normal"]),Paragraph(f"<b>{MovimientoStock.objects.count()}</b>",st["bold"])]]
     t = Table(rows,colWidths=[cw*0.6,cw*0.4]); t.setStyle(_tbl_style(st)); story.append(t)
@@ -1288,7 +870,6 @@ def informe_pdf_compras(request):
         rows3.append([Paragraph(str(rem.numero),st["normal"]),Paragraph(str(rem.proveedor)[:30],st["normal"]),Paragraph(rem.fecha.strftime("%d/%m/%y"),st["normal"]),Paragraph(str(rem.n_items),st["normal"])])
     if len(rows3)==1: rows3.append([Paragraph("Sin remitos",st["normal"]),Paragraph("-",st["normal"]),Paragraph("-",st["normal"]),Paragraph("-",st["normal"])])
     t3 = Table(rows3,colWidths=[cw*0.2,cw*0.45,cw*0.2,cw*0.15]); t3.setStyle(_tbl_style(st)); story.append(t3)
-    _data_api = _get_api_data(api_estadistica_compras, desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
     hr2, firma_items = _pdf_firma(st, usuario); story.append(hr2); story.extend(firma_items)
     # Primera pasada: contar paginas
@@ -1324,7 +905,6 @@ def informe_pdf_compras(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_presupuestos(request):
-    from estadisticas.views import api_estadistica_presupuestos
     from reportlab.platypus import Paragraph, Table
     from django.utils.dateparse import parse_date
     desde = parse_date(request.GET.get("desde", "") or "")
@@ -1340,12 +920,15 @@ def informe_pdf_presupuestos(request):
     pqs = Presupuesto.objects.all()
     if desde: pqs = pqs.filter(fecha__gte=desde)
     if hasta: pqs = pqs.filter(fecha__lte=hasta)
-    total_pres = pqs.count()
-    aceptados = pqs.filter(respuesta_cliente="aceptado").count()
-    rechazados = pqs.filter(respuesta_cliente="rechazado").count()
+    _data_api = datos.presupuestos(desde, hasta)
+    por_respuesta = _data_api["categoricas"]["por_respuesta"]
+    por_respuesta = dict(zip(por_respuesta["labels"], por_respuesta["values"]))
+    total_pres = sum(por_respuesta.values())
+    aceptados = por_respuesta.get("aceptado", 0)
+    rechazados = por_respuesta.get("rechazado", 0)
     pendientes = total_pres - aceptados - rechazados
-    from django.db.models import Avg
-    monto_prom = pqs.aggregate(p=Avg("total"))["p"] or 0
+    stats_total = _data_api["variables"]["total"]["stats"]
+    monto_prom = stats_total["media"] if stats_total else 0
     rows = [
         [Paragraph("<b>Indicador</b>", st["bold"]), Paragraph("<b>Valor</b>", st["bold"])],
         [Paragraph("Total presupuestos", st["normal"]), Paragraph(f"<b>{total_pres}</b>", st["bold"])],
@@ -1384,7 +967,6 @@ def informe_pdf_presupuestos(request):
     story.append(t2)
 
     # Gráficos
-    _data_api = _get_api_data(api_estadistica_presupuestos, desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
 
     hr2, firma_items = _pdf_firma(st, usuario)
@@ -1425,9 +1007,8 @@ def informe_pdf_presupuestos(request):
 # ═══════════════════════════════════════════════════════════════════════════════
 @login_required
 def informe_pdf_facturas(request):
-    from pedidos.models import Factura, PagoFactura
+    from pedidos.models import Factura
     from reportlab.platypus import Paragraph, Table
-    from django.db.models import Count, Sum
     from django.utils.dateparse import parse_date
 
     desde = parse_date(request.GET.get("desde", "") or "")
@@ -1443,13 +1024,12 @@ def informe_pdf_facturas(request):
     if desde: qs = qs.filter(fecha_emision__date__gte=desde)
     if hasta: qs = qs.filter(fecha_emision__date__lte=hasta)
 
-    total = qs.count()
-    anuladas = qs.filter(anulada=True).count()
-    total_facturado = float(qs.filter(anulada=False).aggregate(t=Sum("monto_total"))["t"] or 0)
-    total_cobrado = float(
-        PagoFactura.objects.filter(factura__in=qs.filter(anulada=False))
-        .aggregate(t=Sum("monto"))["t"] or 0
-    )
+    _data_api = datos.facturas(desde, hasta)
+    resumen_facturas = _data_api["resumen"]
+    total = resumen_facturas["total"]
+    anuladas = resumen_facturas["anuladas"]
+    total_facturado = resumen_facturas["total_facturado"]
+    total_cobrado = resumen_facturas["total_cobrado"]
     saldo_pendiente = total_facturado - total_cobrado
 
     story.append(Paragraph("Resumen de Facturas", st["seccion"]))
@@ -1474,18 +1054,8 @@ def informe_pdf_facturas(request):
         Paragraph("<b>Total</b>",      st["bold"]),
         Paragraph("<b>Estado</b>",     st["bold"]),
     ]]
-    for f in qs.select_related("pedido__cliente").prefetch_related("pagos").order_by("-fecha_emision")[:30]:
-        if f.anulada:
-            estado_label = "Anulada"
-        else:
-            pagado = float(f.total_pagado)
-            monto  = float(f.monto_total)
-            if pagado >= monto:
-                estado_label = "Pagada"
-            elif pagado > 0:
-                estado_label = "Parcial"
-            else:
-                estado_label = "Pendiente"
+    for f in qs.select_related("pedido__cliente").with_cobro().order_by("-fecha_emision")[:30]:
+        estado_label = "Parcial" if f.cobro_estado == "parcial" else Factura.ESTADO_COBRO_DISPLAY[f.cobro_estado]
         rows2.append([
             Paragraph(str(f.numero),                        st["normal"]),
             Paragraph(f"#{f.pedido_id}",                    st["normal"]),
@@ -1500,7 +1070,6 @@ def informe_pdf_facturas(request):
     t2.setStyle(_tbl_style(st))
     story.append(t2)
 
-    _data_api = _get_api_data(api_estadistica_facturas, desde, hasta)
     _agregar_graficos_api(story, _data_api, st, request=request)
 
     hr2, firma_items = _pdf_firma(st, usuario)
@@ -1,7 +1,8 @@
 # Detectar entorno de test  # reload: 2026-04-03
 import sys
-TESTING = 'test' in sys.argv
+TESTING = 'test' in sys.argv or 'pytest' in sys.modules
 
+from celery.schedules import crontab
 from django.contrib.messages import constants as messages
 from pathlib import Path
 import os
@@ -163,6 +164,42 @@ LOGIN_URL = '/accounts/login/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Snapshot de configuración en memoria (configuracion/snapshot.py):
+# cada cuántos segundos se compara contra ConfigVersion y cada cuántos se recarga igual.
+CONFIG_SNAPSHOT_CHECK_SEGUNDOS = int(os.environ.get('CONFIG_SNAPSHOT_CHECK_SEGUNDOS', '5'))
+CONFIG_SNAPSHOT_TTL_SEGUNDOS = int(os.environ.get('CONFIG_SNAPSHOT_TTL_SEGUNDOS', '300'))
+
+# Auditoría (auditoria/writer.py): 'buffer' escribe un lote por transacción en
+# on_commit, 'celery' delega el lote a un worker y 'sincrono' hace un INSERT por fila.
+AUDITORIA_MODO = os.environ.get('AUDITORIA_MODO', 'buffer')
+AUDITORIA_EXCLUIR_MODELOS = set()
+# {'Modelo': tasa}: fracción de actualizaciones registradas para modelos muy escritos.
+AUDITORIA_MUESTREO = {}
+
+# Registro de modelos ML (core/ai_ml/registro.py): cada cuántos segundos se
+# compara el mtime del artefacto para recargar modelos reentrenados.
+ML_MODELOS_CHECK_SEGUNDOS = int(os.environ.get('ML_MODELOS_CHECK_SEGUNDOS', '10'))
+
+# Chequeos AJAX de stock de pedidos (pedidos/utils.py verificar_escenarios): segundos
+# que se reutiliza el stock leído de cada insumo. 0 = siempre desde la BD.
+STOCK_SNAPSHOT_TTL_SEGUNDOS = int(os.environ.get('STOCK_SNAPSHOT_TTL_SEGUNDOS', '0'))
+# Efectos de Pedido.save (pedidos/efectos.py): se ejecutan después del commit en un
+# worker del proceso ('hilo'), en Celery ('celery') o en el mismo hilo ('sincrono').
+PEDIDOS_EFECTOS_MODO = os.environ.get('PEDIDOS_EFECTOS_MODO', 'hilo')
+# Resúmenes de KPI del tablero (estadisticas/resumen.py): recalcular los días tocados
+# en cada commit (si no, sólo la tarea nocturna) y cuántos días recalcula esa tarea.
+KPI_RESUMEN_EN_LINEA = os.environ.get('KPI_RESUMEN_EN_LINEA', 'True').lower() in ('true', '1', 'yes')
+KPI_RESUMEN_DIAS_COMPACTAR = int(os.environ.get('KPI_RESUMEN_DIAS_COMPACTAR', '3'))
+# Gráficos de los informes PDF (estadisticas/graficos.py): procesos que los dibujan en
+# paralelo (0: en el hilo del request), segundos que se cachean los PNG, si cada
+# worker precalienta matplotlib y el pool al cargar impre_tucan/wsgi.py y cuántos
+# segundos se esperan los gráficos del pool antes de fallar. Pool y precalentado
+# son opcionales: cada proceso del pool suma la memoria de un worker.
+GRAFICOS_PROCESOS = int(os.environ.get('GRAFICOS_PROCESOS', '0'))
+GRAFICOS_CACHE_SEGUNDOS = int(os.environ.get('GRAFICOS_CACHE_SEGUNDOS', '600'))
+GRAFICOS_PRECALENTAR = os.environ.get('GRAFICOS_PRECALENTAR', 'False').lower() in ('true', '1', 'yes')
+GRAFICOS_TIMEOUT_SEGUNDOS = float(os.environ.get('GRAFICOS_TIMEOUT_SEGUNDOS', '60'))
+
 
 MESSAGE_TAGS = {
     messages.DEBUG: 'debug',
@@ -228,6 +265,27 @@ CELERY_BEAT_SCHEDULE = {
         'task': 'automatizacion.tasks.tarea_alertar_pagos_por_vencer',
         'schedule': 24 * 60 * 60,  # cada día
     },
+    # Reintentos y efectos abandonados del outbox de pedidos
+    'procesar-efectos-pedido-cada-minuto': {
+        'task': 'pedidos.tasks.procesar_efectos_pedido',
+        'schedule': 60,
+    },
+    # Estadísticas de montos por cliente para detectar anomalías de pedidos
+    'estadisticas-anomalias-cada-hora': {
+        'task': 'automatizacion.tasks.tarea_estadisticas_anomalias',
+        'schedule': 60 * 60,
+    },
+    'reconstruir-estadisticas-anomalias-diario': {
+        'task': 'automatizacion.tasks.tarea_estadisticas_anomalias',
+        'schedule': 24 * 60 * 60,
+        'kwargs': {'reconstruir': True},
+    },
+    # Compactación nocturna de los resúmenes de KPI del tablero de estadísticas.
+    # Sin beat: `manage.py recalcular_resumen_kpi --compactar` desde cron.
+    'compactar-resumen-kpi-diario': {
+        'task': 'estadisticas.tasks.compactar_resumen_kpi',
+        'schedule': crontab(hour=3, minute=30),
+    },
 }
 
 from .celery import app as celery_app
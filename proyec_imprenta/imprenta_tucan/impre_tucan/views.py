@@ -98,13 +98,7 @@ def dashboard(request):
     facturas_pendientes = 0
     try:
         from pedidos.models import Factura
-        from django.db.models import Sum as _Sum
-        _ids_pagadas = [
-            f.pk for f in Factura.objects.prefetch_related('pagos').annotate(
-                _pagado=_Sum('pagos__monto')
-            ) if (f._pagado or 0) >= f.monto_total
-        ]
-        facturas_pendientes = Factura.objects.exclude(pk__in=_ids_pagadas).count()
+        facturas_pendientes = Factura.objects.with_cobro().exclude(cobro_estado_pago='pagada').count()
     except Exception:
         pass
 
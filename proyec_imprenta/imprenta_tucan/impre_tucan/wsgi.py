@@ -4,3 +4,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'impre_tucan.settings')
 
 application = get_wsgi_application()
+
+# Opcional (GRAFICOS_PRECALENTAR): cada worker carga matplotlib (y levanta el pool de
+# gráficos, si GRAFICOS_PROCESOS > 0) al iniciar en lugar de en el primer informe
+from django.conf import settings  # noqa: E402
+
+if settings.GRAFICOS_PRECALENTAR:
+    from estadisticas import graficos  # noqa: E402
+
+    graficos.precalentar()
@@ -0,0 +1,38 @@
+"""
+Backfill / reparación del agregado ConsumoMensualInsumo desde ConsumoRealInsumo.
+
+El agregado se mantiene solo con cada alta, cambio o baja de consumos; este
+comando lo reconstruye para cargas que no pasan por save()/delete()
+(QuerySet.update, bulk_create, SQL directo) o para verificar que no divergió.
+
+Uso:
+    python manage.py recalcular_consumo_mensual
+    python manage.py recalcular_consumo_mensual --insumo 12 --insumo 40
+"""
+import logging
+
+from django.core.management.base import BaseCommand
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Reconstruye ConsumoMensualInsumo (total y registros por insumo y período) desde ConsumoRealInsumo."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--insumo',
+            type=int,
+            action='append',
+            dest='insumos',
+            help='idInsumo a reconstruir (repetible). Sin este flag se reconstruye todo.',
+        )
+
+    def handle(self, *args, **options):
+        from insumos.models import ConsumoMensualInsumo
+
+        filas = ConsumoMensualInsumo.reconstruir(insumo_ids=options['insumos'])
+        alcance = f"{len(options['insumos'])} insumos" if options['insumos'] else "todos los insumos"
+        resumen = f"Completado: {filas} filas (insumo, período) para {alcance}"
+        self.stdout.write(self.style.SUCCESS(resumen))
+        logger.info("recalcular_consumo_mensual: %s", resumen)
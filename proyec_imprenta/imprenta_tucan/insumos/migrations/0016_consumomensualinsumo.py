@@ -0,0 +1,50 @@
+# Generated by Django 5.2.7 on 2026-10-18 14:10
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def poblar_consumo_mensual(apps, schema_editor):
+    """Backfill inicial del agregado desde los registros de ConsumoRealInsumo existentes."""
+    from django.db.models import Count, Sum
+    ConsumoRealInsumo = apps.get_model('insumos', 'ConsumoRealInsumo')
+    ConsumoMensualInsumo = apps.get_model('insumos', 'ConsumoMensualInsumo')
+    ConsumoMensualInsumo.objects.bulk_create(
+        [
+            ConsumoMensualInsumo(insumo_id=insumo_id, periodo=periodo, total=total, n=n)
+            for insumo_id, periodo, total, n in (
+                ConsumoRealInsumo.objects.order_by()
+                .values('insumo_id', 'periodo')
+                .annotate(total=Sum('cantidad_consumida'), n=Count('id'))
+                .values_list('insumo_id', 'periodo', 'total', 'n')
+            )
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('insumos', '0015_remove_insumo_cantidad_add_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumoMensualInsumo',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('periodo', models.CharField(max_length=20)),
+                ('total', models.BigIntegerField(default=0)),
+                ('n', models.PositiveIntegerField(default=0)),
+                ('actualizado', models.DateTimeField(auto_now=True)),
+                ('insumo', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='consumos_mensuales', to='insumos.insumo')),
+            ],
+            options={
+                'verbose_name': 'Consumo Mensual de Insumo',
+                'verbose_name_plural': 'Consumos Mensuales de Insumos',
+                'unique_together': {('insumo', 'periodo')},
+            },
+        ),
+        migrations.RunPython(poblar_consumo_mensual, migrations.RunPython.noop),
+    ]
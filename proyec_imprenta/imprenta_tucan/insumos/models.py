@@ -11,7 +11,14 @@ def predecir_demanda_media_movil(insumo, periodo_actual, meses=3):
     Si no hay dato para un período, ese período simplemente no aporta peso,
     evitando que promedios bajen artificialmente por datos faltantes.
     """
-    from insumos.models import ConsumoRealInsumo
+    from insumos.models import ConsumoMensualInsumo
+    periodos = periodos_previos(periodo_actual, meses)
+    consumos = ConsumoMensualInsumo.serie(insumo, periodos)
+    return media_movil_ponderada(consumos, periodo_actual, meses=meses)
+
+
+def periodos_previos(periodo_actual, meses):
+    """Lista de los N períodos 'YYYY-MM' anteriores, del más reciente al más antiguo."""
     año, mes = map(int, periodo_actual.split('-'))
     periodos = []
     for i in range(1, meses + 1):
@@ -21,14 +28,45 @@ def predecir_demanda_media_movil(insumo, periodo_actual, meses=3):
             m += 12
             y -= 1
         periodos.append(f"{y:04d}-{m:02d}")
+    return periodos
+
+
+def periodo_inicio_anual(periodo_actual=None):
+    """
+    Primer período 'YYYY-MM' de la ventana de 12 meses que termina en
+    periodo_actual (incluido). Por defecto, el mes en curso.
+    """
+    if periodo_actual is None:
+        from django.utils import timezone
+        periodo_actual = timezone.now().strftime('%Y-%m')
+    return periodos_previos(periodo_actual, 11)[-1]
+
+
+def media_movil_ponderada(consumos, periodo_actual, meses=3):
+    """
+    Media móvil ponderada sobre ternas (periodo, total, n) ya cargadas en memoria.
+
+    Núcleo de predecir_demanda_media_movil() sin acceso a BD: permite que los
+    motores batch carguen el historial de todos los insumos en una sola query
+    y obtengan exactamente el mismo resultado que la versión por insumo.
+    Cada registro de consumo del período aporta su peso, así que un período
+    con n registros pesa n veces (igual que promediar las filas crudas).
+    Las ternas fuera de la ventana se ignoran.
+    """
+    periodos = periodos_previos(periodo_actual, meses)
     # peso_por_periodo: el período más reciente (periodos[0]) obtiene el mayor peso
     peso_por_periodo = {p: meses - i for i, p in enumerate(periodos)}
-    consumos = ConsumoRealInsumo.objects.filter(insumo=insumo, periodo__in=periodos)
-    if not consumos.exists():
+    suma_ponderada = 0
+    suma_pesos = 0
+    for periodo, total, n in consumos:
+        peso = peso_por_periodo.get(periodo)
+        if peso is None:
+            continue
+        suma_ponderada += total * peso
+        suma_pesos += n * peso
+    if suma_pesos == 0:
         return None
-    suma_ponderada = sum(c.cantidad_consumida * peso_por_periodo[c.periodo] for c in consumos)
-    suma_pesos     = sum(peso_por_periodo[c.periodo] for c in consumos)
-    return round(suma_ponderada / suma_pesos) if suma_pesos > 0 else None
+    return round(suma_ponderada / suma_pesos)
 from django.db import models
 from proveedores.models import Proveedor
 from usuarios.models import Usuario
@@ -81,12 +119,8 @@ class Insumo(models.Model):
     @property
     def consumo_promedio_mensual(self):
         # Si hay registros de consumo real, calcular el promedio del último año
-        from insumos.models import ConsumoRealInsumo
-        from django.utils import timezone
-        import datetime
-        hace_un_ano = timezone.now() - datetime.timedelta(days=365)
-        consumos = ConsumoRealInsumo.objects.filter(insumo=self, fecha_registro__gte=hace_un_ano)
-        total = sum(c.cantidad_consumida for c in consumos)
+        from insumos.models import ConsumoMensualInsumo
+        total = ConsumoMensualInsumo.total_anual(self)
         meses = 12
         return total / meses if total > 0 else 0
 
@@ -188,15 +222,141 @@ class ConsumoRealInsumo(models.Model):
         return f"{self.insumo} - {self.periodo}: {self.cantidad_consumida}"
 
 
-def predecir_demanda_ets(insumo, periodo_actual, alpha=None):
-    from insumos.models import ConsumoRealInsumo
+class ConsumoMensualInsumo(models.Model):
+    """
+    Agregado de ConsumoRealInsumo por (insumo, período): suma consumida y
+    cantidad de registros. Los pronósticos leen de acá con una consulta
+    indexada en lugar de recorrer los eventos de consumo crudos.
+
+    Se mantiene por deltas desde los signals de ConsumoRealInsumo
+    (insumos/signals.py); las escrituras que no pasan por save()/delete()
+    — QuerySet.update(), bulk_create() — requieren
+    `manage.py recalcular_consumo_mensual`.
+    """
+    insumo = models.ForeignKey(Insumo, on_delete=models.CASCADE, to_field='idInsumo',
+                               related_name='consumos_mensuales')
+    periodo = models.CharField(max_length=20)  # Ej: '2025-12'
+    total = models.BigIntegerField(default=0)
+    n = models.PositiveIntegerField(default=0)
+    actualizado = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('insumo', 'periodo')
+        verbose_name = 'Consumo Mensual de Insumo'
+        verbose_name_plural = 'Consumos Mensuales de Insumos'
+
+    def __str__(self):
+        return f"{self.insumo_id} - {self.periodo}: {self.total} ({self.n})"
+
+    @classmethod
+    def serie(cls, insumo, periodos=None):
+        """Ternas (periodo, total, n) del insumo, opcionalmente acotadas a `periodos`."""
+        qs = cls.objects.filter(insumo=insumo)
+        if periodos is not None:
+            qs = qs.filter(periodo__in=periodos)
+        return list(qs.order_by('periodo').values_list('periodo', 'total', 'n'))
+
+    @classmethod
+    def totales(cls, insumo, periodos=None):
+        """{periodo: total} del insumo, opcionalmente acotado a `periodos`."""
+        return {per: total for per, total, _n in cls.serie(insumo, periodos)}
+
+    @classmethod
+    def total_anual(cls, insumo, periodo_actual=None):
+        """Consumo total de los últimos 12 períodos (incluido el actual)."""
+        from django.db.models import Sum
+        total = (
+            cls.objects
+            .filter(insumo=insumo, periodo__gte=periodo_inicio_anual(periodo_actual))
+            .aggregate(total=Sum('total'))['total']
+        )
+        return total or 0
+
+    @classmethod
+    def totales_anuales(cls, insumo_ids, periodo_actual=None) -> dict:
+        """total_anual() de varios insumos en una consulta: {insumo_id: total}."""
+        from django.db.models import Sum
+        filas = (
+            cls.objects
+            .filter(insumo_id__in=list(insumo_ids), periodo__gte=periodo_inicio_anual(periodo_actual))
+            .order_by()
+            .values('insumo_id')
+            .annotate(total=Sum('total'))
+            .values_list('insumo_id', 'total')
+        )
+        return {iid: total or 0 for iid, total in filas}
+
+    @classmethod
+    def aplicar_delta(cls, insumo_id, periodo, total, n):
+        """
+        Suma (total, n) a la fila del período, creándola si no existe.
+        Una fila que queda sin registros (n == 0) se elimina.
+        """
+        from django.db import IntegrityError, transaction
+        from django.db.models import F
+        from django.utils import timezone
+
+        filtro = cls.objects.filter(insumo_id=insumo_id, periodo=periodo)
+
+        def _actualizar():
+            return filtro.update(total=F('total') + total, n=F('n') + n, actualizado=timezone.now())
+
+        with transaction.atomic():
+            if not _actualizar():
+                if n <= 0:
+                    # Baja sobre un período que el agregado no tiene: nada que restar.
+                    return
+                try:
+                    with transaction.atomic():
+                        cls.objects.create(insumo_id=insumo_id, periodo=periodo, total=total, n=n)
+                except IntegrityError:
+                    # Otra transacción creó la fila entre el UPDATE y el INSERT
+                    _actualizar()
+            if n < 0:
+                filtro.filter(n__lte=0).delete()
+
+    @classmethod
+    def reconstruir(cls, insumo_ids=None):
+        """
+        Recalcula el agregado desde ConsumoRealInsumo (backfill / reparación).
+        Sin `insumo_ids` reconstruye la tabla completa. Retorna las filas escritas.
+        """
+        from django.db import transaction
+        from django.db.models import Count, Sum
+
+        crudos = ConsumoRealInsumo.objects.all()
+        existentes = cls.objects.all()
+        if insumo_ids is not None:
+            crudos = crudos.filter(insumo_id__in=insumo_ids)
+            existentes = existentes.filter(insumo_id__in=insumo_ids)
+        filas = [
+            cls(insumo_id=insumo_id, periodo=periodo, total=total, n=n)
+            for insumo_id, periodo, total, n in (
+                crudos.order_by()
+                .values('insumo_id', 'periodo')
+                .annotate(total=Sum('cantidad_consumida'), n=Count('id'))
+                .values_list('insumo_id', 'periodo', 'total', 'n')
+            )
+        ]
+        with transaction.atomic():
+            existentes.delete()
+            cls.objects.bulk_create(filas, batch_size=1000)
+        return len(filas)
+
+
+def alpha_ets(alpha=None):
+    """Constante de suavizado del ETS: parámetro DEMANDA_ETS_ALPHA acotado a [0.1, 0.9]."""
     if alpha is None:
         try:
             from configuracion.models import Parametro
             alpha = float(Parametro.get('DEMANDA_ETS_ALPHA', 0.3))
         except Exception:
             alpha = 0.3
-    alpha = max(0.1, min(0.9, alpha))
+    return max(0.1, min(0.9, alpha))
+
+
+def periodos_ets(periodo_actual):
+    """Los 12 períodos previos a periodo_actual, del más antiguo al más reciente."""
     anio, mes = map(int, periodo_actual.split('-'))
     periodos = []
     for i in range(12, 0, -1):
@@ -206,11 +366,24 @@ def predecir_demanda_ets(insumo, periodo_actual, alpha=None):
             m += 12
             y -= 1
         periodos.append(f'{y:04d}-{m:02d}')
-    consumos_map = dict(
-        ConsumoRealInsumo.objects
-        .filter(insumo=insumo, periodo__in=periodos)
-        .values_list('periodo', 'cantidad_consumida')
-    )
+    return periodos
+
+
+def predecir_demanda_ets(insumo, periodo_actual, alpha=None):
+    from insumos.models import ConsumoMensualInsumo
+    alpha = alpha_ets(alpha)
+    periodos = periodos_ets(periodo_actual)
+    return suavizado_exponencial(ConsumoMensualInsumo.serie(insumo, periodos), periodo_actual, alpha)
+
+
+def suavizado_exponencial(consumos, periodo_actual, alpha):
+    """
+    Núcleo de predecir_demanda_ets() sobre ternas (periodo, total, n) ya
+    cargadas; alpha ya resuelto con alpha_ets().
+    """
+    periodos = periodos_ets(periodo_actual)
+    # Un valor por período: el promedio de sus registros de consumo
+    consumos_map = {per: total / n for per, total, n in consumos if n}
     valores = [float(consumos_map[p]) for p in periodos if p in consumos_map]
     if not valores:
         return None
@@ -4,10 +4,13 @@ Signals de tiempo real para la app insumos.
 Cuando el stock de un insumo cambia y cae por debajo del mínimo sugerido,
 se crea una Notificacion para todos los usuarios staff automáticamente,
 sin esperar al ciclo diario de Celery.
+
+Cada alta, cambio o baja de ConsumoRealInsumo se refleja por delta en el
+agregado ConsumoMensualInsumo que leen los pronósticos de demanda.
 """
 import logging
 
-from django.db.models.signals import post_save, pre_save
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
 from django.dispatch import receiver
 
 logger = logging.getLogger(__name__)
@@ -34,42 +37,159 @@ def _alerta_stock_bajo(sender, instance, created, **kwargs):
     try:
         stock_actual = int(instance.stock or 0)
         stock_previo = getattr(instance, '_stock_previo', stock_actual)
-        stock_minimo = int(instance.stock_minimo_sugerido or 0)
-
         # Solo actuar si el stock bajó en este guardado
         if stock_actual >= stock_previo:
             return
+        mensaje = _mensaje_alerta_stock(
+            instance, stock_previo, stock_actual, int(instance.stock_minimo_sugerido or 0)
+        )
+        if mensaje:
+            _crear_notificaciones_staff(mensaje)
+
+    except Exception as exc:
+        logger.exception('Error en signal _alerta_stock_bajo para insumo %s: %s', getattr(instance, 'pk', '?'), exc)
+
+
+def _mensaje_alerta_stock(insumo, stock_previo: int, stock_actual: int, stock_minimo: int):
+    """
+    Texto de la alerta si el stock bajó cruzando un umbral, o None:
+      - El stock llegó a 0 (alerta crítica inmediata).
+      - El stock cayó por debajo del mínimo sugerido (cruce, no solo si está bajo).
+    """
+    # Alerta crítica: llegó a 0
+    if stock_actual == 0 and stock_previo > 0:
+        return (
+            f'⚠️ STOCK AGOTADO: {insumo.nombre} [{insumo.codigo}] — '
+            f'stock en 0. Compra inmediata requerida.'
+        )
+    # Alerta de mínimo: cruzó el umbral (estaba arriba, ahora está abajo)
+    if stock_minimo > 0 and stock_previo >= stock_minimo and stock_actual < stock_minimo:
+        faltante = stock_minimo - stock_actual
+        return (
+            f'🔔 Stock bajo mínimo: {insumo.nombre} [{insumo.codigo}] — '
+            f'stock={stock_actual}, mínimo={stock_minimo}. '
+            f'Reponer al menos {faltante} unidades.'
+        )
+    return None
+
+
+def alertar_descuentos_stock(movimientos) -> None:
+    """
+    Versión por lote de _alerta_stock_bajo para descuentos que no pasan por
+    Insumo.save() (reserva de stock de pedidos con UPDATE condicional).
+
+    movimientos: [(insumo, stock_previo, stock_actual)]. Los mínimos sugeridos
+    se resuelven en una consulta y las notificaciones en un solo bulk_create.
+    """
+    try:
+        import numpy as np
+        from core.ai_ml.pronostico_catalogo import stock_minimo_sugerido
+        from insumos.models import ConsumoMensualInsumo
 
-        # Alerta crítica: llegó a 0
-        if stock_actual == 0 and stock_previo > 0:
-            _crear_notificaciones_staff(
-                f'⚠️ STOCK AGOTADO: {instance.nombre} [{instance.codigo}] — '
-                f'stock en 0. Compra inmediata requerida.'
-            )
+        bajaron = [(ins, previo, actual) for ins, previo, actual in movimientos if actual < previo]
+        if not bajaron:
             return
+        sin_calculado = [ins.idInsumo for ins, _p, _a in bajaron if ins.stock_minimo_calculado is None]
+        anuales = ConsumoMensualInsumo.totales_anuales(sin_calculado) if sin_calculado else {}
+        try:
+            from configuracion.models import Parametro
+            dias_reposicion = int(Parametro.get('DIAS_REPOSICION_INSUMO', 15))
+        except Exception:
+            dias_reposicion = 15
 
-        # Alerta de mínimo: cruzó el umbral (estaba arriba, ahora está abajo)
-        if stock_minimo > 0 and stock_previo >= stock_minimo and stock_actual < stock_minimo:
-            faltante = stock_minimo - stock_actual
-            _crear_notificaciones_staff(
-                f'🔔 Stock bajo mínimo: {instance.nombre} [{instance.codigo}] — '
-                f'stock={stock_actual}, mínimo={stock_minimo}. '
-                f'Reponer al menos {faltante} unidades.'
-            )
+        def _columna(valores):
+            return np.array([np.nan if v is None else v for v in valores], dtype=float)
 
+        minimos = stock_minimo_sugerido(
+            _columna(ins.stock_minimo_calculado for ins, _p, _a in bajaron),
+            _columna(ins.stock_minimo_manual for ins, _p, _a in bajaron),
+            [anuales.get(ins.idInsumo, 0) for ins, _p, _a in bajaron],
+            dias_reposicion,
+        )
+        mensajes = [
+            _mensaje_alerta_stock(ins, previo, actual, int(minimo))
+            for (ins, previo, actual), minimo in zip(bajaron, minimos)
+        ]
+        mensajes = [m for m in mensajes if m]
+        if mensajes:
+            _crear_notificaciones_staff(*mensajes)
     except Exception as exc:
-        logger.exception('Error en signal _alerta_stock_bajo para insumo %s: %s', getattr(instance, 'pk', '?'), exc)
+        logger.exception('Error en alertar_descuentos_stock: %s', exc)
 
 
-def _crear_notificaciones_staff(mensaje: str) -> None:
-    """Crea una Notificacion por cada usuario staff activo."""
+def _crear_notificaciones_staff(*mensajes: str) -> None:
+    """Crea una Notificacion por cada usuario staff activo y mensaje."""
     try:
         from usuarios.models import Usuario, Notificacion
-        staff = Usuario.objects.filter(is_staff=True, estado='Activo').values_list('id', flat=True)
+        staff = list(Usuario.objects.filter(is_staff=True, estado='Activo').values_list('id', flat=True))
         Notificacion.objects.bulk_create(
-            [Notificacion(usuario_id=uid, mensaje=mensaje) for uid in staff],
+            [Notificacion(usuario_id=uid, mensaje=mensaje) for mensaje in mensajes for uid in staff],
             ignore_conflicts=True,
         )
-        logger.info('Notificación stock enviada a %d usuarios staff: %s', len(staff), mensaje[:80])
+        for mensaje in mensajes:
+            logger.info('Notificación stock enviada a %d usuarios staff: %s', len(staff), mensaje[:80])
     except Exception as exc:
         logger.exception('Error creando notificaciones staff: %s', exc)
+
+
+# --------------------------------------------------------------------------- #
+# Agregado mensual de consumos                                                  #
+# --------------------------------------------------------------------------- #
+
+_CAMPOS_CONSUMO = ('insumo_id', 'periodo', 'cantidad_consumida')
+
+
+@receiver(post_init, sender='insumos.ConsumoRealInsumo')
+def _consumo_cargado(sender, instance, **kwargs):
+    """(insumo, periodo, cantidad) con que se leyó el registro; None si alguno está diferido."""
+    data = instance.__dict__
+    instance._consumo_cargado = (
+        None if instance.pk is None or any(a not in data for a in _CAMPOS_CONSUMO)
+        else tuple(data[a] for a in _CAMPOS_CONSUMO)
+    )
+
+
+@receiver(pre_save, sender='insumos.ConsumoRealInsumo')
+def _capturar_consumo_previo(sender, instance, using, **kwargs):
+    """Guarda (insumo, periodo, cantidad) previos para calcular el delta del agregado."""
+    instance._consumo_previo = None
+    if instance.pk is None:
+        return
+    cargado = getattr(instance, '_consumo_cargado', None)
+    if cargado is not None and not instance._state.adding:
+        instance._consumo_previo = cargado
+        return
+    # Campos diferidos o instancia armada a mano con pk: se lee de la base
+    instance._consumo_previo = (
+        sender._base_manager.using(using).filter(pk=instance.pk)
+        .values_list(*_CAMPOS_CONSUMO)
+        .first()
+    )
+
+
+@receiver(post_save, sender='insumos.ConsumoRealInsumo')
+def _actualizar_consumo_mensual(sender, instance, **kwargs):
+    """Aplica a ConsumoMensualInsumo la diferencia entre el registro previo y el guardado."""
+    from insumos.models import ConsumoMensualInsumo
+
+    previo = getattr(instance, '_consumo_previo', None)
+    actual = (instance.insumo_id, instance.periodo, instance.cantidad_consumida)
+    # El estado guardado pasa a ser la base del próximo delta de esta instancia
+    instance._consumo_cargado = actual
+    if previo and previo[:2] == actual[:2]:
+        if previo[2] != actual[2]:
+            ConsumoMensualInsumo.aplicar_delta(actual[0], actual[1], actual[2] - previo[2], 0)
+        return
+    # Alta, o cambio de insumo/período: se mueve el registro de una fila a otra
+    if previo:
+        ConsumoMensualInsumo.aplicar_delta(previo[0], previo[1], -previo[2], -1)
+    ConsumoMensualInsumo.aplicar_delta(actual[0], actual[1], actual[2], 1)
+
+
+@receiver(post_delete, sender='insumos.ConsumoRealInsumo')
+def _descontar_consumo_mensual(sender, instance, **kwargs):
+    """Resta el registro eliminado del agregado (también en bajas masivas vía QuerySet)."""
+    from insumos.models import ConsumoMensualInsumo
+    ConsumoMensualInsumo.aplicar_delta(
+        instance.insumo_id, instance.periodo, -instance.cantidad_consumida, -1
+    )
@@ -4,8 +4,12 @@ from pedidos.models import Pedido
 from proveedores.models import Proveedor
 from django.utils import timezone
 
+# Filas por INSERT ... ON CONFLICT al persistir proyecciones
+TAM_LOTE_PROYECCIONES = 500
+
+
 @shared_task
-def generar_proyecciones_insumos():
+def generar_proyecciones_insumos(batch=True):
     """
     Genera proyecciones mensuales de demanda para cada insumo activo.
 
@@ -18,13 +22,28 @@ def generar_proyecciones_insumos():
         2. Si tampoco hay mínimo sugerido (0), el insumo se omite.
 
     El campo `fuente` registra de dónde proviene el valor proyectado.
+
+    batch=True (default) pronostica el catálogo completo sobre una matriz
+    insumos × períodos (core.ai_ml.pronostico_catalogo) y persiste con upserts
+    por lote; batch=False usa la ruta original insumo por insumo. Ambas
+    producen las mismas proyecciones.
     """
-    from insumos.models import predecir_demanda_media_movil, predecir_demanda_ets
     from core.motor.config import MotorConfig
 
     periodo = timezone.now().strftime('%Y-%m')
     meses = MotorConfig.get('PROYECCION_MESES', cast=int) or 3
     algoritmo = str(MotorConfig.get('ALGORITMO_PROYECCION') or 'media_movil').strip()
+    if batch:
+        generadas, omitidas = _generar_proyecciones_batch(periodo, meses, algoritmo)
+    else:
+        generadas, omitidas = _generar_proyecciones_por_insumo(periodo, meses, algoritmo)
+    return f'Proyecciones generadas: {generadas} | Sin datos (omitidas): {omitidas}'
+
+
+def _generar_proyecciones_por_insumo(periodo, meses, algoritmo):
+    """Ruta original: una predicción y un update_or_create por insumo."""
+    from insumos.models import predecir_demanda_media_movil, predecir_demanda_ets
+
     generadas = 0
     omitidas = 0
 
@@ -62,4 +81,77 @@ def generar_proyecciones_insumos():
         )
         generadas += 1
 
-    return f'Proyecciones generadas: {generadas} | Sin datos (omitidas): {omitidas}'
+    return generadas, omitidas
+
+
+def _generar_proyecciones_batch(periodo, meses, algoritmo):
+    """
+    Misma lógica que _generar_proyecciones_por_insumo() para todo el catálogo:
+    una consulta de insumos, una de consumos mensuales, el pronóstico como
+    operaciones sobre la matriz y un upsert cada TAM_LOTE_PROYECCIONES filas.
+    """
+    import numpy as np
+    from core.ai_ml.pronostico_catalogo import (
+        MatrizConsumos, desde_para_ventana, stock_minimo_sugerido,
+    )
+    from insumos.models import alpha_ets
+
+    filas = list(
+        Insumo.objects.filter(activo=True)
+        .values_list('idInsumo', 'proveedor_id', 'stock_minimo_calculado', 'stock_minimo_manual')
+    )
+    if not filas:
+        return 0, 0
+    ids = [f[0] for f in filas]
+    matriz = MatrizConsumos.cargar(ids, desde=desde_para_ventana(periodo, meses))
+
+    if algoritmo == 'ets':
+        cantidades = matriz.ets(periodo, alpha_ets())
+    else:
+        cantidades = matriz.media_movil(periodo, meses=meses)
+
+    sin_datos = np.isnan(cantidades)
+    fallback = np.zeros(len(filas), dtype=np.int64)
+    if sin_datos.any():
+        try:
+            from configuracion.models import Parametro
+            dias_reposicion = int(Parametro.get('DIAS_REPOSICION_INSUMO', 15))
+        except Exception:
+            dias_reposicion = 15
+        fallback = stock_minimo_sugerido(
+            np.array([np.nan if f[2] is None else f[2] for f in filas], dtype=float),
+            np.array([np.nan if f[3] is None else f[3] for f in filas], dtype=float),
+            matriz.total_anual(periodo),
+            dias_reposicion,
+        )
+
+    proyecciones = []
+    omitidas = 0
+    for i, (insumo_id, proveedor_id, _calculado, _manual) in enumerate(filas):
+        fuente = algoritmo
+        if sin_datos[i]:
+            # Fallback: usar stock mínimo sugerido
+            cantidad_proyectada = int(fallback[i])
+            fuente = ProyeccionInsumo.FUENTE_STOCK_MINIMO
+        else:
+            cantidad_proyectada = int(cantidades[i])
+        if cantidad_proyectada <= 0:
+            omitidas += 1
+            continue
+        proyecciones.append(ProyeccionInsumo(
+            insumo_id=insumo_id,
+            periodo=periodo,
+            cantidad_proyectada=cantidad_proyectada,
+            proveedor_sugerido_id=proveedor_id,
+            estado='pendiente',
+            fuente=fuente,
+        ))
+
+    for inicio in range(0, len(proyecciones), TAM_LOTE_PROYECCIONES):
+        ProyeccionInsumo.objects.bulk_create(
+            proyecciones[inicio:inicio + TAM_LOTE_PROYECCIONES],
+            update_conflicts=True,
+            unique_fields=['insumo', 'periodo'],
+            update_fields=['cantidad_proyectada', 'proveedor_sugerido', 'estado', 'fuente'],
+        )
+    return len(proyecciones), omitidas
@@ -0,0 +1,342 @@
+"""
+Outbox transaccional de los efectos secundarios de Pedido.save.
+
+Pedido.save no habla más con servicios externos dentro de la transacción:
+cada efecto (notificación de entrega, factura + PDF + email, ajuste de score,
+consumo real) se encola como una fila EfectoPedido en la misma transacción
+que el cambio de estado y se ejecuta después del commit. Si la transacción
+se revierte, las filas desaparecen con ella. El movimiento de stock y el
+marcado de la oferta aplicada siguen dentro de la transacción: son parte
+del propio cambio (la oferta marcada evita aplicar dos veces el descuento).
+
+Despacho (settings.PEDIDOS_EFECTOS_MODO), siempre en transaction.on_commit:
+
+    'hilo'     (default) — un worker en segundo plano por proceso ejecuta los
+               efectos; la request responde sin esperarlos. Cada
+               EFECTO_BARRIDO_SEGUNDOS barre además los reintentos vencidos
+               y los abandonados, sin depender de celery beat.
+    'celery'   — la tarea pedidos.tasks.procesar_efectos_pedido; si el broker
+               no responde se usa el worker del proceso.
+    'sincrono' — se ejecutan en el mismo hilo, al confirmar la transacción.
+
+Reintentos: un efecto que lanza una excepción vuelve a 'pendiente' con
+backoff exponencial (EFECTO_BACKOFF_SEGUNDOS × 2^(intentos-1)) hasta
+EFECTO_MAX_INTENTOS; después queda en 'error' y se avisa a los
+administradores. El barrido del worker y la tarea periódica
+procesar_efectos_pedido toman los pendientes vencidos y los 'procesando'
+abandonados (EFECTO_LEASE_SEGUNDOS).
+
+Idempotencia: `clave` es única y depende de la política del efecto:
+
+    'unico'      — uno por pedido (factura): un segundo encolado se ignora.
+    'por_evento' — uno por transición (notificación de entrega, score al
+                   cancelar): cada encolado es un evento nuevo con su propio
+                   identificador (`tipo:pedido:uuid`), así dos transiciones
+                   concurrentes no chocan en la clave.
+    'repetible'  — una fila por pedido (consumo real) que vuelve a
+                   'pendiente' si ya se había ejecutado.
+
+Un efecto en 'error' se rearma (intentos en cero) si se vuelve a encolar.
+Cada fila se toma con un UPDATE condicionado, así que dos workers no
+ejecutan el mismo efecto a la vez; el resultado se escribe sólo si la fila
+sigue con ese mismo lease (`tomado_en`), así no pisa un rearmado hecho por
+encolar() mientras se ejecutaba ni a otro worker que la retomó.
+
+histograma_latencias() agrupa por tipo la latencia encolado → procesado (o
+la duración de la ejecución) de los efectos ya hechos.
+"""
+import logging
+import queue
+import threading
+import time
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, transaction
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+MODO_HILO = 'hilo'
+MODO_CELERY = 'celery'
+MODO_SINCRONO = 'sincrono'
+
+EFECTO_MAX_INTENTOS = 5
+EFECTO_BACKOFF_SEGUNDOS = 30
+EFECTO_LEASE_SEGUNDOS = 600
+# Cada cuánto el worker del modo 'hilo' barre los pendientes vencidos y abandonados
+EFECTO_BARRIDO_SEGUNDOS = 60
+
+# Límites superiores (segundos) de los buckets de histograma_latencias()
+LIMITES_HISTOGRAMA = (0.1, 0.5, 1, 5, 30, 60, 300, 3600)
+
+
+# --------------------------------------------------------------------------- #
+# Efectos                                                                      #
+# --------------------------------------------------------------------------- #
+
+def _notificar_entrega(pedido, **_payload):
+    from .services import notificar_entrega_pedido
+    notificar_entrega_pedido(pedido)
+
+
+def _emitir_factura(pedido, **_payload):
+    from .services import crear_factura_para_pedido
+    crear_factura_para_pedido(pedido)
+
+
+def _ajustar_score_cancelacion(pedido, **_payload):
+    from .services import ajustar_score_cancelacion
+    ajustar_score_cancelacion(pedido)
+
+
+def _registrar_consumo_real(pedido, **_payload):
+    from .services import registrar_consumo_real_pedido
+    registrar_consumo_real_pedido(pedido)
+
+
+UNICO = 'unico'
+POR_EVENTO = 'por_evento'
+REPETIBLE = 'repetible'
+
+# tipo → (función(pedido, **payload), política de idempotencia)
+EFECTOS = {
+    'notificar_entrega': (_notificar_entrega, POR_EVENTO),
+    'emitir_factura': (_emitir_factura, UNICO),
+    'ajustar_score_cancelacion': (_ajustar_score_cancelacion, POR_EVENTO),
+    'registrar_consumo_real': (_registrar_consumo_real, REPETIBLE),
+}
+
+
+# --------------------------------------------------------------------------- #
+# Encolado                                                                     #
+# --------------------------------------------------------------------------- #
+
+def modo() -> str:
+    return getattr(settings, 'PEDIDOS_EFECTOS_MODO', MODO_HILO)
+
+
+def encolar(pedido, tipo: str, **payload):
+    """
+    Registra el efecto `tipo` para `pedido` en la transacción actual y
+    programa su despacho para después del commit. Retorna el EfectoPedido.
+    """
+    from .models import EfectoPedido
+
+    _funcion, politica = EFECTOS[tipo]
+    clave = f'{tipo}:{pedido.pk}'
+    if politica == POR_EVENTO:
+        clave = f'{clave}:{uuid.uuid4().hex}'
+    ahora = timezone.now()
+    try:
+        with transaction.atomic():
+            efecto = EfectoPedido.objects.create(
+                pedido=pedido, tipo=tipo, clave=clave, payload=payload,
+                encolado=ahora, proximo_intento=ahora,
+            )
+    except IntegrityError:
+        efecto = EfectoPedido.objects.get(clave=clave)
+        rearmar = efecto.estado == EfectoPedido.ESTADO_ERROR or (
+            politica == REPETIBLE and efecto.estado != EfectoPedido.ESTADO_PENDIENTE
+        )
+        if not rearmar:
+            return efecto
+        # Repetible ya ejecutado o efecto agotado: vuelve a la cola con un encolado nuevo
+        EfectoPedido.objects.filter(pk=efecto.pk).update(
+            estado=EfectoPedido.ESTADO_PENDIENTE, payload=payload, intentos=0,
+            encolado=ahora, proximo_intento=ahora, procesado=None, ultimo_error='',
+        )
+
+    transaction.on_commit(lambda: despachar([efecto.pk]))
+    return efecto
+
+
+def despachar(ids) -> None:
+    """Entrega los efectos `ids` (ya confirmados) según PEDIDOS_EFECTOS_MODO."""
+    ids = list(ids)
+    if not ids:
+        return
+    if modo() == MODO_SINCRONO:
+        procesar(ids)
+        return
+    if modo() == MODO_CELERY:
+        try:
+            from .tasks import procesar_efectos_pedido
+            procesar_efectos_pedido.delay(ids)
+            return
+        except Exception as e:
+            logger.warning("efectos de pedido: broker no disponible (%s); se usa el worker del proceso.", e)
+    _worker().put(ids)
+
+
+# --------------------------------------------------------------------------- #
+# Ejecución                                                                    #
+# --------------------------------------------------------------------------- #
+
+def _tomar(efecto_id, ahora) -> bool:
+    """Marca el efecto como 'procesando' si está disponible; False si otro lo tomó."""
+    from django.db.models import Q
+    from .models import EfectoPedido
+
+    vencido = ahora - timedelta(seconds=EFECTO_LEASE_SEGUNDOS)
+    return EfectoPedido.objects.filter(
+        Q(estado=EfectoPedido.ESTADO_PENDIENTE, proximo_intento__lte=ahora)
+        | Q(estado=EfectoPedido.ESTADO_PROCESANDO, tomado_en__lt=vencido),
+        pk=efecto_id,
+    ).update(estado=EfectoPedido.ESTADO_PROCESANDO, tomado_en=ahora) == 1
+
+
+def _ejecutar(efecto) -> bool:
+    """
+    Ejecuta un efecto ya tomado y registra el resultado si la fila sigue con
+    el lease de _tomar(). True si terminó bien.
+    """
+    from .models import EfectoPedido
+
+    funcion, _politica = EFECTOS[efecto.tipo]
+    con_lease = EfectoPedido.objects.filter(
+        pk=efecto.pk, estado=EfectoPedido.ESTADO_PROCESANDO, tomado_en=efecto.tomado_en,
+    )
+    inicio = time.perf_counter()
+    try:
+        funcion(efecto.pedido, **(efecto.payload or {}))
+    except Exception as exc:
+        intentos = efecto.intentos + 1
+        agotado = intentos >= EFECTO_MAX_INTENTOS
+        logger.exception(
+            "efecto %s del pedido #%s falló (intento %s/%s)",
+            efecto.tipo, efecto.pedido_id, intentos, EFECTO_MAX_INTENTOS,
+        )
+        registrado = con_lease.update(
+            estado=EfectoPedido.ESTADO_ERROR if agotado else EfectoPedido.ESTADO_PENDIENTE,
+            intentos=intentos,
+            proximo_intento=timezone.now() + timedelta(seconds=EFECTO_BACKOFF_SEGUNDOS * 2 ** (intentos - 1)),
+            ultimo_error=f'{type(exc).__name__}: {exc}'[:2000],
+        )
+        if agotado and registrado:
+            _avisar_administradores(efecto, exc)
+        return False
+
+    if not con_lease.update(
+        estado=EfectoPedido.ESTADO_HECHO, intentos=efecto.intentos + 1, procesado=timezone.now(),
+        duracion_ms=(time.perf_counter() - inicio) * 1000, ultimo_error='',
+    ):
+        logger.info(
+            "efecto %s del pedido #%s: se rearmó o se retomó durante la ejecución; queda como está",
+            efecto.tipo, efecto.pedido_id,
+        )
+    return True
+
+
+def _avisar_administradores(efecto, exc) -> None:
+    try:
+        from django.core.mail import mail_admins
+        mail_admins(
+            subject=f"[Imprenta Tucán] Efecto {efecto.tipo} fallido — Pedido #{efecto.pedido_id}",
+            message=(
+                f"El efecto {efecto.tipo} del Pedido #{efecto.pedido_id} falló "
+                f"{EFECTO_MAX_INTENTOS} veces y no se reintentará.\n\n"
+                f"Último error: {type(exc).__name__}: {exc}\n"
+                f"Revisá los logs del servidor y EfectoPedido #{efecto.pk}."
+            ),
+            fail_silently=True,
+        )
+    except Exception:
+        pass  # mail_admins es best-effort, no debe romper nada
+
+
+def procesar(ids=None, limite: int = 200) -> dict:
+    """
+    Ejecuta los efectos `ids` (o, sin ids, los pendientes vencidos y los
+    abandonados, hasta `limite`). Retorna {'hechos': n, 'fallidos': n}.
+    """
+    from django.db.models import Q
+    from .models import EfectoPedido
+
+    ahora = timezone.now()
+    if ids is None:
+        vencido = ahora - timedelta(seconds=EFECTO_LEASE_SEGUNDOS)
+        ids = list(
+            EfectoPedido.objects.filter(
+                Q(estado=EfectoPedido.ESTADO_PENDIENTE, proximo_intento__lte=ahora)
+                | Q(estado=EfectoPedido.ESTADO_PROCESANDO, tomado_en__lt=vencido)
+            ).order_by('proximo_intento').values_list('pk', flat=True)[:limite]
+        )
+    tomados = [pk for pk in ids if _tomar(pk, ahora)]
+    resumen = {'hechos': 0, 'fallidos': 0}
+    for efecto in EfectoPedido.objects.filter(pk__in=tomados).select_related('pedido').order_by('pk'):
+        resumen['hechos' if _ejecutar(efecto) else 'fallidos'] += 1
+    return resumen
+
+
+# --------------------------------------------------------------------------- #
+# Worker en segundo plano (modo 'hilo')                                        #
+# --------------------------------------------------------------------------- #
+
+_cola = None
+_cola_lock = threading.Lock()
+
+
+def _bucle(cola) -> None:
+    """
+    Ejecuta los ids que llegan por la cola y, cada EFECTO_BARRIDO_SEGUNDOS,
+    procesar() sin ids: reintentos cuyo backoff venció y leases vencidos.
+    """
+    proximo_barrido = time.monotonic() + EFECTO_BARRIDO_SEGUNDOS
+    while True:
+        try:
+            ids = cola.get(timeout=max(0.0, proximo_barrido - time.monotonic()))
+        except queue.Empty:
+            ids = None
+        try:
+            close_old_connections()
+            if ids is not None:
+                procesar(ids)
+            if time.monotonic() >= proximo_barrido:
+                proximo_barrido = time.monotonic() + EFECTO_BARRIDO_SEGUNDOS
+                procesar()
+        except Exception:
+            logger.exception("efectos de pedido: error en el worker")
+        finally:
+            close_old_connections()
+            if ids is not None:
+                cola.task_done()
+
+
+def _worker() -> queue.Queue:
+    global _cola
+    with _cola_lock:
+        if _cola is None:
+            _cola = queue.Queue()
+            threading.Thread(target=_bucle, args=(_cola,), name='efectos-pedido', daemon=True).start()
+    return _cola
+
+
+# --------------------------------------------------------------------------- #
+# Métricas                                                                     #
+# --------------------------------------------------------------------------- #
+
+def histograma_latencias(desde=None, medida: str = 'latencia', limites=LIMITES_HISTOGRAMA) -> dict:
+    """
+    {tipo: [n por bucket]} de los efectos hechos desde `desde`. El bucket k
+    cuenta los valores <= limites[k]; el último, los que superan todos.
+
+    medida='latencia' usa encolado → procesado (lo que espera el usuario
+    hasta que el efecto ocurre); medida='duracion', el tiempo de ejecución.
+    """
+    import bisect
+    from .models import EfectoPedido
+
+    qs = EfectoPedido.objects.filter(estado=EfectoPedido.ESTADO_HECHO)
+    if desde is not None:
+        qs = qs.filter(procesado__gte=desde)
+    histograma = {}
+    for tipo, encolado, procesado, duracion_ms in qs.values_list('tipo', 'encolado', 'procesado', 'duracion_ms'):
+        if medida == 'duracion':
+            segundos = (duracion_ms or 0) / 1000
+        else:
+            segundos = (procesado - encolado).total_seconds()
+        buckets = histograma.setdefault(tipo, [0] * (len(limites) + 1))
+        buckets[bisect.bisect_left(limites, segundos)] += 1
+    return histograma
@@ -0,0 +1,56 @@
+"""
+Management command: procesar_efectos_pedido
+
+Ejecuta los efectos pendientes del outbox de pedidos (reintentos vencidos y
+efectos abandonados por un worker caído) o muestra el histograma de
+latencias por tipo de efecto.
+
+Uso:
+    python manage.py procesar_efectos_pedido
+    python manage.py procesar_efectos_pedido --histograma
+    python manage.py procesar_efectos_pedido --histograma --medida duracion --dias 7
+"""
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pedidos.efectos import LIMITES_HISTOGRAMA, histograma_latencias, procesar
+
+
+class Command(BaseCommand):
+    help = 'Procesa el outbox de efectos de pedidos o muestra su histograma de latencias'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--histograma',
+            action='store_true',
+            help='Muestra el histograma de latencias en lugar de procesar',
+        )
+        parser.add_argument(
+            '--medida', choices=['latencia', 'duracion'], default='latencia',
+            help='latencia = encolado → procesado; duracion = tiempo de ejecución',
+        )
+        parser.add_argument(
+            '--dias', type=int, default=1,
+            help='Ventana del histograma en días (default 1)',
+        )
+
+    def handle(self, *args, **options):
+        if not options['histograma']:
+            resumen = procesar()
+            self.stdout.write(self.style.SUCCESS(
+                f"Efectos procesados: {resumen['hechos']} hechos, {resumen['fallidos']} fallidos."
+            ))
+            return
+
+        desde = timezone.now() - timedelta(days=options['dias'])
+        histograma = histograma_latencias(desde=desde, medida=options['medida'])
+        if not histograma:
+            self.stdout.write('Sin efectos procesados en la ventana.')
+            return
+        encabezado = [f'<={limite}s' for limite in LIMITES_HISTOGRAMA] + [f'>{LIMITES_HISTOGRAMA[-1]}s']
+        ancho = max(len(tipo) for tipo in histograma)
+        self.stdout.write(' ' * ancho + ' ' + ' '.join(f'{c:>8}' for c in encabezado))
+        for tipo, buckets in sorted(histograma.items()):
+            self.stdout.write(f'{tipo:<{ancho}} ' + ' '.join(f'{n:>8}' for n in buckets))
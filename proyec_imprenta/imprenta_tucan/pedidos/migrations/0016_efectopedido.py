@@ -0,0 +1,36 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pedidos', '0015_add_pedido_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EfectoPedido',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=40)),
+                ('clave', models.CharField(help_text='Clave de idempotencia del evento', max_length=120, unique=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('procesando', 'Procesando'), ('hecho', 'Hecho'), ('error', 'Error')], default='pendiente', max_length=12)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('encolado', models.DateTimeField(default=django.utils.timezone.now)),
+                ('proximo_intento', models.DateTimeField(default=django.utils.timezone.now)),
+                ('tomado_en', models.DateTimeField(blank=True, null=True)),
+                ('procesado', models.DateTimeField(blank=True, null=True)),
+                ('duracion_ms', models.FloatField(blank=True, null=True)),
+                ('ultimo_error', models.TextField(blank=True)),
+                ('pedido', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='efectos', to='pedidos.pedido')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['estado', 'proximo_intento'], name='efectopedido_estado_prox')],
+            },
+        ),
+    ]
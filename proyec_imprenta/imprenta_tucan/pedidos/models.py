@@ -29,58 +29,91 @@ class Pedido(models.Model):
 
     def save(self, *args, **kwargs):
         # T-05: lógica de negocio delegada a services.py
+        # Stock y oferta se resuelven en la misma transacción; notificaciones,
+        # factura, score y consumo real se encolan en el outbox
+        # (pedidos/efectos.py) y corren recién después del commit.
+        from django.db import transaction
+        from .efectos import encolar
         from .services import (
             reservar_insumos_para_pedido,
             devolver_insumos_para_pedido,
             aplicar_descuento_oferta,
-            ajustar_score_cancelacion,
             marcar_oferta_aplicada,
-            notificar_entrega_pedido,
         )
         oferta_aceptada = None
         _should_reserve_new = False
-
-        if not self.pk:
-            # Pedido nuevo: aplicar descuento de oferta si existe
-            oferta_aceptada = aplicar_descuento_oferta(self)
-            # Si ya nace en estado "proceso", reservar después del super().save()
-            estado_proceso = EstadoPedido.objects.filter(nombre__icontains="proceso").first()
-            if estado_proceso and self.estado == estado_proceso:
-                _should_reserve_new = True
-        else:
-            old = type(self).objects.get(pk=self.pk)
-            old_estado = old.estado.nombre.lower() if old.estado else ""
-            new_estado = self.estado.nombre.lower() if self.estado else ""
-            if "proceso" not in old_estado and "proceso" in new_estado:
+        efectos = []
+
+        with transaction.atomic():
+            if not self.pk:
+                # Pedido nuevo: aplicar descuento de oferta si existe
+                oferta_aceptada = aplicar_descuento_oferta(self)
+                # Si ya nace en estado "proceso", reservar después del super().save()
+                estado_proceso = EstadoPedido.objects.filter(nombre__icontains="proceso").first()
+                if estado_proceso and self.estado == estado_proceso:
+                    _should_reserve_new = True
+            else:
+                old = type(self).objects.get(pk=self.pk)
+                old_estado = old.estado.nombre.lower() if old.estado else ""
+                new_estado = self.estado.nombre.lower() if self.estado else ""
+                if "proceso" not in old_estado and "proceso" in new_estado:
+                    reservar_insumos_para_pedido(self)
+                    efectos.append('emitir_factura')  # factura al confirmar producción
+                if "cancelad" in new_estado and "cancelad" not in old_estado:
+                    efectos.append('ajustar_score_cancelacion')
+                    # Devolver stock si el pedido ya había consumido insumos.
+                    # Ocurre cuando venía de En Proceso, Completado o Entregado
+                    # (en todos esos estados el stock fue reservado al pasar por "proceso").
+                    _estados_con_stock_reservado = ("proceso", "complet", "entreg")
+                    if any(s in old_estado for s in _estados_con_stock_reservado):
+                        devolver_insumos_para_pedido(self)
+                if "entreg" in new_estado and "entreg" not in old_estado:
+                    efectos.append('notificar_entrega')
+
+            super().save(*args, **kwargs)
+
+            if _should_reserve_new:
                 reservar_insumos_para_pedido(self)
-                self._emitir_factura = True  # factura al confirmar producción
-            if "cancelad" in new_estado and "cancelad" not in old_estado:
-                ajustar_score_cancelacion(self)
-                # Devolver stock si el pedido ya había consumido insumos.
-                # Ocurre cuando venía de En Proceso, Completado o Entregado
-                # (en todos esos estados el stock fue reservado al pasar por "proceso").
-                _estados_con_stock_reservado = ("proceso", "complet", "entreg")
-                if any(s in old_estado for s in _estados_con_stock_reservado):
-                    devolver_insumos_para_pedido(self)
-            if "entreg" in new_estado and "entreg" not in old_estado:
-                self._notificar_entrega = True   # se dispara en post_save para tener pk seguro
+            if oferta_aceptada:
+                marcar_oferta_aplicada(self, oferta_aceptada)
+            for tipo in efectos:
+                encolar(self, tipo)
 
-        super().save(*args, **kwargs)
 
-        if _should_reserve_new:
-            reservar_insumos_para_pedido(self)
-        if oferta_aceptada:
-            marcar_oferta_aplicada(self, oferta_aceptada)
-        if getattr(self, '_notificar_entrega', False):
-            self._notificar_entrega = False
-            notificar_entrega_pedido(self)
-        if getattr(self, '_emitir_factura', False):
-            self._emitir_factura = False
-            try:
-                from .services import crear_factura_para_pedido
-                crear_factura_para_pedido(self)
-            except Exception:
-                logger.exception('Error al emitir factura para pedido #%s', self.pk)
+class FacturaQuerySet(models.QuerySet):
+    def with_cobro(self):
+        """
+        Anota el estado de cobro calculado en la base, sin una consulta por factura:
+
+            cobro_pagado      — suma de pagos (subconsulta correlacionada, 0 si no hay)
+            cobro_estado_pago — 'pagada' | 'parcial' | 'pendiente' (como estado_pago)
+            cobro_estado      — igual, pero 'anulada' para las anuladas
+
+        Agrupable: .values('cobro_estado').annotate(n=Count('pk')) cuenta por estado.
+        """
+        from decimal import Decimal
+        from django.db.models import Case, F, OuterRef, Subquery, Sum, Value, When
+        from django.db.models.functions import Coalesce
+
+        dinero = models.DecimalField(max_digits=12, decimal_places=2)
+        pagos = (
+            PagoFactura.objects.filter(factura=OuterRef('pk')).order_by()
+            .values('factura').annotate(total=Sum('monto')).values('total')
+        )
+        return self.annotate(
+            cobro_pagado=Coalesce(Subquery(pagos, output_field=dinero), Value(Decimal('0')), output_field=dinero),
+            cobro_estado_pago=Case(
+                When(cobro_pagado__lte=0, then=Value('pendiente')),
+                When(cobro_pagado__gte=F('monto_total'), then=Value('pagada')),
+                default=Value('parcial'),
+                output_field=models.CharField(),
+            ),
+            cobro_estado=Case(
+                When(anulada=True, then=Value('anulada')),
+                default=F('cobro_estado_pago'),
+                output_field=models.CharField(),
+            ),
+        )
 
 
 class Factura(models.Model):
@@ -98,6 +131,15 @@ class Factura(models.Model):
     fecha_anulacion = models.DateTimeField(null=True, blank=True)
     motivo_anulacion = models.TextField(blank=True)
 
+    objects = FacturaQuerySet.as_manager()
+
+    ESTADO_COBRO_DISPLAY = {
+        'pagada': 'Pagada',
+        'parcial': 'Pago parcial',
+        'pendiente': 'Pendiente',
+        'anulada': 'Anulada',
+    }
+
     class Meta:
         ordering = ['-fecha_emision']
         verbose_name = 'Factura'
@@ -106,29 +148,55 @@ class Factura(models.Model):
     def __str__(self):
         return f'Factura {self.numero} — Pedido #{self.pedido_id}'
 
+    SERIE = 'factura'
+
     @classmethod
-    def proximo_numero(cls, punto_venta: int = 1):
-        """
-        Genera el siguiente número correlativo en formato AFIP: XXXX-XXXXXXXX
-        Ejemplo: 0001-00000001
-        """
-        pv = f'{punto_venta:04d}'
+    def _ultima_secuencia(cls, punto_venta: int) -> int:
+        """Último número emitido antes de usar configuracion.Secuencia."""
         ultimo = (
-            cls.objects.filter(numero__startswith=f'{pv}-')
+            cls.objects.filter(numero__startswith=f'{punto_venta:04d}-')
             .order_by('-numero')
+            .values_list('numero', flat=True)
             .first()
         )
-        if ultimo:
-            try:
-                secuencia = int(ultimo.numero.split('-')[-1]) + 1
-            except (ValueError, IndexError):
-                secuencia = 1
+        try:
+            return int(ultimo.split('-')[-1]) if ultimo else 0
+        except (ValueError, IndexError):
+            return 0
+
+    @classmethod
+    def proximo_numero(cls, punto_venta: int = 1, reservar: bool = True):
+        """
+        Genera el siguiente número correlativo en formato AFIP: XXXX-XXXXXXXX
+        Ejemplo: 0001-00000001
+
+        Con reservar=True el número queda asignado (llamar dentro de la misma
+        transacción que crea la factura); con reservar=False sólo se consulta,
+        para vistas previas.
+        """
+        from configuracion import secuencias
+
+        inicial = lambda: cls._ultima_secuencia(punto_venta)
+        if reservar:
+            secuencia = secuencias.siguiente(cls.SERIE, punto_venta, inicial)
         else:
-            secuencia = 1
-        return f'{pv}-{secuencia:08d}'
+            secuencia = secuencias.proximo(cls.SERIE, punto_venta, inicial)
+        return f'{punto_venta:04d}-{secuencia:08d}'
+
+    @classmethod
+    def reservar_numeros(cls, cantidad: int, punto_venta: int = 1) -> list:
+        """Asigna `cantidad` números consecutivos de una vez (emisión masiva)."""
+        from configuracion import secuencias
+
+        bloque = secuencias.reservar(
+            cls.SERIE, cantidad, punto_venta, lambda: cls._ultima_secuencia(punto_venta),
+        )
+        return [f'{punto_venta:04d}-{secuencia:08d}' for secuencia in bloque]
 
     @property
     def total_pagado(self):
+        if 'cobro_pagado' in self.__dict__:  # anotado por with_cobro()
+            return self.cobro_pagado
         from django.db.models import Sum
         resultado = self.pagos.aggregate(total=Sum('monto'))['total']
         return resultado or 0
@@ -140,6 +208,8 @@ class Factura(models.Model):
     @property
     def estado_pago(self):
         """Retorna: 'pagada', 'parcial' o 'pendiente'."""
+        if 'cobro_estado_pago' in self.__dict__:
+            return self.cobro_estado_pago
         pagado = self.total_pagado
         if pagado <= 0:
             return 'pendiente'
@@ -151,11 +221,7 @@ class Factura(models.Model):
     def estado_pago_display(self):
         if self.anulada:
             return 'Anulada'
-        return {
-            'pagada': 'Pagada',
-            'parcial': 'Pago parcial',
-            'pendiente': 'Pendiente',
-        }.get(self.estado_pago, 'Pendiente')
+        return self.ESTADO_COBRO_DISPLAY.get(self.estado_pago, 'Pendiente')
 
 
 class PagoFactura(models.Model):
@@ -268,6 +334,48 @@ class OrdenCompra(models.Model):
         return f"Orden de compra {self.id} - {self.insumo} ({self.cantidad})"
 
 
+class EfectoPedido(models.Model):
+    """
+    Outbox transaccional de los efectos secundarios de Pedido.save: se inserta
+    en la misma transacción que el cambio de estado y pedidos/efectos.py lo
+    ejecuta después del commit, con reintentos.
+
+    `clave` es la clave de idempotencia: un mismo evento encolado dos veces
+    produce una sola fila (ver efectos.encolar).
+    """
+    ESTADO_PENDIENTE = 'pendiente'
+    ESTADO_PROCESANDO = 'procesando'
+    ESTADO_HECHO = 'hecho'
+    ESTADO_ERROR = 'error'
+    ESTADO_CHOICES = [
+        (ESTADO_PENDIENTE, 'Pendiente'),
+        (ESTADO_PROCESANDO, 'Procesando'),
+        (ESTADO_HECHO, 'Hecho'),
+        (ESTADO_ERROR, 'Error'),
+    ]
+
+    pedido = models.ForeignKey(Pedido, on_delete=models.CASCADE, related_name='efectos')
+    tipo = models.CharField(max_length=40)
+    clave = models.CharField(max_length=120, unique=True, help_text='Clave de idempotencia del evento')
+    payload = models.JSONField(default=dict, blank=True)
+    estado = models.CharField(max_length=12, choices=ESTADO_CHOICES, default=ESTADO_PENDIENTE)
+    intentos = models.PositiveSmallIntegerField(default=0)
+    encolado = models.DateTimeField(default=timezone.now)
+    proximo_intento = models.DateTimeField(default=timezone.now)
+    tomado_en = models.DateTimeField(null=True, blank=True)
+    procesado = models.DateTimeField(null=True, blank=True)
+    duracion_ms = models.FloatField(null=True, blank=True)
+    ultimo_error = models.TextField(blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'proximo_intento'], name='efectopedido_estado_prox'),
+        ]
+
+    def __str__(self):
+        return f"{self.tipo} — Pedido #{self.pedido_id} ({self.estado})"
+
+
 # ─── Signal: registrar ConsumoRealInsumo al completar un pedido ───────────────
 from django.db.models.signals import post_save
 from django.dispatch import receiver
@@ -275,66 +383,14 @@ from django.dispatch import receiver
 @receiver(post_save, sender=Pedido)
 def registrar_consumo_real_al_completar(sender, instance, **kwargs):
     """
-    Cuando un pedido pasa a estado 'completado', cruza LineaPedido con
-    ProductoInsumo (BOM) y registra el consumo real de cada insumo.
-    Evita duplicados: si ya existe un registro para ese pedido+insumo+periodo,
-    lo actualiza sumando la diferencia.
+    Cuando un pedido pasa a estado 'completado' encola el registro de su
+    consumo real (services.registrar_consumo_real_pedido) en el outbox de
+    efectos; se reintenta si falla y avisa a los administradores al agotar
+    los intentos.
     """
-    try:
-        estado_nombre = instance.estado.nombre.lower() if instance.estado else ""
-        if "complet" not in estado_nombre:
-            return
-
-        from django.utils import timezone
-        from insumos.models import ConsumoRealInsumo
-        from productos.models import ProductoInsumo
-
-        periodo = timezone.now().strftime("%Y-%m")
-        lineas = instance.lineas.select_related("producto").all()
-
-        for linea in lineas:
-            bom = ProductoInsumo.objects.filter(
-                producto=linea.producto
-            ).select_related("insumo")
-
-            for item in bom:
-                if item.es_costo_fijo:
-                    cantidad = int(item.cantidad_por_unidad)
-                else:
-                    cantidad = int(item.cantidad_por_unidad * linea.cantidad)
-
-                if cantidad <= 0:
-                    continue
-
-                obj, created = ConsumoRealInsumo.objects.get_or_create(
-                    insumo=item.insumo,
-                    periodo=periodo,
-                    comentario=f"pedido#{instance.pk}",
-                    defaults={"cantidad_consumida": cantidad},
-                )
-                if not created:
-                    # Ya existía para este pedido: actualizar
-                    obj.cantidad_consumida = cantidad
-                    obj.save(update_fields=["cantidad_consumida"])
-
-    except Exception:
-        logger.exception(
-            "registrar_consumo_real_al_completar: error inesperado en pedido #%s — "
-            "el historial de consumo puede estar incompleto.",
-            instance.pk,
-        )
-        # Notificar al administrador si hay email configurado
-        try:
-            from django.core.mail import mail_admins
-            mail_admins(
-                subject=f"[Imprenta Tucán] Error en consumo real — Pedido #{instance.pk}",
-                message=(
-                    f"El signal registrar_consumo_real_al_completar falló para el "
-                    f"Pedido #{instance.pk}.\n\n"
-                    f"El historial de consumo de insumos puede estar incompleto.\n"
-                    f"Revisá los logs del servidor para más detalles."
-                ),
-                fail_silently=True,
-            )
-        except Exception:
-            pass  # mail_admins es best-effort, no debe romper nada
+    estado_nombre = instance.estado.nombre.lower() if instance.estado else ""
+    if "complet" not in estado_nombre:
+        return
+
+    from .efectos import encolar
+    encolar(instance, 'registrar_consumo_real')
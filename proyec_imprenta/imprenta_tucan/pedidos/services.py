@@ -55,30 +55,14 @@ def calcular_consumo_producto(producto, cantidad: int) -> dict:
       1. RecetaDinamica (si existe y está activa)
       2. BOM estático (ProductoInsumo)
       3. Fórmula dinámica (producto.formula + ParametroProducto)
+
+    Evalúa la receta compilada del producto (productos/recetas.py): sin
+    consultas mientras la receta no cambie.
     """
-    req = defaultdict(Decimal)
     if not producto or not cantidad:
-        return dict(req)
-
-    try:
-        receta = producto.receta_dinamica
-        if receta and receta.activo:
-            return receta.calcular(cantidad)
-    except Exception:
-        pass
-
-    from productos.models import ProductoInsumo
-    for r in ProductoInsumo.objects.filter(producto=producto):
-        if r.es_costo_fijo:
-            req[r.insumo_id] += Decimal(r.cantidad_por_unidad)
-        else:
-            req[r.insumo_id] += Decimal(r.cantidad_por_unidad) * Decimal(cantidad)
-
-    for insumo_id, qty in calcular_con_formula(producto, cantidad).items():
-        if insumo_id not in req:
-            req[insumo_id] = qty
-
-    return dict(req)
+        return {}
+    from productos.recetas import receta_compilada
+    return receta_compilada(producto).consumo(cantidad)
 
 
 def calcular_consumo_pedido(pedido) -> dict:
@@ -86,85 +70,142 @@ def calcular_consumo_pedido(pedido) -> dict:
     req = defaultdict(Decimal)
     if not pedido:
         return dict(req)
-    for linea in pedido.lineas.select_related('producto').all():
-        consumo_linea = calcular_consumo_producto(linea.producto, linea.cantidad)
-        for insumo_id, cantidad in consumo_linea.items():
+    from productos.recetas import recetas_compiladas
+    lineas = list(pedido.lineas.select_related('producto').all())
+    recetas = recetas_compiladas(linea.producto for linea in lineas)
+    for linea in lineas:
+        if not linea.producto or not linea.cantidad:
+            continue
+        for insumo_id, cantidad in recetas[linea.producto.pk].consumo(linea.cantidad).items():
             req[insumo_id] += Decimal(cantidad)
     return dict(req)
 
 
-def reservar_insumos_para_pedido(pedido):
+def _mover_stock_pedido(pedido, consumos: dict, signo: int, motivo: str, clave_cantidad: str) -> None:
+    """
+    Aplica en bloque los movimientos de stock de un pedido (signo=-1 descuenta,
+    signo=1 devuelve). Debe llamarse dentro de transaction.atomic().
+
+    - Bloquea todas las filas de Insumo con un único SELECT ... FOR UPDATE
+      ordenado por idInsumo: dos pedidos con insumos en común toman los locks
+      en el mismo orden y no pueden bloquearse mutuamente.
+    - Actualiza el stock con un solo UPDATE (CASE por insumo) condicionado a
+      que cada fila tenga stock suficiente; si alguna no alcanza, ValueError.
+    - Registra un movimiento de auditoría por insumo vía auditoria.writer (un
+      bulk_create al confirmar la transacción) y las alertas de stock bajo en
+      un único bulk_create de Notificacion.
+
+    No pasa por Insumo.save(): la auditoría genérica de la actualización queda
+    cubierta por el movimiento 'stock-movement' de cada insumo.
+    """
     from insumos.models import Insumo
-    from pedidos.models import OrdenProduccion
+    from insumos.signals import alertar_descuentos_stock
+    from pedidos.utils import invalidar_snapshot_stock
+    from auditoria import writer
+    from auditoria.middleware import get_current_request, get_current_user
     from auditoria.models import AuditEntry
     from django.db import transaction
+    from django.db.models import Case, F, Q, When
+    from django.utils import timezone
     import json
 
-    consumos = calcular_consumo_pedido(pedido)
-    with transaction.atomic():
-        for insumo_id, cantidad in consumos.items():
-            insumo = Insumo.objects.select_for_update().get(idInsumo=insumo_id)
-            if insumo.stock < cantidad:
-                raise ValueError(f"Stock insuficiente para {insumo.nombre}: "
-                                 f"disponible={insumo.stock}, requerido={cantidad}")
-            stock_anterior = insumo.stock
-            insumo.stock -= int(cantidad)
-            insumo.save()
-
-            AuditEntry.objects.create(
-                app_label='insumos',
-                model='Insumo',
-                object_id=str(insumo.idInsumo),
-                object_repr=str(insumo),
-                action=AuditEntry.ACTION_UPDATE,
-                changes=json.dumps({
-                    'stock': {'before': stock_anterior, 'after': int(insumo.stock)}
-                }),
-                extra=json.dumps({
-                    'category': 'stock-movement',
-                    'motivo': f'Descuento automático por Pedido #{pedido.pk} → "{pedido.estado}"',
-                    'pedido_id': pedido.pk,
-                    'cantidad_descontada': int(cantidad),
-                    'before': stock_anterior,
-                    'after': int(insumo.stock),
-                }),
+    cantidades = {iid: int(cant) for iid, cant in consumos.items()}
+    if not cantidades:
+        return
+    insumos = list(
+        Insumo.objects.select_for_update()
+        .filter(idInsumo__in=sorted(cantidades))
+        .order_by('idInsumo')
+    )
+    if signo < 0:
+        encontrados = {ins.idInsumo for ins in insumos}
+        if len(encontrados) < len(cantidades):
+            raise Insumo.DoesNotExist(
+                f"Insumos inexistentes: {sorted(set(cantidades) - encontrados)}"
             )
+        for ins in insumos:
+            requerido = consumos[ins.idInsumo]
+            if ins.stock < requerido:
+                raise ValueError(f"Stock insuficiente para {ins.nombre}: "
+                                 f"disponible={ins.stock}, requerido={requerido}")
+    if not insumos:
+        return
 
-        OrdenProduccion.objects.get_or_create(pedido=pedido)
-
-
-def devolver_insumos_para_pedido(pedido):
-    """Revierte el descuento de stock. Se llama cuando se cancela un pedido En Proceso."""
-    from insumos.models import Insumo
-    from pedidos.models import OrdenProduccion
-    from auditoria.models import AuditEntry
-    import json
-
-    consumos = calcular_consumo_pedido(pedido)
-    for insumo_id, cantidad in consumos.items():
-        try:
-            insumo = Insumo.objects.select_for_update().get(idInsumo=insumo_id)
-        except Insumo.DoesNotExist:
-            continue
-        stock_anterior = insumo.stock
-        insumo.stock += int(cantidad)
-        insumo.save(update_fields=['stock', 'updated_at'])
-
-        AuditEntry.objects.create(
+    filas = Insumo.objects.filter(idInsumo__in=[ins.idInsumo for ins in insumos])
+    if signo < 0:
+        # Cada fila se descuenta sólo si alcanza (stock entero: >= ceil(requerido))
+        guarda = Q()
+        for ins in insumos:
+            guarda |= Q(idInsumo=ins.idInsumo, stock__gte=math.ceil(consumos[ins.idInsumo]))
+        filas = Insumo.objects.filter(guarda)
+    actualizados = filas.update(
+        stock=Case(
+            *[When(idInsumo=ins.idInsumo, then=F('stock') + signo * cantidades[ins.idInsumo]) for ins in insumos],
+            default=F('stock'),
+        ),
+        updated_at=timezone.now(),
+    )
+    if actualizados != len(insumos):
+        raise ValueError(f"Stock insuficiente al reservar insumos para Pedido #{pedido.pk}")
+
+    request = get_current_request()
+    user = get_current_user()
+    movimientos = []
+    for ins in insumos:
+        stock_anterior = ins.stock
+        ins.stock = stock_anterior + signo * cantidades[ins.idInsumo]
+        movimientos.append((ins, stock_anterior, ins.stock))
+        writer.registrar(AuditEntry(
+            user=user,
+            ip_address=getattr(request, 'META', {}).get('REMOTE_ADDR') if request else None,
+            path=getattr(request, 'path', '') if request else '',
+            method=getattr(request, 'method', '') if request else '',
             app_label='insumos',
             model='Insumo',
-            object_id=str(insumo.idInsumo),
-            object_repr=str(insumo),
+            object_id=str(ins.idInsumo),
+            object_repr=str(ins),
             action=AuditEntry.ACTION_UPDATE,
-            changes=json.dumps({'stock': {'before': stock_anterior, 'after': int(insumo.stock)}}),
+            changes=json.dumps({'stock': {'before': stock_anterior, 'after': ins.stock}}),
             extra=json.dumps({
                 'category': 'stock-movement',
-                'motivo': f'Devolución por cancelación de Pedido #{pedido.pk}',
+                'motivo': motivo,
                 'pedido_id': pedido.pk,
-                'cantidad_devuelta': int(cantidad),
+                clave_cantidad: cantidades[ins.idInsumo],
                 'before': stock_anterior,
-                'after': int(insumo.stock),
+                'after': ins.stock,
             }),
+        ))
+    if signo < 0:
+        alertar_descuentos_stock(movimientos)
+    transaction.on_commit(lambda: invalidar_snapshot_stock(cantidades))
+
+
+def reservar_insumos_para_pedido(pedido):
+    from pedidos.models import OrdenProduccion
+    from django.db import transaction
+
+    consumos = calcular_consumo_pedido(pedido)
+    with transaction.atomic():
+        _mover_stock_pedido(
+            pedido, consumos, -1,
+            motivo=f'Descuento automático por Pedido #{pedido.pk} → "{pedido.estado}"',
+            clave_cantidad='cantidad_descontada',
+        )
+        OrdenProduccion.objects.get_or_create(pedido=pedido)
+
+
+def devolver_insumos_para_pedido(pedido):
+    """Revierte el descuento de stock. Se llama cuando se cancela un pedido En Proceso."""
+    from pedidos.models import OrdenProduccion
+    from django.db import transaction
+
+    consumos = calcular_consumo_pedido(pedido)
+    with transaction.atomic():
+        # Los insumos borrados desde la reserva se omiten
+        _mover_stock_pedido(
+            pedido, consumos, 1,
+            motivo=f'Devolución por cancelación de Pedido #{pedido.pk}',
+            clave_cantidad='cantidad_devuelta',
         )
 
     try:
@@ -329,6 +370,43 @@ def notificar_entrega_pedido(pedido):
 
 # ── Facturación ───────────────────────────────────────────────────────────────
 
+def registrar_consumo_real_pedido(pedido) -> None:
+    """
+    Cruza LineaPedido con el BOM de cada producto y registra el consumo real
+    de cada insumo del pedido. Evita duplicados: si ya existe un registro
+    para ese pedido+insumo+periodo, lo actualiza con la cantidad actual.
+    Las excepciones se propagan para que el outbox reintente.
+    """
+    from django.utils import timezone
+    from insumos.models import ConsumoRealInsumo
+    from productos.recetas import recetas_compiladas
+
+    periodo = timezone.now().strftime("%Y-%m")
+    lineas = list(pedido.lineas.select_related("producto").all())
+    recetas = recetas_compiladas(linea.producto for linea in lineas)
+
+    for linea in lineas:
+        for insumo_id, por_unidad, es_fijo in recetas[linea.producto_id].bom:
+            if es_fijo:
+                cantidad = int(por_unidad)
+            else:
+                cantidad = int(por_unidad * linea.cantidad)
+
+            if cantidad <= 0:
+                continue
+
+            obj, created = ConsumoRealInsumo.objects.get_or_create(
+                insumo_id=insumo_id,
+                periodo=periodo,
+                comentario=f"pedido#{pedido.pk}",
+                defaults={"cantidad_consumida": cantidad},
+            )
+            if not created:
+                # Ya existía para este pedido: actualizar
+                obj.cantidad_consumida = cantidad
+                obj.save(update_fields=["cantidad_consumida"])
+
+
 def crear_factura_para_pedido(pedido) -> 'Factura':
     """Crea Factura C para un pedido Entregado y envía PDF al cliente."""
     import logging
@@ -339,10 +417,13 @@ def crear_factura_para_pedido(pedido) -> 'Factura':
     if existing:
         return existing
 
-    numero = Factura.proximo_numero()
-    factura = Factura.objects.create(
-        pedido=pedido, numero=numero, monto_total=pedido.monto_total,
-    )
+    from django.db import transaction
+    with transaction.atomic():
+        # Número y factura en la misma transacción: si el alta falla no queda hueco
+        numero = Factura.proximo_numero()
+        factura = Factura.objects.create(
+            pedido=pedido, numero=numero, monto_total=pedido.monto_total,
+        )
     log.info('Factura C %s emitida para pedido #%s', numero, pedido.pk)
     _enviar_factura_por_email(factura)
     return factura
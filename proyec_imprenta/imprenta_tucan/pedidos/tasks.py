@@ -0,0 +1,13 @@
+from celery import shared_task
+
+
+@shared_task
+def procesar_efectos_pedido(ids=None):
+    """
+    Ejecuta efectos del outbox de pedidos (pedidos/efectos.py). Con `ids`,
+    los recién confirmados (modo 'celery'); sin ids, los reintentos vencidos
+    y los abandonados (beat cada minuto).
+    """
+    from .efectos import procesar
+    resumen = procesar(ids)
+    return f"efectos de pedido: {resumen['hechos']} hechos, {resumen['fallidos']} fallidos"
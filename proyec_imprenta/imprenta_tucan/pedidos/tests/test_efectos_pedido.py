@@ -0,0 +1,219 @@
+"""
+Tests del outbox de efectos de Pedido.save (pedidos/efectos.py).
+
+Cubre:
+  1. Los efectos se encolan en la transacción de save() y se ejecutan recién
+     después del commit; un rollback los descarta.
+  2. Idempotencia: un efecto de una sola vez no se repite; uno repetible
+     vuelve a la cola; uno por evento se registra en cada transición.
+  3. Reintentos con backoff y estado 'error' al agotar los intentos; el
+     resultado no pisa un rearmado hecho durante la ejecución.
+  4. El worker del modo 'hilo' barre los pendientes vencidos sin ids.
+  5. Histograma de latencias por tipo.
+"""
+import queue
+import threading
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from clientes.models import Cliente
+from insumos.models import ConsumoRealInsumo, Insumo
+from pedidos import efectos
+from pedidos.models import EfectoPedido, EstadoPedido, Factura, LineaPedido, Pedido
+from productos.models import Producto, ProductoInsumo
+from productos.recetas import limpiar_cache
+
+
+class _DetenerWorker(BaseException):
+    """Corta el bucle del worker: no es Exception, así _bucle no la atrapa."""
+
+
+def _correr_worker(cola):
+    try:
+        efectos._bucle(cola)
+    except _DetenerWorker:
+        pass
+
+
+@override_settings(PEDIDOS_EFECTOS_MODO='sincrono')
+class EfectosPedidoTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        self.insumo = Insumo.objects.create(
+            nombre="Papel", codigo="EFE-1", stock=1000, precio_unitario=1, activo=True,
+        )
+        self.producto = Producto.objects.create(nombreProducto="Folleto", precioUnitario=10, activo=True)
+        ProductoInsumo.objects.create(producto=self.producto, insumo=self.insumo, cantidad_por_unidad=2)
+        self.cliente = Cliente.objects.create(
+            nombre="Test", apellido="Efectos", email="", telefono="123", cuit="20-44444444-4",
+        )
+        self.pendiente = EstadoPedido.objects.create(nombre="pendiente")
+        self.proceso = EstadoPedido.objects.create(nombre="proceso")
+        self.completado = EstadoPedido.objects.create(nombre="completado")
+        self.pedido = Pedido.objects.create(
+            cliente=self.cliente, fecha_entrega=date.today() + timedelta(days=7),
+            monto_total=Decimal("100.00"), estado=self.pendiente,
+        )
+        LineaPedido.objects.create(
+            pedido=self.pedido, producto=self.producto, cantidad=10, precio_unitario=Decimal("10.00"),
+        )
+
+    def _cambiar_estado(self, estado):
+        self.pedido.estado = estado
+        self.pedido.save()
+
+    def test_factura_despues_del_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            self._cambiar_estado(self.proceso)
+        efecto = EfectoPedido.objects.get(pedido=self.pedido, tipo='emitir_factura')
+        self.assertEqual(efecto.estado, EfectoPedido.ESTADO_PENDIENTE)
+        self.assertFalse(Factura.objects.filter(pedido=self.pedido).exists())
+
+        for callback in callbacks:
+            callback()
+        efecto.refresh_from_db()
+        self.assertEqual(efecto.estado, EfectoPedido.ESTADO_HECHO)
+        self.assertEqual(efecto.intentos, 1)
+        self.assertIsNotNone(efecto.duracion_ms)
+        self.assertTrue(Factura.objects.filter(pedido=self.pedido).exists())
+
+    def test_rollback_descarta_los_efectos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    self._cambiar_estado(self.proceso)
+                    raise RuntimeError("falla posterior")
+            except RuntimeError:
+                pass
+        self.assertFalse(EfectoPedido.objects.exists())
+        self.assertFalse(Factura.objects.exists())
+
+    # Auditoría síncrona: en modo 'buffer' la Factura emitida registra además
+    # el flush de su lote (auditoria/writer.py) entre los callbacks capturados
+    @override_settings(AUDITORIA_MODO='sincrono')
+    def test_idempotencia(self):
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            efectos.encolar(self.pedido, 'emitir_factura')
+            efectos.encolar(self.pedido, 'emitir_factura')
+        self.assertEqual(len(callbacks), 1)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            efectos.encolar(self.pedido, 'emitir_factura')
+        self.assertEqual(callbacks, [])
+        self.assertEqual(Factura.objects.filter(pedido=self.pedido).count(), 1)
+
+        # Repetible: cada vez que se guarda completado vuelve a registrarse
+        with self.captureOnCommitCallbacks(execute=True):
+            self._cambiar_estado(self.completado)
+        consumo = ConsumoRealInsumo.objects.get(comentario=f"pedido#{self.pedido.pk}")
+        self.assertEqual(consumo.cantidad_consumida, 20)
+        LineaPedido.objects.filter(pedido=self.pedido).update(cantidad=15)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.pedido.save()
+        consumo.refresh_from_db()
+        self.assertEqual(consumo.cantidad_consumida, 30)
+        self.assertEqual(EfectoPedido.objects.filter(tipo='registrar_consumo_real').count(), 1)
+
+    def test_por_evento_en_cada_transicion(self):
+        cancelado = EstadoPedido.objects.create(nombre="cancelado")
+        with mock.patch('pedidos.services.ajustar_score_cancelacion') as ajustar:
+            for estado in (cancelado, self.pendiente, cancelado):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self._cambiar_estado(estado)
+        self.assertEqual(ajustar.call_count, 2)
+        claves = set(EfectoPedido.objects.filter(tipo='ajustar_score_cancelacion').values_list('clave', flat=True))
+        self.assertEqual(len(claves), 2)
+        self.assertTrue(all(c.startswith(f'ajustar_score_cancelacion:{self.pedido.pk}:') for c in claves))
+
+    def test_error_se_rearma_al_encolar(self):
+        with self.captureOnCommitCallbacks(execute=False):
+            efecto = efectos.encolar(self.pedido, 'emitir_factura')
+        EfectoPedido.objects.filter(pk=efecto.pk).update(
+            estado=EfectoPedido.ESTADO_ERROR, intentos=efectos.EFECTO_MAX_INTENTOS,
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            efectos.encolar(self.pedido, 'emitir_factura')
+        efecto.refresh_from_db()
+        self.assertEqual((efecto.estado, efecto.intentos), (EfectoPedido.ESTADO_HECHO, 1))
+        self.assertTrue(Factura.objects.filter(pedido=self.pedido).exists())
+
+    def test_reintentos_y_error(self):
+        with mock.patch('pedidos.services.crear_factura_para_pedido', side_effect=RuntimeError("smtp caído")), \
+                mock.patch('django.core.mail.mail_admins') as mail_admins, \
+                self.assertLogs('pedidos.efectos', 'ERROR'):
+            with self.captureOnCommitCallbacks(execute=True):
+                efectos.encolar(self.pedido, 'emitir_factura')
+            efecto = EfectoPedido.objects.get()
+            self.assertEqual(efecto.estado, EfectoPedido.ESTADO_PENDIENTE)
+            self.assertEqual(efecto.intentos, 1)
+            self.assertIn("smtp caído", efecto.ultimo_error)
+            self.assertGreater(efecto.proximo_intento, timezone.now() + timedelta(seconds=20))
+            # Todavía no venció el backoff
+            self.assertEqual(efectos.procesar(), {'hechos': 0, 'fallidos': 0})
+
+            for _ in range(efectos.EFECTO_MAX_INTENTOS - 1):
+                EfectoPedido.objects.update(proximo_intento=timezone.now())
+                efectos.procesar()
+            efecto.refresh_from_db()
+            self.assertEqual(efecto.estado, EfectoPedido.ESTADO_ERROR)
+            self.assertEqual(efecto.intentos, efectos.EFECTO_MAX_INTENTOS)
+            mail_admins.assert_called_once()
+
+        # Un efecto 'procesando' abandonado se retoma al vencer el lease
+        EfectoPedido.objects.update(
+            estado=EfectoPedido.ESTADO_PROCESANDO,
+            tomado_en=timezone.now() - timedelta(seconds=efectos.EFECTO_LEASE_SEGUNDOS + 1),
+        )
+        self.assertEqual(efectos.procesar(), {'hechos': 1, 'fallidos': 0})
+        self.assertTrue(Factura.objects.filter(pedido=self.pedido).exists())
+
+    def test_rearmado_durante_la_ejecucion_no_se_pisa(self):
+        def rearmar(pedido):
+            with self.captureOnCommitCallbacks(execute=False):
+                efectos.encolar(pedido, 'registrar_consumo_real')
+
+        with self.captureOnCommitCallbacks(execute=False):
+            efecto = efectos.encolar(self.pedido, 'registrar_consumo_real')
+        with mock.patch('pedidos.services.registrar_consumo_real_pedido', side_effect=rearmar):
+            self.assertEqual(efectos.procesar([efecto.pk]), {'hechos': 1, 'fallidos': 0})
+        efecto.refresh_from_db()
+        self.assertEqual((efecto.estado, efecto.intentos), (EfectoPedido.ESTADO_PENDIENTE, 0))
+        self.assertIsNone(efecto.procesado)
+
+    def test_worker_barre_pendientes_vencidos(self):
+        barridos = threading.Event()
+        llamadas = []
+
+        def procesar(ids=None):
+            llamadas.append(ids)
+            if ids is None:
+                barridos.set()
+                raise _DetenerWorker
+
+        cola = queue.Queue()
+        cola.put([7])
+        with mock.patch.object(efectos, 'EFECTO_BARRIDO_SEGUNDOS', 0.05), \
+                mock.patch.object(efectos, 'procesar', side_effect=procesar), \
+                mock.patch.object(efectos, 'close_old_connections'):
+            hilo = threading.Thread(target=_correr_worker, args=(cola,), daemon=True)
+            hilo.start()
+            self.assertTrue(barridos.wait(5))
+            hilo.join(5)
+        self.assertEqual(llamadas[:2], [[7], None])
+
+    def test_histograma_latencias(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self._cambiar_estado(self.proceso)
+            efectos.encolar(self.pedido, 'ajustar_score_cancelacion')
+        EfectoPedido.objects.filter(tipo='ajustar_score_cancelacion').update(
+            encolado=timezone.now() - timedelta(seconds=45),
+        )
+        histograma = efectos.histograma_latencias()
+        self.assertEqual(set(histograma), {'emitir_factura', 'ajustar_score_cancelacion'})
+        self.assertEqual(histograma['emitir_factura'][0], 1)
+        self.assertEqual(histograma['ajustar_score_cancelacion'][efectos.LIMITES_HISTOGRAMA.index(60)], 1)
+        self.assertEqual(sum(efectos.histograma_latencias(medida='duracion')['emitir_factura']), 1)
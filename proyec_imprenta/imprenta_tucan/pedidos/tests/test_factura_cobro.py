@@ -0,0 +1,100 @@
+"""
+Tests del estado de cobro calculado en la base (Factura.objects.with_cobro()).
+
+Cubre:
+  1. Anotaciones iguales a las propiedades total_pagado / estado_pago.
+  2. Conteo por estado en una sola consulta agrupada.
+  3. La lista de facturas filtra en SQL y no hace una consulta por fila.
+"""
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import Count
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from clientes.models import Cliente
+from pedidos.models import EstadoPedido, Factura, PagoFactura, Pedido
+from usuarios.models import Usuario
+
+
+class FacturaConCobroTests(TestCase):
+    def setUp(self):
+        cliente = Cliente.objects.create(
+            nombre="Test", apellido="Cobro", email="cobro@test.com", telefono="1", cuit="20-33333333-3",
+        )
+        estado = EstadoPedido.objects.create(nombre="entregado")
+        self.numero = 0
+
+        def factura(monto, pagos=(), anulada=False):
+            self.numero += 1
+            pedido = Pedido.objects.create(
+                cliente=cliente, fecha_entrega=date.today() + timedelta(days=2),
+                monto_total=Decimal(monto), estado=estado,
+            )
+            f = Factura.objects.create(
+                pedido=pedido, numero=f"0001-{self.numero:08d}", monto_total=Decimal(monto), anulada=anulada,
+            )
+            for pago in pagos:
+                PagoFactura.objects.create(factura=f, monto=Decimal(pago))
+            return f
+
+        self.pagada = factura("100.00", ["60.00", "40.00"])
+        self.parcial = factura("100.00", ["30.00"])
+        self.pendiente = factura("80.00")
+        self.anulada = factura("50.00", anulada=True)
+
+    def test_anotaciones_iguales_a_las_propiedades(self):
+        esperado = {
+            self.pagada.pk: ("pagada", "pagada", Decimal("100.00")),
+            self.parcial.pk: ("parcial", "parcial", Decimal("30.00")),
+            self.pendiente.pk: ("pendiente", "pendiente", Decimal("0")),
+            self.anulada.pk: ("anulada", "pendiente", Decimal("0")),
+        }
+        with CaptureQueriesContext(connection) as queries:
+            facturas = list(Factura.objects.with_cobro())
+            for f in facturas:
+                self.assertEqual((f.cobro_estado, f.estado_pago, f.total_pagado), esperado[f.pk])
+        self.assertEqual(len(queries), 1)
+        for f in Factura.objects.all():
+            self.assertEqual((f.estado_pago, f.total_pagado), esperado[f.pk][1:])
+
+    def test_conteo_por_estado_en_una_consulta(self):
+        with CaptureQueriesContext(connection) as queries:
+            conteo = dict(
+                Factura.objects.with_cobro().order_by().values("cobro_estado")
+                .annotate(n=Count("pk")).values_list("cobro_estado", "n")
+            )
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(conteo, {"pagada": 1, "parcial": 1, "pendiente": 1, "anulada": 1})
+
+    def test_lista_facturas_filtra_en_sql(self):
+        user = Usuario.objects.create_user(
+            email="facturas@test.com", password="testpass", nombre="Test", apellido="Facturas", telefono="1",
+        )
+        user.is_staff = True
+        user.save()
+        self.client.force_login(user)
+        url = reverse("lista_facturas")
+
+        resp = self.client.get(url, {"estado_pago": "pendiente"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual({f.pk for f in resp.context["facturas"]}, {self.pendiente.pk, self.anulada.pk})
+
+        with CaptureQueriesContext(connection) as pocas:
+            self.client.get(url)
+        PagoFactura.objects.create(factura=self.pendiente, monto=Decimal("10.00"))
+        for i in range(5):
+            Factura.objects.create(
+                pedido=Pedido.objects.create(
+                    cliente=self.pendiente.pedido.cliente, fecha_entrega=date.today(),
+                    monto_total=Decimal("1.00"), estado=self.pendiente.pedido.estado,
+                ),
+                numero=f"0002-{i:08d}", monto_total=Decimal("1.00"),
+            )
+        with CaptureQueriesContext(connection) as muchas:
+            resp = self.client.get(url)
+        self.assertEqual(resp.context["total_resultados"], 9)
+        self.assertEqual(len(muchas), len(pocas))
@@ -0,0 +1,160 @@
+"""
+Tests de las recetas compiladas (productos/recetas.py) que usan
+calcular_consumo_producto y los chequeos de stock de pedidos/utils.py.
+
+Cubre:
+  1. Mismo resultado que RecetaDinamica.calcular / BOM + fórmula, incluido
+     el fallback al BOM cuando la receta falla.
+  2. Sin consultas mientras la receta no cambia; compilación conjunta.
+  3. Invalidación por signals y por version_receta (otro proceso); un save()
+     de una instancia vieja no hace retroceder la versión.
+  4. simular_formula evalúa un rango de cantidades como consumo_formula.
+"""
+from decimal import Decimal
+
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from configuracion.models import Formula
+from insumos.models import Insumo
+from pedidos.services import calcular_consumo_producto
+from pedidos.utils import _calcular_requerimientos
+from productos.models import LineaReceta, ParametroProducto, Producto, ProductoInsumo, RecetaDinamica
+from productos.recetas import limpiar_cache
+
+
+_contador = 0
+
+
+def _insumo():
+    global _contador
+    _contador += 1
+    return Insumo.objects.create(
+        nombre=f"Insumo {_contador}", codigo=f"RC-{_contador}",
+        stock=100, precio_unitario=1, activo=True,
+    )
+
+
+def _producto(formula=None):
+    return Producto.objects.create(nombreProducto="Folleto", precioUnitario=10, activo=True, formula=formula)
+
+
+class RecetaCompiladaTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        self.papel, self.tinta, self.plancha, self.barniz, self.laminado = (_insumo() for _ in range(5))
+        self.producto = _producto()
+        ParametroProducto.objects.create(
+            producto=self.producto, R=Decimal("3"), M=Decimal("0.0700"), C=4, F=2, Formas=2,
+            At=Decimal("0.0615"), Ct=Decimal("1.35"), tiene_barniz=True, Cb=Decimal("2.10"),
+            tiene_laminado=True,
+        )
+        self.receta = RecetaDinamica.objects.create(producto=self.producto)
+        for orden, (insumo, tipo) in enumerate([
+            (self.papel, LineaReceta.TIPO_PAPEL), (self.tinta, LineaReceta.TIPO_TINTA),
+            (self.plancha, LineaReceta.TIPO_PLANCHA), (self.barniz, LineaReceta.TIPO_BARNIZ),
+            (self.laminado, LineaReceta.TIPO_LAMINADO), (self.tinta, LineaReceta.TIPO_TINTA),
+            (self.papel, LineaReceta.TIPO_OTRO),
+        ]):
+            LineaReceta.objects.create(receta=self.receta, insumo=insumo, tipo=tipo, orden=orden)
+
+        self.insumo_formula = _insumo()
+        self.formula = Formula.objects.create(
+            insumo=self.insumo_formula, codigo="F-RC", nombre="Formula RC",
+            expresion="ceil(tirada * cobertura / paginas_totales)", variables_json=[], version=1, activo=True,
+        )
+        self.simple = _producto(self.formula)
+        ProductoInsumo.objects.create(producto=self.simple, insumo=self.papel, cantidad_por_unidad=Decimal("0.125"))
+        ProductoInsumo.objects.create(
+            producto=self.simple, insumo=self.plancha, cantidad_por_unidad=Decimal("4"), es_costo_fijo=True,
+        )
+        ParametroProducto.objects.create(producto=self.simple, Ct=Decimal("1.50"), C=2, F=1, Formas=3)
+
+    def _fresco(self, producto):
+        return Producto.objects.get(pk=producto.pk)
+
+    def test_receta_dinamica_igual_a_calcular(self):
+        for cantidad in (1, 7, 250, 1001, 33333):
+            esperado = RecetaDinamica.objects.get(pk=self.receta.pk).calcular(cantidad)
+            self.assertEqual(calcular_consumo_producto(self._fresco(self.producto), cantidad), esperado)
+        self.assertEqual(
+            calcular_consumo_producto(self._fresco(self.producto), 100)[self.plancha.pk], Decimal(16),
+        )
+
+    def test_bom_y_formula(self):
+        consumo = calcular_consumo_producto(self._fresco(self.simple), 500)
+        self.assertEqual(consumo, {
+            self.papel.pk: Decimal("62.500"),
+            self.plancha.pk: Decimal("4"),
+            self.insumo_formula.pk: Decimal("125"),
+        })
+
+    def test_receta_que_falla_cae_al_bom(self):
+        ParametroProducto.objects.filter(producto=self.producto).update(R=0)
+        ProductoInsumo.objects.create(producto=self.producto, insumo=self.papel, cantidad_por_unidad=2)
+        self.assertEqual(calcular_consumo_producto(self._fresco(self.producto), 10), {self.papel.pk: Decimal(20)})
+
+    def test_sin_consultas_con_receta_vigente(self):
+        productos = [self._fresco(self.producto), self._fresco(self.simple)]
+        with CaptureQueriesContext(connection) as compilar:
+            _calcular_requerimientos([(p, 10) for p in productos])
+        with CaptureQueriesContext(connection) as vigente:
+            for producto in productos:
+                calcular_consumo_producto(producto, 20)
+            _calcular_requerimientos([(p, 10) for p in productos])
+        self.assertEqual(len(vigente), 0)
+        self.assertLessEqual(len(compilar), 5)
+
+    def test_signals_invalidan(self):
+        producto = self._fresco(self.producto)
+        antes = calcular_consumo_producto(producto, 100)
+
+        linea = LineaReceta.objects.get(receta=self.receta, tipo=LineaReceta.TIPO_OTRO)
+        linea.tipo = LineaReceta.TIPO_PLANCHA
+        linea.save()
+        self.assertEqual(calcular_consumo_producto(producto, 100)[self.papel.pk], antes[self.papel.pk] + 16)
+
+        parametros = ParametroProducto.objects.get(producto=self.producto)
+        parametros.tiene_laminado = False
+        parametros.save()
+        self.assertNotIn(self.laminado.pk, calcular_consumo_producto(self._fresco(self.producto), 100))
+
+        self.formula.expresion = "tirada * 2"
+        self.formula.save()
+        self.assertEqual(calcular_consumo_producto(self._fresco(self.simple), 10)[self.insumo_formula.pk], 20)
+
+        ProductoInsumo.objects.filter(producto=self.simple, insumo=self.papel).delete()
+        self.assertNotIn(self.papel.pk, calcular_consumo_producto(self._fresco(self.simple), 10))
+
+        self.assertGreater(self._fresco(self.simple).version_receta, self.simple.version_receta)
+
+    def test_version_de_otro_proceso(self):
+        calcular_consumo_producto(self._fresco(self.simple), 10)
+        # Cambio hecho por otro proceso: sin signals en éste, sólo la versión en la BD
+        ProductoInsumo.objects.filter(producto=self.simple, insumo=self.papel).update(cantidad_por_unidad=1)
+        Producto.objects.filter(pk=self.simple.pk).update(version_receta=F('version_receta') + 1)
+        self.assertEqual(calcular_consumo_producto(self._fresco(self.simple), 10)[self.papel.pk], Decimal(10))
+
+    def test_save_de_instancia_vieja_no_pisa_la_version(self):
+        vieja = self._fresco(self.simple)
+        calcular_consumo_producto(vieja, 10)
+        ProductoInsumo.objects.filter(producto=self.simple, insumo=self.papel).update(cantidad_por_unidad=1)
+        Producto.objects.filter(pk=self.simple.pk).update(version_receta=F('version_receta') + 1)
+
+        vieja.nombreProducto = "Renombrado"
+        vieja.save()
+        fresco = self._fresco(self.simple)
+        self.assertEqual((fresco.nombreProducto, fresco.version_receta), ("Renombrado", vieja.version_receta + 1))
+        self.assertEqual(calcular_consumo_producto(fresco, 10)[self.papel.pk], Decimal(10))
+
+    def test_simular_formula_igual_a_consumo_formula(self):
+        from productos.recetas import receta_compilada
+        compilada = receta_compilada(self._fresco(self.simple))
+        cantidades = [0, 1, 7, 100, 999, 5000]
+        simulado = compilada.simular_formula(cantidades)
+        for cantidad, valor in zip(cantidades, simulado):
+            esperado = compilada.consumo_formula(cantidad).get(self.insumo_formula.pk, 0)
+            self.assertEqual(valor, float(esperado))
+        self.assertEqual(list(receta_compilada(self._fresco(self.producto)).simular_formula([1, 2])), [0, 0])
@@ -2,16 +2,21 @@
 Tests de integración del flujo de stock en pedidos.
 Reemplaza la versión pytest anterior que usaba campos eliminados del modelo Pedido.
 """
+import json
 from datetime import date, timedelta
 from decimal import Decimal
+from unittest import mock
 
 from django.test import TestCase
 
+from auditoria.models import AuditEntry
 from clientes.models import Cliente
 from configuracion.models import Formula
 from insumos.models import Insumo
-from pedidos.models import EstadoPedido, LineaPedido, Pedido
+from pedidos.models import EstadoPedido, LineaPedido, OrdenProduccion, Pedido
 from productos.models import Producto, ProductoInsumo
+from usuarios.models import Notificacion, Usuario
+from utils.pruebas import assert_queries_no_crecen
 
 
 class StockPedidoTests(TestCase):
@@ -83,3 +88,97 @@ class StockPedidoTests(TestCase):
         self.insumo.refresh_from_db()
         # costo_fijo: cantidad_por_unidad=2 independiente de cantidad=100
         self.assertEqual(self.insumo.stock, stock_antes - 2)
+
+
+class ReservaStockEnBloqueTests(TestCase):
+    """Reserva y devolución en bloque (pedidos.services._mover_stock_pedido)."""
+
+    def setUp(self):
+        self.cliente = Cliente.objects.create(
+            nombre="Test", apellido="Bloque",
+            email="bloque@stock.com", telefono="123456",
+            cuit="20-44444444-4",
+        )
+        estado, _ = EstadoPedido.objects.get_or_create(nombre="pendiente")
+        self.pedido = Pedido.objects.create(
+            cliente=self.cliente,
+            fecha_entrega=date.today() + timedelta(days=7),
+            monto_total=Decimal("100.00"),
+            estado=estado,
+        )
+
+    def _insumos(self, n, stock=50):
+        base = Insumo.objects.count()
+        return [
+            Insumo.objects.create(
+                nombre=f"Bloque {base + k}", codigo=f"BLQ-{base + k:03d}",
+                stock=stock, precio_unitario=1, activo=True,
+            )
+            for k in range(n)
+        ]
+
+    def _reservar(self, consumos):
+        from pedidos import services
+        with mock.patch.object(services, 'calcular_consumo_pedido', return_value=consumos):
+            services.reservar_insumos_para_pedido(self.pedido)
+
+    def _devolver(self, consumos):
+        from pedidos import services
+        with mock.patch.object(services, 'calcular_consumo_pedido', return_value=consumos):
+            services.devolver_insumos_para_pedido(self.pedido)
+
+    def _movimientos(self):
+        return list(
+            AuditEntry.objects.filter(model='Insumo', extra__contains='stock-movement')
+            .values_list('object_id', 'changes')
+        )
+
+    def test_reserva_y_devolucion_actualizan_stock_y_auditan(self):
+        insumos = self._insumos(3)
+        consumos = {ins.idInsumo: Decimal(k + 1) + Decimal("0.5") for k, ins in enumerate(insumos)}
+        with self.captureOnCommitCallbacks(execute=True):
+            self._reservar(consumos)
+        self.assertEqual(
+            [Insumo.objects.get(pk=ins.pk).stock for ins in insumos], [49, 48, 47],
+        )
+        movimientos = self._movimientos()
+        self.assertEqual(len(movimientos), 3)
+        self.assertIn(
+            (str(insumos[2].idInsumo), json.dumps({'stock': {'before': 50, 'after': 47}})), movimientos,
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self._devolver(consumos)
+        self.assertEqual([Insumo.objects.get(pk=ins.pk).stock for ins in insumos], [50, 50, 50])
+        self.assertEqual(len(self._movimientos()), 6)
+
+    def test_stock_insuficiente_no_descuenta_nada(self):
+        insumos = self._insumos(3, stock=5)
+        consumos = {ins.idInsumo: Decimal(3) for ins in insumos}
+        consumos[insumos[1].idInsumo] = Decimal("5.5")
+        with self.assertRaises(ValueError):
+            self._reservar(consumos)
+        self.assertEqual([Insumo.objects.get(pk=ins.pk).stock for ins in insumos], [5, 5, 5])
+        self.assertEqual(self._movimientos(), [])
+
+    def test_queries_no_crecen_con_el_bom(self):
+        pocos = {ins.idInsumo: Decimal(2) for ins in self._insumos(3)}
+        muchos = {ins.idInsumo: Decimal(2) for ins in self._insumos(40)}
+        assert_queries_no_crecen(
+            self, lambda: self._reservar(pocos), lambda: self._reservar(muchos),
+            entre=lambda: OrdenProduccion.objects.filter(pedido=self.pedido).delete(),
+        )
+
+    def test_alerta_de_stock_bajo_por_lote(self):
+        Usuario.objects.create_user(
+            email="staff@stock.com", password="x", nombre="Staff", apellido="Stock",
+            telefono="1", is_staff=True,
+        )
+        agotado, bajo_minimo, holgado = self._insumos(3, stock=10)
+        Insumo.objects.filter(pk=bajo_minimo.pk).update(stock_minimo_calculado=8)
+        self._reservar({agotado.idInsumo: 10, bajo_minimo.idInsumo: 4, holgado.idInsumo: 1})
+        mensajes = sorted(Notificacion.objects.values_list('mensaje', flat=True))
+        self.assertEqual(len(mensajes), 2)
+        self.assertIn('STOCK AGOTADO', mensajes[0])
+        self.assertIn(f'[{bajo_minimo.codigo}]', mensajes[1])
+        self.assertIn('stock=6, mínimo=8', mensajes[1])
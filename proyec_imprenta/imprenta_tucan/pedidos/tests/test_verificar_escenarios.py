@@ -0,0 +1,211 @@
+"""
+Tests de la verificación de stock por escenarios (pedidos/utils.py
+verificar_escenarios y el endpoint verificar_stock_escenarios).
+
+Cubre:
+  1. Faltantes por escenario, ajuste neto contra un pedido y fallback al
+     stock total cuando ninguna línea tiene BOM.
+  2. Cantidad de queries independiente de la cantidad de escenarios.
+  3. Snapshot de stock con TTL: no relee la BD y se invalida al mover stock.
+  4. El endpoint responde un resultado por escenario y 400 ante ids o
+     cantidades inválidos; verificar_stock, verificar_stock_modificar y
+     verificar_stock_diferencial validan igual.
+"""
+import json
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from clientes.models import Cliente
+from insumos.models import Insumo
+from pedidos.models import EstadoPedido, Pedido
+from pedidos.utils import descontar_insumos_para_lineas, verificar_escenarios
+from productos.models import Producto, ProductoInsumo
+from productos.recetas import limpiar_cache
+from usuarios.models import Usuario
+from utils.pruebas import assert_queries_no_crecen
+
+
+class VerificarEscenariosTests(TestCase):
+    def setUp(self):
+        limpiar_cache()
+        cache.clear()
+        self.papel = Insumo.objects.create(nombre="Papel", codigo="ESC-P", stock=100, precio_unitario=1, activo=True)
+        self.tinta = Insumo.objects.create(nombre="Tinta", codigo="ESC-T", stock=10, precio_unitario=1, activo=True)
+        self.folleto = Producto.objects.create(nombreProducto="Folleto", precioUnitario=10, activo=True)
+        ProductoInsumo.objects.create(producto=self.folleto, insumo=self.papel, cantidad_por_unidad=Decimal("2"))
+        ProductoInsumo.objects.create(
+            producto=self.folleto, insumo=self.tinta, cantidad_por_unidad=Decimal("3"), es_costo_fijo=True,
+        )
+        self.tarjeta = Producto.objects.create(nombreProducto="Tarjeta", precioUnitario=10, activo=True)
+        ProductoInsumo.objects.create(producto=self.tarjeta, insumo=self.tinta, cantidad_por_unidad=Decimal("0.5"))
+        self.sin_bom = Producto.objects.create(nombreProducto="Servicio", precioUnitario=10, activo=True)
+
+    def test_faltantes_por_escenario(self):
+        resultados = verificar_escenarios([
+            [(self.folleto, 10)],
+            [(self.folleto, 60)],
+            [(self.folleto, 10), (self.tarjeta, 20)],
+            [(self.sin_bom, 110)],
+            [(self.sin_bom, 111)],
+            [],
+        ])
+        self.assertEqual(resultados, [
+            (True, {}),
+            (False, {self.papel.pk: 20.0}),
+            (False, {self.tinta.pk: 3.0}),
+            (True, {}),
+            (False, {}),
+            (True, {}),
+        ])
+
+    def test_ajuste_neto_contra_base(self):
+        base = [(self.folleto, 40)]
+        resultados = verificar_escenarios([[(self.folleto, 50)], [(self.folleto, 100)], []], base_lineas=base)
+        self.assertEqual(resultados, [(True, {}), (False, {self.papel.pk: 20.0}), (True, {})])
+
+    def test_queries_no_crecen_con_los_escenarios(self):
+        uno = [[(self.folleto, 10), (self.tarjeta, 5)]]
+        muchos = [[(self.folleto, k), (self.tarjeta, 3 * k)] for k in range(1, 30)] + [[(self.sin_bom, 5)]]
+        verificar_escenarios(muchos)
+        _pocos, varios = assert_queries_no_crecen(
+            self, lambda: verificar_escenarios(uno + [[(self.sin_bom, 5)]]), lambda: verificar_escenarios(muchos),
+        )
+        self.assertEqual(len(varios), 2)
+
+    @override_settings(STOCK_SNAPSHOT_TTL_SEGUNDOS=30)
+    def test_snapshot_de_stock(self):
+        escenarios = [[(self.folleto, 45)]]
+        self.assertEqual(verificar_escenarios(escenarios, ttl_stock=30), [(True, {})])
+        Insumo.objects.filter(pk=self.papel.pk).update(stock=0)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(verificar_escenarios(escenarios, ttl_stock=30), [(True, {})])
+        self.assertEqual(len(queries), 0)
+        # Sin TTL siempre se lee la BD
+        self.assertEqual(verificar_escenarios(escenarios), [(False, {self.papel.pk: 90.0})])
+
+        Insumo.objects.filter(pk=self.papel.pk).update(stock=100)
+        with self.captureOnCommitCallbacks(execute=True):
+            descontar_insumos_para_lineas([(self.folleto, 30)])
+        self.assertEqual(verificar_escenarios(escenarios, ttl_stock=30), [(False, {self.papel.pk: 50.0})])
+
+
+class VerificarStockEscenariosViewTests(TestCase):
+    def setUp(self):
+        from permisos.models import Permiso
+        from roles.models import Rol
+
+        limpiar_cache()
+        permiso = Permiso.objects.create(
+            nombre="Permiso Pedidos", descripcion="Pedidos", modulo="Pedidos",
+            acciones=json.dumps(["Listar", "Crear", "Ver", "Editar"]), estado="Activo",
+        )
+        rol = Rol.objects.create(nombreRol="Rol Escenarios", estado="Activo")
+        rol.permisos.add(permiso)
+        user = Usuario.objects.create_user(
+            email="escenarios@test.com", password="testpass", nombre="Test", apellido="Escenarios",
+            telefono="1234", rol=rol,
+        )
+        self.client.force_login(user)
+        self.papel = Insumo.objects.create(nombre="Papel", codigo="ESC-V", stock=100, precio_unitario=1, activo=True)
+        self.producto = Producto.objects.create(nombreProducto="Folleto", precioUnitario=10, activo=True)
+        ProductoInsumo.objects.create(producto=self.producto, insumo=self.papel, cantidad_por_unidad=Decimal("2"))
+
+    def _post(self, body):
+        return self.client.post(
+            reverse("verificar_stock_escenarios"), data=json.dumps(body), content_type="application/json",
+        )
+
+    def test_un_resultado_por_escenario(self):
+        resp = self._post({"escenarios": [
+            [{"producto": self.producto.pk, "cantidad": 50}],
+            [{"producto": self.producto.pk, "cantidad": 80}],
+        ]})
+        self.assertEqual(resp.status_code, 200)
+        data = resp.json()
+        self.assertFalse(data["ok"])
+        self.assertEqual(data["escenarios"][0], {"ok": True, "faltantes": []})
+        self.assertEqual(data["escenarios"][1], {"ok": False, "faltantes": [
+            {"id": self.papel.pk, "codigo": "ESC-V", "nombre": "Papel", "faltan": 60.0},
+        ]})
+
+    def test_formato_invalido(self):
+        self.assertEqual(self._post({"escenarios": [{"producto": 1}]}).status_code, 400)
+        self.assertEqual(self._post({"escenarios": [[]] * 51}).status_code, 400)
+        self.assertEqual(self._post([]).status_code, 400)
+
+    def test_ids_invalidos(self):
+        for body in (
+            {"escenarios": [[{"producto": "abc", "cantidad": 1}]]},
+            {"escenarios": [[{"producto": [1], "cantidad": 1}]]},
+            {"escenarios": [[{"producto": 10 ** 30, "cantidad": 1}]]},
+            {"escenarios": [], "pedido": "x"},
+            {"escenarios": [], "pedido": {"id": 1}},
+        ):
+            with self.subTest(body=body):
+                resp = self._post(body)
+                self.assertEqual(resp.status_code, 400)
+                self.assertFalse(resp.json()["ok"])
+
+        # Id como texto numérico: se resuelve igual que el número
+        resp = self._post({"escenarios": [[{"producto": str(self.producto.pk), "cantidad": 80}]]})
+        self.assertFalse(resp.json()["escenarios"][0]["ok"])
+
+    def test_cantidades_invalidas(self):
+        linea = '{"escenarios": [[{"producto": %d, "cantidad": %s}]]}'
+        for cantidad in ("1e999", "2.5", '"abc"', "[3]", "true", str(2 ** 31)):
+            with self.subTest(cantidad=cantidad):
+                resp = self.client.post(
+                    reverse("verificar_stock_escenarios"), data=linea % (self.producto.pk, cantidad),
+                    content_type="application/json",
+                )
+                self.assertEqual(resp.status_code, 400)
+                self.assertFalse(resp.json()["ok"])
+
+        # Cantidad como texto numérico: se resuelve igual que el número
+        resp = self._post({"escenarios": [[{"producto": self.producto.pk, "cantidad": "80"}]]})
+        self.assertFalse(resp.json()["escenarios"][0]["ok"])
+
+    def test_otros_endpoints_validan_igual(self):
+        pedido = Pedido.objects.create(
+            cliente=Cliente.objects.create(
+                nombre="Test", apellido="Escenarios", email="cli-esc@test.com", telefono="123", cuit="20-11111111-0",
+            ),
+            fecha_entrega=date.today() + timedelta(days=7), monto_total=Decimal("100"),
+            estado=EstadoPedido.objects.get_or_create(nombre="pendiente")[0],
+        )
+        verificar_stock = reverse("verificar_stock")
+        diferencial = reverse("verificar_stock_diferencial", args=[pedido.pk])
+        modificar = reverse("verificar_stock_modificar", args=[pedido.pk])
+        for url, body in (
+            (verificar_stock, {"lineas": [{"producto": self.producto.pk, "cantidad": "abc"}]}),
+            (verificar_stock, {"lineas": [{"producto": "abc", "cantidad": 1}]}),
+            (verificar_stock, {"lineas": [{"producto": self.producto.pk, "cantidad": 2 ** 31}]}),
+            (verificar_stock, {"lineas": [1]}),
+            (verificar_stock, []),
+            (diferencial, {"lineas": [{"producto": self.producto.pk, "cantidad": [3]}]}),
+            (diferencial, {"lineas": [{"producto": self.producto.pk, "cantidad": 1}], "nuevo_estado_id": "x"}),
+            (diferencial, {"lineas": "x"}),
+            (modificar, {"producto": self.producto.pk, "cantidad": "1e999"}),
+            (modificar, {"producto": {"id": 1}, "cantidad": 1}),
+        ):
+            with self.subTest(url=url, body=body):
+                resp = self.client.post(url, data=json.dumps(body), content_type="application/json")
+                self.assertEqual(resp.status_code, 400)
+                self.assertFalse(resp.json()["ok"])
+
+        # Ids y cantidades como texto numérico se resuelven igual que los números
+        for url, body in (
+            (verificar_stock, {"lineas": [{"producto": str(self.producto.pk), "cantidad": "80"}]}),
+            (diferencial, {"lineas": [{"producto": self.producto.pk, "cantidad": "80"}]}),
+            (modificar, {"producto": str(self.producto.pk), "cantidad": "80"}),
+        ):
+            with self.subTest(url=url, body=body):
+                resp = self.client.post(url, data=json.dumps(body), content_type="application/json")
+                self.assertEqual(resp.status_code, 200)
+                self.assertFalse(resp.json()["ok"])
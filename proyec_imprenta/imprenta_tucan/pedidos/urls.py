@@ -7,6 +7,7 @@ urlpatterns = [
     path('verificar-stock/', views.verificar_stock, name='verificar_stock'),
     path('verificar-stock-modificar/<int:idPedido>/', views.verificar_stock_modificar, name='verificar_stock_modificar'),
     path('verificar-stock-diferencial/<int:idPedido>/', views.verificar_stock_diferencial, name='verificar_stock_diferencial'),
+    path('verificar-stock-escenarios/', views.verificar_stock_escenarios, name='verificar_stock_escenarios'),
     path('enviar-cliente/<int:idPedido>/', views.enviar_pedido_cliente, name='enviar_pedido_cliente'),
     path('factura/<int:idPedido>/pdf/', views.descargar_factura, name='descargar_factura'),
     path('buscar/', views.buscar_pedido, name='buscar_pedido'),
@@ -37,48 +37,167 @@ def verificar_insumos_disponibles(producto, cantidad: int) -> bool:
     return int(total_stock) >= int(cantidad or 0)
 
 
+def _requeridos_bom(lineas: list[tuple]) -> tuple[dict, bool]:
+    """
+    Suma el BOM (ProductoInsumo) de las líneas (producto, cantidad) desde las
+    recetas compiladas de productos/recetas.py: una compilación conjunta para
+    los productos que no están en cache y ninguna consulta para los demás.
+    Retorna ({insumo_id: requerido_float}, hay_receta).
+    """
+    from productos.recetas import recetas_compiladas
+
+    lineas = [(producto, cantidad) for producto, cantidad in lineas if producto and cantidad]
+    recetas = recetas_compiladas(producto for producto, _cantidad in lineas)
+    requeridos = defaultdict(float)
+    hay_receta = False
+    for producto, cantidad in lineas:
+        bom = recetas[producto.pk].bom
+        if bom:
+            hay_receta = True
+        for insumo_id, por_unidad, es_fijo in bom:
+            if es_fijo:
+                # Costo fijo: la cantidad es por trabajo, no se multiplica por los ejemplares
+                requeridos[insumo_id] += float(por_unidad)
+            else:
+                requeridos[insumo_id] += float(por_unidad) * float(cantidad)
+    return requeridos, hay_receta
+
+
 def verificar_insumos_para_lineas(lineas: list[tuple]) -> tuple[bool, dict]:
     """
     Verifica en conjunto los insumos necesarios para múltiples líneas.
     lineas: lista de tuplas (producto, cantidad)
     Retorna (ok, faltantes_por_insumo_id)
     """
-    try:
-        from insumos.models import Insumo
-        from productos.models import ProductoInsumo
-    except Exception:
-        return False, {}
+    return verificar_escenarios([lineas])[0]
 
-    requeridos = defaultdict(float)  # insumo_id -> cantidad requerida
-    hay_receta = False
-    for producto, cantidad in lineas:
-        if not producto or not cantidad:
+
+# --------------------------------------------------------------------------- #
+# Verificación de stock por escenarios                                         #
+# --------------------------------------------------------------------------- #
+
+_CLAVE_STOCK = 'pedidos:stock:'
+_CLAVE_STOCK_TOTAL = 'pedidos:stock_total_activo'
+
+
+def ttl_snapshot_stock() -> float:
+    """Segundos que vale el snapshot de stock de los chequeos AJAX (0 = sin snapshot)."""
+    from django.conf import settings
+    return float(getattr(settings, 'STOCK_SNAPSHOT_TTL_SEGUNDOS', 0))
+
+
+def _stocks(insumo_ids, ttl: float) -> dict:
+    """
+    {idInsumo: stock_float} en una consulta. Con ttl > 0 se sirve primero del
+    snapshot en cache y sólo se leen (y guardan por `ttl` segundos) los que faltan.
+    """
+    from insumos.models import Insumo
+
+    ids = set(insumo_ids)
+    if not ids:
+        return {}
+    stocks = {}
+    if ttl > 0:
+        from django.core.cache import cache
+        en_cache = cache.get_many([f'{_CLAVE_STOCK}{iid}' for iid in ids])
+        stocks = {int(clave[len(_CLAVE_STOCK):]): valor for clave, valor in en_cache.items()}
+    faltan = ids - stocks.keys()
+    if faltan:
+        leidos = {
+            iid: float(stock)
+            for iid, stock in Insumo.objects.filter(idInsumo__in=faltan).values_list('idInsumo', 'stock')
+        }
+        if ttl > 0 and leidos:
+            cache.set_many({f'{_CLAVE_STOCK}{iid}': stock for iid, stock in leidos.items()}, timeout=ttl)
+        stocks.update(leidos)
+    return stocks
+
+
+def _stock_total_activo(ttl: float) -> int:
+    """Suma de stock de insumos activos: el fallback de verificar_insumos_disponibles."""
+    from insumos.models import Insumo
+
+    if ttl > 0:
+        from django.core.cache import cache
+        total = cache.get(_CLAVE_STOCK_TOTAL)
+        if total is not None:
+            return total
+    total = int(Insumo.objects.filter(activo=True).aggregate(total=Sum("stock")).get("total") or 0)
+    if ttl > 0:
+        cache.set(_CLAVE_STOCK_TOTAL, total, timeout=ttl)
+    return total
+
+
+def invalidar_snapshot_stock(insumo_ids) -> None:
+    """
+    Descarta del snapshot los insumos cuyo stock acaba de cambiar. Quien
+    mueve stock dentro de una transacción lo llama en on_commit: antes, otra
+    request podría volver a guardar el valor viejo.
+    """
+    if ttl_snapshot_stock() <= 0:
+        return
+    from django.core.cache import cache
+    cache.delete_many([f'{_CLAVE_STOCK}{iid}' for iid in insumo_ids] + [_CLAVE_STOCK_TOTAL])
+
+
+def verificar_escenarios(escenarios, base_lineas=None, ttl_stock: float = 0) -> list[tuple[bool, dict]]:
+    """
+    Verifica el stock de varios escenarios de líneas (producto, cantidad) a la
+    vez: compila las recetas de todos los productos juntas y lee el stock de
+    todos los insumos involucrados en una sola consulta.
+
+    Sin `base_lineas` cada escenario se evalúa como verificar_insumos_para_lineas
+    (incluido el fallback al stock total cuando ninguna línea tiene BOM); con
+    `base_lineas` (las líneas actuales de un pedido) se verifica sólo el ajuste
+    neto positivo, como verificar_insumos_para_ajuste.
+
+    ttl_stock > 0 permite servir el stock desde un snapshot de esa antigüedad
+    (ttl_snapshot_stock()): pensado para los chequeos AJAX mientras se editan
+    las líneas, nunca para validar un movimiento de stock.
+
+    Retorna [(ok, {insumo_id: faltante})] en el orden de `escenarios`.
+    """
+    from productos.recetas import recetas_compiladas
+
+    escenarios = [list(lineas) for lineas in escenarios]
+    recetas_compiladas(
+        producto for lineas in escenarios + [list(base_lineas or [])]
+        for producto, cantidad in lineas if producto and cantidad
+    )
+    base = _requeridos_bom(base_lineas)[0] if base_lineas is not None else None
+
+    requerimientos = []
+    for lineas in escenarios:
+        requeridos, hay_receta = _requeridos_bom(lineas)
+        if base is not None:
+            # Sólo los netos positivos (necesitamos stock adicional)
+            netos = {
+                iid: float(requeridos.get(iid, 0.0)) - float(base.get(iid, 0.0))
+                for iid in set(requeridos) | set(base)
+            }
+            requeridos, hay_receta = {iid: cant for iid, cant in netos.items() if cant > 0}, True
+        requerimientos.append((lineas, requeridos, hay_receta))
+
+    stocks = _stocks(
+        (iid for _lineas, requeridos, hay_receta in requerimientos if hay_receta for iid in requeridos),
+        ttl_stock,
+    )
+    total_activo = None
+    resultados = []
+    for lineas, requeridos, hay_receta in requerimientos:
+        if not hay_receta:
+            # Si no hay recetas en ninguna línea, mantener la validación simple por cada línea
+            if total_activo is None:
+                total_activo = _stock_total_activo(ttl_stock)
+            resultados.append((all(total_activo >= int(cantidad or 0) for _producto, cantidad in lineas), {}))
             continue
-        # Usar receta detallada por producto-insumo con cantidad_por_unidad
-        receta_items = list(ProductoInsumo.objects.filter(producto=producto).only('insumo_id', 'cantidad_por_unidad', 'es_costo_fijo'))
-        if receta_items:
-            hay_receta = True
-            for r in receta_items:
-                if r.es_costo_fijo:
-                    # Costo fijo: la cantidad es por trabajo, no se multiplica por los ejemplares
-                    requeridos[r.insumo_id] += float(r.cantidad_por_unidad)
-                else:
-                    requeridos[r.insumo_id] += float(r.cantidad_por_unidad) * float(cantidad)
-
-    if not hay_receta:
-        # Si no hay recetas en ninguna línea, mantener la validación simple por cada línea
-        for producto, cantidad in lineas:
-            if not verificar_insumos_disponibles(producto, cantidad):
-                return False, {}
-        return True, {}
-
-    faltantes = {}
-    stocks = {i.idInsumo: float(i.stock) for i in Insumo.objects.filter(idInsumo__in=requeridos.keys())}
-    for insumo_id, req in requeridos.items():
-        disp = float(stocks.get(insumo_id, 0.0))
-        if disp < req:
-            faltantes[insumo_id] = req - disp
-    return (len(faltantes) == 0), faltantes
+        faltantes = {}
+        for insumo_id, req in requeridos.items():
+            disp = float(stocks.get(insumo_id, 0.0))
+            if disp < req:
+                faltantes[insumo_id] = req - disp
+        resultados.append(((len(faltantes) == 0), faltantes))
+    return resultados
 
 
 def descontar_insumos_para_lineas(lineas: list[tuple]) -> None:
@@ -86,18 +205,8 @@ def descontar_insumos_para_lineas(lineas: list[tuple]) -> None:
     Debe ejecutarse dentro de una transacción atómica si se combina con creación de pedidos.
     """
     from insumos.models import Insumo
-    from productos.models import ProductoInsumo
-
-    requeridos = defaultdict(float)
-    for producto, cantidad in lineas:
-        if not producto or not cantidad:
-            continue
-        for r in ProductoInsumo.objects.filter(producto=producto).only('insumo_id', 'cantidad_por_unidad', 'es_costo_fijo'):
-            if r.es_costo_fijo:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad)
-            else:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad) * float(cantidad)
 
+    requeridos, _hay_receta = _requeridos_bom(lineas)
     if not requeridos:
         return
 
@@ -121,24 +230,14 @@ def descontar_insumos_para_lineas(lineas: list[tuple]) -> None:
             )
             ins.stock = 0
         ins.save(update_fields=["stock", "updated_at"])
+    transaction.on_commit(lambda: invalidar_snapshot_stock(insumos_by_id))
 
 
 def _calcular_requerimientos(lineas: list[tuple]) -> dict:
     """Calcula requerimientos agregados de insumos para una lista de líneas (producto, cantidad).
     Devuelve dict {insumo_id: requerido_float}.
     """
-    from productos.models import ProductoInsumo
-
-    requeridos = defaultdict(float)
-    for producto, cantidad in lineas:
-        if not producto or not cantidad:
-            continue
-        for r in ProductoInsumo.objects.filter(producto=producto).only('insumo_id', 'cantidad_por_unidad', 'es_costo_fijo'):
-            if r.es_costo_fijo:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad)
-            else:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad) * float(cantidad)
-    return requeridos
+    return _requeridos_bom(lineas)[0]
 
 
 def calcular_insumos_bajo_minimo(lineas: list[tuple]) -> list[dict]:
@@ -148,19 +247,10 @@ def calcular_insumos_bajo_minimo(lineas: list[tuple]) -> list[dict]:
     """
     try:
         from insumos.models import Insumo
-        from productos.models import ProductoInsumo
     except Exception:
         return []
 
-    requeridos = defaultdict(float)
-    for producto, cantidad in lineas:
-        if not producto or not cantidad:
-            continue
-        for r in ProductoInsumo.objects.filter(producto=producto).only('insumo_id', 'cantidad_por_unidad', 'es_costo_fijo'):
-            if r.es_costo_fijo:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad)
-            else:
-                requeridos[r.insumo_id] += float(r.cantidad_por_unidad) * float(cantidad)
+    requeridos, _hay_receta = _requeridos_bom(lineas)
 
     if not requeridos:
         return []
@@ -190,28 +280,7 @@ def verificar_insumos_para_ajuste(old_lineas: list[tuple], new_lineas: list[tupl
     """Verifica sólo el ajuste neto de insumos entre estado anterior y nuevo.
     Retorna (ok, faltantes_por_insumo_id) considerando únicamente necesidades netas positivas.
     """
-    from insumos.models import Insumo
-
-    req_old = _calcular_requerimientos(old_lineas)
-    req_new = _calcular_requerimientos(new_lineas)
-
-    netos = defaultdict(float)
-    insumo_ids = set(req_old.keys()) | set(req_new.keys())
-    for iid in insumo_ids:
-        netos[iid] = float(req_new.get(iid, 0.0)) - float(req_old.get(iid, 0.0))
-
-    # Sólo validar los positivos (necesitamos stock adicional)
-    positivos = {iid: cant for iid, cant in netos.items() if cant > 0}
-    if not positivos:
-        return True, {}
-
-    stocks = {i.idInsumo: float(i.stock) for i in Insumo.objects.filter(idInsumo__in=positivos.keys())}
-    faltantes = {}
-    for iid, req in positivos.items():
-        disp = stocks.get(iid, 0.0)
-        if disp < req:
-            faltantes[iid] = req - disp
-    return (len(faltantes) == 0), faltantes
+    return verificar_escenarios([new_lineas], base_lineas=old_lineas)[0]
 
 
 def ajustar_insumos_por_diferencia(old_lineas: list[tuple], new_lineas: list[tuple]) -> None:
@@ -275,3 +344,4 @@ def ajustar_insumos_por_diferencia(old_lineas: list[tuple], new_lineas: list[tup
             )
         except Exception as exc:
             log.warning('ajustar_insumos_por_diferencia: no se pudo registrar AuditEntry para insumo #%s: %s', ins.idInsumo, exc)
+    transaction.on_commit(lambda: invalidar_snapshot_stock(insumos_by_id))
@@ -27,6 +27,8 @@ from .utils import (
     verificar_insumos_para_ajuste,
     ajustar_insumos_por_diferencia,
     calcular_insumos_bajo_minimo,
+    ttl_snapshot_stock,
+    verificar_escenarios,
 )
 from productos.models import Producto
 from proveedores.models import Proveedor
@@ -65,6 +67,68 @@ def _audit_pedido(request, pedido, accion, extra=None):
         pass
 
 
+def _detalle_faltantes(faltantes: dict) -> list[dict]:
+    """[{id, codigo, nombre, faltan}] para {insumo_id: faltante}, en una consulta."""
+    if not faltantes:
+        return []
+    try:
+        info = {i.idInsumo: (i.codigo, i.nombre) for i in Insumo.objects.filter(idInsumo__in=faltantes.keys())}
+    except Exception:
+        info = {}
+    detalle = []
+    for iid, falt in faltantes.items():
+        codigo, nombre = info.get(iid, ("-", f"Insumo {iid}"))
+        detalle.append({"id": iid, "codigo": codigo, "nombre": nombre, "faltan": float(falt)})
+    return detalle
+
+
+def _id_desde_json(valor):
+    """Id entero positivo de un valor JSON (número o texto); None si viene vacío."""
+    if valor is None or valor == "":
+        return None
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(f"id inválido: {valor!r}")
+    pk = int(valor)
+    if not 0 < pk < 2 ** 63:
+        raise ValueError(f"id fuera de rango: {valor!r}")
+    return pk
+
+
+def _cantidad_desde_json(valor) -> int:
+    """Cantidad entera de un valor JSON (número o texto); 0 si viene vacía."""
+    if valor is None or valor == "":
+        return 0
+    if isinstance(valor, bool) or not isinstance(valor, (int, str)):
+        raise ValueError(f"cantidad inválida: {valor!r}")
+    cant = int(valor)
+    # Tope de LineaPedido.cantidad (PositiveIntegerField)
+    if cant >= 2 ** 31:
+        raise ValueError(f"cantidad fuera de rango: {valor!r}")
+    return cant
+
+
+def _lineas_desde_json(lineas_req, productos_by_id) -> list[tuple]:
+    """(producto, cantidad) de las líneas JSON con producto conocido y cantidad > 0."""
+    lineas = []
+    for l in lineas_req:
+        prod = productos_by_id.get(_id_desde_json(l.get("producto")))
+        cant = _cantidad_desde_json(l.get("cantidad"))
+        if prod and cant > 0:
+            lineas.append((prod, cant))
+    return lineas
+
+
+def _lineas_con_productos(lineas_req) -> list[tuple]:
+    """
+    _lineas_desde_json cargando los productos en una consulta. ValueError si
+    lineas_req no es una lista de objetos o trae ids/cantidades inválidos.
+    """
+    if not isinstance(lineas_req, list) or not all(isinstance(l, dict) for l in lineas_req):
+        raise ValueError("formato de líneas inválido")
+    producto_ids = {_id_desde_json(l.get("producto")) for l in lineas_req} - {None}
+    return _lineas_desde_json(lineas_req, Producto.objects.in_bulk(producto_ids))
+
+
 @require_perm('Pedidos', 'Listar')
 @login_required
 @requiere_permiso("Pedidos")
@@ -383,26 +447,18 @@ def verificar_stock(request):
         body = json.loads(request.body.decode("utf-8"))
     except Exception:
         return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
-
-    lineas_req = body.get("lineas", []) or []
-    if not isinstance(lineas_req, list):
+    if not isinstance(body, dict):
         return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
 
-    # Construir (producto, cantidad)
-    productos_by_id = {p.idProducto: p for p in Producto.objects.filter(
-        idProducto__in=[l.get("producto") for l in lineas_req if l.get("producto")])}
-    lineas = []
-    for l in lineas_req:
-        pid = l.get("producto")
-        cant = l.get("cantidad") or 0
-        prod = productos_by_id.get(pid)
-        if prod and int(cant) > 0:
-            lineas.append((prod, int(cant)))
+    try:
+        lineas = _lineas_con_productos(body.get("lineas", []) or [])
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
 
     if not lineas:
         return JsonResponse({"ok": True, "faltantes": []})
 
-    ok, faltantes = verificar_insumos_para_lineas(lineas)
+    ok, faltantes = verificar_escenarios([lineas], ttl_stock=ttl_snapshot_stock())[0]
 
     # Calcular insumos que quedarán bajo mínimo (advertencia, no bloqueo)
     try:
@@ -414,17 +470,7 @@ def verificar_stock(request):
         return JsonResponse({"ok": True, "faltantes": [], "bajo_minimo": bajo_minimo})
 
     # Enriquecer faltantes con código y nombre si está disponible
-    detalle = []
-    if faltantes:
-        try:
-            from insumos.models import Insumo
-            info = {i.idInsumo: (i.codigo, i.nombre) for i in Insumo.objects.filter(idInsumo__in=faltantes.keys())}
-        except Exception:
-            info = {}
-        for iid, falt in faltantes.items():
-            codigo, nombre = info.get(iid, ("-", f"Insumo {iid}"))
-            detalle.append({"id": iid, "codigo": codigo, "nombre": nombre, "faltan": float(falt)})
-    return JsonResponse({"ok": False, "faltantes": detalle, "bajo_minimo": []})
+    return JsonResponse({"ok": False, "faltantes": _detalle_faltantes(faltantes), "bajo_minimo": []})
 
 
 @require_POST
@@ -440,9 +486,15 @@ def verificar_stock_modificar(request, idPedido: int):
     except Exception:
         return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
 
+    if not isinstance(body, dict):
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
+
     pedido = get_object_or_404(Pedido.objects.select_related("cliente", "estado"), pk=idPedido)
-    producto_id = body.get("producto")
-    cantidad = int(body.get("cantidad") or 0)
+    try:
+        producto_id = _id_desde_json(body.get("producto"))
+        cantidad = _cantidad_desde_json(body.get("cantidad"))
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
 
     if not producto_id or cantidad <= 0:
         # Si no hay datos, no bloquear
@@ -456,21 +508,10 @@ def verificar_stock_modificar(request, idPedido: int):
     lineas_actuales = list(pedido.lineas.select_related('producto').all())
     old_lineas = [(l.producto, l.cantidad) for l in lineas_actuales]
     new_lineas = [(prod, cantidad)]
-    ok, faltantes = verificar_insumos_para_ajuste(old_lineas, new_lineas)
+    ok, faltantes = verificar_escenarios([new_lineas], base_lineas=old_lineas, ttl_stock=ttl_snapshot_stock())[0]
     if ok:
         return JsonResponse({"ok": True, "faltantes": []})
-
-    detalle = []
-    if faltantes:
-        try:
-            from insumos.models import Insumo
-            info = {i.idInsumo: (i.codigo, i.nombre) for i in Insumo.objects.filter(idInsumo__in=faltantes.keys())}
-        except Exception:
-            info = {}
-        for iid, falt in faltantes.items():
-            codigo, nombre = info.get(iid, ("-", f"Insumo {iid}"))
-            detalle.append({"id": iid, "codigo": codigo, "nombre": nombre, "faltan": float(falt)})
-    return JsonResponse({"ok": False, "faltantes": detalle})
+    return JsonResponse({"ok": False, "faltantes": _detalle_faltantes(faltantes)})
 
 
 @require_POST
@@ -490,20 +531,15 @@ def verificar_stock_diferencial(request, idPedido: int):
     except Exception:
         return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
 
-    pedido = get_object_or_404(Pedido.objects.select_related("estado"), pk=idPedido)
-    lineas_req = body.get("lineas", []) or []
-    if not isinstance(lineas_req, list):
+    if not isinstance(body, dict):
         return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
 
-    productos_by_id = {p.idProducto: p for p in Producto.objects.filter(
-        idProducto__in=[l.get("producto") for l in lineas_req if l.get("producto")])}
-    new_lineas = []
-    for l in lineas_req:
-        pid = l.get("producto")
-        cant = l.get("cantidad") or 0
-        prod = productos_by_id.get(pid)
-        if prod and int(cant) > 0:
-            new_lineas.append((prod, int(cant)))
+    pedido = get_object_or_404(Pedido.objects.select_related("estado"), pk=idPedido)
+    try:
+        new_lineas = _lineas_con_productos(body.get("lineas", []) or [])
+        nuevo_estado_id = _id_desde_json(body.get("nuevo_estado_id"))
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
 
     if not new_lineas:
         return JsonResponse({"ok": True, "faltantes": []})
@@ -511,7 +547,6 @@ def verificar_stock_diferencial(request, idPedido: int):
     old_lineas = [(lp.producto, lp.cantidad) for lp in pedido.lineas.select_related('producto').all()]
 
     # Detectar si el nuevo estado es "En Proceso" y el actual es "Pendiente"
-    nuevo_estado_id = body.get("nuevo_estado_id")
     estado_actual_nombre = (pedido.estado.nombre or "").lower() if pedido.estado else ""
     es_transicion_a_proceso = False
     if nuevo_estado_id:
@@ -524,24 +559,78 @@ def verificar_stock_diferencial(request, idPedido: int):
         except EstadoPedido.DoesNotExist:
             pass
 
-    if es_transicion_a_proceso:
-        ok, faltantes = verificar_insumos_para_lineas(new_lineas)
-    else:
-        ok, faltantes = verificar_insumos_para_ajuste(old_lineas, new_lineas)
+    ok, faltantes = verificar_escenarios(
+        [new_lineas],
+        base_lineas=None if es_transicion_a_proceso else old_lineas,
+        ttl_stock=ttl_snapshot_stock(),
+    )[0]
 
     if ok:
         return JsonResponse({"ok": True, "faltantes": []})
+    return JsonResponse({"ok": False, "faltantes": _detalle_faltantes(faltantes)})
 
-    detalle = []
-    if faltantes:
-        try:
-            info = {i.idInsumo: (i.codigo, i.nombre) for i in Insumo.objects.filter(idInsumo__in=faltantes.keys())}
-        except Exception:
-            info = {}
-        for iid, falt in faltantes.items():
-            codigo, nombre = info.get(iid, ("-", f"Insumo {iid}"))
-            detalle.append({"id": iid, "codigo": codigo, "nombre": nombre, "faltan": float(falt)})
-    return JsonResponse({"ok": False, "faltantes": detalle})
+
+# Tope de escenarios por request en verificar_stock_escenarios
+MAX_ESCENARIOS_STOCK = 50
+
+
+@require_POST
+@login_required
+@requiere_permiso("Pedidos")
+def verificar_stock_escenarios(request):
+    """Endpoint AJAX: valida stock para varios escenarios de líneas en una sola llamada
+    (ej. distintas cantidades o combinaciones de productos candidatas).
+    Espera JSON:
+      { "escenarios": [[{"producto": <id>, "cantidad": <int>}, ...], ...], "pedido": <id|null> }
+    Con "pedido" valida cada escenario como ajuste neto sobre las líneas actuales del pedido.
+    Responde: { ok: bool, escenarios: [{ok: bool, faltantes: [{id, codigo, nombre, faltan}]}] }
+    """
+    try:
+        body = json.loads(request.body.decode("utf-8"))
+    except Exception:
+        return JsonResponse({"ok": False, "error": "JSON inválido"}, status=400)
+    if not isinstance(body, dict):
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
+
+    escenarios_req = body.get("escenarios", []) or []
+    if not isinstance(escenarios_req, list) or not all(
+        isinstance(e, list) and all(isinstance(l, dict) for l in e) for e in escenarios_req
+    ):
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
+    if len(escenarios_req) > MAX_ESCENARIOS_STOCK:
+        return JsonResponse(
+            {"ok": False, "error": f"Máximo {MAX_ESCENARIOS_STOCK} escenarios por consulta"}, status=400,
+        )
+
+    try:
+        pedido_id = _id_desde_json(body.get("pedido"))
+        producto_ids = {_id_desde_json(l.get("producto")) for e in escenarios_req for l in e} - {None}
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Identificador de pedido o producto inválido"}, status=400)
+
+    base_lineas = None
+    if pedido_id:
+        pedido = get_object_or_404(Pedido, pk=pedido_id)
+        base_lineas = [(lp.producto, lp.cantidad) for lp in pedido.lineas.select_related('producto').all()]
+
+    productos_by_id = Producto.objects.in_bulk(producto_ids)
+    try:
+        escenarios = [_lineas_desde_json(e, productos_by_id) for e in escenarios_req]
+    except ValueError:
+        return JsonResponse({"ok": False, "error": "Formato inválido"}, status=400)
+
+    resultados = verificar_escenarios(escenarios, base_lineas=base_lineas, ttl_stock=ttl_snapshot_stock())
+    info_faltantes = {}
+    for _ok, faltantes in resultados:
+        info_faltantes.update(faltantes)
+    detalle = {d["id"]: d for d in _detalle_faltantes(info_faltantes)}
+    return JsonResponse({
+        "ok": all(ok for ok, _faltantes in resultados),
+        "escenarios": [
+            {"ok": ok, "faltantes": [dict(detalle[iid], faltan=float(falt)) for iid, falt in faltantes.items()]}
+            for ok, faltantes in resultados
+        ],
+    })
 
 
 @require_POST
@@ -1004,7 +1093,7 @@ def descargar_factura(request, idPedido: int):
             from django.utils import timezone as _tz
             factura = _F(
                 pedido=pedido,
-                numero=_F.proximo_numero(),
+                numero=_F.proximo_numero(reservar=False),
                 fecha_emision=_tz.now(),
                 monto_total=pedido.monto_total,
             )
@@ -1135,13 +1224,10 @@ def cambiar_estado_pedido(request, idPedido: int):
 @requiere_permiso("Pedidos")
 def lista_facturas(request):
     """Lista todas las facturas con su estado de cobro."""
-    from django.db.models import Sum, Value, DecimalField
-    from django.db.models.functions import Coalesce
-
     qs = (
         Factura.objects
         .select_related('pedido__cliente', 'pedido__estado')
-        .prefetch_related('pagos')
+        .with_cobro()
         .order_by('-fecha_emision')
     )
 
@@ -1162,24 +1248,14 @@ def lista_facturas(request):
     if fecha_hasta:
         qs = qs.filter(fecha_emision__date__lte=fecha_hasta)
 
-    # Anotar total pagado para filtrar por estado
-    qs = qs.annotate(
-        total_pagado_sum=Coalesce(
-            Sum('pagos__monto'), Value(0, output_field=DecimalField())
-        )
-    )
-
-    # Filtrar por estado_pago en Python (más simple que SQL complejo)
-    facturas_all = list(qs)
     if estado_fil:
-        facturas_all = [f for f in facturas_all if f.estado_pago == estado_fil]
-
-    total_resultados = len(facturas_all)
+        qs = qs.filter(cobro_estado_pago=estado_fil)
 
     # Paginación
-    paginator = Paginator(facturas_all, 20)
+    paginator = Paginator(qs, 20)
     page_num = request.GET.get('page', 1)
     page_obj = paginator.get_page(page_num)
+    total_resultados = paginator.count
 
     return render(request, 'pedidos/lista_facturas.html', {
         'facturas': page_obj,
@@ -40,6 +40,28 @@ class Presupuesto(models.Model):
         help_text='Se actualiza cada vez que se envía un recordatorio automático. Evita duplicados en el mismo día.',
     )
 
+    SERIE = 'presupuesto'
+
+    @classmethod
+    def _ultima_secuencia(cls) -> int:
+        """Último número emitido antes de usar configuracion.Secuencia."""
+        ultimo = cls.objects.order_by('-id').values_list('id', 'numero').first()
+        if not ultimo:
+            return 0
+        pk, numero = ultimo
+        if numero and numero.startswith('P-'):
+            try:
+                return int(numero.split('-')[1])
+            except (ValueError, IndexError):
+                pass
+        return pk
+
+    @classmethod
+    def proximo_numero(cls) -> str:
+        """Asigna el siguiente número P-NNNNN. Llamar dentro de la transacción que crea el presupuesto."""
+        from configuracion import secuencias
+        return f"P-{secuencias.siguiente(cls.SERIE, inicial=cls._ultima_secuencia):05d}"
+
 
 class PresupuestoDetalle(models.Model):
     presupuesto = models.ForeignKey(Presupuesto, on_delete=models.CASCADE, related_name='detalles')
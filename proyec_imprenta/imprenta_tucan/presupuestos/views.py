@@ -142,15 +142,7 @@ def crear_presupuesto(request):
             presupuesto = form.save(commit=False)
             # Generar número automático de forma thread-safe
             with transaction.atomic():
-                ultimo = Presupuesto.objects.select_for_update().order_by('-id').first()
-                if ultimo and ultimo.numero and ultimo.numero.startswith('P-'):
-                    try:
-                        last_num = int(ultimo.numero.split('-')[1])
-                    except Exception:
-                        last_num = ultimo.id
-                else:
-                    last_num = ultimo.id if ultimo else 0
-                presupuesto.numero = f"P-{last_num + 1:05d}"
+                presupuesto.numero = Presupuesto.proximo_numero()
                 presupuesto.save()
 
             # Leer descuento/IVA global
@@ -382,15 +374,7 @@ def clonar_presupuesto(request, pk):
     from configuracion.models import Parametro
     with transaction.atomic():
         # S-2: generar número de forma atómica igual que en crear_presupuesto
-        ultimo = Presupuesto.objects.select_for_update().order_by('-id').first()
-        if ultimo and ultimo.numero and ultimo.numero.startswith('P-'):
-            try:
-                last_num = int(ultimo.numero.split('-')[1])
-            except Exception:
-                last_num = ultimo.id
-        else:
-            last_num = ultimo.id if ultimo else 0
-        nuevo_numero = f"P-{last_num + 1:05d}"
+        nuevo_numero = Presupuesto.proximo_numero()
 
         nuevo = Presupuesto.objects.create(
             numero=nuevo_numero,
@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ProductosConfig(AppConfig):
+    name = 'productos'
+
+    def ready(self):
+        import productos.signals  # noqa: F401 — invalidación de recetas compiladas
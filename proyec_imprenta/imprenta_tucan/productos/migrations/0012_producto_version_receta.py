@@ -0,0 +1,18 @@
+# Generated by Django 5.2.7 on 2026-10-18 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('productos', '0011_alter_producto_formula_optional'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='version_receta',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
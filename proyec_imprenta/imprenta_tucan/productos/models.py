@@ -74,12 +74,29 @@ class Producto(models.Model):
         'insumos.Insumo', on_delete=models.SET_NULL, null=True, blank=True, related_name='productos_tinta',
         help_text="Insumo de tinta a descontar (gramos)"
     )
+    # Se incrementa con cada cambio de receta, parámetros o fórmula (productos/signals.py);
+    # invalida la receta compilada en cache (productos/recetas.py).
+    version_receta = models.PositiveIntegerField(default=0, editable=False)
 
     # Compatibilidad hacia atrás con código existente que usa 'precio'
     @property
     def precio(self):
         return self.precioUnitario
 
+    def save(self, *args, **kwargs):
+        # version_receta sólo la escribe nueva_version_receta() con F(): un
+        # save() completo de una instancia cargada antes la haría retroceder.
+        if not self._state.adding and not kwargs.get('force_insert') and not args:
+            update_fields = kwargs.get('update_fields')
+            if update_fields is None:
+                diferidos = self.get_deferred_fields()
+                update_fields = [
+                    f.name for f in self._meta.concrete_fields
+                    if not f.primary_key and f.attname not in diferidos
+                ]
+            kwargs['update_fields'] = [f for f in update_fields if f != 'version_receta']
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.nombreProducto
 
@@ -0,0 +1,260 @@
+"""
+Recetas compiladas: consumo de insumos de un producto sin consultas por cálculo.
+
+calcular_consumo_producto (pedidos/services.py) y los chequeos de stock de
+pedidos/utils.py resolvían la receta de cada producto en cada llamada:
+RecetaDinamica + LineaReceta + ParametroProducto, ProductoInsumo y la fórmula
+(parseada y compilada por safe_eval). RecetaCompilada reduce todo eso a una
+vez por producto y versión de receta:
+
+    - bom:     (insumo_id, cantidad_por_unidad, es_costo_fijo) de ProductoInsumo.
+    - receta:  términos de las LineaReceta activas con los parámetros técnicos
+               ya multiplicados — 'fijo' (planchas), 'lineal' (tinta, barniz,
+               laminado: Q × coeficiente / divisor) y 'pliegos' (papel:
+               ceil((Q / R) × (1 + M))). None si no hay RecetaDinamica activa.
+    - formula: (insumo_id, expresión, code object, variables fijas) de
+               producto.formula; simular_formula() la evalúa para un rango de
+               cantidades de una vez.
+
+Los resultados son idénticos a los de la ruta original: misma aritmética
+Decimal, mismo orden de prioridad y mismos casos de error (una receta que
+falla cae al BOM, una fórmula que falla no aporta nada).
+
+Vigencia: Producto.version_receta se incrementa (UPDATE con F()) cada vez que
+cambia algo que alimenta la receta — ver productos/signals.py — y la cache de
+proceso guarda cada RecetaCompilada con la versión con que se compiló. Como
+la versión viaja en la fila de Producto que el llamador ya cargó, comprobar
+la vigencia no cuesta consultas y los demás procesos ven el cambio en su
+próxima lectura del producto. La versión se compara por igualdad: si la
+transacción que la incrementó se revierte, la receta compilada con los datos
+no confirmados deja de coincidir. Producto.formula se compara aparte porque
+se edita en el propio Producto.
+"""
+import logging
+import math
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+logger = logging.getLogger(__name__)
+
+_MIL = Decimal(1000)
+_UNO = Decimal(1)
+_MILESIMA = Decimal('0.001')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+class RecetaCompilada:
+    """Receta de un producto lista para evaluar con cualquier cantidad."""
+
+    __slots__ = ('producto_id', 'version', 'formula_id', 'bom', 'receta', 'formula')
+
+    def __init__(self, producto_id, version, formula_id, bom, receta=None, formula=None):
+        self.producto_id = producto_id
+        self.version = version
+        self.formula_id = formula_id
+        self.bom = tuple(bom)
+        self.receta = None if receta is None else tuple(receta)
+        self.formula = formula
+
+    def vigente_para(self, producto) -> bool:
+        return (
+            self.version == (producto.version_receta or 0)
+            and self.formula_id == producto.formula_id
+        )
+
+    # ------------------------------------------------------------------ #
+    # Evaluación                                                           #
+    # ------------------------------------------------------------------ #
+
+    def consumo(self, cantidad) -> dict:
+        """calcular_consumo_producto(): {insumo_id: Decimal} para `cantidad` unidades."""
+        if self.receta is not None:
+            try:
+                return self._consumo_receta(cantidad)
+            except Exception:
+                pass
+
+        req = defaultdict(Decimal)
+        q = Decimal(cantidad)
+        for insumo_id, por_unidad, es_fijo in self.bom:
+            req[insumo_id] += por_unidad if es_fijo else por_unidad * q
+
+        for insumo_id, qty in self.consumo_formula(cantidad).items():
+            if insumo_id not in req:
+                req[insumo_id] = qty
+        return dict(req)
+
+    def _consumo_receta(self, cantidad) -> dict:
+        """RecetaDinamica.calcular() sobre los términos compilados."""
+        q = Decimal(cantidad)
+        resultado = {}
+        for termino in self.receta:
+            tipo, insumo_id = termino[0], termino[1]
+            if tipo == 'fijo':
+                qty = termino[2]
+            elif tipo == 'lineal':
+                qty = (q * termino[2] / termino[3]).quantize(_MILESIMA)
+            else:
+                qty = Decimal(math.ceil((q / termino[2]) * termino[3]))
+            if qty > 0:
+                if insumo_id in resultado:
+                    resultado[insumo_id] += qty
+                else:
+                    resultado[insumo_id] = qty
+        return resultado
+
+    def consumo_formula(self, cantidad) -> dict:
+        """calcular_con_formula(): {insumo_id: Decimal} o {} si no aplica."""
+        if self.formula is None:
+            return {}
+        from configuracion.utils.safe_eval import evaluar
+
+        insumo_id, expresion, code, fijas = self.formula
+        variables = dict(fijas, tirada=float(cantidad), cantidad=float(cantidad))
+        try:
+            resultado = Decimal(str(evaluar(code, variables)))
+            if resultado > 0:
+                return {insumo_id: resultado}
+        except Exception:
+            return {}
+        return {}
+
+    def simular_formula(self, cantidades):
+        """
+        consumo_formula() para cada una de `cantidades` en una sola evaluación
+        vectorizada: ndarray float, 0 donde la fórmula no aporta consumo.
+        """
+        import numpy as np
+        from configuracion.utils.safe_eval import evaluar_vector
+
+        cantidades = np.asarray(cantidades, dtype=float)
+        if self.formula is None:
+            return np.zeros(cantidades.shape)
+        _insumo_id, expresion, _code, fijas = self.formula
+        try:
+            resultado = evaluar_vector(expresion, dict(fijas, tirada=cantidades, cantidad=cantidades))
+        except Exception:
+            return np.zeros(cantidades.shape)
+        return np.where(np.isfinite(resultado) & (resultado > 0), resultado, 0.0)
+
+
+def _terminos_linea(tipo, insumo_id, p):
+    """Términos de una LineaReceta según LineaReceta.calcular(); [] si siempre da 0."""
+    from productos.models import LineaReceta
+
+    if p is None:
+        return []
+    R, M = Decimal(p.R), Decimal(p.M)
+    C, F, Fo = Decimal(p.C), Decimal(p.F), Decimal(p.Formas)
+    At, Ct, Cb = Decimal(p.At), Decimal(p.Ct), Decimal(p.Cb)
+
+    if tipo == LineaReceta.TIPO_PAPEL:
+        return [('pliegos', insumo_id, R, 1 + M)]
+    if tipo == LineaReceta.TIPO_TINTA:
+        return [('lineal', insumo_id, At * Ct * C * F, _MIL)]
+    if tipo == LineaReceta.TIPO_PLANCHA:
+        return [('fijo', insumo_id, C * F * Fo)]
+    if tipo == LineaReceta.TIPO_BARNIZ and p.tiene_barniz:
+        return [('lineal', insumo_id, At * Cb, _MIL)]
+    if tipo == LineaReceta.TIPO_LAMINADO and p.tiene_laminado:
+        return [('lineal', insumo_id, At, _UNO)]
+    return []
+
+
+def _compilar(productos) -> dict:
+    """
+    Compila la receta de cada producto de `productos` (instancias) en una
+    consulta por modelo involucrado, independiente de la cantidad de productos.
+    """
+    from configuracion.models import Formula
+    from configuracion.utils.safe_eval import compilar
+    from pedidos.services import _build_formula_variables
+    from productos.models import LineaReceta, ParametroProducto, ProductoInsumo, RecetaDinamica
+
+    ids = [p.pk for p in productos]
+    params = {p.producto_id: p for p in ParametroProducto.objects.filter(producto_id__in=ids)}
+
+    bom = defaultdict(list)
+    for producto_id, insumo_id, por_unidad, es_fijo in (
+        ProductoInsumo.objects.filter(producto_id__in=ids).order_by('pk')
+        .values_list('producto_id', 'insumo_id', 'cantidad_por_unidad', 'es_costo_fijo')
+    ):
+        bom[producto_id].append((insumo_id, Decimal(por_unidad), es_fijo))
+
+    recetas = dict(
+        RecetaDinamica.objects.filter(producto_id__in=ids, activo=True).values_list('producto_id', 'pk')
+    )
+    terminos = {producto_id: [] for producto_id in recetas}
+    if recetas:
+        for producto_id, insumo_id, tipo in (
+            LineaReceta.objects.filter(receta_id__in=recetas.values(), activo=True)
+            .order_by('orden', 'tipo', 'pk')
+            .values_list('receta__producto_id', 'insumo_id', 'tipo')
+        ):
+            terminos[producto_id].extend(_terminos_linea(tipo, insumo_id, params.get(producto_id)))
+
+    formulas = {}
+    formula_ids = {p.formula_id for p in productos if p.formula_id}
+    if formula_ids:
+        for pk, insumo_id, expresion in (
+            Formula.objects.filter(pk__in=formula_ids, activo=True).values_list('pk', 'insumo_id', 'expresion')
+        ):
+            try:
+                formulas[pk] = (insumo_id, expresion, compilar(expresion))
+            except Exception:
+                # Una expresión inválida nunca aporta consumo: se descarta al compilar
+                logger.warning('Fórmula #%s no compila; se ignora en el consumo de productos', pk)
+
+    compiladas = {}
+    for producto in productos:
+        formula = None
+        if producto.formula_id in formulas and producto.pk in params:
+            insumo_id, expresion, code = formulas[producto.formula_id]
+            fijas = _build_formula_variables(params[producto.pk], 0)
+            del fijas['tirada'], fijas['cantidad']
+            formula = (insumo_id, expresion, code, fijas)
+        compiladas[producto.pk] = RecetaCompilada(
+            producto.pk, producto.version_receta or 0, producto.formula_id,
+            bom.get(producto.pk, ()), terminos.get(producto.pk), formula,
+        )
+    return compiladas
+
+
+def recetas_compiladas(productos) -> dict:
+    """
+    {producto_id: RecetaCompilada} para `productos` (instancias de Producto;
+    los None se ignoran). Compila sólo los que no están en cache o cuya
+    versión quedó atrás, todos juntos.
+    """
+    productos = {p.pk: p for p in productos if p is not None}
+    with _lock:
+        resultado = {pid: _cache.get(pid) for pid in productos}
+    faltantes = [
+        productos[pid] for pid, compilada in resultado.items()
+        if compilada is None or not compilada.vigente_para(productos[pid])
+    ]
+    if faltantes:
+        nuevas = _compilar(faltantes)
+        with _lock:
+            _cache.update(nuevas)
+        resultado.update(nuevas)
+    return resultado
+
+
+def receta_compilada(producto) -> RecetaCompilada:
+    return recetas_compiladas([producto])[producto.pk]
+
+
+def invalidar(*producto_ids) -> None:
+    """Descarta de la cache de este proceso las recetas de `producto_ids`."""
+    with _lock:
+        for pid in producto_ids:
+            _cache.pop(pid, None)
+
+
+def limpiar_cache() -> None:
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,69 @@
+"""
+Signals de la app productos.
+
+Todo cambio que alimenta el consumo de insumos de un producto — BOM
+(ProductoInsumo), parámetros técnicos, receta dinámica y sus líneas, o la
+fórmula asociada — incrementa Producto.version_receta y descarta la receta
+compilada de este proceso (productos/recetas.py). Los demás procesos la
+recompilan al leer la nueva versión.
+
+Los QuerySet.update()/bulk_create() sobre esos modelos no disparan signals:
+quien los use debe llamar a nueva_version_receta() con los productos tocados.
+"""
+import logging
+
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+
+def nueva_version_receta(producto_ids) -> None:
+    """Incrementa version_receta de `producto_ids` e invalida su receta compilada."""
+    from productos.models import Producto
+    from productos.recetas import invalidar
+
+    producto_ids = [pid for pid in set(producto_ids) if pid is not None]
+    if not producto_ids:
+        return
+    Producto.objects.filter(pk__in=producto_ids).update(version_receta=F('version_receta') + 1)
+    invalidar(*producto_ids)
+
+
+@receiver(post_save, sender='productos.ProductoInsumo')
+@receiver(post_delete, sender='productos.ProductoInsumo')
+@receiver(post_save, sender='productos.ParametroProducto')
+@receiver(post_delete, sender='productos.ParametroProducto')
+@receiver(post_save, sender='productos.RecetaDinamica')
+@receiver(post_delete, sender='productos.RecetaDinamica')
+def _receta_modificada(sender, instance, **kwargs):
+    nueva_version_receta([instance.producto_id])
+
+
+@receiver(post_save, sender='productos.LineaReceta')
+@receiver(post_delete, sender='productos.LineaReceta')
+def _linea_receta_modificada(sender, instance, **kwargs):
+    from productos.models import RecetaDinamica
+
+    nueva_version_receta(
+        RecetaDinamica.objects.filter(pk=instance.receta_id).values_list('producto_id', flat=True)
+    )
+
+
+@receiver(post_save, sender='configuracion.Formula')
+@receiver(pre_delete, sender='configuracion.Formula')
+def _formula_modificada(sender, instance, **kwargs):
+    # pre_delete: después del borrado los productos ya tienen formula=NULL
+    from productos.models import Producto
+
+    nueva_version_receta(Producto.objects.filter(formula_id=instance.pk).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender='productos.Producto')
+@receiver(post_delete, sender='productos.Producto')
+def _producto_guardado(sender, instance, **kwargs):
+    # También en el alta: un pk reutilizado tras un rollback no hereda la receta anterior
+    from productos.recetas import invalidar
+
+    invalidar(instance.pk)
@@ -127,3 +127,14 @@ class ProveedorParametro(models.Model):
 
     def __str__(self):
         return f"{self.clave}: {self.valor}"
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from configuracion.models import ConfigVersion
+        ConfigVersion.bump()
+
+    def delete(self, *args, **kwargs):
+        resultado = super().delete(*args, **kwargs)
+        from configuracion.models import ConfigVersion
+        ConfigVersion.bump()
+        return resultado
@@ -2,6 +2,10 @@ from .models import ProveedorParametro
 
 
 def get_parametro(clave, default=None):
+    from configuracion.snapshot import get_snapshot
+    snapshot = get_snapshot()
+    if snapshot is not None:
+        return snapshot.proveedor_parametro(clave, default)
     try:
         param = ProveedorParametro.objects.get(clave=clave, activo=True)
         return param.valor
@@ -0,0 +1,42 @@
+"""
+Ayudas compartidas por los tests que miden cantidad de queries.
+
+El snapshot de configuración (configuracion/snapshot.py) consulta ConfigVersion
+como máximo cada CONFIG_SNAPSHOT_CHECK_SEGUNDOS: si ese chequeo cae dentro de
+una sola de las ventanas medidas, sus SAVEPOINT/SELECT/RELEASE rompen la
+comparación. queries_estables() lo precarga y lo congela mientras se mide.
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def queries_estables(using=DEFAULT_DB_ALIAS):
+    """CaptureQueriesContext con el snapshot de configuración cargado y sin chequeos de versión."""
+    from configuracion.snapshot import get_snapshot
+
+    with override_settings(CONFIG_SNAPSHOT_CHECK_SEGUNDOS=10 ** 9, CONFIG_SNAPSHOT_TTL_SEGUNDOS=10 ** 9):
+        get_snapshot()
+        with CaptureQueriesContext(connections[using]) as capturadas:
+            yield capturadas
+
+
+def assert_queries_no_crecen(test, pocos, muchos, entre=None, using=DEFAULT_DB_ALIAS):
+    """
+    Corre pocos(), entre() (sin medir) y muchos(), y verifica que ambas
+    mediciones hagan la misma cantidad de queries. Retorna las dos capturas.
+    """
+    with queries_estables(using) as q_pocos:
+        pocos()
+    if entre is not None:
+        entre()
+    with queries_estables(using) as q_muchos:
+        muchos()
+    test.assertEqual(
+        len(q_muchos), len(q_pocos),
+        "\n".join(q["sql"] for q in q_muchos.captured_queries),
+    )
+    return q_pocos, q_muchos